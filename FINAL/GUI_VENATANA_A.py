@@ -8,7 +8,9 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt
 from pathlib import Path
 from M_acomplado2 import ACOPLADO
-from cmsis_svd.parser import SVDParser
+from M_cache_svd import dispositivo_svd
+from M_indice_svd import indice_svd
+from M_configuracion_automatica import MICROCONTROLADORES
 from GUI_TEMA import tema_oscuro
 
 
@@ -20,34 +22,25 @@ class ListaRegistros:
         self.micro = micro
         self.svd_repo = svd_repo
 
-        self.micro_svds = {
-            "stm32f407g-disc1": "STM32F407.svd",
-            "nucleo-f446re": "STM32F446.svd"
-        }
-
     def find_svd_path(self) -> Path:
-        svd_file = self.micro_svds.get(self.micro)
-        if not svd_file:
-            raise ValueError(f"❌ Micro {self.micro} no definido")
-
-        matches = list(self.svd_repo.rglob(svd_file))
-        if not matches:
-            raise FileNotFoundError(f"❌ No se encontró {svd_file}")
+        # Índice del repositorio (M_indice_svd): basta el dispositivo en MICROCONTROLADORES
+        dispositivo = MICROCONTROLADORES.get(self.micro, self.micro)
+        svd_path = indice_svd(self.svd_repo).buscar(dispositivo)
+        if svd_path is None:
+            raise FileNotFoundError(f"❌ No se encontró SVD para {dispositivo}")
 
-        return matches[0]
+        return svd_path
 
     def obtener_perifericos_completos(self):
         svd_path = self.find_svd_path()
-        parser = SVDParser.for_xml_file(svd_path)
-        device = parser.get_device()
+        # Misma cache que el pipeline (M_cache_svd): sin volver a analizar el XML
+        dispositivo = dispositivo_svd(svd_path)
 
         display, siglas = [], []
 
-        for p in device.peripherals:
-            if not p.name:
+        for nombre, descripcion in dispositivo.perifericos():
+            if not nombre:
                 continue
-            nombre = p.name
-            descripcion = getattr(p, "description", "Sin descripción")
             display.append(f"{nombre} – {descripcion}")
             siglas.append(nombre)
 
@@ -365,7 +358,8 @@ class VentanaA(QDialog):
             periferico=periferico,
             numero_fallas=numero,
             ubicacion=ubicacion,
-            tipo_falla=tipo
+            tipo_falla=tipo,
+            broker=True
         )
 
         # ---------------------------------------------
@@ -393,7 +393,8 @@ class VentanaB(QDialog):
                 periferico="GENERAL",
                 numero_fallas=len(self.lista_fallas),
                 ubicacion="usuario",
-                tipo_falla="manual"
+                tipo_falla="manual",
+                broker=True
             )
 
             acop.usuario(abrir_gui=True)
@@ -210,7 +210,8 @@ class VentanaTablaCSV(QDialog):
                 periferico="GPIOD",
                 numero_fallas=1,
                 ubicacion="flash",
-                tipo_falla="replay"
+                tipo_falla="replay",
+                broker=True
             )
             acop.reproducir_csv(self.ruta_csv, abrir_gui=True)
 
@@ -492,7 +493,8 @@ class VentanaCSV(QDialog):
                 periferico="GPIOD",
                 numero_fallas=1,
                 ubicacion="flash",
-                tipo_falla="replay"
+                tipo_falla="replay",
+                broker=True
             )
 
             acop.reproducir_csv(self.ruta_actual_csv, abrir_gui=True)
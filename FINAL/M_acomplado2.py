@@ -1,23 +1,36 @@
 import os
+import random
 import subprocess
 import sys
 import webbrowser
 import time
 
+from contextlib import ExitStack
 from pathlib import Path
 from M_analisis_archivos_elf import ElfAnalyzer
 from M_analizador_svd import ListaRegistros
-from M_generador_lista_fallas_mejorado import RandomFaultGenerator
+from M_cache_svd import TablaBits
+from M_modelo_elf import modelo_elf, hash_archivo
+from M_generador_lista_fallas_mejorado import RandomFaultGenerator, escribir_lista_inyeccion
+from M_cache_etapas import CacheEtapas, huella
 from Pruebas_inyector_2 import FaultInjector
-from M_gestion_mcu import MCU
-from M_golden import GOLDEN
+from M_broker_sondas import abrir_mcu, asegurar_broker
+from M_golden import GOLDEN, CacheGolden, leer_fallas_gold, filtrar_csv_fallas
+from M_detector_campana import obtener_ultima_carpeta_campania
+from M_almacen_snapshots import compactar_delta
+from M_diario_campana import leer_campania, ARCHIVO_LISTA
+from M_politica_captura import leer_politica, politica_desde
 from M_analizador import analizar_campana_avanzado
+from M_ejecucion_paralela import EjecutorParalelo
+from M_cribado import CribadoDosNiveles
+from M_grafo_etapas import GrafoEtapas
 
 
 class ACOPLADO:
     def __init__(self, elf_flash, map_flash, elf_ram, map_ram,
                  microcontrolador, periferico, numero_fallas,
-                 ubicacion, tipo_falla):
+                 ubicacion, tipo_falla, broker=None, artefactos=None, politica=None,
+                 semilla=None, exportar_csv=False):
         # Entradas necesarias
         self.elf_flash = Path(elf_flash)
         self.map_flash = Path(map_flash)
@@ -36,7 +49,9 @@ class ACOPLADO:
             "resume_on_disconnect": False,
             "reset_type": "hw",
             "vector_catch": "reset,hardfault,memmanage,busfault,usagefault",
-            "enable_semihosting": False
+            "enable_semihosting": False,
+            # Reloj SWD: 'frequency' es la base; se calibra al abrir sesión (M_calibracion_swd)
+            "auto_frecuencia": True
         }
 
         # Directorio donde están los archivos SVD
@@ -44,16 +59,39 @@ class ACOPLADO:
         # Para guardar CSVs
         self.out_dir = Path(__file__).resolve().parent
 
+        # Broker de sondas: True -> dirección por defecto (se arranca si no está activo)
+        self.broker = asegurar_broker() if broker is True else broker
+
+        # Artefactos compartidos entre varias instancias (GOLDEN ya medidos);
+        # None -> cada campaña mide el suyo
+        self.artefactos = artefactos
+
+        # Salidas de las etapas ELF/SVD/generador por hash de sus entradas (M_cache_etapas):
+        # pasan entre etapas en memoria y no se recalculan si nada cambió
+        self.cache_etapas = CacheEtapas()
+        # Semilla del generador: con semilla la lista de fallas también se guarda en cache
+        self.semilla = semilla
+        # DIRECCIONES_EJECUTABLE.csv y LISTA_FALLAS_PERIFERICO.csv solo como exportación
+        self.exportar_csv = exportar_csv
+
+        # Política de captura de snapshots (M_politica_captura); None -> las tres fases completas
+        self.politica = politica_desde(politica)
+        if self.politica.perifericos and not self.politica.svd:
+            # Bancos de periféricos: se leen con el SVD del micro
+            try:
+                self.politica.svd = str(ListaRegistros(microcontrolador, self.svd_repo).find_svd_path())
+            except (ValueError, FileNotFoundError) as e:
+                print(f"[WARNING] Captura de periféricos sin SVD: {e}")
+
     # ------------------------------------------------------------------
     # Flujo principal pseudo: ram y regsitros
     # ------------------------------------------------------------------
     def pseudo(self, abrir_gui=True):
         print("\n[ACOPLADO] === Iniciando pseudo_ram ===\n")
 
-        self._modulo_elf()
-        self._modulo_svd()
-        self._modulo_generador_fallas()
-        self._modulo_inyeccion_fallas()
+        # ELF, SVD y conexión con la placa en paralelo; el generador cuando terminan ELF y SVD
+        etapas = self._etapas_previas(sonda=True)
+        self._modulo_inyeccion_fallas(etapas['sonda'])
         self._modulo_golden()
         self._modulo_analizador(abrir_gui)
 
@@ -64,10 +102,8 @@ class ACOPLADO:
     # ------------------------------------------------------------------
     def pseudo_flash(self, abrir_gui=True):
 
-        self._modulo_elf_flash()
-        self._modulo_svd()
-        self._modulo_generador_fallas_flash()
-        self._modulo_inyeccion_fallas()
+        etapas = self._etapas_previas(flash=True, sonda=True)
+        self._modulo_inyeccion_fallas(etapas['sonda'])
         self._modulo_golden()
         self._modulo_analizador(abrir_gui)
 
@@ -84,93 +120,226 @@ class ACOPLADO:
 
         print("\n[ACOPLADO] === Finalizó pseudo_ram ===\n")
 
+    # ------------------------------------------------------------------
+    # Flujo principal emulado: fork desde checkpoint, sin placa
+    # ------------------------------------------------------------------
+    def emulado(self, abrir_gui=True, max_procesos=None):
+        print("\n[ACOPLADO] === Iniciando campaña emulada ===\n")
+
+        self._etapas_previas(flash=str(self.ubicacion).lower() == 'flash')
+        self._modulo_inyeccion_fallas_emulada(max_procesos)
+        self._modulo_analizador(abrir_gui)
+
+        print("\n[ACOPLADO] === Finalizó campaña emulada ===\n")
+
+    # ------------------------------------------------------------------
+    # Flujo principal cribado: emulación completa + confirmación en placa
+    # ------------------------------------------------------------------
+    def cribado(self, abrir_gui=True, fraccion_calibracion=0.05, max_procesos=None):
+        print("\n[ACOPLADO] === Iniciando cribado en dos niveles ===\n")
+
+        self._etapas_previas(flash=str(self.ubicacion).lower() == 'flash')
+        self._modulo_cribado(fraccion_calibracion, max_procesos)
+
+        if abrir_gui:
+            # La última campaña es la de placa: el dashboard muestra los resultados confirmados
+            self._modulo_analizador(abrir_gui)
+
+        print("\n[ACOPLADO] === Finalizó cribado en dos niveles ===\n")
+
     # ------------------------------------------------------------------
     # Flujo principal inyeccion por usuario
     # ------------------------------------------------------------------
     def reproducir_csv(self, ruta_csv, abrir_gui=True):
         print("\n[ACOPLADO] === Reproduciendo fallas desde CSV externo ===\n")
         self._modulo_inyeccion_fallas_csv(ruta_csv)
-        self._modulo_golden()
+        self._modulo_golden(ruta_csv)
         self._modulo_analizador(abrir_gui)
         print("\n[ACOPLADO] === Finalizó reproducción desde CSV ===\n")
 
+    # ------------------------------------------------------------------
+    # Reanudar una campaña interrumpida (diario de progreso)
+    # ------------------------------------------------------------------
+    def reanudar(self, campaign_dir, abrir_gui=True):
+        print(f"\n[ACOPLADO] === Reanudando campaña: {campaign_dir} ===\n")
+        campaign_dir = str(campaign_dir)
+        elfs = self._elfs_campania(campaign_dir)
+        if elfs is None:
+            print("\n[ACOPLADO] === Reanudación abortada ===\n")
+            return
+        if self._modulo_inyeccion_reanudada(campaign_dir, elfs[0]):
+            self._modulo_golden(os.path.join(campaign_dir, ARCHIVO_LISTA), campaign_dir, elfs)
+            self._modulo_analizador(abrir_gui, campaign_dir)
+        print("\n[ACOPLADO] === Finalizó campaña reanudada ===\n")
+
+    def _elfs_campania(self, campaign_dir):
+        """
+        (elf_main, elf_ram) registrados en campania.json; None si el ELF principal ya no
+        es el firmware con el que empezó la campaña (firmware_hash distinto o archivo ausente).
+        """
+        try:
+            datos = leer_campania(campaign_dir)
+        except Exception as e:
+            print(f"[ERROR] No se pudo leer la campaña {campaign_dir}: {e}")
+            return None
+        elf_main = datos.get('elf_main_path') or str(self.elf_flash)
+        elf_ram = datos.get('elf_ram_path') or str(self.elf_ram)
+        esperado = datos.get('firmware_hash')
+        if esperado:
+            if not os.path.isfile(elf_main):
+                print(f"[ERROR] ELF de la campaña no encontrado: {elf_main}")
+                return None
+            actual = hash_archivo(elf_main)
+            if actual != esperado:
+                print(f"[ERROR] El ELF {elf_main} cambió desde el inicio de la campaña "
+                      f"(firmware_hash {esperado[:12]}… != {actual[:12]}…)")
+                return None
+        else:
+            print("[WARNING] La campaña no registra firmware_hash: no se verifica el ELF.")
+        return elf_main, elf_ram
+
+    # ------------------------------------------------------------------
+    # Etapas previas a la inyección (grafo de dependencias, M_grafo_etapas)
+    # ------------------------------------------------------------------
+    def _etapas_previas(self, flash=False, sonda=False):
+        """
+        ELF y SVD no dependen entre sí y corren a la vez; el generador espera a ambos y
+        recibe sus resultados en memoria (direcciones y TablaBits). Con sonda=True la sesión con la placa (conectar + programar el ELF) se abre en
+        paralelo y queda en resultados['sonda'] para _modulo_inyeccion_fallas.
+        """
+        grafo = GrafoEtapas("ACOPLADO")
+        grafo.etapa('elf', self._modulo_elf_flash if flash else self._modulo_elf)
+        grafo.etapa('svd', self._modulo_svd)
+        generador = self._modulo_generador_fallas_flash if flash else self._modulo_generador_fallas
+        grafo.etapa('generador', lambda: generador(grafo.resultados['elf'], grafo.resultados['svd']),
+                    depende=['elf', 'svd'])
+        if sonda:
+            grafo.etapa('sonda', self._conectar_sonda, liberar=self._cerrar_sonda)
+        return grafo.ejecutar()
+
+    def _conectar_sonda(self):
+        """(mcu, pila) con la sesión ya abierta; None si no se pudo (la inyección lo reintenta)."""
+        pila = ExitStack()
+        try:
+            mcu = pila.enter_context(abrir_mcu(self.opts, str(self.elf_flash), broker=self.broker))
+        except Exception as e:
+            pila.close()
+            print(f"[ERROR] No se pudo abrir la sesión con la placa: {e}")
+            return None
+        return mcu, pila
+
+    @staticmethod
+    def _cerrar_sonda(sesion):
+        if sesion is not None:
+            sesion[1].close()
+
     # ------------------------------------------------------------------
     # Módulo 1: Análisis ELF
     # ------------------------------------------------------------------
-    def _modulo_elf(self):
+    def _modulo_elf(self, elf_path=None):
+        """Direcciones ejecutables de .text (np.ndarray uint32), por hash del ELF."""
+        elf_path = Path(elf_path or self.elf_flash)
         print("[ACOPLADO] Ejecutando módulo: análisis ELF...")
-        analizador = ElfAnalyzer(self.elf_flash)
-        analizador.list_exec_addresses()
-        analizador.generate_csv()
+        direcciones = self.cache_etapas.obtener(
+            'elf', {'elf': hash_archivo(elf_path), 'seccion': '.text'},
+            lambda: modelo_elf(elf_path).direcciones_ejecutables('.text'),
+            formato='npz', a_tablas=lambda d: {'direcciones': d}, desde_tablas=lambda t: t['direcciones'])
+        print(f"[INFO] Total de direcciones encontradas: {len(direcciones)}")
+        if self.exportar_csv:
+            analizador = ElfAnalyzer(elf_path)
+            analizador.list_exec_addresses()
+            analizador.generate_csv(self.out_dir)
         print("[ACOPLADO] Módulo análisis ELF completado.\n")
+        return direcciones
 
     def _modulo_elf_flash(self):
-        print("[ACOPLADO] Ejecutando módulo: análisis ELF...")
-        analizador = ElfAnalyzer(self.elf_ram)
-        analizador.list_exec_addresses()
-        analizador.generate_csv()
-        print("[ACOPLADO] Módulo análisis ELF completado.\n")
-
+        return self._modulo_elf(self.elf_ram)
 
     # ------------------------------------------------------------------
     # Módulo 2: Analizador SVD
     # ------------------------------------------------------------------
     def _modulo_svd(self):
+        """Bits del periférico elegido (TablaBits), por hash del SVD + micro + periférico."""
         print("[ACOPLADO] Ejecutando módulo: análisis SVD...")
-        generator = ListaRegistros(self.microcontrolador, self.svd_repo)
-        generator.generador_lista_fallas()
-        generator.save_results(self.out_dir)
-        generator.save_results_peripheral(self.periferico, self.out_dir)
+        svd_path = ListaRegistros(self.microcontrolador, self.svd_repo).find_svd_path()
+        bits = self.cache_etapas.obtener(
+            'svd', {'svd': hash_archivo(svd_path), 'micro': self.microcontrolador,
+                    'periferico': str(self.periferico).upper()},
+            self._analizar_svd, formato='npz', a_tablas=TablaBits.a_tablas, desde_tablas=TablaBits.desde_tablas)
+        if self.exportar_csv:
+            csv_path = self.out_dir / "LISTA_FALLAS_PERIFERICO.csv"
+            bits.guardar_csv(csv_path)
+            print(f"✅ CSV filtrado generado para {self.periferico} en: {csv_path}")
         print("[ACOPLADO] Módulo análisis SVD completado.\n")
+        return bits
+
+    def _analizar_svd(self):
+        generator = ListaRegistros(self.microcontrolador, self.svd_repo)
+        # Solo el periférico elegido (streaming) mientras el SVD completo no esté en cache
+        generator.generador_lista_fallas(perifericos=[self.periferico])
+        return generator.filtrar_periferico(self.periferico)
 
     # ------------------------------------------------------------------
     # Módulo 3: Generador de fallas pseudoaleatorio
     # ------------------------------------------------------------------
-    def _modulo_generador_fallas(self):
+    def _modulo_generador_fallas(self, direcciones=None, bits=None, elf_path=None, map_path=None):
+        """
+        Lista de fallas a partir de las salidas de ELF y SVD (en memoria; sin ellas, de los
+        CSV exportados). Siempre se escribe LISTA_INYECCION.csv: es la entrada de la campaña.
+        """
         print("[ACOPLADO] Ejecutando módulo: generador de fallas...")
-        flash_csv = self.out_dir / "DIRECCIONES_EJECUTABLE.csv"
-        reg_csv = self.out_dir / "LISTA_FALLAS_PERIFERICO.csv"
-        map_path = self.map_flash
+        elf_path = Path(elf_path or self.elf_flash)
+        map_path = Path(map_path or self.map_flash)
         out_csv = self.out_dir / "LISTA_INYECCION.csv"
 
-        gen = RandomFaultGenerator(
-            flash_csv=flash_csv,
-            reg_csv=reg_csv,
-            elf_path=self.elf_flash,
-            map_path=map_path
-        )
-
-        gen.load_flash_csv()
-        gen.load_reg_csv()
-        faults = gen.generate_random_faults(self.numero_fallas, self.ubicacion, self.tipo_falla)
-        gen.save_to_csv(faults, out_csv)
+        def generar():
+            gen = RandomFaultGenerator(
+                flash_csv=self.out_dir / "DIRECCIONES_EJECUTABLE.csv",
+                reg_csv=self.out_dir / "LISTA_FALLAS_PERIFERICO.csv",
+                elf_path=elf_path,
+                map_path=map_path
+            )
+            if direcciones is not None:
+                gen.usar_direcciones(direcciones)
+            else:
+                gen.load_flash_csv()
+            if bits is not None:
+                gen.usar_bits(bits)
+            else:
+                gen.load_reg_csv()
+            if self.semilla is not None:
+                random.seed(self.semilla)
+            faults = gen.generate_random_faults(self.numero_fallas, self.ubicacion, self.tipo_falla)
+            gen.resumen_secciones(faults)
+            return faults
+
+        if self.semilla is None or direcciones is None or bits is None:
+            # Sin semilla cada campaña sortea una lista nueva: no hay nada que reutilizar
+            faults = generar()
+        else:
+            faults = self.cache_etapas.obtener('generador', {
+                'elf': hash_archivo(elf_path),
+                'map': hash_archivo(map_path) if map_path.is_file() else None,
+                'direcciones': huella(direcciones),
+                'bits': huella(*bits.a_tablas().values()),
+                'numero_fallas': int(self.numero_fallas),
+                'ubicacion': str(self.ubicacion).lower(),
+                'tipo_falla': str(self.tipo_falla).lower(),
+                'semilla': self.semilla,
+            }, generar)
+        escribir_lista_inyeccion(faults, out_csv)
 
         print("[ACOPLADO] Módulo generador de fallas completado.\n")
+        return faults
 
-    def _modulo_generador_fallas_flash(self):
-        print("[ACOPLADO] Ejecutando módulo: generador de fallas...")
-        flash_csv = self.out_dir / "DIRECCIONES_EJECUTABLE.csv"
-        reg_csv = self.out_dir / "LISTA_FALLAS_PERIFERICO.csv"
-        out_csv = self.out_dir / "LISTA_INYECCION.csv"
-
-        gen = RandomFaultGenerator(
-            flash_csv=flash_csv,
-            reg_csv=reg_csv,
-            elf_path=self.elf_ram,
-            map_path=self.map_ram
-        )
-
-        gen.load_flash_csv()
-        gen.load_reg_csv()
-        faults = gen.generate_random_faults(self.numero_fallas, self.ubicacion, self.tipo_falla)
-        gen.save_to_csv(faults, out_csv)
-
-        print("[ACOPLADO] Módulo generador de fallas completado.\n")
+    def _modulo_generador_fallas_flash(self, direcciones=None, bits=None):
+        return self._modulo_generador_fallas(direcciones, bits, self.elf_ram, self.map_ram)
 
     # ------------------------------------------------------------------
     # Módulo 4: Inyección de fallas
     # ------------------------------------------------------------------
-    def _modulo_inyeccion_fallas(self):
+    def _modulo_inyeccion_fallas(self, sesion=None):
+        """sesion: (mcu, pila) abierta por _conectar_sonda; None -> se abre aquí."""
         elf_main = str(self.elf_flash)
         elf_ram = str(self.elf_ram)
         csv_file = str(self.out_dir / "LISTA_INYECCION.csv")
@@ -178,13 +347,16 @@ class ACOPLADO:
         print(f"[DEBUG] CSV path: {csv_file}, ELF main: {elf_main}, ELF RAM: {elf_ram}")
 
         try:
-            with MCU(self.opts, elf_main) as mcu:
+            with (sesion[1] if sesion else ExitStack()) as pila:
+                mcu = sesion[0] if sesion else pila.enter_context(abrir_mcu(self.opts, elf_main, broker=self.broker))
                 injector = FaultInjector(
                     mcu=mcu,
                     csv_file=csv_file,
                     elf_main_path=elf_main,
                     elf_ram_path=elf_ram,
-                    main_opts=self.opts
+                    main_opts=self.opts,
+                    broker=self.broker,
+                    politica=self.politica
                 )
                 print("[INFO] Inyección de fallas iniciada.")
                 injector.ejecutar()
@@ -200,13 +372,15 @@ class ACOPLADO:
         print(f"[DEBUG] CSV path: {csv_file}, ELF main: {elf_main}, ELF RAM: {elf_ram}")
 
         try:
-            with MCU(self.opts, elf_main) as mcu:
+            with abrir_mcu(self.opts, elf_main, broker=self.broker) as mcu:
                 injector = FaultInjector(
                     mcu=mcu,
                     csv_file=csv_file,
                     elf_main_path=elf_main,
                     elf_ram_path=elf_ram,
-                    main_opts=self.opts
+                    main_opts=self.opts,
+                    broker=self.broker,
+                    politica=self.politica
                 )
                 print("[INFO] Inyección de fallas iniciada.")
                 injector.ejecutar()
@@ -226,13 +400,15 @@ class ACOPLADO:
         print(f"[DEBUG] CSV path: {csv_file}, ELF main: {elf_main}, ELF RAM: {elf_ram}")
 
         try:
-            with MCU(self.opts, elf_main) as mcu:
+            with abrir_mcu(self.opts, elf_main, broker=self.broker) as mcu:
                 injector = FaultInjector(
                     mcu=mcu,
                     csv_file=csv_file,
                     elf_main_path=elf_main,
                     elf_ram_path=elf_ram,
-                    main_opts=self.opts
+                    main_opts=self.opts,
+                    broker=self.broker,
+                    politica=self.politica
                 )
                 print("[INFO] Inyección de fallas iniciada desde CSV externo.")
                 injector.ejecutar()
@@ -240,13 +416,44 @@ class ACOPLADO:
         except Exception as e:
             print(f"[ERROR] Falló la inyección de fallas desde CSV externo: {e}")
 
-    # ------------------------------------------------------------------
-    # Módulo 5: GOLDEN
-    # ------------------------------------------------------------------
-    def _modulo_golden(self):
-        print("\n[ACOPLADO] Ejecutando módulo: GOLDEN...\n")
-        elf_main = str(self.elf_flash)
-        elf_ram = str(self.elf_ram)
+    def _modulo_inyeccion_reanudada(self, campaign_dir, elf_main):
+        """True si la campaña terminó todas sus fallas."""
+        try:
+            with abrir_mcu(self.opts, elf_main, broker=self.broker) as mcu:
+                injector = FaultInjector.reanudar_campania(campaign_dir, mcu=mcu, main_opts=self.opts,
+                                                           broker=self.broker)
+                print("[INFO] Inyección de fallas reanudada.")
+                injector.ejecutar()
+                pendientes = len(injector.lista_fallas) - len(injector.completadas)
+                if pendientes:
+                    print(f"[WARNING] Quedan {pendientes} fallas pendientes: vuelve a reanudar la campaña.")
+                    return False
+                print("[INFO] Inyección de fallas completada.")
+                return True
+        except Exception as e:
+            print(f"[ERROR] Falló la reanudación de la campaña: {e}")
+            return False
+
+    def _modulo_inyeccion_fallas_emulada(self, max_procesos=None):
+        csv_file = str(self.out_dir / "LISTA_INYECCION.csv")
+        print(f"[DEBUG] CSV path: {csv_file}, ELF main: {self.elf_flash}, ELF RAM: {self.elf_ram}")
+
+        try:
+            ejecutor = EjecutorParalelo(
+                csv_file=csv_file,
+                elf_main_path=str(self.elf_flash),
+                elf_ram_path=str(self.elf_ram),
+                max_procesos=max_procesos,
+                politica=self.politica
+            )
+            print("[INFO] Inyección de fallas emulada iniciada.")
+            # Incluye el GOLDEN emulado: no hace falta _modulo_golden()
+            ejecutor.ejecutar(golden=True)
+            print("[INFO] Inyección de fallas emulada completada.")
+        except Exception as e:
+            print(f"[ERROR] Falló la inyección de fallas emulada: {e}")
+
+    def _modulo_cribado(self, fraccion_calibracion=0.05, max_procesos=None):
         csv_file = str(self.out_dir / "LISTA_INYECCION.csv")
 
         if not os.path.exists(csv_file):
@@ -254,40 +461,78 @@ class ACOPLADO:
             return
 
         try:
-            with MCU(self.opts, elf_main) as mcu:
-                injector = GOLDEN(
-                    mcu=mcu,
-                    csv_file=csv_file,
-                    elf_main_path=elf_main,
-                    elf_ram_path=elf_ram,
-                    main_opts=self.opts
-                )
-                num_fallas = len(injector.lista_fallas)
-                print(f"[INFO] GOLDEN cargado con {num_fallas} fallas")
-                if num_fallas > 0:
-                    injector.ejecutar()
-                    print("[INFO] Ejecución GOLDEN completada.")
+            cribado = CribadoDosNiveles(
+                csv_file=csv_file,
+                elf_main_path=str(self.elf_flash),
+                elf_ram_path=str(self.elf_ram),
+                main_opts=self.opts,
+                broker=self.broker,
+                fraccion_calibracion=fraccion_calibracion,
+                max_procesos=max_procesos,
+                politica=self.politica
+            )
+            # Incluye GOLDEN y analizador de ambos niveles
+            cribado.ejecutar()
+            print("[INFO] Cribado en dos niveles completado.")
         except Exception as e:
-            print(f"[ERROR] Falló GOLDEN: {e}")
+            print(f"[ERROR] Falló el cribado en dos niveles: {e}")
 
-    def _modulo_golden_usuario(self):
+    # ------------------------------------------------------------------
+    # Módulo 5: GOLDEN
+    # ------------------------------------------------------------------
+    def _modulo_golden(self, csv_file=None, campaign_dir=None, elfs=None):
         print("\n[ACOPLADO] Ejecutando módulo: GOLDEN...\n")
-        elf_main = str(self.elf_flash)
-        elf_ram = str(self.elf_ram)
-        csv_file = str(self.out_dir / "LISTA_INYECCION_USUARIO.csv")
+        csv_file = str(csv_file or self.out_dir / "LISTA_INYECCION.csv")
 
         if not os.path.exists(csv_file):
             print(f"[ERROR] CSV de fallas no encontrado: {csv_file}")
             return
 
+        if self.artefactos is not None:
+            self._modulo_golden_cache(csv_file, campaign_dir, elfs)
+            return
+
+        self._ejecutar_golden(csv_file, campaign_dir, elfs=elfs)
+
+    def _modulo_golden_usuario(self):
+        self._modulo_golden(self.out_dir / "LISTA_INYECCION_USUARIO.csv")
+
+    def _modulo_golden_cache(self, csv_file, campaign_dir=None, elfs=None):
+        """GOLDEN solo para las direcciones que no estén ya en la cache compartida."""
+        elf_main, elf_ram = elfs or (str(self.elf_flash), str(self.elf_ram))
+        cache = self.artefactos.setdefault('golden', CacheGolden())
+
+        try:
+            lista = leer_fallas_gold(csv_file)
+            campaign_dir = campaign_dir or obtener_ultima_carpeta_campania()
+            faltantes = cache.faltantes(lista, elf_main, elf_ram, leer_politica(campaign_dir))
+
+            if faltantes:
+                csv_parcial = filtrar_csv_fallas(csv_file, str(self.out_dir / "LISTA_GOLDEN_FALTANTES.csv"),
+                                                 {f.id_falla for f in faltantes})
+                self._ejecutar_golden(csv_parcial, campaign_dir, compactar=False, elfs=(elf_main, elf_ram))
+                cache.registrar(campaign_dir, faltantes, elf_main, elf_ram)
+
+            escritas = cache.escribir(campaign_dir, lista, elf_main, elf_ram)
+            compactar_delta(campaign_dir)
+            print(f"[INFO] GOLDEN: {len(lista) - len(faltantes)} reutilizadas de cache, "
+                  f"{len(faltantes)} medidas, {escritas} filas en {campaign_dir}")
+        except Exception as e:
+            print(f"[ERROR] Falló GOLDEN con cache: {e}")
+
+    def _ejecutar_golden(self, csv_file, campaign_dir=None, compactar=True, elfs=None):
+        elf_main, elf_ram = elfs or (str(self.elf_flash), str(self.elf_ram))
         try:
-            with MCU(self.opts, elf_main) as mcu:
+            with abrir_mcu(self.opts, elf_main, broker=self.broker) as mcu:
                 injector = GOLDEN(
                     mcu=mcu,
                     csv_file=csv_file,
                     elf_main_path=elf_main,
                     elf_ram_path=elf_ram,
-                    main_opts=self.opts
+                    main_opts=self.opts,
+                    campaign_dir=campaign_dir,
+                    broker=self.broker,
+                    compactar=compactar
                 )
                 num_fallas = len(injector.lista_fallas)
                 print(f"[INFO] GOLDEN cargado con {num_fallas} fallas")
@@ -300,9 +545,9 @@ class ACOPLADO:
     # ------------------------------------------------------------------
     # Módulo 6: Analizador avanzado + Streamlit
     # ------------------------------------------------------------------
-    def _modulo_analizador(self, abrir_gui=True):
+    def _modulo_analizador(self, abrir_gui=True, campaign_dir=None):
         print("[ACOPLADO] Ejecutando módulo: Analizador Avanzado...")
-        analizar_campana_avanzado()
+        analizar_campana_avanzado(campaign_dir)
 
         if abrir_gui:
             streamlit_file = Path(__file__).parent / "M_iterativo.py"
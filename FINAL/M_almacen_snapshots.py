@@ -0,0 +1,492 @@
+#------------------------MODULO ALMACEN BINARIO DE SNAPSHOTS-------------------------------#
+"""
+M_almacen_snapshots.py
+
+Almacenamiento compacto de los snapshots de una campaña. En lugar de un CSV con
+16 registros + 256 columnas MEM_i en texto hexadecimal, cada fase se guarda como
+una matriz uint32 (little-endian) con una fila por snapshot:
+
+    Test_ID, Fault_ID, PC, SP, LR, R0..R12, MEM_0..MEM_n [, X_<región>_i ...]
+
+(las columnas X_ son las regiones extra de la política de captura, M_politica_captura)
+
+Archivos por fase (before, after, after_stable, gold) en la carpeta de campaña:
+    snapshots_<fase>.u32   filas crudas mientras la campaña corre (append, a prueba de cortes)
+    snapshots_<fase>.npy   matriz final (se abre con memory-map)
+    snapshots_<fase>.json  columnas y tipo de dato
+
+Modo delta: como casi toda la ventana after/after_stable coincide con GOLDEN, las fases
+before/after/after_stable pueden guardarse solo como pares (columna, valor) que difieren
+de la fila GOLDEN del mismo Fault_ID:
+    snapshots_referencia.npy       copia fija de GOLDEN usada como base de los deltas
+    snapshots_<fase>.d32           registros delta crudos durante la campaña
+    snapshots_<fase>.delta.npz     filas (Test_ID, Fault_ID, inicio, n) + pares (columna, valor)
+Se activa al escribir si GOLDEN ya existe (AlmacenSnapshots(..., referencia=...)) o
+después, compactando una campaña terminada con compactar_delta().
+
+El analizador y el dashboard leen directamente el binario (cargar_snapshots), que
+reconstruye las filas delta de forma transparente; los CSV con el formato anterior se
+generan bajo demanda con exportar_csv().
+
+Uso:
+    python M_almacen_snapshots.py [carpeta_campaña]     # exporta los CSV (por defecto, la última)
+"""
+import csv
+import json
+import numbers
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+DTYPE = np.dtype('<u4')
+
+FASES = ('before', 'after', 'after_stable', 'gold')
+
+COLUMNAS_REGISTROS = ['PC', 'SP', 'LR'] + [f'R{i}' for i in range(13)]
+
+ARCHIVO_REFERENCIA = "snapshots_referencia.npy"
+
+# Fases que se pueden guardar como delta (GOLDEN siempre se guarda completo)
+FASES_DELTA = ('before', 'after', 'after_stable')
+
+EXTENSIONES = ('u32', 'npy', 'd32', 'delta.npz', 'csv')
+
+
+# ---------- utilidades ----------
+def columnas(mem_cols_count, extras=()):
+    return (['Test_ID', 'Fault_ID'] + COLUMNAS_REGISTROS + [f"MEM_{i}" for i in range(mem_cols_count)]
+            + list(extras))
+
+
+def a_u32(val):
+    """Entero de 32 bits sin signo (acepta int, numpy o texto '0x...'); 0 si no es válido."""
+    try:
+        if val is None:
+            return 0
+        if isinstance(val, numbers.Integral):
+            return int(val) & 0xFFFFFFFF
+        return int(str(val), 0) & 0xFFFFFFFF
+    except (TypeError, ValueError):
+        return 0
+
+
+def ruta_fase(campaign_dir, fase, extension):
+    return os.path.join(campaign_dir, f"snapshots_{fase}.{extension}")
+
+
+def _leer_meta(campaign_dir, fase):
+    try:
+        with open(ruta_fase(campaign_dir, fase, 'json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _leer_columnas(campaign_dir, fase):
+    return _leer_meta(campaign_dir, fase).get('columnas')
+
+
+def _escribir_columnas(campaign_dir, fase, cols, formato='completo'):
+    with open(ruta_fase(campaign_dir, fase, 'json'), 'w') as f:
+        json.dump({'dtype': DTYPE.str, 'formato': formato, 'columnas': cols}, f)
+
+
+def _borrar_fase(campaign_dir, fase, extensiones=EXTENSIONES):
+    for ext in extensiones:
+        ruta = ruta_fase(campaign_dir, fase, ext)
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+# ---------- referencia GOLDEN para los deltas ----------
+class ReferenciaGolden:
+    """
+    Filas GOLDEN sin Test_ID/Fault_ID (primera fila de cada Fault_ID), apiladas en una
+    matriz ordenada por Fault_ID: las bases de muchas filas se toman con un solo índice.
+    """
+
+    def __init__(self, matriz):
+        ids, primeras = np.unique(np.asarray(matriz[:, 1]), return_index=True)
+        self.ids = ids
+        self.filas = np.ascontiguousarray(matriz[primeras, 2:], dtype=DTYPE)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, fault_id, defecto=None):
+        i = np.searchsorted(self.ids, fault_id)
+        return self.filas[i] if i < len(self.ids) and self.ids[i] == fault_id else defecto
+
+    def bases(self, fault_ids, n):
+        """Matriz (len(fault_ids), n): fila GOLDEN de cada Fault_ID ajustada a n columnas (ceros si no existe)."""
+        fault_ids = np.asarray(fault_ids)
+        bases = np.zeros((len(fault_ids), n), dtype=DTYPE)
+        if not len(self.ids) or not len(fault_ids):
+            return bases
+        i = np.minimum(np.searchsorted(self.ids, fault_ids), len(self.ids) - 1)
+        existe = self.ids[i] == fault_ids
+        k = min(n, self.filas.shape[1])
+        bases[existe, :k] = self.filas[i[existe], :k]
+        return bases
+
+
+def congelar_referencia(campaign_dir):
+    """
+    Copia los snapshots GOLDEN actuales a snapshots_referencia.npy y devuelve la
+    ReferenciaGolden. La copia no cambia aunque GOLDEN se vuelva a medir, así los deltas
+    ya escritos siguen siendo válidos.
+    """
+    matriz, _ = cargar_matriz(campaign_dir, 'gold', mmap=False)
+    if matriz is None or len(matriz) == 0:
+        return None
+    np.save(os.path.join(campaign_dir, ARCHIVO_REFERENCIA), matriz)
+    return ReferenciaGolden(matriz)
+
+
+def cargar_referencia(campaign_dir):
+    ruta = os.path.join(campaign_dir, ARCHIVO_REFERENCIA)
+    if not os.path.exists(ruta):
+        return None
+    return ReferenciaGolden(np.load(ruta))
+
+
+def _bases(referencia, fault_ids, n):
+    """Filas GOLDEN de cada Fault_ID ajustadas a n columnas (ceros si no hay referencia)."""
+    if not referencia:
+        return np.zeros((len(fault_ids), n), dtype=DTYPE)
+    return referencia.bases(fault_ids, n)
+
+
+def _base(referencia, fault_id, n):
+    """Fila GOLDEN del Fault_ID ajustada a n columnas (ceros si no existe)."""
+    return _bases(referencia, [int(fault_id)], n)[0]
+
+
+# ---------- escritura ----------
+class AlmacenSnapshots:
+    """
+    Una fase de snapshots de una campaña; las filas se agregan como bytes crudos.
+    Con referencia (ReferenciaGolden de congelar_referencia) las filas se guardan como delta.
+    Con reanudar=True no se borra lo ya guardado de la fase (campaña reanudada).
+    """
+
+    def __init__(self, campaign_dir, fase, mem_cols_count, referencia=None, reanudar=False, extras=()):
+        self.campaign_dir = campaign_dir
+        self.fase = fase
+        self.mem_cols_count = mem_cols_count
+        self.extras = list(extras)
+        self.columnas = columnas(mem_cols_count, self.extras)
+        self.referencia = referencia
+        self.delta = referencia is not None
+        self.ruta_raw = ruta_fase(campaign_dir, fase, 'd32' if self.delta else 'u32')
+        self.ruta_npy = ruta_fase(campaign_dir, fase, 'npy')
+        self.ruta_delta = ruta_fase(campaign_dir, fase, 'delta.npz')
+
+        # Una fase nueva reemplaza cualquier resultado anterior de la misma fase;
+        # al reanudar se sigue agregando a lo ya guardado
+        if not reanudar:
+            _borrar_fase(campaign_dir, fase)
+        open(self.ruta_raw, 'ab').close()
+        _escribir_columnas(campaign_dir, fase, self.columnas, 'delta' if self.delta else 'completo')
+
+    def fila(self, test_id, fault_id, snap):
+        """Bytes de una fila a partir del dict de construir_snapshot_dict()."""
+        valores = [a_u32(snap.get(c)) for c in COLUMNAS_REGISTROS]
+        valores += [a_u32(snap.get(f'MEM_{i}')) for i in range(self.mem_cols_count)]
+        valores += [a_u32(snap.get(c)) for c in self.extras]
+        if not self.delta:
+            return np.array([a_u32(test_id), a_u32(fault_id)] + valores, dtype=DTYPE).tobytes()
+
+        # Registro delta: Test_ID, Fault_ID, n, (columna, valor) * n
+        valores = np.array(valores, dtype=DTYPE)
+        idx = np.flatnonzero(valores != _base(self.referencia, fault_id, len(valores)))
+        registro = np.empty(3 + 2 * len(idx), dtype=DTYPE)
+        registro[:3] = (a_u32(test_id), a_u32(fault_id), len(idx))
+        registro[3::2] = idx
+        registro[4::2] = valores[idx]
+        return registro.tobytes()
+
+    def finalizar(self):
+        """Consolida las filas crudas en .npy o .delta.npz (se puede llamar varias veces)."""
+        if not os.path.exists(self.ruta_raw):
+            return
+        if self.delta:
+            filas, pares = _leer_raw_delta(self.ruta_raw)
+            if os.path.exists(self.ruta_delta):
+                filas, pares = _unir_delta(*_cargar_npz(self.ruta_delta), filas, pares)
+            np.savez(self.ruta_delta, filas=filas, pares=pares)
+        else:
+            nuevas = _leer_raw(self.ruta_raw, len(self.columnas))
+            if os.path.exists(self.ruta_npy):
+                nuevas = np.concatenate([np.load(self.ruta_npy), nuevas])
+            np.save(self.ruta_npy, nuevas)
+        os.remove(self.ruta_raw)
+
+
+def guardar_snapshots(campaign_dir, fase, filas, mem_cols_count, extras=()):
+    """Escribe una fase completa de una vez (filas: listas de enteros en el orden de columnas())."""
+    cols = columnas(mem_cols_count, extras)
+    matriz = np.array(filas, dtype=DTYPE).reshape(-1, len(cols))
+    _borrar_fase(campaign_dir, fase)
+    np.save(ruta_fase(campaign_dir, fase, 'npy'), matriz)
+    _escribir_columnas(campaign_dir, fase, cols)
+    return ruta_fase(campaign_dir, fase, 'npy')
+
+
+# ---------- lectura ----------
+def _leer_raw(ruta, n_cols):
+    datos = np.fromfile(ruta, dtype=DTYPE)
+    completas = len(datos) // n_cols          # una fila cortada a medias se descarta
+    return datos[:completas * n_cols].reshape(completas, n_cols)
+
+
+def _leer_raw_delta(ruta):
+    datos = np.fromfile(ruta, dtype=DTYPE)
+    filas, pares = [], []
+    inicio = pos = 0
+    while pos + 3 <= len(datos):
+        n = int(datos[pos + 2])
+        fin = pos + 3 + 2 * n
+        if fin > len(datos):                   # registro cortado a medias
+            break
+        filas.append((datos[pos], datos[pos + 1], inicio, n))
+        pares.append(datos[pos + 3:fin].reshape(n, 2))
+        inicio += n
+        pos = fin
+    return (np.array(filas, dtype=DTYPE).reshape(-1, 4),
+            np.concatenate(pares) if pares else np.empty((0, 2), dtype=DTYPE))
+
+
+def _cargar_npz(ruta):
+    with np.load(ruta) as datos:
+        return datos['filas'], datos['pares']
+
+
+def _unir_delta(filas_a, pares_a, filas_b, pares_b):
+    filas_b = filas_b.copy()
+    filas_b[:, 2] += len(pares_a)
+    return np.concatenate([filas_a, filas_b]), np.concatenate([pares_a, pares_b])
+
+
+def cargar_delta(campaign_dir, fase):
+    """
+    (filas, pares) de una fase delta, o (None, None) si la fase no es delta.
+    filas: Test_ID, Fault_ID, inicio, n   |   pares[inicio:inicio+n]: (columna, valor),
+    con la columna contada desde PC (0 = PC, 16 = MEM_0).
+    """
+    ruta_npz = ruta_fase(campaign_dir, fase, 'delta.npz')
+    ruta_raw = ruta_fase(campaign_dir, fase, 'd32')
+    partes = []
+    if os.path.exists(ruta_npz):
+        partes.append(_cargar_npz(ruta_npz))
+    if os.path.exists(ruta_raw):
+        partes.append(_leer_raw_delta(ruta_raw))
+    if not partes:
+        return None, None
+    return partes[0] if len(partes) == 1 else _unir_delta(*partes[0], *partes[1])
+
+
+def reconstruir(filas, pares, referencia, n_cols):
+    """
+    Matriz completa (Test_ID, Fault_ID, registros, MEM_i) a partir de filas delta: base
+    GOLDEN de todas las filas con un índice y todos los pares escritos de una vez.
+    filas puede ser un tramo de las filas de la fase (pares es siempre el de la fase entera).
+    """
+    filas = np.asarray(filas).reshape(-1, 4)
+    matriz = np.empty((len(filas), n_cols), dtype=DTYPE)
+    matriz[:, 0] = filas[:, 0]
+    matriz[:, 1] = filas[:, 1]
+    matriz[:, 2:] = _bases(referencia, filas[:, 1], n_cols - 2)
+
+    # posición en pares de cada par: inicio de su fila + orden dentro de la fila
+    n = filas[:, 3].astype(np.int64)
+    fila_idx = np.repeat(np.arange(len(filas)), n)
+    desplazamiento = filas[:, 2].astype(np.int64) - (np.cumsum(n) - n)
+    p = pares[np.arange(int(n.sum())) + np.repeat(desplazamiento, n)]
+    matriz[fila_idx, 2 + p[:, 0].astype(np.int64)] = p[:, 1]
+    return matriz
+
+
+def reconstruir_fila(campaign_dir, fase, fault_id):
+    """
+    dict {columna: valor} del primer snapshot de fault_id en una fase (delta o completa).
+    En fases delta solo se reconstruye esa fila.
+    """
+    cols = _leer_columnas(campaign_dir, fase)
+    filas, pares = cargar_delta(campaign_dir, fase)
+    if filas is not None and cols:
+        primera = np.flatnonzero(filas[:, 1] == int(fault_id))[:1]
+        matriz = reconstruir(filas[primera], pares, cargar_referencia(campaign_dir), len(cols))
+    else:
+        matriz, cols = cargar_matriz(campaign_dir, fase)
+        if matriz is None:
+            return None
+        matriz = matriz[np.flatnonzero(np.asarray(matriz[:, 1]) == int(fault_id))[:1]]
+    if len(matriz) == 0:
+        return None
+    return dict(zip(cols, (int(v) for v in matriz[0])))
+
+
+def cargar_matriz(campaign_dir, fase, mmap=True):
+    """
+    (matriz uint32, columnas) de una fase, o (None, None) si no hay binario.
+    Si la campaña se interrumpió antes de finalizar, se leen las filas crudas.
+    Las fases delta se reconstruyen con snapshots_referencia.npy.
+    """
+    cols = _leer_columnas(campaign_dir, fase)
+    filas, pares = cargar_delta(campaign_dir, fase)
+    if filas is not None and cols:
+        return reconstruir(filas, pares, cargar_referencia(campaign_dir), len(cols)), cols
+
+    ruta_npy = ruta_fase(campaign_dir, fase, 'npy')
+    ruta_raw = ruta_fase(campaign_dir, fase, 'u32')
+
+    partes = []
+    if os.path.exists(ruta_npy):
+        partes.append(np.load(ruta_npy, mmap_mode='r' if mmap else None))
+        cols = cols or columnas(partes[0].shape[1] - len(COLUMNAS_REGISTROS) - 2)
+    if cols and os.path.exists(ruta_raw):
+        partes.append(_leer_raw(ruta_raw, len(cols)))
+    if not partes:
+        return None, None
+    return (partes[0] if len(partes) == 1 else np.concatenate(partes)), cols
+
+
+def _leer_csv(ruta):
+    df = pd.read_csv(ruta, dtype=str)
+    for c in df.columns:
+        df[c] = df[c].map(a_u32).astype(np.int64)
+    return df
+
+
+def cargar_snapshots(campaign_dir, fase):
+    """
+    DataFrame de enteros (Test_ID, Fault_ID, registros, MEM_i) de una fase.
+    Lee el binario si existe y, si no, el CSV de campañas anteriores.
+    """
+    matriz, cols = cargar_matriz(campaign_dir, fase)
+    if matriz is not None:
+        return pd.DataFrame(np.asarray(matriz, dtype=np.int64), columns=cols)
+    ruta_csv = ruta_fase(campaign_dir, fase, 'csv')
+    if os.path.exists(ruta_csv):
+        return _leer_csv(ruta_csv)
+    raise FileNotFoundError(f"No hay snapshots '{fase}' en {campaign_dir}")
+
+
+def es_delta(campaign_dir, fase):
+    return _leer_meta(campaign_dir, fase).get('formato') == 'delta'
+
+
+def depurar_fase(campaign_dir, fase, conservar):
+    """
+    Deja solo las filas cuyo Fault_ID está en 'conservar' (p.ej. al reanudar una campaña
+    cortada) y consolida las filas crudas. Devuelve cuántas filas se quitaron.
+    """
+    conservar = np.array(sorted(conservar), dtype=np.int64)
+    if es_delta(campaign_dir, fase):
+        filas, pares = cargar_delta(campaign_dir, fase)
+        if filas is None:
+            return 0
+        mascara = np.isin(filas[:, 1].astype(np.int64), conservar)
+        quedan = filas[mascara].copy()
+        tramos = [pares[int(i):int(i) + int(n)] for _, _, i, n in quedan]
+        nuevos_pares = np.concatenate(tramos) if tramos else np.empty((0, 2), dtype=DTYPE)
+        quedan[:, 2] = np.concatenate([[0], np.cumsum(quedan[:, 3])[:-1]]) if len(quedan) else []
+        _borrar_fase(campaign_dir, fase, ('d32', 'delta.npz'))
+        np.savez(ruta_fase(campaign_dir, fase, 'delta.npz'), filas=quedan, pares=nuevos_pares)
+    else:
+        matriz, _ = cargar_matriz(campaign_dir, fase, mmap=False)
+        if matriz is None:
+            return 0
+        mascara = np.isin(matriz[:, 1].astype(np.int64), conservar)
+        _borrar_fase(campaign_dir, fase, ('u32', 'npy'))
+        np.save(ruta_fase(campaign_dir, fase, 'npy'), matriz[mascara])
+    return int((~mascara).sum())
+
+
+def existe_fase(campaign_dir, fase):
+    return any(os.path.exists(ruta_fase(campaign_dir, fase, ext)) for ext in EXTENSIONES)
+
+
+# ---------- compactación delta de una campaña terminada ----------
+def compactar_delta(campaign_dir, fases=FASES_DELTA):
+    """
+    Reescribe como delta contra GOLDEN las fases guardadas completas (.npy).
+    Devuelve (bytes_antes, bytes_despues); (0, 0) si aún no hay GOLDEN.
+    """
+    referencia = cargar_referencia(campaign_dir)
+    if referencia is None:
+        referencia = congelar_referencia(campaign_dir)
+    if referencia is None:
+        return 0, 0
+
+    antes = despues = 0
+    for fase in fases:
+        ruta_npy = ruta_fase(campaign_dir, fase, 'npy')
+        if not os.path.exists(ruta_npy) or os.path.exists(ruta_fase(campaign_dir, fase, 'u32')):
+            continue
+        matriz = np.load(ruta_npy)
+        cols = _leer_columnas(campaign_dir, fase) or columnas(matriz.shape[1] - len(COLUMNAS_REGISTROS) - 2)
+        n = matriz.shape[1] - 2
+
+        bases = _bases(referencia, matriz[:, 1], n)
+        fila_idx, col_idx = np.nonzero(matriz[:, 2:] != bases)
+        conteo = np.bincount(fila_idx, minlength=len(matriz))
+        inicio = np.concatenate([[0], np.cumsum(conteo)[:-1]]) if len(matriz) else conteo
+        filas = np.column_stack([matriz[:, 0], matriz[:, 1], inicio, conteo]).astype(DTYPE)
+        pares = np.column_stack([col_idx, matriz[fila_idx, 2 + col_idx]]).astype(DTYPE)
+
+        ruta_npz = ruta_fase(campaign_dir, fase, 'delta.npz')
+        np.savez(ruta_npz, filas=filas, pares=pares)
+        _escribir_columnas(campaign_dir, fase, cols, 'delta')
+        antes += os.path.getsize(ruta_npy)
+        despues += os.path.getsize(ruta_npz)
+        os.remove(ruta_npy)
+
+    if antes:
+        print(f"[INFO] Snapshots compactados como delta: {antes / 1024:.1f} KiB -> {despues / 1024:.1f} KiB")
+    return antes, despues
+
+
+def a_hex(df):
+    """Copia para mostrar: registros y MEM_i como texto 0xXXXXXXXX."""
+    df = df.copy()
+    for c in df.columns:
+        if c not in ('Test_ID', 'Fault_ID'):
+            df[c] = df[c].map(lambda v: f"0x{a_u32(v):08X}")
+    return df
+
+
+# ---------- exportación ----------
+def exportar_csv(campaign_dir, fases=FASES):
+    """Genera snapshots_<fase>.csv con el formato hexadecimal anterior. Devuelve las rutas."""
+    rutas = []
+    for fase in fases:
+        matriz, cols = cargar_matriz(campaign_dir, fase)
+        if matriz is None:
+            continue
+        ruta = ruta_fase(campaign_dir, fase, 'csv')
+        with open(ruta, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(cols)
+            for fila in matriz:
+                writer.writerow([int(fila[0]), int(fila[1])] + [f"0x{int(v):08X}" for v in fila[2:]])
+        rutas.append(ruta)
+        print(f"[INFO] Exportado: {ruta}")
+    return rutas
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        camp = sys.argv[1]
+    else:
+        from M_detector_campana import obtener_ultima_carpeta_campania
+        camp = obtener_ultima_carpeta_campania()
+
+    for ruta_csv in exportar_csv(camp):
+        for ruta_bin in (ruta_csv[:-3] + 'npy', ruta_csv[:-3] + 'delta.npz'):
+            if os.path.exists(ruta_bin):
+                print(f"    {os.path.basename(ruta_bin)}: {os.path.getsize(ruta_bin) / 1024:.1f} KiB  |  "
+                      f"{os.path.basename(ruta_csv)}: {os.path.getsize(ruta_csv) / 1024:.1f} KiB")
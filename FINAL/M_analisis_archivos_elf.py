@@ -1,10 +1,9 @@
 #------------------------ MODULO ANALISIS DE ARCHIVOS ELF -------------------------------#
 
-import subprocess
-import re
 from pathlib import Path
 import csv
-import sys
+
+from M_modelo_elf import modelo_elf
 
 # --------------------------------------------------------------------
 # Clase que se encarga de analizar archivos ELF
@@ -19,58 +18,11 @@ class ElfAnalyzer:
 
     # ----------------------------------------------------------------
     # Obtiene todas las direcciones de la sección ejecutable (.text)
+    # (modelo ELF compartido: se calculan una vez por firmware, M_modelo_elf)
     # ----------------------------------------------------------------
     def list_exec_addresses(self, section: str = '.text'):
-        objdump_cmd = None
-
-        # Detecta el sistema operativo
-        if sys.platform.startswith("win"):
-            # Rutas posibles donde puede estar instalado el toolchain en Windows
-            possible_paths = [
-                r"C:\Program Files (x86)\Arm GNU Toolchain arm-none-eabi\14.3 rel1\bin\arm-none-eabi-objdump.exe",
-                r"C:\Program Files\Arm GNU Toolchain arm-none-eabi\14.3 rel1\bin\arm-none-eabi-objdump.exe",
-            ]
-            for path in possible_paths:
-                if Path(path).exists():
-                    objdump_cmd = path
-                    break
-            if objdump_cmd is None:
-                objdump_cmd = "arm-none-eabi-objdump.exe"  # Fallback si está en el PATH
-        else:
-            # En macOS o Linux normalmente basta con el nombre del comando
-            objdump_cmd = "arm-none-eabi-objdump"
-
-        # Muestra qué comando se está utilizando (útil para depuración)
-        print(f"[INFO] Usando objdump: {objdump_cmd}")
-
-        # Construye el comando completo
-        cmd = [objdump_cmd, "-d", "-j", section, str(self.elf_path)]
-
-        # Ejecuta el comando y captura la salida
-        try:
-            out = subprocess.check_output(cmd, text=True, errors="ignore")
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                f"No se encontró '{objdump_cmd}'. Verifica que Arm GNU Toolchain esté instalado "
-                f"y agregado al PATH del sistema."
-            )
-
-        # Procesa la salida para extraer las direcciones ejecutables
-        addrs = []
-        for line in out.splitlines():
-            m = re.match(r"^\s*([0-9a-fA-F]+):\s", line)
-            if not m:
-                continue
-            addr_hex = m.group(1)
-            if ".word" in line:
-                continue
-            if re.search(r"\t[A-Za-z]", line) is None:
-                continue
-            addrs.append(f"0x{addr_hex.lower()}")
-
-        # Elimina duplicados manteniendo el orden
-        seen = set()
-        self.exec_addresses = [a for a in addrs if not (a in seen or seen.add(a))]
+        direcciones = modelo_elf(self.elf_path).direcciones_ejecutables(section)
+        self.exec_addresses = [f"0x{int(a):x}" for a in direcciones]
 
         print(f"[INFO] Total de direcciones encontradas: {len(self.exec_addresses)}")
         return self.exec_addresses
@@ -1,8 +1,8 @@
 #------------------------MODULO ANÁLISIS DE MEMORIAS RAM Y FLASH------------------------------#
 
-import re
 import sys
-from elftools.elf.elffile import ELFFile
+from M_modelo_elf import modelo_elf
+from M_mapa_ld import mapa_ld
 
 # -------------------------
 # FUNCIÓN 1: OBTENER RANGOS TOTALES DE RAM Y FLASH DESDE .MAP
@@ -10,31 +10,20 @@ from elftools.elf.elffile import ELFFile
 def metodo_aleatorio_dir(map_path):
     """
     Devuelve los rangos de RAM y FLASH de un archivo .map
+    (regiones de Memory Configuration del parser M_mapa_ld, con cache por contenido)
     """
     aleatorio_ram = []
     aleatorio_flash = []
 
-    with open(map_path, 'r') as archivo_map:
-        lineas = archivo_map.readlines()
-
-    for linea in lineas:
+    for region in mapa_ld(map_path).regiones:
+        inicio = region['origen']
+        fin = inicio + region['longitud'] - 1
         # Detecta RAM
-        if re.match(r"^\s*RAM\b", linea):
-            hex_values = re.findall(r'0x[0-9A-Fa-f]+', linea)
-            if len(hex_values) >= 2:
-                inicio = int(hex_values[0], 16)
-                tam = int(hex_values[1], 16)
-                fin = inicio + tam - 1
-                aleatorio_ram = [hex(inicio), hex(fin)]
-
+        if region['nombre'] == "RAM":
+            aleatorio_ram = [hex(inicio), hex(fin)]
         # Detecta FLASH
-        if re.match(r"^\s*FLASH\b", linea):
-            hex_values = re.findall(r'0x[0-9A-Fa-f]+', linea)
-            if len(hex_values) >= 2:
-                inicio = int(hex_values[0], 16)
-                tam = int(hex_values[1], 16)
-                fin = inicio + tam - 1
-                aleatorio_flash = [hex(inicio), hex(fin)]
+        if region['nombre'] == "FLASH":
+            aleatorio_flash = [hex(inicio), hex(fin)]
 
     return {
         "RAM-TOTAL": aleatorio_ram,
@@ -59,28 +48,25 @@ def metodo_pseudo_mems(elf_path, map_path):
     ram_start = ram_end = None
 
     try:
-        with open(elf_path, 'rb') as f:
-            elf = ELFFile(f)
-
-            print("\n📄 Secciones detectadas en ELF:")
-            for section in elf.iter_sections():
-                addr = section['sh_addr']
-                size = section['sh_size']
+        # Modelo ELF compartido (M_modelo_elf): sin volver a analizar el archivo
+        elf = modelo_elf(elf_path)
 
-                if addr == 0 or size == 0:
-                    continue
+        print("\n📄 Secciones detectadas en ELF:")
+        for section in elf.secciones_cargadas():
+            addr = section['direccion']
+            size = section['tamano']
 
-                print(f"  {section.name:<12} addr={hex(addr)} size={hex(size)}")
+            print(f"  {section['nombre']:<12} addr={hex(addr)} size={hex(size)}")
 
-                # FLASH
-                if flash_total and int(flash_total[0], 16) <= addr < int(flash_total[1], 16):
-                    flash_start = addr if flash_start is None else min(flash_start, addr)
-                    flash_end = addr + size if flash_end is None else max(flash_end, addr + size)
+            # FLASH
+            if flash_total and int(flash_total[0], 16) <= addr < int(flash_total[1], 16):
+                flash_start = addr if flash_start is None else min(flash_start, addr)
+                flash_end = addr + size if flash_end is None else max(flash_end, addr + size)
 
-                # RAM
-                if ram_total and int(ram_total[0], 16) <= addr < int(ram_total[1], 16):
-                    ram_start = addr if ram_start is None else min(ram_start, addr)
-                    ram_end = addr + size if ram_end is None else max(ram_end, addr + size)
+            # RAM
+            if ram_total and int(ram_total[0], 16) <= addr < int(ram_total[1], 16):
+                ram_start = addr if ram_start is None else min(ram_start, addr)
+                ram_end = addr + size if ram_end is None else max(ram_end, addr + size)
 
         rangos = {}
 
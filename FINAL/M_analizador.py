@@ -2,16 +2,25 @@
 # -*- coding: utf-8 -*-
 
 import os
+import numbers
 import pandas as pd
 import matplotlib.pyplot as plt
 
 from M_detector_campana import obtener_ultima_carpeta_campania
+from M_almacen_snapshots import cargar_snapshots
+from M_politica_captura import leer_politica
+from M_propagacion_ram import cargar_metricas
+from M_catalogo import catalogar
+from M_diario_campana import leer_campania
+from M_modelo_elf import modelo_elf
 
 
 # =====================================================
 # Utilidad: HEX → INT
 # =====================================================
 def hex_to_int(x):
+    if isinstance(x, numbers.Integral):
+        return int(x)
     try:
         return int(str(x), 16)
     except Exception:
@@ -81,6 +90,35 @@ def comparar_gold_vs_after(row_gold, row_after, mem_cols):
     }
 
 
+# =====================================================
+# Sección / símbolo de cada falla (índice de intervalos del ELF)
+# =====================================================
+def ubicar_fallas(faultlog, camp_path):
+    """
+    Seccion / Simbolo / Offset_Simbolo de la dirección inyectada y Funcion_BP (símbolo
+    de la dirección del breakpoint). Una sola búsqueda por lote; None si no hay ELF.
+    """
+    try:
+        elf_path = leer_campania(camp_path).get("elf_main_path")
+        indice = modelo_elf(elf_path).indice_direcciones()
+    except Exception as e:
+        print(f"[INFO] Sin ELF de la campaña, se omiten Seccion/Simbolo: {e}")
+        return None
+
+    fallas = faultlog.drop_duplicates("Fault_ID")
+    dir_iny = fallas["Direccion_Inyeccion"].map(lambda x: hex_to_int(x) or 0).to_numpy()
+    dir_bp = fallas["Direccion_BP"].map(lambda x: hex_to_int(x) or 0).to_numpy()
+    secciones, simbolos, offsets = indice.ubicar(dir_iny)
+    _, funciones, _ = indice.ubicar(dir_bp)
+    return pd.DataFrame({
+        "Fault_ID": fallas["Fault_ID"].to_numpy(),
+        "Seccion": secciones,
+        "Simbolo": simbolos,
+        "Offset_Simbolo": offsets,
+        "Funcion_BP": funciones,
+    })
+
+
 # =====================================================
 # Helper para % y conteo
 # =====================================================
@@ -102,7 +140,7 @@ def make_autopct(values):
 def grafico_clasificacion_tecnica(df, output_path):
 
     counts = df["Clasificacion"].value_counts().reindex(
-        ["silenciosa", "propagada", "no_aplicada"],
+        ["silenciosa", "propagada", "no_aplicada", "sin_captura"],
         fill_value=0
     )
 
@@ -112,13 +150,15 @@ def grafico_clasificacion_tecnica(df, output_path):
     colores = {
         "silenciosa": "#2ECC71",
         "propagada": "#E74C3C",
-        "no_aplicada": "#F1C40F"
+        "no_aplicada": "#F1C40F",
+        "sin_captura": "#95A5A6"
     }
 
     etiquetas = {
         "silenciosa": "Silenciosa",
         "propagada": "Propagada",
-        "no_aplicada": "No aplicada"
+        "no_aplicada": "No aplicada",
+        "sin_captura": "Sin captura"
     }
 
     categorias = [c for c in counts.index if counts[c] > 0]
@@ -222,26 +262,45 @@ def grafico_inyector_estados(faultlog, output_path):
 # =====================================================
 # ANALIZADOR PRINCIPAL
 # =====================================================
-def analizar_campana_avanzado():
-    print("\n[INFO] Buscando última campaña...")
-    camp_path = obtener_ultima_carpeta_campania()
-    print("[INFO] Última campaña encontrada:", camp_path)
+def analizar_campana_avanzado(camp_path=None):
+    if camp_path is None:
+        print("\n[INFO] Buscando última campaña...")
+        camp_path = obtener_ultima_carpeta_campania()
+        print("[INFO] Última campaña encontrada:", camp_path)
 
-    gold = pd.read_csv(os.path.join(camp_path, "snapshots_gold.csv"))
-    after_st = pd.read_csv(os.path.join(camp_path, "snapshots_after_stable.csv"))
     faultlog = pd.read_csv(os.path.join(camp_path, "faults_log.csv"))
 
-    mem_cols = [c for c in gold.columns if c.startswith("MEM_")]
+    # La política de captura de la campaña decide qué se puede comparar
+    politica = leer_politica(camp_path)
+    con_snapshots = politica.incluye("after_stable")
+
+    if con_snapshots:
+        gold = cargar_snapshots(camp_path, "gold")
+        after_st = cargar_snapshots(camp_path, "after_stable")
+        # Ventana de memoria + regiones extra de la política
+        mem_cols = [c for c in gold.columns if c.startswith(("MEM_", "X_"))]
+        cols_perif = set(politica.columnas_perifericos()) & set(mem_cols)
+        filas_gold = [g for _, g in gold.iterrows()]
+    else:
+        print(f"[INFO] Política '{politica.nivel}' sin after_stable: clasificación solo con faults_log")
+        mem_cols = []
+        cols_perif = set()
+        filas_gold = [pd.Series({"Fault_ID": fid}) for fid in faultlog["Fault_ID"].unique()]
+
+    # Propagación fuera de la ventana (política ram_completa, M_propagacion_ram)
+    metricas_ram = cargar_metricas(camp_path)
+    if metricas_ram is not None:
+        metricas_ram = metricas_ram.set_index("Fault_ID")
 
     resultados = []
 
     print("[INFO] Analizando fallas...")
 
-    for _, g in gold.iterrows():
+    for g in filas_gold:
 
         fid = g["Fault_ID"]
         estado_final = resolver_estado_final(faultlog, fid)
-        fila_after = after_st[after_st["Fault_ID"] == fid]
+        fila_after = after_st[after_st["Fault_ID"] == fid] if con_snapshots else None
 
         # Estados del inyector que significan NO APLICADA
         ESTADOS_NO_APLICADA = [
@@ -265,13 +324,19 @@ def analizar_campana_avanzado():
             met = {"RegCriticos": False, "RegGenerales": False,
                    "RamCambiada": False, "NumBytesRAM": 0, "OffsetsRAM": []}
 
-        # 3) SI NO EXISTE AFTER_STABLE → TAMPOCO SE APLICÓ
+        # 3) LA POLÍTICA NO CAPTURA AFTER_STABLE → no se puede comparar
+        elif not con_snapshots:
+            clas = "sin_captura"
+            met = {"RegCriticos": False, "RegGenerales": False,
+                   "RamCambiada": False, "NumBytesRAM": 0, "OffsetsRAM": []}
+
+        # 4) SI NO EXISTE AFTER_STABLE → TAMPOCO SE APLICÓ
         elif fila_after.empty:
             clas = "no_aplicada"
             met = {"RegCriticos": False, "RegGenerales": False,
                    "RamCambiada": False, "NumBytesRAM": 0, "OffsetsRAM": []}
 
-        # 4) SÍ EXISTE AFTER_STABLE → comparar
+        # 5) SÍ EXISTE AFTER_STABLE → comparar
         else:
             a = fila_after.iloc[0]
             met = comparar_gold_vs_after(g, a, mem_cols)
@@ -281,6 +346,21 @@ def analizar_campana_avanzado():
             else:
                 clas = "propagada"
 
+        # 6) RAM completa: corrupción en cualquier parte de la RAM también es propagación
+        if metricas_ram is not None and fid in metricas_ram.index:
+            m = metricas_ram.loc[fid]
+            met = {**met,
+                   "RamPalabrasCorruptas": int(m["Palabras_Corruptas"]),
+                   "RamBitsCorruptos": int(m["Bits_Corruptos"]),
+                   "RamSimbolos": m["Simbolos_Afectados"]}
+            if met["RamPalabrasCorruptas"] > 0 and clas in ("silenciosa", "sin_captura"):
+                clas = "propagada"
+                met["RamCambiada"] = True
+
+        # 7) Bancos de periféricos (política 'perifericos'): registros distintos de GOLDEN
+        if cols_perif:
+            met = {**met, "RegistrosPerifericos": [c[2:] for c in met["OffsetsRAM"] if c in cols_perif]}
+
         resultados.append({
             "Fault_ID": fid,
             "Clasificacion": clas,
@@ -290,6 +370,9 @@ def analizar_campana_avanzado():
 
     # Guardar CSV
     df = pd.DataFrame(resultados)
+    ubicaciones = ubicar_fallas(faultlog, camp_path)
+    if ubicaciones is not None:
+        df = df.merge(ubicaciones, on="Fault_ID", how="left")
     out_csv = os.path.join(camp_path, "analisis_avanzado.csv")
     df.to_csv(out_csv, index=False)
     print("[INFO] Archivo analisis_avanzado.csv generado:", out_csv)
@@ -298,6 +381,9 @@ def analizar_campana_avanzado():
     grafico_clasificacion_tecnica(df, camp_path)
     grafico_inyector_estados(faultlog, camp_path)
 
+    # Resultados al catálogo de campañas (consultas entre campañas sin releer CSV)
+    catalogar(camp_path)
+
     print("[INFO] Análisis COMPLETO.\n")
     return df, camp_path
 
@@ -1,107 +1,60 @@
 #------------------------MODULO ANALIZADOR DE REGISTROS SVD-------------------------------#
 from pathlib import Path
-from cmsis_svd.parser import SVDParser  # Permite leer y analizar .svd
-import csv
+from M_cache_svd import dispositivo_svd, en_cache, DispositivoSVD  # SVD digerido y en cache
+from M_svd_streaming import extraer_perifericos
+from M_indice_svd import indice_svd
+from M_configuracion_automatica import MICROCONTROLADORES
 
 class ListaRegistros:
     def __init__(self, micro: str, svd_repo: Path):
         self.micro = micro
         self.svd_repo = svd_repo
-        self.lista_fallas = []          # Lista completa de bits
-        self.peripherals_dict = {}      # Diccionario: periférico -> lista de bits
-        self.micro_svds = {"stm32f407g-disc1": "STM32F407.svd", 'nucleo-f446re': 'STM32F446.svd'}
+        self.bits = None                # TablaBits (M_cache_svd): todos los bits en columnas
+        self.completo = False           # False si solo se extrajeron algunos periféricos
 
     def find_svd_path(self) -> Path:
-        svd_file = self.micro_svds.get(self.micro)
-        if not svd_file:
-            raise ValueError(f"❌ Micro {self.micro} no está definido en micro_svds")
-        matches = list(self.svd_repo.rglob(svd_file))
-        if not matches:
-            raise FileNotFoundError(f"❌ No se encontró el archivo {svd_file} en {self.svd_repo}")
-        print(f"✅ Usando archivo SVD: {matches[0]}")
-        return matches[0]
-
-    def generador_lista_fallas(self):
-        """Carga el SVD y genera la lista de bits a inyectar y diccionario por periférico"""
+        """SVD del dispositivo de la placa (MICROCONTROLADORES) por el índice del repositorio."""
+        dispositivo = MICROCONTROLADORES.get(self.micro, self.micro)
+        svd_path = indice_svd(self.svd_repo).buscar(dispositivo)
+        if svd_path is None:
+            raise FileNotFoundError(f"❌ No se encontró un SVD para {self.micro} ({dispositivo}) en {self.svd_repo}")
+        print(f"✅ Usando archivo SVD: {svd_path}")
+        return svd_path
+
+    def generador_lista_fallas(self, perifericos=None):
+        """
+        Carga el SVD y genera la lista de bits a inyectar (TablaBits, en columnas).
+        Con perifericos=[...] y el SVD aún sin digerir, solo se extraen esos (M_svd_streaming).
+        """
         svd_path = self.find_svd_path()
-        parser = SVDParser.for_xml_file(svd_path)
-        device = parser.get_device()
-
-        self.lista_fallas = []
-        self.peripherals_dict = {}
-
-        for peripheral in device.peripherals:
-            peripheral_bits = []
-            for reg in peripheral.registers:
-                if "RESERVED" in reg.name.upper():
-                    continue
+        if perifericos and not en_cache(svd_path):
+            dispositivo = DispositivoSVD(svd_path, tablas=extraer_perifericos(svd_path, perifericos))
+            self.completo = False
+        else:
+            # SVD digerido una vez y guardado en cache_svd/ (M_cache_svd): milisegundos en las siguientes
+            dispositivo = dispositivo_svd(svd_path)
+            self.completo = True
 
-                reg_addr = peripheral.base_address + reg.address_offset
-                reg_size = reg.size or 32
-                reg_access = str(reg.access or "unknown")
+        self.bits = dispositivo.bits()
 
-                if reg.fields:
-                    for field in reg.fields:
-                        if "RESERVED" in field.name.upper():
-                            continue
-                        field_access = str(field.access or reg_access)
-                        if "READ_WRITE" not in field_access.upper():
-                            continue
-                        for bit in range(field.bit_width):
-                            absolute_byte_addr = reg_addr + (field.bit_offset + bit) // 8
-                            aligned_addr = absolute_byte_addr & ~0x3
-                            bit_in_word = (absolute_byte_addr % 4) * 8 + ((field.bit_offset + bit) % 8)
-                            bit_dict = {
-                                "PERIFERICO": peripheral.name,
-                                "REGISTRO": reg.name,
-                                "CAMPO": field.name,
-                                "DIRECCION": hex(aligned_addr),
-                                "BIT": bit_in_word,
-                                "TIPO DE ACCESO": field_access,
-                                "MASCARA": f"0x{(1 << bit_in_word):08X}"
-                            }
-                            self.lista_fallas.append(bit_dict)
-                            peripheral_bits.append(bit_dict)
-                else:
-                    if "READ_WRITE" in reg_access.upper():
-                        for bit in range(reg_size):
-                            absolute_byte_addr = reg_addr + bit // 8
-                            aligned_addr = absolute_byte_addr & ~0x3
-                            bit_in_word = (absolute_byte_addr % 4) * 8 + (bit % 8)
-                            bit_dict = {
-                                "PERIFERICO": peripheral.name,
-                                "REGISTRO": reg.name,
-                                "CAMPO": field.name,
-                                "DIRECCION": hex(aligned_addr),
-                                "BIT": bit_in_word,
-                                "TIPO DE ACCESO": field_access,
-                                "MASCARA": f"0x{(1 << bit_in_word):08X}"
-                            }
-                            self.lista_fallas.append(bit_dict)
-                            peripheral_bits.append(bit_dict)
-
-            self.peripherals_dict[peripheral.name] = peripheral_bits
-
-        print(f"🔢 Total de bits listos para inyección: {len(self.lista_fallas)}")
+        print(f"🔢 Total de bits listos para inyección: {len(self.bits)}")
 
     def save_results(self, out_dir: Path):
         """Guarda CSV completo"""
-        if not self.lista_fallas:
+        if not self.bits:
             raise RuntimeError('⚠️ No se ha generado la lista de bits. Llama primero a generador_lista_fallas()')
+        if not self.completo:
+            print(f"ℹ️ Lista parcial ({', '.join(self.bits.conteo_perifericos())}): no se escribe el CSV completo")
+            return
         csv_path = out_dir / f'LISTA_FALLAS_TOTALES_REGISTROS.csv'
-        fieldnames = ['PERIFERICO', 'REGISTRO', 'CAMPO', 'DIRECCION', 'BIT', 'TIPO DE ACCESO', 'MASCARA']
-        with open(csv_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for b in self.lista_fallas:
-                writer.writerow(b)
+        self.bits.guardar_csv(csv_path)
         print(f"✅ CSV completo generado en: {csv_path}")
 
     def filtrar_periferico(self, peripheral_name: str):
-        """Devuelve solo los registros del periférico indicado"""
-        if not self.lista_fallas:
+        """Devuelve solo los bits del periférico indicado (TablaBits)"""
+        if not self.bits:
             raise RuntimeError('⚠️ No se ha generado la lista de bits. Llama primero a generador_lista_fallas()')
-        filtrados = self.peripherals_dict.get(peripheral_name.upper(), [])
+        filtrados = self.bits.filtrar(peripheral_name)
         if not filtrados:
             print(f"⚠️ No se encontraron registros para el periférico {peripheral_name}")
         return filtrados
@@ -112,12 +65,7 @@ class ListaRegistros:
         if not registros:
             return
         csv_path = out_dir / f'LISTA_FALLAS_PERIFERICO.csv'
-        fieldnames = ['PERIFERICO', 'REGISTRO', 'CAMPO', 'DIRECCION', 'BIT', 'TIPO DE ACCESO', 'MASCARA']
-        with open(csv_path, 'w', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            for b in registros:
-                writer.writerow(b)
+        registros.guardar_csv(csv_path)
         print(f"✅ CSV filtrado generado para {peripheral_name} en: {csv_path}")
 
 
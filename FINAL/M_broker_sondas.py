@@ -0,0 +1,579 @@
+#------------------------MODULO BROKER DE SONDAS-------------------------------#
+"""
+M_broker_sondas.py
+
+Proceso local de larga duración que es dueño de las sesiones pyOCD:
+    - enumera las sondas una sola vez y cachea sus IDs,
+    - mantiene cada sesión abierta ("caliente") entre etapas y campañas,
+    - solo reprograma el ELF principal si cambió (ruta + fecha de modificación),
+    - atiende operaciones del core por un socket local (multiprocessing.connection).
+
+Los clientes (FaultInjector, GOLDEN, ACOPLADO, GUI) usan MCU_BROKER, que tiene la
+misma interfaz que MCU / MCU_RAM (.core, .session, .target, boot_from_elf_vector),
+o la fábrica abrir_mcu(), que elige entre broker y sesión directa.
+
+Cada cliente toma la sonda en exclusiva entre 'abrir' y 'cerrar' (arriendo);
+al cerrar, la sesión pyOCD queda abierta para el siguiente cliente, que la recibe con el
+core reseteado y sin breakpoints/watchpoints del anterior.
+
+Seguridad: el socket se autentica con una clave aleatoria por usuario que el broker crea
+al primer arranque en ~/.inyector_fallas/broker.key (permisos 0600), y solo se aceptan
+los métodos del core/MCU de METODOS_CORE / METODOS_MCU. 'apagar' exige el token del
+proceso dueño (el que lo arrancó con asegurar_broker, que lo pasa en INYECTOR_BROKER_TOKEN). Si ningún cliente
+se conecta durante TIEMPO_INACTIVO, las sesiones calientes se cierran (la sonda queda
+libre para otras herramientas) y se reabren en el próximo 'abrir'.
+
+Uso:
+    python M_broker_sondas.py            # arranca el broker en DIRECCION_BROKER
+    python M_broker_sondas.py --puerto 50556
+    python M_broker_sondas.py --inactivo 300
+    INYECTOR_BROKER_TOKEN=<token> python M_broker_sondas.py --apagar   # solo el dueño
+"""
+import argparse
+import hmac
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+from pyocd.core.helpers import ConnectHelper
+from pyocd.core.target import Target
+from pyocd.flash.file_programmer import FileProgrammer
+
+from M_gestion_MCU_ram import MCU_RAM
+from M_gestion_mcu import MCU
+from M_calibracion_swd import opciones_pyocd, ajustar_reloj_swd
+
+# Dirección del socket local del broker y archivo con su clave (uno por usuario)
+DIRECCION_BROKER = ('127.0.0.1', 50555)
+CARPETA_USUARIO = os.path.join(os.path.expanduser("~"), ".inyector_fallas")
+ARCHIVO_CLAVE = os.path.join(CARPETA_USUARIO, "broker.key")
+
+# Variable de entorno con el token de apagado del proceso dueño del broker
+VARIABLE_TOKEN = "INYECTOR_BROKER_TOKEN"
+
+# Métodos que un cliente puede invocar por el socket (los que usan FaultInjector, GOLDEN,
+# M_crc_objetivo, M_propagacion_ram y M_politica_captura sobre el core de pyOCD)
+METODOS_CORE = frozenset({
+    'read_core_register', 'write_core_register',
+    'read_memory', 'write_memory', 'read_memory_block32', 'write_memory_block32',
+    'halt', 'resume', 'reset', 'reset_and_halt', 'is_halted', 'get_state',
+    'set_breakpoint', 'remove_breakpoint', 'get_breakpoints',
+})
+METODOS_MCU = frozenset({'program_elf', 'boot_from_elf_vector'})
+
+# Tiempo máximo esperando a que otro cliente libere la sonda
+TIMEOUT_ARRIENDO = 60.0
+
+# Segundos sin clientes tras los que se cierran las sesiones calientes
+TIEMPO_INACTIVO = 600.0
+
+
+def clave_broker(crear=False):
+    """
+    Clave del socket: 32 bytes aleatorios en ARCHIVO_CLAVE (0600, carpeta 0700).
+    El broker la crea al primer arranque (crear=True); los clientes solo la leen (None si no existe).
+    """
+    try:
+        with open(ARCHIVO_CLAVE, 'rb') as f:
+            clave = f.read()
+        if clave:
+            return clave
+    except FileNotFoundError:
+        pass
+    if not crear:
+        return None
+    os.makedirs(CARPETA_USUARIO, mode=0o700, exist_ok=True)
+    tmp = f"{ARCHIVO_CLAVE}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secrets.token_bytes(32))
+    try:
+        os.link(tmp, ARCHIVO_CLAVE)      # falla si otro broker la creó primero: se usa esa
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp)
+    return clave_broker()
+
+
+def _clave_opts(opts):
+    """Opciones que obligan a reabrir la sesión si cambian."""
+    return tuple(sorted((k, repr(v)) for k, v in (opts or {}).items() if k != 'unique_id'))
+
+
+def _serializable(valor):
+    """Los objetos Breakpoint de pyOCD no viajan por el socket: se envía solo la dirección."""
+    if isinstance(valor, (list, tuple)):
+        return [_serializable(v) for v in valor]
+    if hasattr(valor, 'address') and not isinstance(valor, (int, str)):
+        return {'address': valor.address}
+    return valor
+
+
+def _conectar(direccion):
+    """Cliente autenticado con la clave del usuario; ConnectionRefusedError si no hay clave."""
+    clave = clave_broker()
+    if clave is None:
+        raise ConnectionRefusedError(f"[ERROR] No existe {ARCHIVO_CLAVE}: el broker nunca se inició")
+    return Client(direccion, authkey=clave)
+
+
+def _pedir(conexion, *mensaje):
+    conexion.send(mensaje)
+    estado, valor = conexion.recv()
+    if estado == 'error':
+        raise valor
+    return valor
+
+
+# =====================================================================
+#   SERVIDOR
+# =====================================================================
+class _SesionCaliente:
+    def __init__(self, uid):
+        self.uid = uid
+        self.session = None
+        self.target = None
+        self.core = None
+        self.clave_opts = None
+        self.elf_programado = None     # (ruta, mtime) del último ELF principal programado
+        self.candado = threading.Lock()
+
+
+class BrokerSondas:
+    def __init__(self, direccion=DIRECCION_BROKER, clave=None, tiempo_inactivo=TIEMPO_INACTIVO, token=None):
+        """token: token de apagado del proceso dueño (por defecto INYECTOR_BROKER_TOKEN o uno aleatorio)."""
+        self.direccion = direccion
+        self.clave = clave or clave_broker(crear=True)
+        self.token = token or os.environ.get(VARIABLE_TOKEN) or secrets.token_hex(16)
+        self.tiempo_inactivo = tiempo_inactivo
+        self.sondas = None             # cache de unique_id de sondas conectadas
+        self.sesiones = {}             # uid -> _SesionCaliente
+        self.candado_sesiones = threading.Lock()
+        self.activo = False
+        self.listener = None
+        self.clientes = 0              # conexiones atendidas en este momento
+        self.ultima_actividad = time.time()
+
+    # ---------- sondas ----------
+    def _ids_sondas(self, refrescar=False):
+        if self.sondas is None or refrescar:
+            sondas = ConnectHelper.get_all_connected_probes(blocking=False)
+            self.sondas = [s.unique_id for s in sondas]
+            print(f"[INFO] Sondas detectadas: {self.sondas}")
+        return self.sondas
+
+    def _resolver_uid(self, opts):
+        uid = (opts or {}).get('unique_id')
+        if uid:
+            return uid
+        ids = self._ids_sondas() or self._ids_sondas(refrescar=True)
+        if not ids:
+            raise RuntimeError("[ERROR] No se detectó ningún probe compatible. ¿Está conectado?")
+        return ids[0]
+
+    def _sesion(self, uid):
+        with self.candado_sesiones:
+            if uid not in self.sesiones:
+                self.sesiones[uid] = _SesionCaliente(uid)
+            return self.sesiones[uid]
+
+    # ---------- sesión caliente ----------
+    def _cerrar_sesion(self, sc):
+        if sc.session is not None:
+            try:
+                sc.session.close()
+            except Exception as e:
+                print(f"[WARNING] Error cerrando sesión {sc.uid}: {e}")
+        sc.session = sc.target = sc.core = None
+        sc.clave_opts = None
+        sc.elf_programado = None
+
+    def _sesion_viva(self, sc):
+        try:
+            sc.target.get_state()
+            return True
+        except Exception:
+            return False
+
+    def _preparar(self, sc, opts):
+        """Abre la sesión o reutiliza la caliente. Devuelve True si se reutilizó."""
+        clave = _clave_opts(opts)
+        if sc.session is not None and sc.clave_opts == clave and self._sesion_viva(sc):
+            return True
+        self._cerrar_sesion(sc)
+
+        opciones = {k: v for k, v in opciones_pyocd(opts).items() if k != 'unique_id'}
+        sc.session = ConnectHelper.session_with_chosen_probe(unique_id=sc.uid, options=opciones)
+        if sc.session is None:
+            self.sondas = None
+            raise RuntimeError(f"[ERROR] No se pudo abrir la sonda {sc.uid}")
+        sc.session.open()
+        sc.target = sc.session.board.target
+        sc.core = ajustar_reloj_swd(sc.session, getattr(sc.target, "selected_core", sc.target), opts)
+        sc.clave_opts = clave
+        return False
+
+    @staticmethod
+    def _limpiar_core(sc):
+        """Sesión reutilizada: sin breakpoints/watchpoints del cliente anterior, reseteada y detenida."""
+        core = sc.core
+        if getattr(core, 'bp_manager', None) is not None:
+            core.bp_manager.remove_all_breakpoints()
+        if getattr(core, 'dwt', None) is not None:
+            core.dwt.remove_all_watchpoints()
+        core.reset_and_halt()
+
+    def _abrir(self, sc, opts, elf_path, ram):
+        t0 = time.time()
+        reutilizada = self._preparar(sc, opts)
+        if reutilizada:
+            self._limpiar_core(sc)
+
+        if ram:
+            # MCU_RAM no programa al abrir: el cliente llama boot_from_elf_vector()
+            mcu = MCU_RAM(opts, elf_path)
+            mcu.session, mcu.target, mcu.core = sc.session, sc.target, sc.core
+            mcu.programmer = FileProgrammer(sc.session)
+            programado = False
+        else:
+            # El ELF en RAM no toca la Flash: basta con reprogramar si cambió el ELF principal
+            mcu = None
+            firma = (os.path.abspath(elf_path), os.path.getmtime(elf_path))
+            programado = sc.elf_programado != firma
+            if programado:
+                FileProgrammer(sc.session).program(elf_path)
+                sc.elf_programado = firma
+
+        info = {'uid': sc.uid, 'reutilizada': reutilizada, 'programado': programado,
+                'segundos': round(time.time() - t0, 3)}
+        return mcu, info
+
+    # ---------- atención de clientes ----------
+    def _atender(self, conexion):
+        sc = None
+        mcu = None
+        apagar = False
+        with self.candado_sesiones:
+            self.clientes += 1
+        try:
+            while True:
+                try:
+                    mensaje = conexion.recv()
+                except (EOFError, OSError):
+                    break
+                op = mensaje[0]
+                try:
+                    if op == 'ping':
+                        respuesta = 'pong'
+                    elif op == 'estado':
+                        respuesta = {uid: {'abierta': s.session is not None,
+                                           'ocupada': s.candado.locked(),
+                                           'elf_programado': s.elf_programado}
+                                     for uid, s in self.sesiones.items()}
+                    elif op == 'sondas':
+                        respuesta = self._ids_sondas(refrescar=True)
+                    elif op == 'abrir':
+                        if sc is not None:
+                            raise RuntimeError("[ERROR] La conexión ya tiene una sonda abierta")
+                        _, opts, elf_path, ram = mensaje
+                        candidata = self._sesion(self._resolver_uid(opts))
+                        if not candidata.candado.acquire(timeout=TIMEOUT_ARRIENDO):
+                            raise TimeoutError(f"[ERROR] Sonda {candidata.uid} ocupada por otro cliente")
+                        sc = candidata
+                        try:
+                            mcu, respuesta = self._abrir(sc, opts, elf_path, ram)
+                        except Exception:
+                            self._cerrar_sesion(sc)
+                            sc.candado.release()
+                            sc = None
+                            raise
+                    elif op == 'core':
+                        _, metodo, args, kwargs = mensaje
+                        if metodo not in METODOS_CORE:
+                            raise PermissionError(f"[ERROR] Método del core no permitido: '{metodo}'")
+                        if sc is None:
+                            raise RuntimeError("[ERROR] No hay sonda abierta: falta 'abrir'")
+                        respuesta = _serializable(getattr(sc.core, metodo)(*args, **kwargs))
+                    elif op == 'mcu':
+                        _, metodo, args, kwargs = mensaje
+                        if metodo not in METODOS_MCU:
+                            raise PermissionError(f"[ERROR] Método del MCU no permitido: '{metodo}'")
+                        if mcu is None:
+                            raise RuntimeError(f"[ERROR] '{metodo}' solo está disponible en sesiones RAM")
+                        respuesta = _serializable(getattr(mcu, metodo)(*args, **kwargs))
+                    elif op == 'cerrar':
+                        if sc is not None:
+                            sc.candado.release()
+                        sc, mcu = None, None
+                        respuesta = True
+                    elif op == 'apagar':
+                        token = mensaje[1] if len(mensaje) > 1 else None
+                        if not isinstance(token, str) or not hmac.compare_digest(token, self.token):
+                            raise PermissionError("[ERROR] 'apagar' solo lo puede pedir el proceso dueño del broker")
+                        self.activo = False
+                        apagar = True
+                        respuesta = True
+                    else:
+                        raise ValueError(f"[ERROR] Operación desconocida: {op}")
+                    conexion.send(('ok', respuesta))
+                except Exception as e:
+                    if sc is not None and op == 'core' and not self._sesion_viva(sc):
+                        # La sesión murió (USB, reset de la sonda): se reabrirá en el próximo 'abrir'
+                        print(f"[WARNING] Sesión {sc.uid} perdida: {e}")
+                        self._cerrar_sesion(sc)
+                    try:
+                        conexion.send(('error', e))
+                    except Exception:
+                        conexion.send(('error', RuntimeError(str(e))))
+                if apagar:
+                    self._despertar()
+                    break
+        finally:
+            if sc is not None:
+                sc.candado.release()
+            conexion.close()
+            with self.candado_sesiones:
+                self.clientes -= 1
+                self.ultima_actividad = time.time()
+
+    def detener(self):
+        """Apagado pedido desde el propio proceso del broker (dueño)."""
+        self.activo = False
+        self._despertar()
+
+    def _despertar(self):
+        """accept() no vuelve al cerrar el listener desde otro hilo: se conecta un cliente vacío."""
+        try:
+            Client(self.direccion, authkey=self.clave).close()
+        except Exception:
+            pass
+
+    def _vigilar_inactividad(self):
+        """Cierra las sesiones calientes si nadie se conecta durante tiempo_inactivo."""
+        while self.activo:
+            time.sleep(min(5.0, self.tiempo_inactivo))
+            with self.candado_sesiones:
+                inactivo = self.clientes == 0 and time.time() - self.ultima_actividad >= self.tiempo_inactivo
+                sesiones = list(self.sesiones.values())
+            if not inactivo or not self.activo:
+                continue
+            for sc in sesiones:
+                if sc.session is None or not sc.candado.acquire(blocking=False):
+                    continue
+                try:
+                    print(f"[INFO] Sesión {sc.uid} cerrada tras {self.tiempo_inactivo:.0f} s sin clientes")
+                    self._cerrar_sesion(sc)
+                finally:
+                    sc.candado.release()
+
+    def servir(self):
+        self.listener = Listener(self.direccion, authkey=self.clave)
+        self.activo = True
+        print(f"[INFO] Broker de sondas escuchando en {self.direccion[0]}:{self.direccion[1]}")
+        try:
+            self._ids_sondas()
+        except Exception as e:
+            print(f"[WARNING] No se pudieron enumerar sondas al iniciar: {e}")
+
+        if self.tiempo_inactivo:
+            threading.Thread(target=self._vigilar_inactividad, name="BrokerInactividad", daemon=True).start()
+
+        while self.activo:
+            try:
+                conexion = self.listener.accept()
+            except (OSError, EOFError):
+                break
+            except Exception as e:
+                print(f"[WARNING] Conexión rechazada: {e}")
+                continue
+            if not self.activo:
+                # conexión de _despertar() tras 'apagar'
+                conexion.close()
+                break
+            with self.candado_sesiones:
+                self.ultima_actividad = time.time()
+            threading.Thread(target=self._atender, args=(conexion,), daemon=True).start()
+
+        self.listener.close()
+        for sc in self.sesiones.values():
+            self._cerrar_sesion(sc)
+        print("[INFO] Broker de sondas detenido.")
+
+
+# =====================================================================
+#   CLIENTE
+# =====================================================================
+class NucleoRemoto:
+    """Proxy del core pyOCD: cada método se ejecuta en el broker."""
+    BreakpointType = Target.BreakpointType
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+
+    def __getattr__(self, nombre):
+        if nombre.startswith('_'):
+            raise AttributeError(nombre)
+
+        def llamada(*args, **kwargs):
+            return _pedir(self._conexion, 'core', nombre, args, kwargs)
+        return llamada
+
+
+class MCU_BROKER:
+    def __init__(self, opts, elf_path, ram=False, direccion=DIRECCION_BROKER):
+        """
+        opts: opciones pyOCD (se usan al abrir la sesión en el broker; 'unique_id' elige la sonda)
+        elf_path: ELF principal (se programa si cambió) o ELF en RAM si ram=True
+        ram: comportamiento de MCU_RAM (no programa al abrir; usar boot_from_elf_vector)
+        """
+        self.opts = opts or {}
+        self.elf_path = str(elf_path)
+        self.ram = ram
+        self.direccion = direccion
+        self.conexion = None
+        self.session = None
+        self.core = None
+        self.target = None
+        self.info = None
+
+    def __enter__(self):
+        self.conexion = _conectar(self.direccion)
+        try:
+            self.info = _pedir(self.conexion, 'abrir', self.opts, self.elf_path, self.ram)
+        except Exception:
+            self.conexion.close()
+            self.conexion = None
+            raise
+        self.core = NucleoRemoto(self.conexion)
+        self.target = self.core
+        # FaultInjector/GOLDEN liberan la sonda con session.close()
+        self.session = self
+        estado = "reutilizada" if self.info['reutilizada'] else "nueva"
+        print(f"[INFO] Sesión {estado} vía broker ({self.info['uid']}) en {self.info['segundos']} s")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self.conexion is not None:
+            try:
+                _pedir(self.conexion, 'cerrar')
+            except Exception:
+                pass
+            finally:
+                self.conexion.close()
+                self.conexion = None
+                self.session = None
+                self.core = None
+                self.target = None
+
+    # ---------- métodos de MCU_RAM ----------
+    def program_elf(self):
+        return _pedir(self.conexion, 'mcu', 'program_elf', (), {})
+
+    def boot_from_elf_vector(self, force_program=True, halt_before_program=True):
+        return _pedir(self.conexion, 'mcu', 'boot_from_elf_vector', (),
+                      {'force_program': force_program, 'halt_before_program': halt_before_program})
+
+
+# ---------- utilidades para los módulos ----------
+def broker_activo(direccion=DIRECCION_BROKER):
+    try:
+        conexion = _conectar(direccion)
+    except (OSError, EOFError, AuthenticationError):
+        return False
+    try:
+        return _pedir(conexion, 'ping') == 'pong'
+    except Exception:
+        return False
+    finally:
+        conexion.close()
+
+
+# dirección -> token de apagado de los brokers arrancados por este proceso
+_TOKENS = {}
+
+
+def apagar_broker(direccion=DIRECCION_BROKER, token=None):
+    """
+    Pide al broker que se detenga con el token del proceso dueño (el de asegurar_broker o
+    INYECTOR_BROKER_TOKEN). False si no había broker escuchando o rechazó el pedido.
+    """
+    token = token or _TOKENS.get(tuple(direccion)) or os.environ.get(VARIABLE_TOKEN)
+    try:
+        conexion = _conectar(direccion)
+    except (OSError, EOFError, AuthenticationError):
+        return False
+    try:
+        return _pedir(conexion, 'apagar', token)
+    except Exception as e:
+        print(f"[WARNING] El broker no aceptó el apagado: {e}")
+        return False
+    finally:
+        conexion.close()
+
+
+def asegurar_broker(direccion=DIRECCION_BROKER, timeout=10.0):
+    """
+    Devuelve la dirección del broker, arrancándolo en segundo plano si no está activo.
+    Si no se puede arrancar devuelve None (los módulos abrirán sesiones directas).
+    """
+    if broker_activo(direccion):
+        return direccion
+
+    print("[INFO] Iniciando broker de sondas en segundo plano...")
+    token = secrets.token_hex(16)
+    try:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                          '--host', direccion[0], '--puerto', str(direccion[1])],
+                         env=dict(os.environ, **{VARIABLE_TOKEN: token}), start_new_session=True)
+        _TOKENS[tuple(direccion)] = token
+    except Exception as e:
+        print(f"[WARNING] No se pudo iniciar el broker: {e}")
+        return None
+
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        if broker_activo(direccion):
+            return direccion
+        time.sleep(0.1)
+    print("[WARNING] El broker no respondió a tiempo; se usarán sesiones directas.")
+    return None
+
+
+def abrir_mcu(opts, elf_path, ram=False, broker=None):
+    """
+    Fábrica de sesiones: MCU_BROKER si se indica broker (dirección o True), si no MCU / MCU_RAM.
+    """
+    if broker:
+        direccion = broker if isinstance(broker, tuple) else DIRECCION_BROKER
+        return MCU_BROKER(opts, elf_path, ram=ram, direccion=direccion)
+    if ram:
+        return MCU_RAM(opts, elf_path)
+    return MCU(opts, elf_path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Broker local de sesiones pyOCD")
+    parser.add_argument('--host', default=DIRECCION_BROKER[0])
+    parser.add_argument('--puerto', type=int, default=DIRECCION_BROKER[1])
+    parser.add_argument('--inactivo', type=float, default=TIEMPO_INACTIVO,
+                        help="segundos sin clientes antes de cerrar las sesiones (0 = nunca)")
+    parser.add_argument('--apagar', action='store_true',
+                        help="detiene el broker que escucha en esa dirección (token en INYECTOR_BROKER_TOKEN)")
+    args = parser.parse_args()
+
+    if args.apagar:
+        if apagar_broker((args.host, args.puerto)):
+            print(f"[INFO] Broker de {args.host}:{args.puerto} detenido.")
+        else:
+            print(f"[WARNING] No se detuvo el broker de {args.host}:{args.puerto}")
+        sys.exit(0)
+    BrokerSondas((args.host, args.puerto), tiempo_inactivo=args.inactivo).servir()
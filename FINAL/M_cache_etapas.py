@@ -0,0 +1,114 @@
+#------------------------MODULO CACHE DE ETAPAS DE ACOPLADO-------------------------------#
+"""
+M_cache_etapas.py
+
+Artefactos de las etapas de ACOPLADO (direcciones ejecutables, bits del periférico,
+lista de fallas) guardados por el hash de sus entradas. Antes cada etapa escribía un
+CSV fijo junto al módulo (DIRECCIONES_EJECUTABLE.csv, LISTA_FALLAS_PERIFERICO.csv) que
+la siguiente volvía a leer, y todo se recalculaba en cada ejecución.
+
+    cache = CacheEtapas()
+    bits = cache.obtener('svd', {'svd': hash_archivo(svd), 'periferico': 'GPIOD'}, crear,
+                         formato='npz', a_tablas=TablaBits.a_tablas,
+                         desde_tablas=TablaBits.desde_tablas)
+
+    - clave = sha256 de la etapa + sus entradas (hash del ELF/SVD/map, micro, periférico,
+      parámetros del generador, semilla...) + VERSION_CACHE.
+    - en memoria: el mismo objeto para toda instancia de ACOPLADO del proceso (lotes).
+    - en disco: cache_etapas/<etapa>_<clave>.npz (tablas numpy, sin pickle) o .json.
+    Si cambia cualquier entrada cambia la clave y la etapa se vuelve a ejecutar.
+"""
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+VERSION_CACHE = 1
+
+CARPETA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_etapas")
+
+# clave -> artefacto ya cargado o calculado en este proceso
+_MEMORIA = {}
+
+
+def clave_etapa(etapa, entradas):
+    texto = json.dumps({'etapa': etapa, 'version': VERSION_CACHE, **entradas}, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def huella(*valores):
+    """sha256 del contenido de arrays numpy (u otros valores por su texto): artefacto como entrada."""
+    h = hashlib.sha256()
+    for valor in valores:
+        if isinstance(valor, np.ndarray):
+            h.update(str(valor.dtype).encode())
+            h.update(np.ascontiguousarray(valor).tobytes())
+        else:
+            h.update(str(valor).encode())
+    return h.hexdigest()
+
+
+class CacheEtapas:
+    def __init__(self, carpeta_cache=CARPETA_CACHE):
+        self.carpeta_cache = carpeta_cache
+
+    def _ruta(self, etapa, clave, formato):
+        return os.path.join(self.carpeta_cache, f"{etapa}_{clave[:32]}.{formato}")
+
+    def obtener(self, etapa, entradas, crear, formato='json', a_tablas=None, desde_tablas=None):
+        """
+        Artefacto de la etapa para esas entradas: de memoria, de disco o crear().
+        formato 'npz': a_tablas(valor) -> {nombre: array} y desde_tablas(tablas) -> valor.
+        """
+        clave = clave_etapa(etapa, entradas)
+        if clave in _MEMORIA:
+            print(f"[INFO] Etapa '{etapa}': reutilizada de memoria")
+            return _MEMORIA[clave]
+
+        ruta = self._ruta(etapa, clave, formato)
+        valor = self._leer(ruta, formato, desde_tablas)
+        if valor is not None:
+            print(f"[INFO] Etapa '{etapa}': entradas sin cambios, tomada de {ruta}")
+        else:
+            t0 = time.perf_counter()
+            valor = crear()
+            print(f"[INFO] Etapa '{etapa}' calculada en {time.perf_counter() - t0:.2f} s")
+            self._guardar(ruta, formato, valor if a_tablas is None else a_tablas(valor))
+        _MEMORIA[clave] = valor
+        return valor
+
+    # ---------- disco ----------
+    @staticmethod
+    def _leer(ruta, formato, desde_tablas):
+        try:
+            if formato == 'npz':
+                with np.load(ruta, allow_pickle=False) as datos:
+                    tablas = {k: datos[k] for k in datos.files}
+                return tablas if desde_tablas is None else desde_tablas(tablas)
+            with open(ruta) as f:
+                return json.load(f)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _guardar(ruta, formato, datos):
+        try:
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+            tmp = ruta + ".tmp." + formato
+            if formato == 'npz':
+                np.savez_compressed(tmp, **datos)
+            else:
+                with open(tmp, 'w') as f:
+                    json.dump(datos, f)
+            os.replace(tmp, ruta)
+        except OSError as e:
+            print(f"[WARNING] No se pudo guardar la cache de la etapa: {e}")
+
+
+if __name__ == '__main__':
+    cache = CacheEtapas()
+    for _ in range(2):
+        valor = cache.obtener('demo', {'n': 3}, lambda: [1, 2, 3])
+    print(f"[INFO] {valor} en {cache.carpeta_cache}")
@@ -0,0 +1,378 @@
+#------------------------MODULO CACHE DEL SVD DIGERIDO-------------------------------#
+"""
+M_cache_svd.py
+
+El SVD del fabricante (STM32F407/F446: varios MB de XML) se analizaba con
+SVDParser.for_xml_file en cada campaña (ListaRegistros) y otra vez en la GUI solo
+para llenar la lista de periféricos. Aquí se digiere una vez a tablas compactas:
+
+    perifericos   nombre, descripción, rango [inicio, fin) de sus bits
+    bits          columnas numpy: registro, campo, acceso (códigos en tablas de
+                  texto), dirección de palabra (uint32) y bit dentro de la palabra (uint8)
+
+y se guarda en cache_svd/<clave>.npz (np.savez_compressed, sin pickle). La clave es
+ruta del SVD + mtime + tamaño: si el archivo cambia, se vuelve a digerir. Cargar la
+cache tarda milisegundos; dispositivo_svd(ruta) además la memoiza en el proceso.
+
+Los bits son los mismos que generaba ListaRegistros.generador_lista_fallas: campos (o
+registros sin campos) READ_WRITE, sin RESERVED, con la dirección alineada a palabra.
+
+    registros     todos los registros de cada periférico (dirección, tamaño, acceso
+                  heredado y si tienen readAction) y el grupo del periférico: lo que
+                  M_captura_perifericos necesita para armar los bloques de lectura
+
+TablaBits es la lista de bits que usan ListaRegistros y RandomFaultGenerator: un array
+estructurado numpy (DTYPE_BIT, 16 bytes por bit) más las tablas de textos. Filtrar y
+muestrear son operaciones sobre el array; los dicts solo se arman para los bits
+elegidos, y el CSV queda como formato de exportación.
+"""
+import csv
+import hashlib
+import os
+from collections import namedtuple
+
+import numpy as np
+
+VERSION_CACHE = 2
+
+CARPETA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_svd")
+
+COLUMNAS_BITS = ['PERIFERICO', 'REGISTRO', 'CAMPO', 'DIRECCION', 'BIT', 'TIPO DE ACCESO', 'MASCARA']
+
+# Un bit inyectable: códigos en las tablas de textos + dirección de palabra y bit
+DTYPE_BIT = np.dtype([
+    ('periferico', np.uint16),
+    ('registro', np.uint32),
+    ('campo', np.uint32),
+    ('acceso', np.uint8),
+    ('direccion', np.uint32),
+    ('bit', np.uint8),
+])
+
+# Registro del SVD para la captura de periféricos (tamaño en bytes, acceso ya heredado)
+RegistroSVD = namedtuple('RegistroSVD', ['nombre', 'direccion', 'tamano', 'acceso', 'read_action'])
+
+# ruta absoluta -> (mtime, tamaño, DispositivoSVD)
+_DISPOSITIVOS = {}
+
+
+def clave_svd(svd_path):
+    estado = os.stat(svd_path)
+    texto = f"{os.path.abspath(str(svd_path))}|{estado.st_mtime_ns}|{estado.st_size}|{VERSION_CACHE}"
+    return hashlib.sha1(texto.encode()).hexdigest()
+
+
+def en_cache(svd_path, carpeta_cache=CARPETA_CACHE):
+    """True si el SVD ya está digerido en disco (o cargado en el proceso)."""
+    ruta = os.path.abspath(str(svd_path))
+    return ruta in _DISPOSITIVOS or os.path.exists(os.path.join(carpeta_cache, clave_svd(ruta) + ".npz"))
+
+
+class _Tabla:
+    """Textos internados: cada texto distinto una vez, las filas guardan su código."""
+
+    def __init__(self):
+        self.codigos = {}
+
+    def codigo(self, texto):
+        return self.codigos.setdefault(texto, len(self.codigos))
+
+    def textos(self):
+        return np.array(list(self.codigos), dtype=str)
+
+
+class ConstructorTablas:
+    """Acumula periféricos y bits y los devuelve como las tablas de la cache."""
+
+    def __init__(self):
+        self.registros, self.campos, self.accesos = _Tabla(), _Tabla(), _Tabla()
+        self.b_reg, self.b_campo, self.b_acceso, self.b_dir, self.b_bit = [], [], [], [], []
+        self.per_nombre, self.per_desc, self.per_grupo, self.per_inicio = [], [], [], []
+        self.r_per, self.r_nombre, self.r_dir, self.r_tam, self.r_acceso, self.r_lectura = [], [], [], [], [], []
+
+    def periferico(self, nombre, descripcion, grupo=None):
+        self.per_nombre.append(nombre or "")
+        self.per_desc.append(str(descripcion))
+        self.per_grupo.append(grupo or nombre or "")
+        self.per_inicio.append(len(self.b_dir))
+
+    def registro_captura(self, nombre, direccion, tamano, acceso, read_action):
+        """Registro del último periférico agregado, para M_captura_perifericos."""
+        self.r_per.append(len(self.per_nombre) - 1)
+        self.r_nombre.append(nombre)
+        self.r_dir.append(direccion)
+        self.r_tam.append(tamano)
+        self.r_acceso.append(acceso)
+        self.r_lectura.append(read_action)
+
+    def registro(self, nombre, reg_addr, reg_access, reg_size, campos):
+        """
+        Bits inyectables de un registro: campos READ_WRITE (o el registro entero si no
+        tiene campos), sin RESERVED. campos = [(nombre, bit_offset, ancho, acceso o None)].
+        """
+        if "RESERVED" in nombre.upper():
+            return
+        if campos:
+            for campo, bit_offset, ancho, acceso in campos:
+                if "RESERVED" in campo.upper():
+                    continue
+                field_access = str(acceso or reg_access)
+                if "READ_WRITE" not in field_access.upper():
+                    continue
+                self._bits(nombre, campo, field_access, reg_addr, bit_offset, ancho)
+        elif "READ_WRITE" in reg_access.upper():
+            # Registro sin campos: un "campo" con el nombre del registro y todo su ancho
+            self._bits(nombre, nombre, reg_access, reg_addr, 0, reg_size or 32)
+
+    def _bits(self, registro, campo, acceso, reg_addr, bit_offset, ancho):
+        reg, cam, acc = self.registros.codigo(registro), self.campos.codigo(campo), self.accesos.codigo(acceso)
+        for bit in range(ancho):
+            absolute_byte_addr = reg_addr + (bit_offset + bit) // 8
+            self.b_dir.append(absolute_byte_addr & ~0x3)
+            self.b_bit.append((absolute_byte_addr % 4) * 8 + ((bit_offset + bit) % 8))
+            self.b_reg.append(reg)
+            self.b_campo.append(cam)
+            self.b_acceso.append(acc)
+
+    def tablas(self):
+        return {
+            'version': np.array(VERSION_CACHE),
+            'per_nombre': np.array(self.per_nombre, dtype=str),
+            'per_desc': np.array(self.per_desc, dtype=str),
+            'per_grupo': np.array(self.per_grupo, dtype=str),
+            'per_inicio': np.array(self.per_inicio + [len(self.b_dir)], dtype=np.int64),
+            'registros': self.registros.textos(),
+            'campos': self.campos.textos(),
+            'accesos': self.accesos.textos(),
+            'b_reg': np.array(self.b_reg, dtype=np.uint32),
+            'b_campo': np.array(self.b_campo, dtype=np.uint32),
+            'b_acceso': np.array(self.b_acceso, dtype=np.uint8),
+            'b_dir': np.array(self.b_dir, dtype=np.uint32),
+            'b_bit': np.array(self.b_bit, dtype=np.uint8),
+            'r_per': np.array(self.r_per, dtype=np.uint16),
+            'r_nombre': np.array(self.r_nombre, dtype=str),
+            'r_dir': np.array(self.r_dir, dtype=np.uint32),
+            'r_tam': np.array(self.r_tam, dtype=np.uint16),
+            'r_acceso': np.array(self.r_acceso, dtype=str),
+            'r_lectura': np.array(self.r_lectura, dtype=bool),
+        }
+
+
+# ---------- lista de bits en columnas ----------
+class TablaBits:
+    """
+    Bits inyectables como array estructurado (DTYPE_BIT). perifericos, registros,
+    campos y accesos son arrays de textos indexados por los códigos de cada fila.
+    """
+
+    def __init__(self, datos, perifericos, registros, campos, accesos):
+        self.datos = datos
+        self.perifericos = np.asarray(perifericos, dtype=str)
+        self.registros = np.asarray(registros, dtype=str)
+        self.campos = np.asarray(campos, dtype=str)
+        self.accesos = np.asarray(accesos, dtype=str)
+
+    def __len__(self):
+        return len(self.datos)
+
+    def _con(self, datos):
+        return TablaBits(datos, self.perifericos, self.registros, self.campos, self.accesos)
+
+    # ---------- filtrado y muestreo ----------
+    def filtrar(self, perifericos=None, acceso=None):
+        """Bits de los periféricos indicados y/o cuyo acceso contiene 'acceso' (una máscara)."""
+        mascara = np.ones(len(self.datos), dtype=bool)
+        if perifericos is not None:
+            nombres = {str(p).upper() for p in ([perifericos] if isinstance(perifericos, str) else perifericos)}
+            codigos = [i for i, n in enumerate(self.perifericos) if n.upper() in nombres]
+            mascara &= np.isin(self.datos['periferico'], codigos)
+        if acceso is not None:
+            codigos = [i for i, a in enumerate(self.accesos) if str(acceso).upper() in a.upper()]
+            mascara &= np.isin(self.datos['acceso'], codigos)
+        return self._con(self.datos[mascara])
+
+    def muestrear(self, n, rng=None):
+        """n índices al azar (con reemplazo, como random.choice repetido)."""
+        rng = rng if rng is not None else np.random.default_rng()
+        return rng.integers(0, len(self.datos), size=n)
+
+    def conteo_perifericos(self):
+        """{periférico: número de bits}, con un bincount."""
+        conteo = np.bincount(self.datos['periferico'], minlength=len(self.perifericos))
+        return {str(self.perifericos[i]): int(c) for i, c in enumerate(conteo) if c}
+
+    # ---------- filas (solo las pedidas) ----------
+    def filas(self, indices=None):
+        """Bits como dicts con las columnas de COLUMNAS_BITS (todos o los índices dados)."""
+        d = self.datos if indices is None else self.datos[np.asarray(indices, dtype=np.int64)]
+        return [{
+            "PERIFERICO": p,
+            "REGISTRO": r,
+            "CAMPO": c,
+            "DIRECCION": hex(direccion),
+            "BIT": b,
+            "TIPO DE ACCESO": a,
+            "MASCARA": f"0x{(1 << b):08X}",
+        } for p, r, c, a, direccion, b in zip(self.perifericos[d['periferico']].tolist(),
+                                              self.registros[d['registro']].tolist(),
+                                              self.campos[d['campo']].tolist(),
+                                              self.accesos[d['acceso']].tolist(),
+                                              d['direccion'].tolist(), d['bit'].tolist())]
+
+    # ---------- tablas (cache de etapas, M_cache_etapas) ----------
+    def a_tablas(self):
+        return {'datos': self.datos, 'perifericos': self.perifericos, 'registros': self.registros,
+                'campos': self.campos, 'accesos': self.accesos}
+
+    @classmethod
+    def desde_tablas(cls, tablas):
+        return cls(tablas['datos'], tablas['perifericos'], tablas['registros'],
+                   tablas['campos'], tablas['accesos'])
+
+    # ---------- CSV (exportación) ----------
+    def guardar_csv(self, csv_path):
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNAS_BITS)
+            writer.writeheader()
+            writer.writerows(self.filas())
+
+    @classmethod
+    def desde_csv(cls, csv_path):
+        """Lee un CSV exportado (o escrito a mano) con las columnas de COLUMNAS_BITS."""
+        perifericos, registros, campos, accesos = _Tabla(), _Tabla(), _Tabla(), _Tabla()
+        filas = []
+        with open(csv_path, newline='') as f:
+            for row in csv.DictReader(f):
+                filas.append((perifericos.codigo(row.get('PERIFERICO', '')),
+                              registros.codigo(row.get('REGISTRO', '')),
+                              campos.codigo(row.get('CAMPO', '')),
+                              accesos.codigo(row.get('TIPO DE ACCESO', '')),
+                              int(row['DIRECCION'], 16), int(row['BIT'])))
+        return cls(np.array(filas, dtype=DTYPE_BIT), perifericos.textos(),
+                   registros.textos(), campos.textos(), accesos.textos())
+
+
+# ---------- digestión (una vez por SVD) ----------
+def digerir_svd(svd_path):
+    """Analiza el SVD completo y devuelve las tablas (dict de arrays numpy)."""
+    from cmsis_svd.parser import SVDParser
+    print(f"[INFO] Analizando SVD: {svd_path}")
+    device = SVDParser.for_xml_file(str(svd_path)).get_device()
+
+    constructor = ConstructorTablas()
+    for peripheral in device.peripherals:
+        constructor.periferico(peripheral.name, getattr(peripheral, "description", "Sin descripción"),
+                               peripheral.group_name)
+        # get_registers() expande arrays (dim) y clusters; .registers los deja sin expandir
+        for reg in peripheral.get_registers():
+            campos = [(f.name, f.bit_offset, f.bit_width, f.access) for f in (reg.fields or [])]
+            constructor.registro(reg.name, peripheral.base_address + reg.address_offset,
+                                 str(reg.access or "unknown"), reg.size, campos)
+            constructor.registro_captura(
+                reg.name, peripheral.base_address + reg.address_offset,
+                max(1, (reg.size or peripheral.size or 32) // 8), str(reg.access or peripheral.access or ""),
+                reg.read_action is not None or any(f.read_action is not None for f in (reg.fields or [])))
+    return constructor.tablas()
+
+
+# ---------- modelo cargado ----------
+class DispositivoSVD:
+    def __init__(self, svd_path, carpeta_cache=CARPETA_CACHE, tablas=None):
+        """tablas: ya extraídas (p.ej. M_svd_streaming); entonces no se usa la cache."""
+        self.svd_path = os.path.abspath(str(svd_path))
+        if not os.path.isfile(self.svd_path):
+            raise FileNotFoundError(f"Archivo SVD no encontrado: {self.svd_path}")
+        self.ruta_cache = os.path.join(carpeta_cache, clave_svd(self.svd_path) + ".npz")
+
+        if tablas is None:
+            tablas = self._leer_cache()
+        if tablas is None:
+            tablas = digerir_svd(self.svd_path)
+            self._guardar_cache(tablas)
+        for nombre, valor in tablas.items():
+            setattr(self, nombre, valor)
+        self._indice_per = {str(n).upper(): i for i, n in enumerate(self.per_nombre)}
+
+    def _leer_cache(self):
+        try:
+            with np.load(self.ruta_cache, allow_pickle=False) as datos:
+                tablas = {k: datos[k] for k in datos.files}
+        except (OSError, ValueError):
+            return None
+        return tablas if int(tablas.get('version', -1)) == VERSION_CACHE else None
+
+    def _guardar_cache(self, tablas):
+        try:
+            os.makedirs(os.path.dirname(self.ruta_cache), exist_ok=True)
+            tmp = self.ruta_cache + ".tmp.npz"
+            np.savez_compressed(tmp, **tablas)
+            os.replace(tmp, self.ruta_cache)
+        except OSError as e:
+            print(f"[WARNING] No se pudo guardar la cache del SVD: {e}")
+
+    # ---------- consultas ----------
+    def __len__(self):
+        return len(self.b_dir)
+
+    def perifericos(self):
+        """[(nombre, descripción)] en el orden del SVD."""
+        return [(str(n), str(d)) for n, d in zip(self.per_nombre, self.per_desc)]
+
+    def rango_periferico(self, nombre):
+        """(inicio, fin) de las filas de bits del periférico, o None."""
+        i = self._indice_per.get(str(nombre).upper())
+        if i is None:
+            return None
+        return int(self.per_inicio[i]), int(self.per_inicio[i + 1])
+
+    def registros_periferico(self, nombre):
+        """(nombre, grupo, [RegistroSVD]) de un periférico, o None si no está en el SVD."""
+        i = self._indice_per.get(str(nombre).upper())
+        if i is None:
+            return None
+        registros = [RegistroSVD(str(self.r_nombre[k]), int(self.r_dir[k]), int(self.r_tam[k]),
+                                 str(self.r_acceso[k]), bool(self.r_lectura[k]))
+                     for k in np.flatnonzero(self.r_per == i)]
+        return str(self.per_nombre[i]), str(self.per_grupo[i]), registros
+
+    def bits(self, perifericos=None):
+        """TablaBits de todo el dispositivo o de los periféricos indicados (rangos de per_inicio)."""
+        datos = np.empty(len(self.b_dir), dtype=DTYPE_BIT)
+        datos['periferico'] = np.repeat(np.arange(len(self.per_nombre), dtype=np.uint16),
+                                        np.diff(self.per_inicio))
+        datos['registro'], datos['campo'], datos['acceso'] = self.b_reg, self.b_campo, self.b_acceso
+        datos['direccion'], datos['bit'] = self.b_dir, self.b_bit
+        tabla = TablaBits(datos, self.per_nombre, self.registros, self.campos, self.accesos)
+        return tabla if perifericos is None else tabla.filtrar(perifericos)
+
+    def filas(self, periferico=None):
+        """Bits como dicts con las columnas de los CSV de ListaRegistros (todo o un periférico)."""
+        return self.bits(periferico).filas()
+
+
+def dispositivo_svd(svd_path, carpeta_cache=CARPETA_CACHE):
+    """DispositivoSVD memoizado en el proceso (se recarga si el archivo cambia)."""
+    ruta = os.path.abspath(str(svd_path))
+    estado = os.stat(ruta)
+    previo = _DISPOSITIVOS.get(ruta)
+    if previo and previo[0] == estado.st_mtime_ns and previo[1] == estado.st_size:
+        return previo[2]
+    dispositivo = DispositivoSVD(ruta, carpeta_cache)
+    _DISPOSITIVOS[ruta] = (estado.st_mtime_ns, estado.st_size, dispositivo)
+    return dispositivo
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Uso: python M_cache_svd.py dispositivo.svd [PERIFERICO]")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    dispositivo = DispositivoSVD(sys.argv[1])
+    print(f"[INFO] {len(dispositivo.per_nombre)} periféricos, {len(dispositivo)} bits "
+          f"({time.perf_counter() - t0:.3f} s) -> {dispositivo.ruta_cache}")
+    if len(sys.argv) > 2:
+        for fila in dispositivo.filas(sys.argv[2])[:16]:
+            print("  " + "  ".join(str(fila[c]) for c in COLUMNAS_BITS))
@@ -0,0 +1,289 @@
+#------------------------MODULO DE CALIBRACION DEL RELOJ SWD-------------------------------#
+"""
+M_calibracion_swd.py
+
+Ajuste automático del reloj SWD al abrir una sesión pyOCD:
+    1) Se sube la frecuencia escalón a escalón (FRECUENCIAS_SWD).
+    2) En cada escalón se escriben y releen bloques en RAM con patrones
+       aleatorios, alternados y "walking ones"; cualquier diferencia o error
+       de transferencia detiene la subida.
+    3) Se elige la frecuencia más alta que pasó, bajando siempre MARGEN_PASOS
+       escalones como margen de seguridad (también si pasaron todos).
+       Se relee de la sonda el reloj realmente aplicado (las sondas redondean).
+    4) La frecuencia elegida se guarda por (UID de la sonda, target) en
+       calibracion_swd.json y se reutiliza (verificándola) en sesiones siguientes.
+
+Durante la campaña el core se envuelve en NucleoConRespaldo: si aparece un error
+de enlace (TransferError / ProbeError, no un fallo de bus del target) se baja un
+escalón de frecuencia, se actualiza la cache y se reintenta la operación.
+
+Claves propias en opts (se quitan antes de pasar las opciones a pyOCD):
+    auto_frecuencia: True/False (por defecto True)
+    frecuencia_max:  límite superior de la calibración (Hz)
+    ram_prueba_swd:  dirección de RAM para los patrones (por defecto, RAM del memory map)
+"""
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+from pyocd.core.exceptions import ProbeError, TransferError, TransferFaultError
+from pyocd.core.memory_map import MemoryType
+
+# Escalones de frecuencia probados en orden ascendente (Hz)
+FRECUENCIAS_SWD = [1_800_000, 4_000_000, 8_000_000, 12_000_000, 16_000_000, 24_000_000, 33_000_000, 50_000_000]
+
+# Escalones que se bajan desde la frecuencia más alta que pasó
+MARGEN_PASOS = 1
+
+# Palabras por bloque de prueba y rondas por escalón
+PALABRAS_PRUEBA = 256
+RONDAS_PRUEBA = 4
+
+# Reintentos de una operación tras bajar la frecuencia
+MAX_REINTENTOS = 3
+
+ARCHIVO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calibracion_swd.json")
+
+# Claves de opts que no son opciones de pyOCD
+OPCIONES_PROPIAS = ('auto_frecuencia', 'frecuencia_max', 'ram_prueba_swd', 'max_instrucciones')
+
+
+def opciones_pyocd(opts):
+    """Copia de opts sin las claves propias de la herramienta."""
+    return {k: v for k, v in (opts or {}).items() if k not in OPCIONES_PROPIAS}
+
+
+def _es_error_enlace(e):
+    # TransferFaultError es un fallo de bus del target (dirección inválida), no del enlace SWD
+    return isinstance(e, (TransferError, ProbeError)) and not isinstance(e, TransferFaultError)
+
+
+# ---------- cache por sonda y target ----------
+def _clave_cache(session):
+    uid = getattr(session.probe, 'unique_id', None) or 'desconocida'
+    target = getattr(session.board, 'target_type', None) or session.options.get('target_override') or 'desconocido'
+    return f"{uid}|{target}"
+
+
+def leer_cache(archivo=None):
+    try:
+        with open(archivo or ARCHIVO_CACHE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def guardar_cache(clave, frecuencia, archivo=None, efectiva=None):
+    cache = leer_cache(archivo)
+    cache[clave] = {'frequency': int(frecuencia), 'fecha': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    if efectiva is not None:
+        cache[clave]['efectiva'] = int(efectiva)
+    try:
+        with open(archivo or ARCHIVO_CACHE, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"[WARNING] No se pudo guardar la cache de calibración SWD: {e}")
+
+
+# ---------- reloj efectivo ----------
+def reloj_efectivo(session, pedida):
+    """
+    Reloj SWD que la sonda aplica realmente (Hz). ST-Link y J-Link lo informan;
+    para el resto (CMSIS-DAP, ...) no hay lectura posible y se devuelve None.
+    """
+    link = getattr(session.probe, '_link', None)
+    try:
+        # J-Link (pylink): velocidad actual en kHz
+        if hasattr(link, 'speed') and not callable(link.speed):
+            return int(link.speed) * 1000
+        if hasattr(link, 'get_com_frequencies') and getattr(link, '_hw_version', 0) >= 3:
+            # ST-Link V3: frecuencia actual del protocolo SWD en kHz
+            actual, _ = link.get_com_frequencies(link.Protocol.SWD)
+            return int(actual) * 1000
+        if hasattr(link, 'set_swd_frequency') and hasattr(link, '_hw_version'):
+            # ST-Link V2: la sonda usa el mayor escalón de su tabla que no supera la pedida
+            from pyocd.probe.stlink.constants import SWD_FREQ_MAP
+            return next((f for f in SWD_FREQ_MAP if pedida >= f), None)
+    except Exception as e:
+        print(f"[WARNING] No se pudo leer el reloj SWD efectivo: {e}")
+    return None
+
+
+def _texto_reloj(session, pedida):
+    efectiva = reloj_efectivo(session, pedida)
+    if efectiva is None or efectiva == pedida:
+        return efectiva, f"{pedida / 1e6:.1f} MHz"
+    return efectiva, f"{pedida / 1e6:.1f} MHz pedidos, {efectiva / 1e6:.3f} MHz efectivos"
+
+
+# ---------- prueba de enlace ----------
+def _patrones(palabras, rng):
+    yield [rng.getrandbits(32) for _ in range(palabras)]
+    yield [0xAAAAAAAA if i % 2 else 0x55555555 for i in range(palabras)]
+    yield [1 << (i % 32) for i in range(palabras)]
+    while True:
+        yield [rng.getrandbits(32) for _ in range(palabras)]
+
+
+def verificar_enlace(core, direccion, palabras=PALABRAS_PRUEBA, rondas=RONDAS_PRUEBA, rng=None):
+    """Escribe/relee 'rondas' bloques de patrones; True si todos coinciden."""
+    rng = rng or random.Random()
+    patrones = _patrones(palabras, rng)
+    try:
+        for _ in range(rondas):
+            datos = next(patrones)
+            core.write_memory_block32(direccion, datos)
+            if core.read_memory_block32(direccion, palabras) != datos:
+                return False
+        return True
+    except Exception as e:
+        if _es_error_enlace(e):
+            return False
+        raise
+
+
+def _direccion_prueba(session, opts):
+    if opts.get('ram_prueba_swd') is not None:
+        return int(opts['ram_prueba_swd'])
+    try:
+        region = session.target.memory_map.get_default_region_of_type(MemoryType.RAM)
+        if region is not None:
+            return region.start
+    except Exception:
+        pass
+    return 0x20000000
+
+
+def calibrar_frecuencia(session, core, direccion, frecuencias, rondas=RONDAS_PRUEBA):
+    """Sube la frecuencia hasta el primer fallo. Devuelve la lista de frecuencias que pasaron."""
+    rng = random.Random()
+    pasaron = []
+    for f in frecuencias:
+        try:
+            session.probe.set_clock(f)
+        except Exception as e:
+            print(f"[WARNING] La sonda no aceptó {f / 1e6:.1f} MHz: {e}")
+            break
+        if not verificar_enlace(core, direccion, rondas=rondas, rng=rng):
+            print(f"[INFO] SWD {f / 1e6:.1f} MHz: FALLA")
+            break
+        print(f"[INFO] SWD {f / 1e6:.1f} MHz: OK")
+        pasaron.append(f)
+    return pasaron
+
+
+# ---------- core con respaldo de frecuencia ----------
+class NucleoConRespaldo:
+    """Proxy del core: ante errores de enlace baja un escalón de reloj y reintenta."""
+
+    def __init__(self, core, session, frecuencias, indice, clave_cache=None):
+        self._core = core
+        self._session = session
+        self._frecuencias = frecuencias
+        self._indice = indice
+        self._clave_cache = clave_cache
+        self.bajadas = 0
+
+    @property
+    def frecuencia(self):
+        return self._frecuencias[self._indice]
+
+    def _bajar_frecuencia(self):
+        if self._indice == 0:
+            return False
+        self._indice -= 1
+        self._session.probe.set_clock(self.frecuencia)
+        self.bajadas += 1
+        efectiva, texto = _texto_reloj(self._session, self.frecuencia)
+        print(f"[WARNING] Errores de transferencia: reloj SWD reducido a {texto}")
+        if self._clave_cache:
+            guardar_cache(self._clave_cache, self.frecuencia, efectiva=efectiva)
+        return True
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._core, nombre)
+        if not callable(atributo) or isinstance(atributo, type):
+            return atributo
+
+        def llamada(*args, **kwargs):
+            for intento in range(MAX_REINTENTOS + 1):
+                try:
+                    return atributo(*args, **kwargs)
+                except Exception as e:
+                    if intento == MAX_REINTENTOS or not _es_error_enlace(e) or not self._bajar_frecuencia():
+                        raise
+        return llamada
+
+
+def ajustar_reloj_swd(session, core, opts):
+    """
+    Calibra (o recupera de la cache) el reloj SWD de la sesión recién abierta y
+    devuelve el core envuelto en NucleoConRespaldo. Con auto_frecuencia=False
+    devuelve el core sin cambios.
+    """
+    opts = opts or {}
+    if not opts.get('auto_frecuencia', True) or session is None or core is None:
+        return core
+
+    base = int(opts.get('frequency', FRECUENCIAS_SWD[0]))
+    tope = int(opts.get('frecuencia_max', FRECUENCIAS_SWD[-1]))
+    frecuencias = sorted({base} | {f for f in FRECUENCIAS_SWD if base < f <= tope})
+
+    clave = _clave_cache(session)
+    direccion = _direccion_prueba(session, opts)
+    t0 = time.time()
+
+    try:
+        # Se preserva el contenido de la RAM usada para la prueba (leído a la frecuencia base)
+        respaldo = core.read_memory_block32(direccion, PALABRAS_PRUEBA)
+
+        cache = leer_cache().get(clave)
+        if cache and cache['frequency'] in frecuencias:
+            session.probe.set_clock(cache['frequency'])
+            if verificar_enlace(core, direccion, rondas=1):
+                core.write_memory_block32(direccion, respaldo)
+                _, texto = _texto_reloj(session, cache['frequency'])
+                print(f"[INFO] Reloj SWD desde cache ({clave}): {texto}")
+                return NucleoConRespaldo(core, session, frecuencias,
+                                         frecuencias.index(cache['frequency']), clave)
+            print("[WARNING] La frecuencia en cache ya no es fiable: recalibrando...")
+
+        pasaron = calibrar_frecuencia(session, core, direccion, frecuencias)
+        if not pasaron:
+            elegida = frecuencias[0]
+        else:
+            # Aunque pasen todos los escalones se baja el margen: el tope no probó el límite del enlace
+            elegida = pasaron[max(0, len(pasaron) - 1 - MARGEN_PASOS)]
+        session.probe.set_clock(elegida)
+        core.write_memory_block32(direccion, respaldo)
+    except Exception as e:
+        print(f"[WARNING] Calibración SWD no realizada, se mantiene {base / 1e6:.1f} MHz: {e}")
+        try:
+            session.probe.set_clock(base)
+        except Exception:
+            pass
+        return core
+
+    efectiva, texto = _texto_reloj(session, elegida)
+    guardar_cache(clave, elegida, efectiva=efectiva)
+    print(f"[INFO] Reloj SWD calibrado: {texto} ({time.time() - t0:.2f} s)")
+    return NucleoConRespaldo(core, session, frecuencias, frecuencias.index(elegida), clave)
+
+
+if __name__ == '__main__':
+    from pyocd.core.helpers import ConnectHelper
+
+    opts = {
+        "frequency": 1800000,
+        "connect_mode": "under_reset",
+        "halt_on_connect": True,
+        "resume_on_disconnect": False,
+        "reset_type": "hw",
+        "auto_frecuencia": True
+    }
+    with ConnectHelper.session_with_chosen_probe(options=opciones_pyocd(opts)) as session:
+        target = session.board.target
+        core = ajustar_reloj_swd(session, getattr(target, "selected_core", target), opts)
+        print(f"Frecuencia final: {getattr(core, 'frecuencia', opts['frequency']) / 1e6:.1f} MHz")
@@ -0,0 +1,132 @@
+#------------------------MODULO CAPTURA DE PERIFERICOS (SVD)-------------------------------#
+"""
+M_captura_perifericos.py
+
+Snapshot del banco de registros de uno o varios periféricos. Con una falla de tipo
+registro la ventana normal solo cubre la palabra inyectada; aquí se usa el SVD para
+leer en stop_address todos los registros legibles de los periféricos elegidos y ver
+si la falla se propagó a otros registros del mismo periférico o de periféricos
+relacionados (RCC, DMA, NVIC...).
+
+    - Se excluyen los registros de solo escritura y los que tienen efectos al leerse:
+      readAction en el SVD (registro o campo) y, como muchos SVD de ST no lo declaran,
+      los registros de datos/estado conocidos (DR, SR de USART/SPI/I2C...) -> SENSIBLES.
+    - Los registros legibles contiguos se agrupan en bloques: cada bloque es UNA
+      transferencia read_memory_block32. Un registro excluido parte el bloque.
+    - Los registros salen del SVD digerido de M_cache_svd (cache_svd/, memoizado por
+      ruta + mtime): el XML no se vuelve a analizar en cada campaña.
+
+El resultado es una región de M_politica_captura ("bloques" + "registros"): sus palabras
+van a columnas X_<periférico>_<registro> del snapshot, se guardan como delta contra
+GOLDEN (M_almacen_snapshots) y el analizador las compara igual que la ventana.
+"""
+import re
+from pathlib import Path
+
+from M_cache_svd import dispositivo_svd
+
+# ---------- registros con efectos al leerse ----------
+# Nombre exacto en cualquier periférico (datos que se consumen al leer)
+SENSIBLES = {'DR', 'RDR', 'RXDR', 'DOUT', 'DOUTR', 'FIFO', 'RXFIFO', 'RXDATA'}
+
+# Registros de estado cuya lectura forma parte de una secuencia de borrado de flags
+# (p.ej. USART: leer SR y después DR borra ORE/IDLE; I2C: SR1 + SR2 borra ADDR)
+SENSIBLES_POR_GRUPO = {
+    ('USART', 'UART', 'SPI', 'I2S', 'I2C', 'FMPI2C', 'SDIO', 'SDMMC', 'CAN'): re.compile(r'^(SR\d?|RF\dR)$'),
+}
+
+
+def motivo_exclusion(periferico, grupo, registro, excluir=()):
+    """None si el registro (RegistroSVD) se puede leer sin efectos; si no, el motivo."""
+    nombre = registro.nombre.upper()
+    if nombre in excluir or f"{periferico.upper()}.{nombre}" in excluir:
+        return "excluido"
+    if "RESERVED" in nombre:
+        return "reservado"
+    if registro.acceso.upper().endswith(("WRITE_ONLY", ".WRITE_ONCE")):
+        return "solo escritura"
+    if registro.read_action:
+        return "readAction"
+    if nombre in SENSIBLES:
+        return "datos"
+    grupo = grupo.upper()
+    for prefijos, patron in SENSIBLES_POR_GRUPO.items():
+        if grupo.startswith(prefijos) and patron.match(nombre):
+            return "estado"
+    return None
+
+
+def bloques_periferico(periferico, grupo, registros, excluir=()):
+    """
+    Región de captura de un periférico (nombre, grupo y RegistroSVD de M_cache_svd):
+        {"nombre", "periferico", "bloques": [[dirección, palabras], ...],
+         "registros": [nombre por palabra], "excluidos": [...]}
+    """
+    excluir = {e.upper() for e in excluir}
+    palabras, sensibles, excluidos = {}, set(), []
+    for reg in registros:
+        # Registros de 8/16 bits comparten palabra alineada: se lee la palabra entera
+        direcciones = range(reg.direccion & ~0x3, reg.direccion + reg.tamano, 4)
+        motivo = motivo_exclusion(periferico, grupo, reg, excluir)
+        if motivo:
+            excluidos.append(f"{reg.nombre} ({motivo})")
+            sensibles.update(direcciones)
+            continue
+        for dir_palabra in direcciones:
+            palabras.setdefault(dir_palabra, []).append(reg.nombre)
+
+    bloques, nombres = [], []
+    for dir_palabra in sorted(d for d in palabras if d not in sensibles):
+        if bloques and bloques[-1][0] + 4 * bloques[-1][1] == dir_palabra:
+            bloques[-1][1] += 1
+        else:
+            bloques.append([dir_palabra, 1])
+        nombres.append("_".join(dict.fromkeys(palabras[dir_palabra])))
+
+    return {"nombre": periferico, "periferico": periferico,
+            "bloques": bloques, "registros": nombres, "excluidos": excluidos}
+
+
+def regiones_perifericos(svd_path, nombres, excluir=()):
+    """Regiones de captura (ver bloques_periferico) de los periféricos pedidos."""
+    dispositivo = dispositivo_svd(svd_path)
+    regiones = []
+    for nombre in nombres:
+        encontrado = dispositivo.registros_periferico(nombre)
+        if encontrado is None:
+            print(f"[WARNING] Periférico '{nombre}' no está en {Path(svd_path).name}: omitido")
+            continue
+        periferico = encontrado[0]
+        region = bloques_periferico(*encontrado, excluir)
+        if not region["bloques"]:
+            print(f"[WARNING] Periférico '{nombre}' sin registros legibles sin efectos: omitido")
+            continue
+        print(f"[INFO] Periférico {periferico}: {len(region['registros'])} palabras en "
+              f"{len(region['bloques'])} bloque(s), {len(region['excluidos'])} registros excluidos")
+        regiones.append(region)
+    return regiones
+
+
+def leer_bloques(core, region):
+    """Palabras de la región, una transferencia por bloque (0 si un bloque no se puede leer)."""
+    datos = []
+    for inicio, n in region["bloques"]:
+        try:
+            datos += list(core.read_memory_block32(int(inicio), int(n)))
+        except Exception:
+            datos += [0] * int(n)
+    return datos
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Uso: python M_captura_perifericos.py dispositivo.svd PERIFERICO [PERIFERICO...]")
+        sys.exit(1)
+    for r in regiones_perifericos(sys.argv[1], sys.argv[2:]):
+        print(f"{r['nombre']}:")
+        for inicio, n in r["bloques"]:
+            print(f"    0x{inicio:08X} + {n} palabras")
+        if r["excluidos"]:
+            print(f"    excluidos: {', '.join(r['excluidos'])}")
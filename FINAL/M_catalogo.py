@@ -0,0 +1,337 @@
+#------------------------MODULO CATALOGO DE CAMPAÑAS (SQLITE)-------------------------------#
+"""
+M_catalogo.py
+
+Catálogo de campañas en SQLite para consultar entre campañas sin recorrer carpetas ni
+releer CSV completos. Un archivo por carpeta base (la que contiene las campaign_*):
+
+    catalogo_campanias.sqlite   (modo WAL: el dashboard lee mientras una campaña escribe)
+
+Tablas:
+    campanias   una fila por carpeta: inicio, ELF, hash SHA-256 del firmware, política
+    fallas      filas de faults_log.csv (dirección, ubicación, tipo, estado del inyector)
+    resultados  filas de analisis_avanzado.csv (clasificación y estado final por falla)
+    snapshots   dónde está el snapshot de cada falla: fase, archivo y fila
+
+Se llena mientras corren las campañas (FaultInjector/EjecutorParalelo al terminar la
+inyección y el analizador al terminar el análisis) con catalogar(campaign_dir). Cada
+ingesta reemplaza las filas de esa campaña, así que se puede repetir sin duplicar.
+
+Las carpetas anteriores se incorporan con:
+    python M_catalogo.py [carpeta_base]
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ARCHIVO_CATALOGO = "catalogo_campanias.sqlite"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS campanias (
+    id             INTEGER PRIMARY KEY,
+    nombre         TEXT UNIQUE NOT NULL,
+    ruta           TEXT NOT NULL,
+    inicio         TEXT,
+    firmware_hash  TEXT,
+    elf            TEXT,
+    elf_ram        TEXT,
+    politica       TEXT,
+    total_fallas   INTEGER,
+    catalogada     TEXT
+);
+CREATE TABLE IF NOT EXISTS fallas (
+    campania_id          INTEGER NOT NULL REFERENCES campanias(id) ON DELETE CASCADE,
+    fault_id             INTEGER NOT NULL,
+    direccion_inyeccion  INTEGER,
+    direccion_bp         INTEGER,
+    tipo                 TEXT,
+    mascara              INTEGER,
+    ubicacion            TEXT,
+    valor_original       INTEGER,
+    valor_falla          INTEGER,
+    valor_leido          INTEGER,
+    estado               TEXT
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    campania_id    INTEGER NOT NULL REFERENCES campanias(id) ON DELETE CASCADE,
+    fault_id       INTEGER NOT NULL,
+    clasificacion  TEXT,
+    estado_final   TEXT,
+    detalle        TEXT,
+    PRIMARY KEY (campania_id, fault_id)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    campania_id  INTEGER NOT NULL REFERENCES campanias(id) ON DELETE CASCADE,
+    fault_id     INTEGER NOT NULL,
+    fase         TEXT NOT NULL,
+    archivo      TEXT NOT NULL,
+    fila         INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_campanias_firmware ON campanias(firmware_hash);
+CREATE INDEX IF NOT EXISTS idx_fallas_campania ON fallas(campania_id, fault_id);
+CREATE INDEX IF NOT EXISTS idx_fallas_particion ON fallas(campania_id, ubicacion, fault_id);
+CREATE INDEX IF NOT EXISTS idx_fallas_direccion ON fallas(direccion_inyeccion);
+CREATE INDEX IF NOT EXISTS idx_fallas_ubicacion ON fallas(ubicacion);
+CREATE INDEX IF NOT EXISTS idx_resultados_estado ON resultados(estado_final);
+CREATE INDEX IF NOT EXISTS idx_snapshots_falla ON snapshots(campania_id, fault_id, fase);
+"""
+
+# Columnas de faults_log.csv -> columnas de la tabla fallas
+COLUMNAS_FALLAS = {
+    'Fault_ID': 'fault_id', 'Direccion_Inyeccion': 'direccion_inyeccion', 'Direccion_BP': 'direccion_bp',
+    'Tipo': 'tipo', 'Mascara': 'mascara', 'Ubicacion': 'ubicacion', 'Valor_Original': 'valor_original',
+    'Valor_Falla': 'valor_falla', 'Valor_Leido': 'valor_leido', 'Estado': 'estado',
+}
+COLUMNAS_HEX = ('direccion_inyeccion', 'direccion_bp', 'mascara', 'valor_original', 'valor_falla', 'valor_leido')
+
+# Filas de CSV por bloque al ingerir (memoria acotada con campañas de millones de fallas)
+FILAS_BLOQUE = 50000
+
+
+# ---------- utilidades ----------
+def ruta_catalogo(base_dir):
+    return os.path.join(base_dir, ARCHIVO_CATALOGO)
+
+
+def _entero(valor):
+    """'0x2000_0000' / '123' / NaN -> int o None (SQLite INTEGER es de 64 bits con signo)."""
+    if valor is None or (isinstance(valor, float) and np.isnan(valor)):
+        return None
+    try:
+        return int(str(valor), 0)
+    except ValueError:
+        return None
+
+
+def hash_firmware(elf_path):
+    """Solo para carpetas antiguas: campania.json ya trae el hash tomado al iniciar la campaña."""
+    if not elf_path or not os.path.exists(elf_path):
+        return None
+    h = hashlib.sha256()
+    with open(elf_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def _referencias_snapshots(campaign_dir):
+    """(fault_id, fase, archivo, fila) de cada snapshot guardado en la campaña."""
+    from M_almacen_snapshots import FASES, cargar_delta, cargar_matriz, es_delta, existe_fase, ruta_fase
+    refs = []
+    for fase in FASES:
+        if not existe_fase(campaign_dir, fase):
+            continue
+        try:
+            if es_delta(campaign_dir, fase):
+                filas, _ = cargar_delta(campaign_dir, fase)
+                ids, archivo = (filas[:, 1] if filas is not None else []), ruta_fase(campaign_dir, fase, 'delta.npz')
+            else:
+                matriz, _ = cargar_matriz(campaign_dir, fase)
+                ids, archivo = (matriz[:, 1] if matriz is not None else []), ruta_fase(campaign_dir, fase, 'npy')
+        except Exception as e:
+            print(f"[WARNING] No se pudieron leer los snapshots '{fase}' de {campaign_dir}: {e}")
+            continue
+        archivo = os.path.basename(archivo)
+        refs += [(int(fid), fase, archivo, i) for i, fid in enumerate(ids)]
+    return refs
+
+
+# ---------- catálogo ----------
+class CatalogoCampanias:
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+        self.ruta = ruta_catalogo(self.base_dir)
+        self.conexion = sqlite3.connect(self.ruta, timeout=30)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute("PRAGMA foreign_keys=ON")
+        self.conexion.executescript(ESQUEMA)
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    # ---------- ingesta ----------
+    def ingerir(self, campaign_dir):
+        """Agrega o reemplaza una carpeta de campaña; devuelve su id en el catálogo."""
+        campaign_dir = os.path.abspath(campaign_dir)
+        nombre = os.path.basename(campaign_dir)
+        try:
+            with open(os.path.join(campaign_dir, "campania.json")) as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            datos = {}
+        inicio = datos.get('inicio') or datetime.fromtimestamp(os.path.getmtime(campaign_dir)).strftime(
+            "%Y-%m-%d %H:%M:%S")
+        if 'firmware_hash' in datos:
+            firmware = datos['firmware_hash']
+        else:
+            firmware = hash_firmware(datos.get('elf_main_path'))
+
+        with self.conexion:
+            self.conexion.execute("DELETE FROM campanias WHERE nombre = ?", (nombre,))
+            cur = self.conexion.execute(
+                "INSERT INTO campanias (nombre, ruta, inicio, firmware_hash, elf, elf_ram, politica, total_fallas,"
+                " catalogada) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (nombre, campaign_dir, inicio, firmware,
+                 datos.get('elf_main_path'), datos.get('elf_ram_path'),
+                 json.dumps(datos['politica']) if datos.get('politica') else None,
+                 0, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            cid = cur.lastrowid
+
+            for faultlog in self._leer_csv(campaign_dir, "faults_log.csv"):
+                cols = [c for c in COLUMNAS_FALLAS if c in faultlog.columns]
+                destino = [COLUMNAS_FALLAS[c] for c in cols]
+                filas = []
+                for valores in faultlog[cols].itertuples(index=False):
+                    fila = dict(zip(destino, valores))
+                    for c in COLUMNAS_HEX:
+                        if c in fila:
+                            fila[c] = _entero(fila[c])
+                    fila['fault_id'] = _entero(fila['fault_id'])
+                    filas.append([cid] + [fila[c] for c in destino])
+                self.conexion.executemany(
+                    f"INSERT INTO fallas (campania_id, {', '.join(destino)}) "
+                    f"VALUES ({', '.join('?' * (len(destino) + 1))})", filas)
+
+            for analisis in self._leer_csv(campaign_dir, "analisis_avanzado.csv"):
+                if 'Fault_ID' not in analisis.columns:
+                    break
+                otras = [c for c in analisis.columns if c not in ('Fault_ID', 'Clasificacion', 'Estado_Final_Inyector')]
+                self.conexion.executemany(
+                    "INSERT OR REPLACE INTO resultados VALUES (?, ?, ?, ?, ?)",
+                    [(cid, _entero(r['Fault_ID']), r.get('Clasificacion'), r.get('Estado_Final_Inyector'),
+                      json.dumps({c: r[c] for c in otras if pd.notna(r[c])}, default=str))
+                     for r in analisis.to_dict('records')])
+
+            self.conexion.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)",
+                                      [(cid, *ref) for ref in _referencias_snapshots(campaign_dir)])
+            self.conexion.execute(
+                "UPDATE campanias SET total_fallas = (SELECT COUNT(DISTINCT fault_id) FROM fallas "
+                "WHERE campania_id = ?) WHERE id = ?", (cid, cid))
+        return cid
+
+    @staticmethod
+    def _leer_csv(campaign_dir, nombre):
+        """Bloques (DataFrame de texto) de un CSV de la campaña; ninguno si no existe."""
+        ruta = os.path.join(campaign_dir, nombre)
+        if not os.path.exists(ruta):
+            return
+        try:
+            yield from pd.read_csv(ruta, dtype=str, chunksize=FILAS_BLOQUE)
+        except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+            print(f"[WARNING] {ruta} no se pudo leer: {e}")
+
+    def ingerir_carpeta(self, base_dir=None, solo_nuevas=True):
+        """Incorpora las campaign_* de la carpeta base; devuelve cuántas se agregaron."""
+        base_dir = base_dir or self.base_dir
+        conocidas = {n for (n,) in self.conexion.execute("SELECT nombre FROM campanias")} if solo_nuevas else set()
+        nuevas = 0
+        for d in sorted(os.listdir(base_dir)):
+            ruta = os.path.join(base_dir, d)
+            if d.startswith("campaign_") and os.path.isdir(ruta) and d not in conocidas:
+                self.ingerir(ruta)
+                nuevas += 1
+        return nuevas
+
+    def depurar(self):
+        """Quita del catálogo las campañas cuya carpeta ya no existe."""
+        borradas = [(cid,) for cid, ruta in self.conexion.execute("SELECT id, ruta FROM campanias")
+                    if not os.path.isdir(ruta)]
+        with self.conexion:
+            self.conexion.executemany("DELETE FROM campanias WHERE id = ?", borradas)
+        return len(borradas)
+
+    # ---------- consultas ----------
+    def _consulta(self, sql, parametros=()):
+        return pd.read_sql_query(sql, self.conexion, params=parametros)
+
+    def campanias(self):
+        """DataFrame de campañas, de la más antigua a la más reciente."""
+        return self._consulta("SELECT * FROM campanias ORDER BY inicio, nombre")
+
+    def ultima(self):
+        """Ruta de la campaña más reciente que sigue en disco, o None."""
+        for (ruta,) in self.conexion.execute("SELECT ruta FROM campanias ORDER BY inicio DESC, nombre DESC"):
+            if os.path.isdir(ruta):
+                return ruta
+        return None
+
+    def fallas(self, campania=None, direccion=None, ubicacion=None, estado=None, firmware=None,
+               clasificacion=None):
+        """
+        Fallas (faults_log + resultado del análisis) filtradas por campaña (nombre), dirección
+        de inyección, ubicación, estado final del inyector, hash de firmware o clasificación.
+        """
+        condiciones, parametros = [], []
+        for columna, valor in (("c.nombre", campania), ("f.direccion_inyeccion", _entero(direccion)),
+                               ("f.ubicacion", ubicacion), ("c.firmware_hash", firmware),
+                               ("r.clasificacion", clasificacion)):
+            if valor is not None:
+                condiciones.append(f"{columna} = ?")
+                parametros.append(valor)
+        if estado is not None:
+            condiciones.append("COALESCE(r.estado_final, f.estado) = ?")
+            parametros.append(estado)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        return self._consulta(
+            "SELECT c.nombre AS campania, f.*, r.clasificacion, r.estado_final FROM fallas f "
+            "JOIN campanias c ON c.id = f.campania_id "
+            "LEFT JOIN resultados r ON r.campania_id = f.campania_id AND r.fault_id = f.fault_id "
+            f"{donde} ORDER BY c.inicio, f.fault_id", parametros)
+
+    def resumen(self, campania=None):
+        """Conteo de clasificaciones por campaña."""
+        donde, parametros = ("WHERE c.nombre = ?", (campania,)) if campania else ("", ())
+        return self._consulta(
+            "SELECT c.nombre AS campania, r.clasificacion, COUNT(*) AS fallas FROM resultados r "
+            f"JOIN campanias c ON c.id = r.campania_id {donde} "
+            "GROUP BY c.id, r.clasificacion ORDER BY c.inicio", parametros)
+
+    def por_direccion(self, firmware=None):
+        """Clasificaciones agrupadas por dirección de inyección (todas las campañas)."""
+        donde, parametros = ("WHERE c.firmware_hash = ?", (firmware,)) if firmware else ("", ())
+        return self._consulta(
+            "SELECT f.direccion_inyeccion, f.ubicacion, r.clasificacion, COUNT(*) AS fallas FROM fallas f "
+            "JOIN campanias c ON c.id = f.campania_id "
+            "JOIN resultados r ON r.campania_id = f.campania_id AND r.fault_id = f.fault_id "
+            f"{donde} GROUP BY f.direccion_inyeccion, f.ubicacion, r.clasificacion", parametros)
+
+    def snapshot(self, campania, fault_id, fase):
+        """(ruta del archivo, fila) del snapshot de una falla, o None."""
+        fila = self.conexion.execute(
+            "SELECT c.ruta, s.archivo, s.fila FROM snapshots s JOIN campanias c ON c.id = s.campania_id "
+            "WHERE c.nombre = ? AND s.fault_id = ? AND s.fase = ?", (campania, int(fault_id), fase)).fetchone()
+        return (os.path.join(fila[0], fila[1]), fila[2]) if fila else None
+
+
+def catalogar(campaign_dir):
+    """Agrega/actualiza una campaña en el catálogo de su carpeta base (no interrumpe si falla)."""
+    if not campaign_dir:
+        return None
+    try:
+        with CatalogoCampanias(os.path.dirname(os.path.abspath(campaign_dir))) as catalogo:
+            return catalogo.ingerir(campaign_dir)
+    except Exception as e:
+        print(f"[WARNING] No se pudo registrar {campaign_dir} en el catálogo: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    base = sys.argv[1] if len(sys.argv) > 1 else None
+    with CatalogoCampanias(base) as catalogo:
+        nuevas = catalogo.ingerir_carpeta()
+        quitadas = catalogo.depurar()
+        print(f"[INFO] Catálogo {catalogo.ruta}: {nuevas} campañas nuevas, {quitadas} quitadas")
+        print(catalogo.resumen().to_string(index=False))
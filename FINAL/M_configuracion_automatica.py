@@ -7,7 +7,7 @@ from pathlib import Path
 # ---------------------------
 # Librerías generales a instalar
 # ---------------------------
-LIBRERIAS = ['pip', 'pyocd', 'pyelftools', 'cmsis-svd', 'pandas', 'numpy','matplotlib', 'streamlit']
+LIBRERIAS = ['pip', 'pyocd', 'pyelftools', 'cmsis-svd', 'pandas', 'numpy','matplotlib', 'streamlit', 'unicorn', 'pyarrow']
 
 # ---------------------------
 # Microcontroladores y sus packs
@@ -0,0 +1,198 @@
+#------------------------MODULO CRC32 EJECUTADO EN EL OBJETIVO-------------------------------#
+"""
+M_crc_objetivo.py
+
+Huella CRC32 de regiones de memoria calculada POR EL PROPIO MCU: en lugar de leer
+una región entera por SWD se carga una rutina Thumb de 168 bytes (código + tabla de 16
+entradas) en un área de RAM libre, se llama desde la sonda (PC, R0-R2 y LR con
+breakpoint de retorno) y solo se lee R0 (una palabra por región).
+
+    R0 = dirección (alineada a 4), R1 = longitud en bytes (múltiplo de 4),
+    R2 = CRC previo (0 al empezar)
+    -> R0 = CRC32 (mismo valor que zlib.crc32(datos, crc_previo))
+
+La rutina usa solo instrucciones Thumb-1 (Cortex-M0 a M7), sin pila: lee una palabra y
+la procesa de a 4 bits con la tabla (~14 ciclos por byte: ~1 MB/s a 16 MHz, ~12 MB/s a
+168 MHz). Se guardan y restauran los registros del core (PRIMASK incluido: las
+interrupciones quedan enmascaradas mientras corre, así SysTick o una IRQ no modifican la
+RAM entre huellas) y el contenido original del área de trabajo, así que se puede llamar
+con el programa detenido en stop_address sin alterarlo.
+
+M_propagacion_ram la usa para comparar bloques de RAM contra GOLDEN y leer por SWD
+solo los bloques cuya huella difiere. Con el objetivo emulado (M_gestion_MCU_emu) la
+rutina se ejecuta de verdad en el emulador, lo que permite probar todo sin placa;
+HuellaHost calcula lo mismo leyendo la memoria (referencia / núcleos sin la rutina).
+"""
+import struct
+import time
+import zlib
+
+import numpy as np
+
+# ---------- rutina ----------
+# crc32:  adr   r4, tabla              ; tabla de 16 entradas (CRC de un nibble)
+#         mvns  r2, r2
+#         movs  r5, #0x3C              ; máscara del índice ya multiplicado por 4
+#         lsrs  r1, r1, #2             ; palabras
+#         beq   fin
+# bucle:  ldm   r0!, {r3}
+#         eors  r2, r3
+#         lsls  r3, r2, #2             ; x8 (un nibble por bloque):
+#         ands  r3, r5                 ;   r3 = (crc & 0xF) * 4
+#         ldr   r3, [r4, r3]
+#         lsrs  r2, r2, #4
+#         eors  r2, r3                 ;   crc = (crc >> 4) ^ tabla[crc & 0xF]
+#         ...
+#         subs  r1, #1
+#         bne   bucle
+# fin:    mvns  r0, r2
+#         bx    lr
+# ret:    b     ret                    ; breakpoint de retorno (si no salta, el core queda aquí)
+# tabla:  .word tabla[0..15]
+_NIBBLE = (0x0093, 0x402B, 0x58E3, 0x0912, 0x405A)
+_INSTRUCCIONES = (0xA419, 0x43D2, 0x253C, 0x0889, 0xD02B, 0xC808, 0x405A) + _NIBBLE * 8 + \
+                 (0x3901, 0xD1D3, 0x43D0, 0x4770, 0xE7FE)
+
+
+def _tabla_nibble(polinomio=0xEDB88320):
+    tabla = []
+    for i in range(16):
+        c = i
+        for _ in range(4):
+            c = (c >> 1) ^ (polinomio if c & 1 else 0)
+        tabla.append(c)
+    return tabla
+
+
+CODIGO_CRC32 = (struct.pack(f'<{len(_INSTRUCCIONES)}H', *_INSTRUCCIONES)
+                + struct.pack('<16I', *_tabla_nibble()))
+OFFSET_RETORNO = 2 * (len(_INSTRUCCIONES) - 1)
+TAMANO_CODIGO = len(CODIGO_CRC32)
+
+# Registros que la llamada modifica y se restauran al terminar
+REGISTROS_CONTEXTO = ['r0', 'r1', 'r2', 'r3', 'r4', 'r5', 'lr', 'pc', 'xpsr', 'primask']
+
+# Tiempo máximo por región (~1 MB/s a 16 MHz: un bloque de RAM tarda milisegundos)
+TIMEOUT_REGION = 2.0
+
+
+def direccion_trabajo(elf_path):
+    """
+    Área libre para la rutina: inicio del heap (símbolo 'end'/'_end' de newlib) o,
+    si no existe, el final de las secciones escribibles del ELF. Alineada a 4.
+    """
+    from M_modelo_elf import modelo_elf, SHF_WRITE, SHF_ALLOC
+    elf = modelo_elf(elf_path)
+    for nombre in ('end', '_end'):
+        simbolo = elf.simbolo(nombre)
+        if simbolo:
+            return (simbolo[0] + 3) & ~0x3
+    fin = None
+    for sec in elf.secciones:
+        if sec['flags'] & SHF_WRITE and sec['flags'] & SHF_ALLOC and sec['nombre'] != '._user_heap_stack':
+            fin = max(fin or 0, sec['direccion'] + sec['tamano'])
+    return (fin + 3) & ~0x3 if fin is not None else None
+
+
+def _palabras(datos):
+    return list(struct.unpack(f'<{len(datos) // 4}I', datos))
+
+
+# ---------- clases ----------
+class HuellaHost:
+    """Misma interfaz que CRCObjetivo, leyendo la memoria por la sonda y calculando en el PC."""
+
+    def __init__(self, core):
+        self.core = core
+
+    def huellas(self, regiones):
+        res = []
+        for inicio, n_bytes in regiones:
+            datos = np.array(self.core.read_memory_block32(inicio, n_bytes // 4), dtype='<u4').tobytes()
+            res.append(zlib.crc32(datos))
+        return res
+
+
+class CRCObjetivo:
+    """
+    Rutina CRC32 cargada en 'direccion' (área de RAM libre, TAMANO_CODIGO bytes).
+    huellas() guarda el contexto, enmascara interrupciones (PRIMASK=1), carga la rutina,
+    la ejecuta una vez por región y restaura registros y memoria.
+    """
+
+    def __init__(self, core, direccion, timeout=TIMEOUT_REGION):
+        self.core = core
+        self.direccion = direccion & ~0x3
+        self.retorno = self.direccion + OFFSET_RETORNO
+        self.timeout = timeout
+
+    def _esperar_retorno(self):
+        t0 = time.time()
+        while not self.core.is_halted():
+            if time.time() - t0 > self.timeout:
+                self.core.halt()
+                raise TimeoutError("la rutina CRC no volvió al breakpoint de retorno")
+            time.sleep(0.001)
+        pc = self.core.read_core_register('pc')
+        if pc != self.retorno:
+            raise RuntimeError(f"la rutina CRC se detuvo en 0x{pc:08X} (esperado 0x{self.retorno:08X})")
+        return self.core.read_core_register('r0')
+
+    def crc(self, inicio, n_bytes, previo=0):
+        """CRC32 de una región con la rutina ya cargada (usar dentro de huellas())."""
+        self.core.write_core_register('r0', inicio)
+        self.core.write_core_register('r1', n_bytes)
+        self.core.write_core_register('r2', previo)
+        self.core.write_core_register('lr', self.retorno | 1)
+        self.core.write_core_register('pc', self.direccion)
+        self.core.resume()
+        return self._esperar_retorno()
+
+    def huellas(self, regiones):
+        """CRC32 de cada (inicio, n_bytes), en el orden dado (n_bytes múltiplo de 4)."""
+        core = self.core
+        contexto = {r: core.read_core_register(r) for r in REGISTROS_CONTEXTO}
+        core.write_core_register('primask', 1)
+        original = core.read_memory_block32(self.direccion, TAMANO_CODIGO // 4)
+        core.write_memory_block32(self.direccion, _palabras(CODIGO_CRC32))
+        core.set_breakpoint(self.retorno, core.BreakpointType.HW)
+        try:
+            return [self.crc(inicio, n_bytes) for inicio, n_bytes in regiones]
+        finally:
+            core.remove_breakpoint(self.retorno)
+            core.write_memory_block32(self.direccion, original)
+            for r, v in contexto.items():
+                core.write_core_register(r, v)
+
+
+def huellas_imagen(imagen, inicio, palabras_bloque, direccion_codigo=None):
+    """
+    CRC32 esperado de cada bloque de una imagen uint32 (p.ej. la RAM GOLDEN). Si la rutina
+    se carga dentro del rango, sus bytes se incluyen igual que los verá el objetivo.
+    """
+    imagen = np.asarray(imagen, dtype='<u4')
+    if direccion_codigo is not None:
+        ofs = (direccion_codigo - inicio) // 4
+        codigo = np.frombuffer(CODIGO_CRC32, dtype='<u4')
+        if 0 <= ofs < len(imagen):
+            imagen = imagen.copy()
+            n = min(len(codigo), len(imagen) - ofs)
+            imagen[ofs:ofs + n] = codigo[:n]
+    return [zlib.crc32(imagen[i:i + palabras_bloque].tobytes()) for i in range(0, len(imagen), palabras_bloque)]
+
+
+if __name__ == '__main__':
+    import sys
+    from M_gestion_MCU_emu import NucleoEmulado
+
+    elf = sys.argv[1] if len(sys.argv) > 1 else None
+    if not elf:
+        print("Uso: python M_crc_objetivo.py firmware.elf")
+        sys.exit(1)
+    core = NucleoEmulado(elf)
+    trabajo = direccion_trabajo(elf)
+    prueba = bytes(range(256)) * 4
+    base = trabajo + 0x100
+    core.write_memory_block32(base, _palabras(prueba))
+    objetivo = CRCObjetivo(core, trabajo).huellas([(base, len(prueba))])[0]
+    print(f"Rutina en 0x{trabajo:08X}: CRC objetivo 0x{objetivo:08X}  zlib 0x{zlib.crc32(prueba):08X}")
@@ -0,0 +1,242 @@
+#------------------------MODULO DE CRIBADO EN DOS NIVELES-------------------------------#
+"""
+M_cribado.py
+
+Campaña en dos niveles para ahorrar tiempo de placa:
+    Nivel 1: toda la lista de fallas se ejecuta en el objetivo emulado (EjecutorParalelo)
+             y se clasifica con el analizador (silenciosa / propagada / no_aplicada).
+    Nivel 2: solo un subconjunto se confirma en la placa real con FaultInjector:
+               - fallas NO enmascaradas en emulación (propagadas o no aplicadas),
+               - fallas cercanas a accesos a periféricos (el emulador no los modela),
+               - una muestra aleatoria de calibración entre las enmascaradas.
+
+El reporte final (reporte_dos_niveles.csv) une ambos niveles, marca el origen de cada
+resultado ('emulado' o 'confirmado') y mide la concordancia emulador/placa en la
+muestra de calibración.
+"""
+import bisect
+import csv
+import os
+import random
+
+import pandas as pd
+
+from M_ejecucion_paralela import EjecutorParalelo
+from M_analizador import analizar_campana_avanzado, resolver_estado_final
+from Pruebas_inyector_2 import FaultInjector
+from M_broker_sondas import abrir_mcu
+from M_golden import GOLDEN
+
+
+class CribadoDosNiveles:
+    def __init__(self, csv_file, elf_main_path, elf_ram_path, main_opts, broker=None,
+                 fraccion_calibracion=0.05, distancia_periferico=32,
+                 semilla=None, max_procesos=None, politica=None):
+        """
+        csv_file: lista de fallas completa (LISTA_INYECCION.csv)
+        main_opts: opciones pyOCD para la placa real
+        broker: (opcional) dirección del broker de sondas para el nivel 2
+        fraccion_calibracion: fracción de fallas enmascaradas que se confirman en placa
+        distancia_periferico: bytes alrededor de una instrucción que accede a periféricos
+                              dentro de los cuales un breakpoint se considera "cercano"
+        politica: (opcional) política de captura de snapshots para ambos niveles (M_politica_captura)
+        """
+        self.csv_file = str(csv_file)
+        self.elf_path = str(elf_main_path)
+        self.elf_ram_path = str(elf_ram_path) if elf_ram_path else None
+        self.opts = main_opts or {}
+        self.broker = broker
+        self.fraccion_calibracion = fraccion_calibracion
+        self.distancia_periferico = distancia_periferico
+        self.rng = random.Random(semilla)
+        self.max_procesos = max_procesos
+        self.politica = politica
+
+        self.dir_emulado = None
+        self.dir_hardware = None
+
+    # ---------- nivel 1 ----------
+    def _nivel_emulado(self):
+        print("[INFO] ===== CRIBADO NIVEL 1: emulación de toda la lista =====")
+        self.ejecutor = EjecutorParalelo(self.csv_file, self.elf_path, self.elf_ram_path,
+                                         max_procesos=self.max_procesos, politica=self.politica)
+        self.ejecutor.ejecutar(golden=True)
+        self.dir_emulado = self.ejecutor.campaign_dir
+        df, _ = analizar_campana_avanzado(self.dir_emulado)
+        return df
+
+    def _accesos_perifericos(self):
+        """PCs (ordenados) que accedieron a periféricos, por ELF, durante prefijos y GOLDEN."""
+        return {elf: sorted(core.accesos_perifericos) for elf, core in self.ejecutor.nucleos.items()}
+
+    def _cerca_de_periferico(self, falla, accesos):
+        if (falla.ubicacion or '').lower() == 'registro':
+            return True
+        imagen = self.ejecutor._imagen(falla)
+        pcs = accesos.get(imagen[0], []) if imagen else []
+        bp = falla.direccion_breakpoint
+        if bp is None or not pcs:
+            return False
+        i = bisect.bisect_left(pcs, bp - self.distancia_periferico)
+        return i < len(pcs) and pcs[i] <= bp + self.distancia_periferico
+
+    # ---------- selección ----------
+    def seleccionar(self, df_emulado):
+        """Devuelve {Fault_ID: motivo} con las fallas que se confirmarán en placa."""
+        clasif = dict(zip(df_emulado["Fault_ID"].astype(int), df_emulado["Clasificacion"]))
+        accesos = self._accesos_perifericos()
+
+        seleccion = {}
+        enmascaradas = []
+        for falla in self.ejecutor.injector.lista_fallas:
+            fid = falla.id_falla
+            if clasif.get(fid) != "silenciosa":
+                seleccion[fid] = "no_enmascarada"
+            elif self._cerca_de_periferico(falla, accesos):
+                seleccion[fid] = "periferico"
+            else:
+                enmascaradas.append(fid)
+
+        n_cal = int(round(len(enmascaradas) * self.fraccion_calibracion))
+        if enmascaradas and self.fraccion_calibracion > 0:
+            n_cal = max(1, n_cal)
+        for fid in self.rng.sample(enmascaradas, min(n_cal, len(enmascaradas))):
+            seleccion[fid] = "calibracion"
+
+        print(f"[INFO] Seleccionadas para placa: {len(seleccion)} de {len(clasif)} "
+              f"(no enmascaradas: {sum(m == 'no_enmascarada' for m in seleccion.values())}, "
+              f"periférico: {sum(m == 'periferico' for m in seleccion.values())}, "
+              f"calibración: {sum(m == 'calibracion' for m in seleccion.values())})")
+        return seleccion
+
+    def _escribir_subconjunto(self, seleccion):
+        base_dir = os.path.dirname(os.path.abspath(self.csv_file))
+        ruta = os.path.join(base_dir, "LISTA_CONFIRMACION.csv")
+        with open(self.csv_file, newline='') as f_in, open(ruta, 'w', newline='') as f_out:
+            reader = csv.DictReader(f_in)
+            writer = csv.DictWriter(f_out, fieldnames=reader.fieldnames)
+            writer.writeheader()
+            for row in reader:
+                try:
+                    if int(row['FAULT_ID']) in seleccion:
+                        writer.writerow(row)
+                except (KeyError, ValueError):
+                    continue
+        return ruta
+
+    # ---------- nivel 2 ----------
+    def _nivel_hardware(self, csv_subconjunto):
+        print("[INFO] ===== CRIBADO NIVEL 2: confirmación en placa =====")
+        with abrir_mcu(self.opts, self.elf_path, broker=self.broker) as mcu:
+            injector = FaultInjector(mcu=mcu, csv_file=csv_subconjunto,
+                                     elf_main_path=self.elf_path, elf_ram_path=self.elf_ram_path,
+                                     main_opts=self.opts, broker=self.broker, politica=self.politica)
+            injector.ejecutar()
+            self.dir_hardware = injector.campaign_dir
+
+        with abrir_mcu(self.opts, self.elf_path, broker=self.broker) as mcu:
+            golden = GOLDEN(mcu=mcu, csv_file=csv_subconjunto,
+                            elf_main_path=self.elf_path, elf_ram_path=self.elf_ram_path,
+                            main_opts=self.opts, campaign_dir=self.dir_hardware,
+                            broker=self.broker)
+            if golden.lista_fallas:
+                golden.ejecutar()
+
+        df, _ = analizar_campana_avanzado(self.dir_hardware)
+        return df
+
+    # ---------- reporte combinado ----------
+    def _estados(self, camp_dir):
+        faultlog = pd.read_csv(os.path.join(camp_dir, "faults_log.csv"))
+        return {int(fid): resolver_estado_final(faultlog, fid) for fid in faultlog["Fault_ID"].unique()}
+
+    def combinar(self, df_emulado, df_hardware, seleccion):
+        estados_emu = self._estados(self.dir_emulado)
+        estados_hw = self._estados(self.dir_hardware) if self.dir_hardware else {}
+        clasif_emu = dict(zip(df_emulado["Fault_ID"].astype(int), df_emulado["Clasificacion"]))
+        clasif_hw = {}
+        if df_hardware is not None and not df_hardware.empty:
+            clasif_hw = dict(zip(df_hardware["Fault_ID"].astype(int), df_hardware["Clasificacion"]))
+
+        filas = []
+        for falla in self.ejecutor.injector.lista_fallas:
+            fid = falla.id_falla
+            confirmada = fid in clasif_hw
+            c_emu = clasif_emu.get(fid, "")
+            c_hw = clasif_hw.get(fid, "")
+            filas.append({
+                "Fault_ID": fid,
+                "Ubicacion": falla.ubicacion,
+                "Motivo_Confirmacion": seleccion.get(fid, ""),
+                "Clasificacion_Emulada": c_emu,
+                "Estado_Emulado": estados_emu.get(fid, ""),
+                "Clasificacion_Hardware": c_hw,
+                "Estado_Hardware": estados_hw.get(fid, ""),
+                "Clasificacion_Final": c_hw if confirmada else c_emu,
+                "Origen": "confirmado" if confirmada else "emulado",
+                "Coincide": (c_emu == c_hw) if confirmada else None,
+            })
+        df = pd.DataFrame(filas)
+
+        calibracion = df[(df["Motivo_Confirmacion"] == "calibracion") & (df["Origen"] == "confirmado")]
+        confirmadas = df[df["Origen"] == "confirmado"]
+        self.concordancia_calibracion = calibracion["Coincide"].mean() if not calibracion.empty else None
+        self.concordancia_confirmadas = confirmadas["Coincide"].mean() if not confirmadas.empty else None
+
+        out_dir = self.dir_hardware or self.dir_emulado
+        out_csv = os.path.join(out_dir, "reporte_dos_niveles.csv")
+        df.to_csv(out_csv, index=False)
+
+        def pct(x):
+            return "N/A" if x is None else f"{x * 100:.2f}%"
+
+        lineas = [
+            "========== REPORTE DE CRIBADO EN DOS NIVELES ==========",
+            f"Campaña emulada:   {self.dir_emulado}",
+            f"Campaña en placa:  {self.dir_hardware or 'N/A'}",
+            f"Total fallas:                  {len(df)}",
+            f"Resultados solo emulados:      {int((df['Origen'] == 'emulado').sum())}",
+            f"Resultados confirmados:        {len(confirmadas)}",
+            f"Muestra de calibración:        {len(calibracion)}",
+            f"Concordancia en calibración:   {pct(self.concordancia_calibracion)}",
+            f"Concordancia en confirmadas:   {pct(self.concordancia_confirmadas)}",
+            "========================================================",
+        ]
+        print("\n" + "\n".join(lineas) + "\n")
+        with open(os.path.join(out_dir, "resumen_dos_niveles.txt"), "w") as f:
+            f.write("\n".join(lineas) + "\n")
+        print(f"[INFO] Reporte combinado guardado en: {out_csv}")
+        return df
+
+    # ---------- flujo completo ----------
+    def ejecutar(self):
+        df_emulado = self._nivel_emulado()
+        seleccion = self.seleccionar(df_emulado)
+
+        df_hardware = None
+        if seleccion:
+            csv_subconjunto = self._escribir_subconjunto(seleccion)
+            df_hardware = self._nivel_hardware(csv_subconjunto)
+        else:
+            print("[INFO] Ninguna falla requiere confirmación en placa.")
+
+        return self.combinar(df_emulado, df_hardware, seleccion)
+
+
+# ---------- ejemplo de uso ----------
+if __name__ == '__main__':
+    opts = {
+        "frequency": 1800000,
+        "connect_mode": "under_reset",
+        "halt_on_connect": True,
+        "resume_on_disconnect": False,
+        "reset_type": "hw",
+        "vector_catch": "reset,hardfault,memmanage,busfault,usagefault",
+        "enable_semihosting": False
+    }
+    elf_main = r"/Users/apple/Documents/PruebasST/LED/Debug/LED.elf"
+    elf_ram = r"/Users/apple/Documents/PruebasST/ScriptPruebas/Debug/ScriptPruebas.elf"
+    csv_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LISTA_INYECCION.csv")
+
+    cribado = CribadoDosNiveles(csv_file, elf_main, elf_ram, opts, fraccion_calibracion=0.05)
+    cribado.ejecutar()
@@ -0,0 +1,143 @@
+#------------------------MODULO DECODIFICADOR THUMB-2-------------------------------#
+"""
+M_decodificador_thumb.py
+
+Decodificador Thumb/Thumb-2 en el propio proceso, sin arm-none-eabi-objdump.
+Para la campaña solo hacen falta dos cosas del código:
+
+    - las direcciones de inicio de instrucción de una sección (lista de inyección)
+    - el salto incondicional hacia atrás del while(1) de main (stop_address)
+
+Ambas salen de la longitud de cada instrucción: en Thumb-2 una instrucción es de
+32 bits si los 5 bits altos de su primera media palabra son 0b11101, 0b11110 o
+0b11111; si no, es de 16 bits. Todo se calcula con numpy sobre las medias palabras.
+
+Los símbolos de mapeo del ELF ($t / $d) marcan dónde hay código y dónde datos
+(literal pools, tablas); los tramos $d no se decodifican. Sin símbolos de mapeo la
+sección entera se trata como código.
+"""
+import numpy as np
+
+# ---------- longitud de instrucción ----------
+def _es_prefijo32(medias):
+    return (medias >> 11) >= 0b11101
+
+
+def inicios_instruccion(medias):
+    """
+    Máscara de medias palabras que inician instrucción (barrido lineal desde la 0).
+
+    Dentro de una racha de prefijos de 32 bits las instrucciones alternan (prefijo,
+    segunda mitad, prefijo...); fuera de las rachas toda media palabra es un inicio.
+    Con p(i) = inicio de la racha que contiene (o acaba justo antes de) i, la media
+    palabra i inicia instrucción si i - p(i) es par.
+    """
+    n = len(medias)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    prefijo = _es_prefijo32(medias)
+    corte = np.ones(n, dtype=bool)
+    corte[1:] = ~prefijo[:-1]
+    indices = np.arange(n)
+    p = np.maximum.accumulate(np.where(corte, indices, 0))
+    return (indices - p) % 2 == 0
+
+
+def tramos_codigo(inicio, fin, marcas):
+    """
+    Tramos [desde, hasta) de código de la sección [inicio, fin) según los símbolos
+    de mapeo: marcas = [(dirección, '$t' | '$d' | '$a'), ...].
+    """
+    marcas = sorted((d, m[:2]) for d, m in marcas if inicio <= d < fin)
+    if not marcas:
+        return [(inicio, fin)]
+    tramos = []
+    if marcas[0][0] > inicio:
+        tramos.append((inicio, marcas[0][0]))
+    for i, (d, m) in enumerate(marcas):
+        hasta = marcas[i + 1][0] if i + 1 < len(marcas) else fin
+        if m == '$t' and hasta > d:
+            tramos.append((d, hasta))
+    return tramos
+
+
+def direcciones_instrucciones(datos, base, marcas=()):
+    """Direcciones (np.uint32) de inicio de instrucción de un bloque de código en 'base'."""
+    fin = base + len(datos)
+    resultado = []
+    for desde, hasta in tramos_codigo(base, fin, marcas):
+        medias = np.frombuffer(datos, dtype='<u2', count=(hasta - desde) // 2,
+                               offset=desde - base)
+        inicios = np.flatnonzero(inicios_instruccion(medias))
+        resultado.append(desde + 2 * inicios)
+    if not resultado:
+        return np.zeros(0, dtype=np.uint32)
+    return np.concatenate(resultado).astype(np.uint32)
+
+
+# ---------- saltos incondicionales ----------
+def _con_signo(valor, bits):
+    return np.where(valor & (1 << (bits - 1)), valor - (1 << bits), valor)
+
+
+def saltos_incondicionales(datos, base, direcciones):
+    """
+    (dirección, destino) de los B incondicionales entre las instrucciones dadas:
+        T2  b.n  11100 imm11                       destino = pc + 4 + imm11*2
+        T4  b.w  11110 S imm10 / 10 J1 1 J2 imm11  destino = pc + 4 + imm25
+    """
+    direcciones = np.asarray(direcciones, dtype=np.int64)
+    if len(direcciones) == 0:
+        return []
+    medias = np.frombuffer(datos, dtype='<u2', count=len(datos) // 2).astype(np.int64)
+    idx = (direcciones - base) // 2
+    h1 = medias[idx]
+    h2 = medias[np.minimum(idx + 1, len(medias) - 1)]
+
+    es_t2 = (h1 & 0xF800) == 0xE000
+    desp_t2 = _con_signo(h1 & 0x7FF, 11) << 1
+
+    s = (h1 >> 10) & 1
+    i1 = 1 - (((h2 >> 13) & 1) ^ s)
+    i2 = 1 - (((h2 >> 11) & 1) ^ s)
+    imm25 = (s << 24) | (i1 << 23) | (i2 << 22) | ((h1 & 0x3FF) << 12) | ((h2 & 0x7FF) << 1)
+    es_t4 = ((h1 & 0xF800) == 0xF000) & ((h2 & 0xD000) == 0x9000) & (idx + 1 < len(medias))
+    desp_t4 = _con_signo(imm25, 25)
+
+    destinos = direcciones + 4 + np.where(es_t2, desp_t2, desp_t4)
+    sel = es_t2 | es_t4
+    return list(zip(direcciones[sel].tolist(), destinos[sel].tolist()))
+
+
+def bucle_en_rango(datos, base, direcciones, inicio, fin):
+    """
+    Salto hacia atrás con origen y destino dentro de [inicio, fin] (p.ej. main).
+    Como detectar_while_infinito: si hay varios, el de dirección más alta. También
+    cuenta el salto a sí mismo (b .), que es como queda un while(1) vacío.
+    """
+    direcciones = np.asarray(direcciones)
+    direcciones = direcciones[(direcciones >= inicio) & (direcciones <= fin)]
+    candidatos = [(a, t) for a, t in saltos_incondicionales(datos, base, direcciones)
+                  if inicio <= t <= fin and t <= a]
+    return max(candidatos) if candidatos else None
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from M_modelo_elf import modelo_elf
+
+    if len(sys.argv) < 2:
+        print("Uso: python M_decodificador_thumb.py firmware.elf [seccion]")
+        sys.exit(1)
+    modelo = modelo_elf(sys.argv[1])
+    seccion = sys.argv[2] if len(sys.argv) > 2 else '.text'
+    t0 = time.perf_counter()
+    direcciones = modelo.direcciones_ejecutables(seccion)
+    bucle = modelo.bucle_principal()
+    print(f"[INFO] {len(direcciones)} instrucciones en {seccion} ({time.perf_counter() - t0:.3f} s)")
+    if bucle:
+        print(f"[OK] while(1) detectado en main: salto en 0x{bucle[0]:08x} → 0x{bucle[1]:08x}")
+    else:
+        print("[ERROR] No se encontró while(1) dentro de main.")
@@ -12,6 +12,17 @@ def obtener_ultima_carpeta_campania():
     # Carpeta donde se encuentra ESTE archivo .py
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
+    # Catálogo SQLite (M_catalogo): consulta indexada en lugar de recorrer la carpeta
+    try:
+        from M_catalogo import CatalogoCampanias
+        with CatalogoCampanias(base_dir) as catalogo:
+            catalogo.ingerir_carpeta()
+            ultima = catalogo.ultima()
+        if ultima:
+            return ultima
+    except Exception as e:
+        print(f"[WARNING] Catálogo de campañas no disponible, se recorre la carpeta: {e}")
+
     # Buscar subcarpetas dentro de base_dir que empiecen con 'campaign_'
     subdirs = [
         os.path.join(base_dir, d)
@@ -0,0 +1,161 @@
+#------------------------MODULO DIARIO DE CAMPAÑA (REANUDACION)-------------------------------#
+"""
+M_diario_campana.py
+
+Diario de progreso de una campaña para poder reanudarla tras un corte (USB, sonda, GUI):
+
+    campania.json   datos fijos de la campaña (lista de fallas copiada, ELF y su hash SHA-256,
+                    MEM cols, política de captura, inicio)
+    diario.jsonl    una línea por falla terminada: Fault_ID, contadores NASA y segundos acumulados
+
+Cada línea del diario se encola en el EscritorCSV DESPUÉS de las filas de faults_log y
+snapshots de esa falla (escribir_diario: antes se hace fsync de esas filas, y la línea se
+omite si alguna escritura falló) y va seguida de un checkpoint: si una falla aparece en el
+diario, sus filas ya están en disco. Una última línea cortada se ignora al leer.
+
+Al reanudar (FaultInjector.reanudar_campania) se descartan las filas de las fallas que no
+llegaron al diario, se restauran los contadores y se sigue agregando en la misma carpeta.
+"""
+import csv
+import json
+import os
+import shutil
+from datetime import datetime
+
+from M_modelo_elf import hash_archivo
+
+ARCHIVO_DIARIO = "diario.jsonl"
+ARCHIVO_CAMPANIA = "campania.json"
+ARCHIVO_LISTA = "LISTA_FALLAS_CAMPANIA.csv"
+
+# Contadores de FaultInjector que se guardan en cada línea del diario
+CONTADORES = ('ok', 'hangs', 'errores_bp', 'no_escritas', 'no_leido',
+              'no_inyectadas', 'no_inyectadas_valor_no_escrito', 'no_lectura')
+
+
+# ---------- campania.json ----------
+def guardar_campania(campaign_dir, csv_file, elf_main_path, elf_ram_path, mem_cols_count, politica=None):
+    """
+    Copia la lista de fallas a la carpeta (el LISTA_INYECCION.csv original se sobreescribe
+    en la siguiente generación) y escribe campania.json de forma atómica.
+    El hash del firmware se toma ahora: el ELF puede recompilarse antes de catalogar.
+    """
+    lista = os.path.join(campaign_dir, ARCHIVO_LISTA)
+    if csv_file and os.path.abspath(csv_file) != os.path.abspath(lista):
+        shutil.copyfile(csv_file, lista)
+
+    datos = {
+        'csv_original': os.path.abspath(csv_file) if csv_file else None,
+        'lista_fallas': ARCHIVO_LISTA,
+        'elf_main_path': os.path.abspath(elf_main_path) if elf_main_path else None,
+        'firmware_hash': hash_archivo(elf_main_path) if elf_main_path and os.path.isfile(elf_main_path) else None,
+        'elf_ram_path': os.path.abspath(elf_ram_path) if elf_ram_path else None,
+        'mem_cols_count': mem_cols_count,
+        'politica': politica.a_dict() if politica is not None else None,
+        'inicio': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    ruta = os.path.join(campaign_dir, ARCHIVO_CAMPANIA)
+    tmp = ruta + ".tmp"
+    with open(tmp, 'w') as f:
+        json.dump(datos, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+    return datos
+
+
+def leer_campania(campaign_dir):
+    ruta = os.path.join(campaign_dir, ARCHIVO_CAMPANIA)
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(f"[ERROR] {campaign_dir} no tiene {ARCHIVO_CAMPANIA}: no se puede reanudar")
+    with open(ruta) as f:
+        datos = json.load(f)
+    datos['lista_fallas'] = os.path.join(campaign_dir, datos['lista_fallas'])
+    return datos
+
+
+# ---------- diario.jsonl ----------
+class DiarioCampania:
+    def __init__(self, campaign_dir):
+        self.ruta = os.path.join(campaign_dir, ARCHIVO_DIARIO)
+
+    def linea(self, fault_id, injector, segundos):
+        """Bytes de la línea de diario de una falla terminada (para EscritorCSV.escribir_bytes)."""
+        registro = {
+            'id': int(fault_id),
+            'contadores': {c: getattr(injector, c, 0) for c in CONTADORES},
+            'segundos': round(segundos, 3),
+        }
+        return (json.dumps(registro) + "\n").encode()
+
+    def leer(self):
+        """Registros válidos en orden; una última línea incompleta se descarta."""
+        registros = []
+        if not os.path.exists(self.ruta):
+            return registros
+        with open(self.ruta, 'rb') as f:
+            for linea in f:
+                if not linea.endswith(b"\n"):
+                    break
+                try:
+                    registros.append(json.loads(linea))
+                except ValueError:
+                    break
+        return registros
+
+    def estado(self):
+        """(ids completadas, contadores de la última falla, segundos acumulados)."""
+        registros = self.leer()
+        if not registros:
+            return set(), {}, 0.0
+        return ({r['id'] for r in registros}, registros[-1]['contadores'], registros[-1]['segundos'])
+
+    def recortar(self, n_registros):
+        """Reescribe el diario con solo los n primeros registros válidos (quita restos de un corte)."""
+        registros = self.leer()[:n_registros]
+        tmp = self.ruta + ".tmp"
+        with open(tmp, 'w') as f:
+            for r in registros:
+                f.write(json.dumps(r) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.ruta)
+
+
+# ---------- limpieza de filas de fallas no terminadas ----------
+def depurar_faults_log(faults_log_csv, completadas):
+    """Deja en faults_log.csv solo las filas de fallas que llegaron al diario."""
+    if not os.path.exists(faults_log_csv):
+        return 0
+    with open(faults_log_csv, newline='') as f:
+        filas = list(csv.reader(f))
+    if not filas:
+        return 0
+    cabecera, datos = filas[0], filas[1:]
+    conservar = []
+    for fila in datos:
+        try:
+            if int(fila[0]) in completadas:
+                conservar.append(fila)
+        except (ValueError, IndexError):
+            continue
+    tmp = faults_log_csv + ".tmp"
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(cabecera)
+        writer.writerows(conservar)
+    os.replace(tmp, faults_log_csv)
+    return len(datos) - len(conservar)
+
+
+if __name__ == '__main__':
+    import sys
+    from M_detector_campana import obtener_ultima_carpeta_campania
+
+    camp = sys.argv[1] if len(sys.argv) > 1 else obtener_ultima_carpeta_campania()
+    datos = leer_campania(camp)
+    completadas, contadores, segundos = DiarioCampania(camp).estado()
+    print(f"Campaña: {camp}")
+    print(f"Lista de fallas: {datos['lista_fallas']}")
+    print(f"Fallas terminadas: {len(completadas)}  ({segundos:.1f} s)")
+    print(f"Contadores: {contadores}")
@@ -0,0 +1,336 @@
+#------------------------MODULO DE EJECUCION PARALELA EMULADA-------------------------------#
+"""
+M_ejecucion_paralela.py
+
+Campaña sobre el objetivo emulado (M_gestion_MCU_emu) repartida en todos los núcleos:
+    1) Se agrupan las fallas por (ELF, direccion_breakpoint).
+    2) Para cada grupo el emulador corre UNA vez desde reset hasta el breakpoint.
+    3) Desde ese punto se hace fork() de un proceso por falla: la memoria copy-on-write
+       le da a cada hijo el estado del prefijo sin volver a ejecutarlo.
+    4) Cada hijo aplica su falla, corre hasta stop_address y devuelve los snapshots
+       por un pipe; el proceso padre escribe faults_log.csv y snapshots_* con
+       el mismo formato que FaultInjector.
+
+Sin fork() (Windows) se usa el mismo flujo en serie, repitiendo el prefijo por falla.
+
+El hilo EscritorCSV del inyector se vacía y se detiene antes de cada fork(): un hijo no
+debe heredar un hilo a medio escribir (sus locks quedarían tomados) ni buffers sin volcar
+(filas duplicadas). Los resultados se registran por lotes de max_procesos fallas, así el
+escritor se detiene y se vuelve a crear una vez por lote y no una vez por falla.
+
+Si la ejecución GOLDEN emulada de un ELF no llega a stop_address (p.ej. el firmware espera
+un bit de estado de un periférico, que el emulador no modela) sus fallas no se ejecutan:
+se registran como NO_INYECTADA_EMULADOR y el cribado las manda a la placa.
+"""
+import multiprocessing as mp
+import os
+import time
+from multiprocessing.connection import wait
+
+from Pruebas_inyector_2 import FaultInjector
+from M_gestion_MCU_emu import NucleoEmulado, MAX_INSTRUCCIONES
+from M_almacen_snapshots import columnas, guardar_snapshots
+from M_catalogo import catalogar
+
+
+# ---------- utilidades ----------
+def _snapshot(core, direccion, tamano_bytes, politica=None):
+    regs = {}
+    for nombre in ['pc', 'sp', 'lr'] + [f'r{i}' for i in range(13)]:
+        regs[nombre] = core.read_core_register(nombre)
+    mem = []
+    if direccion is not None and tamano_bytes:
+        mem = core.read_memory_block32(direccion, tamano_bytes // 4)
+    extras = politica.leer_regiones(core, regs) if politica is not None and politica.regiones else None
+    return regs, (mem or [0]), extras
+
+
+def ejecutar_falla(core, falla, stop_address, tamano_bytes, politica, propagacion=None):
+    """
+    Con el core detenido en falla.direccion_breakpoint: snapshot before, aplica la falla,
+    snapshot after y corre hasta stop_address (snapshot after_stable si llega).
+    Las fases que la política no captura no se devuelven.
+    propagacion: (opcional) PropagacionRAM con imagen GOLDEN; devuelve además el diff de la RAM.
+    """
+    res = {'id': falla.id_falla}
+    res['before'] = _snapshot(core, falla.direccion_inyeccion, tamano_bytes, politica)
+    res['valor_original'] = res['before'][1][0]
+
+    res['valor_con_falla'] = falla.aplicar(core)
+    try:
+        res['valor_leido'] = core.read_memory(falla.direccion_inyeccion, 32)
+    except Exception:
+        res['valor_leido'] = None
+    if politica.incluye('after'):
+        res['after'] = _snapshot(core, falla.direccion_inyeccion, tamano_bytes, politica)
+
+    core.remove_breakpoint(falla.direccion_breakpoint)
+    core.set_breakpoint(stop_address, core.BreakpointType.HW)
+    res['estable'] = core.ejecutar_hasta(stop_address)
+    if res['estable'] and politica.incluye('after_stable'):
+        res['after_stable'] = _snapshot(core, falla.direccion_inyeccion, tamano_bytes, politica)
+    if res['estable'] and propagacion is not None and propagacion.gold is not None:
+        res['ram'] = propagacion.diff(core)
+    return res
+
+
+def _trabajador(core, falla, stop_address, tamano_bytes, politica, propagacion, conexion):
+    """Proceso hijo (fork): hereda el core ya detenido en el breakpoint."""
+    try:
+        conexion.send(ejecutar_falla(core, falla, stop_address, tamano_bytes, politica, propagacion))
+    except Exception as e:
+        conexion.send({'id': falla.id_falla, 'error': str(e)})
+    finally:
+        conexion.close()
+
+
+# ---------- clases ----------
+class EjecutorParalelo:
+    def __init__(self, csv_file, elf_main_path, elf_ram_path=None, max_procesos=None,
+                 max_instrucciones=MAX_INSTRUCCIONES, politica=None):
+        """
+        csv_file: CSV con la lista de fallas (mismo formato que LISTA_INYECCION.csv)
+        elf_main_path / elf_ram_path: ELF para fallas RAM/registro y FLASH respectivamente
+        max_procesos: hijos simultáneos (por defecto, un proceso por núcleo de CPU)
+        max_instrucciones: presupuesto por ejecución antes de considerar HANG
+        politica: (opcional) política de captura de snapshots (M_politica_captura)
+        """
+        # El inyector se usa sin sesión: crea la campaña, lleva los contadores y escribe los CSV
+        self.injector = FaultInjector(mcu=None, csv_file=csv_file,
+                                      elf_main_path=elf_main_path, elf_ram_path=elf_ram_path,
+                                      politica=politica)
+        self.max_procesos = max_procesos or os.cpu_count() or 1
+        self.max_instrucciones = max_instrucciones
+        self.usar_fork = 'fork' in mp.get_all_start_methods()
+        self.nucleos = {}
+        self.imagenes_sin_gold = set()     # (elf, stop_address) cuyo GOLDEN no llegó a stop
+        self.pendientes = []               # (registro, falla, dato) a volcar antes del próximo lote
+
+    @property
+    def campaign_dir(self):
+        return self.injector.campaign_dir
+
+    def _imagen(self, falla):
+        """Devuelve (elf, stop_address, tamano_bytes) según la ubicación de la falla."""
+        inj = self.injector
+        ubic = (falla.ubicacion or '').lower()
+        if ubic == 'flash':
+            return inj.elf_ram_path, getattr(inj, 'stop_address_flash', None), inj.politica.ventana(ubic)
+        if ubic in ('registro', 'ram'):
+            return inj.elf_path, inj.stop_address, inj.politica.ventana(ubic)
+        return None
+
+    def _nucleo(self, elf):
+        if elf not in self.nucleos:
+            self.nucleos[elf] = NucleoEmulado(elf, self.max_instrucciones)
+        return self.nucleos[elf]
+
+    def _checkpoint(self, core, bp_addr, stop_address):
+        """Reset y ejecución hasta el breakpoint de la falla. Devuelve 'BP', 'STOP' o 'HANG'."""
+        core.reset_and_halt()
+        for addr in core.get_breakpoints():
+            core.remove_breakpoint(addr)
+        core.set_breakpoint(bp_addr, core.BreakpointType.HW)
+        core.set_breakpoint(stop_address, core.BreakpointType.HW)
+        core.resume()
+        pc = core.read_core_register('pc')
+        if core.error is None and pc == bp_addr:
+            return 'BP'
+        if core.error is None and pc == stop_address:
+            return 'STOP'
+        return 'HANG'
+
+    # ---------- registro de resultados (proceso padre) ----------
+    def _registrar_previo(self, falla, motivo):
+        inj = self.injector
+        if motivo == 'STOP':
+            inj.log_falla(falla, None, None, None, "NO_APLICADA_STOP_PREVIO")
+            inj.no_inyectadas += 1
+            inj.errores_bp += 1
+        elif motivo == 'HANG':
+            inj.log_falla(falla, None, None, None, "HANG_NO_LLEGO_A_STOP_ADDRESS")
+            inj.hangs += 1
+        else:
+            inj.log_falla(falla, None, None, None, motivo)
+            inj.no_inyectadas += 1
+            inj.errores_bp += 1
+
+    def _registrar(self, falla, res):
+        inj = self.injector
+        if 'error' in res:
+            print(f"[ERROR] Falla {falla.id_falla} falló en el emulador: {res['error']}")
+            self._registrar_previo(falla, "NO_INYECTADA_EMULADOR")
+            return
+
+        for fase in ('before', 'after'):
+            if inj.politica.incluye(fase):
+                inj.guardar_snapshot(fase, falla.id_falla, falla.id_falla,
+                                     inj.construir_snapshot_dict(*res[fase]))
+        if res['valor_leido'] is None:
+            inj.no_lectura += 1
+        estado = inj.clasificar_aplicacion(res['valor_con_falla'], res['valor_leido'])
+        inj.log_falla(falla, res['valor_original'], res['valor_con_falla'], res['valor_leido'], estado)
+
+        if res['estable']:
+            if 'after_stable' in res:
+                inj.guardar_snapshot('after_stable', falla.id_falla, falla.id_falla,
+                                     inj.construir_snapshot_dict(*res['after_stable']))
+            if 'ram' in res:
+                datos, fila = inj.propagacion.registro(falla.id_falla, *res['ram'])
+                escritor = inj.obtener_escritor()
+                escritor.escribir_bytes(inj.propagacion.ruta_raw, datos)
+                escritor.escribir(inj.propagacion.ruta_metricas, fila)
+        else:
+            inj.log_falla(falla, res['valor_original'], res['valor_con_falla'], res['valor_leido'],
+                          "HANG_POST_FALLA")
+            inj.hangs += 1
+
+    def _diferir(self, registro, falla, dato):
+        """Con fork el registro (que escribe por EscritorCSV) se deja para _volcar()."""
+        if self.usar_fork:
+            self.pendientes.append((registro, falla, dato))
+        else:
+            registro(falla, dato)
+
+    def _volcar(self):
+        pendientes, self.pendientes = self.pendientes, []
+        for registro, falla, dato in pendientes:
+            registro(falla, dato)
+
+    def _detener_escritor(self):
+        """Vacía y detiene el hilo escritor antes de fork(); el próximo registro lo vuelve a crear."""
+        escritor = self.injector.escritor
+        if escritor is not None and not escritor.cerrado:
+            escritor.cerrar()
+
+    def _recoger(self, activos):
+        """Espera a que al menos un hijo termine y deja su resultado para registrar."""
+        for receptor in wait(list(activos)):
+            proceso, falla = activos.pop(receptor)
+            try:
+                res = receptor.recv()
+            except EOFError:
+                res = {'id': falla.id_falla, 'error': f"proceso terminó sin resultado (exit {proceso.exitcode})"}
+            receptor.close()
+            proceso.join()
+            self._diferir(self._registrar, falla, res)
+
+    # ---------- ejecutar campaña ----------
+    def ejecutar(self, golden=True):
+        inj = self.injector
+        modo = f"fork x{self.max_procesos}" if self.usar_fork else "serie (sin fork)"
+        print(f"[INFO] ========== INICIANDO CAMPAÑA EMULADA ({modo}) ==========")
+        inj.tiempo_total_inicio = time.time()
+
+        grupos = {}
+        for falla in inj.lista_fallas:
+            imagen = self._imagen(falla)
+            if imagen is None or imagen[0] is None or imagen[1] is None:
+                print(f"[WARNING] Falla {falla.id_falla}: ubicación/ELF/stop_address no disponible en emulación")
+                self._registrar_previo(falla, "NO_INYECTADA_SIN_SESION")
+                continue
+            if falla.direccion_breakpoint is None:
+                self._registrar_previo(falla, "NO_INYECTADA_SIN_BP")
+                continue
+            grupos.setdefault((imagen, falla.direccion_breakpoint), []).append(falla)
+
+        print(f"[INFO] {len(inj.lista_fallas)} fallas en {len(grupos)} puntos de inyección distintos")
+
+        # GOLDEN primero: los snapshots de cada falla se guardan solo como delta contra él
+        if golden and (inj.politica.fases or inj.propagacion is not None):
+            self.ejecutar_golden()
+            inj.activar_delta()
+
+        ctx = mp.get_context('fork') if self.usar_fork else None
+        activos = {}
+        for (imagen, bp_addr), fallas in grupos.items():
+            elf, stop_address, tamano_bytes = imagen
+            if (elf, stop_address) in self.imagenes_sin_gold:
+                for falla in fallas:
+                    self._registrar_previo(falla, "NO_INYECTADA_EMULADOR")
+                continue
+            core = self._nucleo(elf)
+            # Diff de RAM completa solo sobre el ELF principal (el de FLASH es otra imagen)
+            propagacion = inj.propagacion if elf == inj.elf_path else None
+
+            for i, falla in enumerate(fallas):
+                # Con fork el prefijo se ejecuta una sola vez por grupo
+                if i == 0 or not self.usar_fork:
+                    motivo = self._checkpoint(core, bp_addr, stop_address)
+                if motivo != 'BP':
+                    self._diferir(self._registrar_previo, falla, motivo)
+                    continue
+
+                if not self.usar_fork:
+                    self._registrar(falla, ejecutar_falla(core, falla, stop_address, tamano_bytes,
+                                                          inj.politica, propagacion))
+                    continue
+
+                while len(activos) >= self.max_procesos:
+                    self._recoger(activos)
+                if len(self.pendientes) >= self.max_procesos:
+                    self._volcar()
+                self._detener_escritor()
+                receptor, emisor = ctx.Pipe(duplex=False)
+                proceso = ctx.Process(target=_trabajador,
+                                      args=(core, falla, stop_address, tamano_bytes, inj.politica,
+                                            propagacion, emisor))
+                proceso.start()
+                emisor.close()
+                activos[receptor] = (proceso, falla)
+
+        while activos:
+            self._recoger(activos)
+        self._volcar()
+        inj.cerrar_escritor()
+        inj.reportar()
+        catalogar(inj.campaign_dir)
+
+    # ---------- GOLDEN emulado ----------
+    def ejecutar_golden(self):
+        """
+        Ejecución sin falla hasta stop_address (una por ELF) y snapshot de la ventana de
+        cada falla: genera snapshots_gold.npy en la carpeta de la campaña.
+        Los ELF que no llegan a stop_address quedan en imagenes_sin_gold y ejecutar()
+        no corre sus fallas.
+        """
+        inj = self.injector
+        por_imagen = {}
+        for falla in inj.lista_fallas:
+            imagen = self._imagen(falla)
+            if imagen and imagen[0] is not None and imagen[1] is not None:
+                por_imagen.setdefault(imagen[:2], []).append((falla, imagen[2]))
+
+        extras = inj.politica.columnas_extra()
+        cols = columnas(inj.mem_cols_count, extras)
+        filas = []
+        for (elf, stop_address), fallas in por_imagen.items():
+            core = self._nucleo(elf)
+            core.reset_and_halt()
+            for addr in core.get_breakpoints():
+                core.remove_breakpoint(addr)
+            core.set_breakpoint(stop_address, core.BreakpointType.HW)
+            if not core.ejecutar_hasta(stop_address):
+                print(f"[WARNING] GOLDEN emulado no alcanzó stop_address 0x{stop_address:08X} ({elf}): "
+                      f"{len(fallas)} fallas se marcan NO_INYECTADA_EMULADOR "
+                      f"(¿espera de un bit de estado de periférico? no se emula)")
+                self.imagenes_sin_gold.add((elf, stop_address))
+                continue
+            if inj.propagacion is not None and elf == inj.elf_path:
+                inj.propagacion.capturar_gold(core)
+            for falla, tamano_bytes in fallas:
+                snap = inj.construir_snapshot_dict(*_snapshot(core, falla.direccion_inyeccion, tamano_bytes,
+                                                              inj.politica))
+                filas.append([falla.id_falla, falla.id_falla] + [snap[k] for k in cols[2:]])
+        ruta = guardar_snapshots(inj.campaign_dir, 'gold', filas, inj.mem_cols_count, extras)
+        print(f"[INFO] Snapshots GOLDEN emulados guardados en: {ruta}")
+
+
+# ---------- ejemplo de uso ----------
+if __name__ == '__main__':
+    elf_main = r"/Users/apple/Documents/PruebasST/LED/Debug/LED.elf"
+    elf_ram = r"/Users/apple/Documents/PruebasST/ScriptPruebas/Debug/ScriptPruebas.elf"
+    csv_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "LISTA_INYECCION.csv")
+
+    ejecutor = EjecutorParalelo(csv_file, elf_main, elf_ram)
+    ejecutor.ejecutar()
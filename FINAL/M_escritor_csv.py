@@ -0,0 +1,200 @@
+#------------------------MODULO ESCRITOR CSV EN SEGUNDO PLANO-------------------------------#
+"""
+M_escritor_csv.py
+
+Escritor de filas CSV en un hilo aparte para que la E/S del host no alargue la
+ventana en que el target está detenido ni el tiempo entre fallas:
+    - el hilo de inyección solo encola la fila (cola acotada),
+    - el hilo escritor mantiene los archivos abiertos en modo 'a' (CSV) o 'ab' (binario),
+    - vuelca (flush) cada FILAS_FLUSH filas o cada INTERVALO_FLUSH segundos,
+    - en cada checkpoint() hace flush + fsync de todos los archivos,
+    - cerrar() drena la cola, sincroniza y cierra (también al salir del intérprete).
+
+Si la cola se llena, escribir() espera a que haya sitio: se prefiere frenar la
+campaña a perder filas.
+
+Errores: el hilo escritor nunca muere (cualquier excepción de una fila se registra y se
+sigue vaciando la cola, así put()/cerrar() no se quedan esperando). El primer error se
+relanza al productor como ErrorEscritura en el siguiente escribir*()/checkpoint(), y
+escribir_diario() no escribe la línea si alguna escritura falló desde la línea anterior:
+una falla en el diario tiene sus filas en disco.
+"""
+import atexit
+import csv
+import os
+import queue
+import threading
+import time
+
+# Filas encoladas como máximo antes de frenar al productor
+MAX_COLA = 10000
+
+# Flush por cantidad de filas o por tiempo (lo que ocurra primero)
+FILAS_FLUSH = 256
+INTERVALO_FLUSH = 1.0
+
+
+class ErrorEscritura(RuntimeError):
+    """Falló una escritura o un fsync del hilo escritor: pueden faltar filas."""
+
+
+class EscritorCSV:
+    def __init__(self, max_cola=MAX_COLA, filas_flush=FILAS_FLUSH, intervalo_flush=INTERVALO_FLUSH):
+        self.cola = queue.Queue(maxsize=max_cola)
+        self.filas_flush = filas_flush
+        self.intervalo_flush = intervalo_flush
+        self.archivos = {}             # ruta -> (archivo, csv.writer)
+        self.pendientes = 0            # filas escritas desde el último flush
+        self.ultimo_flush = time.time()
+        self.errores = 0
+        self.error = None              # primera excepción del hilo escritor
+        self.errores_diario = 0        # self.errores al escribir la última línea de diario
+        self.cerrado = False
+
+        self.hilo = threading.Thread(target=self._bucle, name="EscritorCSV", daemon=True)
+        self.hilo.start()
+        atexit.register(self.cerrar)
+
+    # ---------- API (hilo de inyección) ----------
+    def _comprobar(self):
+        if self.cerrado:
+            raise RuntimeError("[ERROR] EscritorCSV ya está cerrado")
+        if self.error is not None:
+            raise ErrorEscritura(f"[ERROR] Falló la escritura en segundo plano: {self.error}") from self.error
+
+    def escribir(self, ruta, fila):
+        """Encola una fila para 'ruta' (el archivo ya debe tener su cabecera)."""
+        self._comprobar()
+        self.cola.put(('fila', ruta, fila))
+
+    def escribir_bytes(self, ruta, datos):
+        """Encola bytes para agregar a un archivo binario (p.ej. snapshots_<fase>.u32)."""
+        self._comprobar()
+        self.cola.put(('bytes', ruta, datos))
+
+    def escribir_diario(self, ruta, datos):
+        """Como escribir_bytes, pero se omite si falló alguna escritura desde la línea anterior."""
+        self._comprobar()
+        self.cola.put(('diario', ruta, datos))
+
+    def checkpoint(self, esperar=False):
+        """Pide flush + fsync de todos los archivos; con esperar=True bloquea hasta que termine."""
+        if self.cerrado:
+            return
+        self._comprobar()
+        listo = threading.Event()
+        self.cola.put(('checkpoint', None, listo))
+        if esperar:
+            listo.wait()
+            self._comprobar()
+
+    def cerrar(self):
+        """Drena la cola, sincroniza y cierra los archivos. Se puede llamar varias veces."""
+        if self.cerrado:
+            return
+        self.cerrado = True
+        self.cola.put(('cerrar', None, None))
+        self.hilo.join()
+        try:
+            atexit.unregister(self.cerrar)
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cerrar()
+
+    # ---------- hilo escritor ----------
+    def _archivo(self, ruta, binario=False):
+        if ruta not in self.archivos:
+            if binario:
+                f = open(ruta, 'ab')
+                self.archivos[ruta] = (f, None)
+            else:
+                f = open(ruta, 'a', newline='')
+                self.archivos[ruta] = (f, csv.writer(f))
+        return self.archivos[ruta]
+
+    def _flush(self, fsync=False):
+        for ruta, (f, _) in self.archivos.items():
+            try:
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+            except Exception as e:
+                self._registrar_error(f"No se pudo volcar {ruta}", e)
+        self.pendientes = 0
+        self.ultimo_flush = time.time()
+
+    def _registrar_error(self, texto, e):
+        self.errores += 1
+        if self.error is None:
+            self.error = e
+        print(f"[WARNING] {texto}: {e}")
+
+    def _bucle(self):
+        while True:
+            try:
+                tipo, ruta, dato = self.cola.get(timeout=self.intervalo_flush)
+            except queue.Empty:
+                if self.pendientes:
+                    self._flush()
+                continue
+
+            try:
+                if tipo in ('fila', 'bytes', 'diario'):
+                    self._escribir(tipo, ruta, dato)
+                elif tipo == 'checkpoint':
+                    self._flush(fsync=True)
+                elif tipo == 'cerrar':
+                    self._flush(fsync=True)
+                    for f, _ in self.archivos.values():
+                        f.close()
+                    self.archivos.clear()
+                    return
+            except Exception as e:
+                # El hilo sigue vaciando la cola: un error nunca deja colgado al productor
+                self._registrar_error(f"Error del escritor en {ruta}", e)
+                if tipo == 'cerrar':
+                    self.archivos.clear()
+                    return
+            finally:
+                if tipo == 'checkpoint':
+                    dato.set()
+
+    def _escribir(self, tipo, ruta, dato):
+        if tipo == 'diario':
+            # Las filas de la falla van a disco antes que su línea de diario
+            self._flush(fsync=True)
+            if self.errores != self.errores_diario:
+                print(f"[WARNING] Línea de diario omitida ({ruta}): falló una escritura de la falla")
+                self.errores_diario = self.errores
+                return
+        try:
+            if tipo == 'fila':
+                self._archivo(ruta)[1].writerow(dato)
+            else:
+                self._archivo(ruta, binario=True)[0].write(dato)
+            self.pendientes += 1
+        except Exception as e:
+            self._registrar_error(f"No se pudo escribir en {ruta}", e)
+        if tipo == 'diario':
+            self.errores_diario = self.errores
+        if (self.pendientes >= self.filas_flush
+                or time.time() - self.ultimo_flush >= self.intervalo_flush):
+            self._flush()
+
+if __name__ == '__main__':
+    ruta = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prueba_escritor.csv")
+    with open(ruta, 'w', newline='') as f:
+        csv.writer(f).writerow(['Fault_ID', 'Valor'])
+
+    t0 = time.time()
+    with EscritorCSV() as escritor:
+        for i in range(10000):
+            escritor.escribir(ruta, [i, f'0x{i:08X}'])
+        print(f"Encolado de 10000 filas: {(time.time() - t0) * 1000:.1f} ms")
+    print(f"Escritura completa: {(time.time() - t0) * 1000:.1f} ms")
+    os.remove(ruta)
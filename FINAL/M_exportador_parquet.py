@@ -0,0 +1,286 @@
+#------------------------MODULO EXPORTADOR PARQUET-------------------------------#
+"""
+M_exportador_parquet.py
+
+Exporta los resultados de una campaña a un dataset Parquet particionado y tipado,
+en lugar de los CSV de texto (faults_log.csv, analisis_avanzado.csv, snapshots_*):
+
+    <destino>/fallas/campania=<nombre>/ubicacion=<RAM|FLASH|REGISTRO>/part-0.parquet
+        una fila por línea de faults_log con el resultado del análisis de esa falla
+    <destino>/snapshots/campania=<nombre>/ubicacion=<...>/fase=<fase>/part-0.parquet
+        una fila por snapshot, columnas uint32 (registros, MEM_i, X_...)
+
+Tipos: direcciones, máscaras y valores uint32; tipo, estados y clasificación como
+diccionario (categóricos); cada campo del análisis con su tipo (bool / int / lista).
+Los archivos llevan codificación por diccionario y estadísticas por row group, así que
+pyarrow.dataset / DuckDB / Spark pueden descartar particiones y row groups por filtro.
+
+Memoria acotada: las fallas se leen del catálogo SQLite (M_catalogo) con un cursor y
+los snapshots del almacén binario (memory-map), en bloques de FILAS_GRUPO filas; cada
+bloque es un row group.
+
+Uso:
+    python M_exportador_parquet.py [carpeta_campaña] [destino]   # por defecto, la última
+"""
+import ast
+import json
+import os
+import shutil
+import sys
+from array import array
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from M_catalogo import CatalogoCampanias
+from M_almacen_snapshots import (FASES, cargar_delta, cargar_matriz, cargar_referencia, reconstruir,
+                                 existe_fase, _leer_columnas)
+
+# Filas por row group (y por lectura del catálogo / almacén)
+FILAS_GRUPO = 100000
+
+CARPETA_DATASET = "dataset_parquet"
+
+OPCIONES_ESCRITURA = dict(compression='zstd', use_dictionary=True, write_statistics=True)
+
+_CATEGORIA = pa.dictionary(pa.int16(), pa.string())
+
+# Campos de analisis_avanzado.csv (columna 'detalle' del catálogo), por nombre
+CAMPOS_ANALISIS = [
+    ('RegCriticos', pa.bool_()),
+    ('RegGenerales', pa.bool_()),
+    ('RamCambiada', pa.bool_()),
+    ('NumBytesRAM', pa.int32()),
+    ('OffsetsRAM', pa.list_(pa.string())),
+    ('RamPalabrasCorruptas', pa.int32()),
+    ('RamBitsCorruptos', pa.int64()),
+    ('RamSimbolos', pa.string()),
+    ('RegistrosPerifericos', pa.list_(pa.string())),
+    ('Seccion', pa.string()),
+    ('Simbolo', pa.string()),
+    ('Offset_Simbolo', pa.int64()),
+    ('Funcion_BP', pa.string()),
+]
+
+ESQUEMA_FALLAS = pa.schema([
+    ('Fault_ID', pa.uint32()),
+    ('Direccion_Inyeccion', pa.uint32()),
+    ('Direccion_BP', pa.uint32()),
+    ('Tipo', _CATEGORIA),
+    ('Mascara', pa.uint32()),
+    ('Valor_Original', pa.uint32()),
+    ('Valor_Falla', pa.uint32()),
+    ('Valor_Leido', pa.uint32()),
+    ('Estado', _CATEGORIA),
+    ('Clasificacion', _CATEGORIA),
+    ('Estado_Final_Inyector', _CATEGORIA),
+] + CAMPOS_ANALISIS)
+
+# Columnas de la tabla fallas del catálogo, en el orden del esquema
+_COLUMNAS_CATALOGO = ['fault_id', 'direccion_inyeccion', 'direccion_bp', 'tipo', 'mascara',
+                      'valor_original', 'valor_falla', 'valor_leido', 'estado']
+_CAMPOS_ANALISIS = [nombre for nombre, _ in CAMPOS_ANALISIS]
+
+# Campos del análisis sin columna en el esquema ya avisados (una vez por proceso)
+_OMITIDOS = set()
+
+
+# ---------- conversión de campos del análisis (texto del CSV) ----------
+def _a_bool(v):
+    return None if v is None else str(v).strip().lower() in ('true', '1')
+
+
+def _a_int(v):
+    try:
+        return None if v is None else int(float(v))
+    except ValueError:
+        return None
+
+
+def _a_lista(v):
+    if v is None:
+        return None
+    try:
+        lista = ast.literal_eval(v) if isinstance(v, str) else v
+        return [str(x) for x in lista]
+    except (ValueError, SyntaxError, TypeError):
+        return [str(v)]
+
+
+_CONVERSION = {pa.bool_(): _a_bool, pa.int32(): _a_int, pa.int64(): _a_int, pa.string(): lambda v: None if v is None else str(v)}
+
+
+def _convertir(campo, valor):
+    tipo = ESQUEMA_FALLAS.field(campo).type
+    if pa.types.is_list(tipo):
+        return _a_lista(valor)
+    return _CONVERSION[tipo](valor)
+
+
+def _uint32(v):
+    return None if v is None else int(v) & 0xFFFFFFFF
+
+
+def _lote_fallas(filas):
+    """RecordBatch con ESQUEMA_FALLAS a partir de filas (catálogo + clasificación + detalle JSON)."""
+    columnas = {n: [] for n in ESQUEMA_FALLAS.names}
+    for fila in filas:
+        base = dict(zip(_COLUMNAS_CATALOGO, fila[:9]))
+        clasificacion, estado_final, detalle = fila[9:12]
+        detalle = json.loads(detalle) if detalle else {}
+        columnas['Fault_ID'].append(base['fault_id'])
+        for n, c in (('Direccion_Inyeccion', 'direccion_inyeccion'), ('Direccion_BP', 'direccion_bp'),
+                     ('Mascara', 'mascara'), ('Valor_Original', 'valor_original'),
+                     ('Valor_Falla', 'valor_falla'), ('Valor_Leido', 'valor_leido')):
+            columnas[n].append(_uint32(base[c]))
+        columnas['Tipo'].append(base['tipo'])
+        columnas['Estado'].append(base['estado'])
+        columnas['Clasificacion'].append(clasificacion)
+        columnas['Estado_Final_Inyector'].append(estado_final)
+        for campo in _CAMPOS_ANALISIS:
+            columnas[campo].append(_convertir(campo, detalle.get(campo)))
+        nuevos = set(detalle) - set(_CAMPOS_ANALISIS) - _OMITIDOS
+        if nuevos:
+            print(f"[WARNING] Campos del análisis sin columna en ESQUEMA_FALLAS (no se exportan): "
+                  f"{', '.join(sorted(nuevos))}")
+            _OMITIDOS.update(nuevos)
+    return pa.RecordBatch.from_pydict(columnas, schema=ESQUEMA_FALLAS)
+
+
+def _particion(destino, tabla, campania, ubicacion):
+    ruta = os.path.join(destino, tabla, f"campania={campania}", f"ubicacion={ubicacion or 'DESCONOCIDA'}")
+    os.makedirs(ruta, exist_ok=True)
+    return ruta
+
+
+# ---------- fallas ----------
+def exportar_fallas(catalogo, campania, destino, filas_grupo=FILAS_GRUPO):
+    """Escribe las fallas de una campaña del catálogo; devuelve {ubicación: filas}."""
+    cursor = catalogo.conexion.execute(
+        f"SELECT {', '.join('f.' + c for c in _COLUMNAS_CATALOGO)}, f.ubicacion, "
+        "r.clasificacion, r.estado_final, r.detalle FROM fallas f "
+        "JOIN campanias c ON c.id = f.campania_id "
+        "LEFT JOIN resultados r ON r.campania_id = f.campania_id AND r.fault_id = f.fault_id "
+        "WHERE c.nombre = ? ORDER BY f.ubicacion, f.fault_id", (campania,))
+    escritores, conteo = {}, {}
+    try:
+        while True:
+            filas = cursor.fetchmany(filas_grupo)
+            if not filas:
+                break
+            # Las filas vienen ordenadas por ubicación: un lote por cada ubicación del bloque
+            por_ubicacion = {}
+            for fila in filas:
+                por_ubicacion.setdefault(fila[9], []).append(fila[:9] + fila[10:])
+            for ubicacion, grupo in por_ubicacion.items():
+                if ubicacion not in escritores:
+                    ruta = os.path.join(_particion(destino, 'fallas', campania, ubicacion), "part-0.parquet")
+                    escritores[ubicacion] = pq.ParquetWriter(ruta, ESQUEMA_FALLAS, **OPCIONES_ESCRITURA)
+                escritores[ubicacion].write_batch(_lote_fallas(grupo), row_group_size=filas_grupo)
+                conteo[ubicacion] = conteo.get(ubicacion, 0) + len(grupo)
+    finally:
+        for escritor in escritores.values():
+            escritor.close()
+    return conteo
+
+
+# ---------- snapshots ----------
+def _ubicaciones(catalogo, campania):
+    """(Fault_IDs ordenados, índice de ubicación, nombres de ubicación) para buscar con searchsorted."""
+    cursor = catalogo.conexion.execute(
+        "SELECT DISTINCT f.fault_id, f.ubicacion FROM fallas f JOIN campanias c ON c.id = f.campania_id "
+        "WHERE c.nombre = ? ORDER BY f.fault_id", (campania,))
+    nombres, ids, codigos = [], array('q'), array('h')
+    for fid, ubicacion in cursor:
+        ubicacion = ubicacion or 'DESCONOCIDA'
+        if ubicacion not in nombres:
+            nombres.append(ubicacion)
+        ids.append(fid)
+        codigos.append(nombres.index(ubicacion))
+    return np.frombuffer(ids, dtype=np.int64), np.frombuffer(codigos, dtype=np.int16), nombres
+
+
+def _bloques_fase(campaign_dir, fase, filas_grupo):
+    """Matrices uint32 de una fase de filas_grupo filas como máximo (delta reconstruido por bloque)."""
+    cols = _leer_columnas(campaign_dir, fase)
+    filas, pares = cargar_delta(campaign_dir, fase)
+    if filas is not None and cols:
+        referencia = cargar_referencia(campaign_dir)
+        for i in range(0, len(filas), filas_grupo):
+            yield reconstruir(filas[i:i + filas_grupo], pares, referencia, len(cols)), cols
+        return
+    matriz, cols = cargar_matriz(campaign_dir, fase)
+    if matriz is None:
+        return
+    for i in range(0, len(matriz), filas_grupo):
+        yield np.asarray(matriz[i:i + filas_grupo]), cols
+
+
+def exportar_snapshots(catalogo, campania, campaign_dir, destino, filas_grupo=FILAS_GRUPO):
+    """Escribe los snapshots de cada fase particionados por ubicación; devuelve {fase: filas}."""
+    ids, codigos, nombres = _ubicaciones(catalogo, campania)
+    conteo = {}
+    for fase in FASES:
+        if not existe_fase(campaign_dir, fase):
+            continue
+        escritores = {}
+        try:
+            for matriz, cols in _bloques_fase(campaign_dir, fase, filas_grupo):
+                esquema = pa.schema([(c, pa.uint32()) for c in cols])
+                fids = matriz[:, 1].astype(np.int64)
+                pos = np.clip(np.searchsorted(ids, fids), 0, max(len(ids) - 1, 0))
+                encontrado = (ids[pos] == fids) if len(ids) else np.zeros(len(fids), dtype=bool)
+                ubic = np.where(encontrado, codigos[pos] if len(ids) else -1, -1)
+                for codigo in np.unique(ubic):
+                    ubicacion = nombres[codigo] if codigo >= 0 else 'DESCONOCIDA'
+                    sub = matriz[ubic == codigo]
+                    lote = pa.RecordBatch.from_arrays([pa.array(sub[:, j], pa.uint32()) for j in range(len(cols))],
+                                                      schema=esquema)
+                    if ubicacion not in escritores:
+                        ruta = os.path.join(_particion(destino, 'snapshots', campania, ubicacion),
+                                            f"fase={fase}")
+                        os.makedirs(ruta, exist_ok=True)
+                        ruta = os.path.join(ruta, "part-0.parquet")
+                        escritores[ubicacion] = pq.ParquetWriter(ruta, esquema, **OPCIONES_ESCRITURA)
+                    escritores[ubicacion].write_batch(lote, row_group_size=filas_grupo)
+                    conteo[fase] = conteo.get(fase, 0) + len(sub)
+        finally:
+            for escritor in escritores.values():
+                escritor.close()
+    return conteo
+
+
+# ---------- campaña completa ----------
+def exportar_parquet(campaign_dir, destino=None, filas_grupo=FILAS_GRUPO):
+    """
+    Exporta una campaña (la registra en el catálogo si hace falta) y devuelve la carpeta
+    del dataset. Las particiones anteriores de la misma campaña se reemplazan.
+    """
+    campaign_dir = os.path.abspath(campaign_dir)
+    base_dir = os.path.dirname(campaign_dir)
+    destino = destino or os.path.join(base_dir, CARPETA_DATASET)
+    campania = os.path.basename(campaign_dir)
+
+    for tabla in ('fallas', 'snapshots'):
+        anterior = os.path.join(destino, tabla, f"campania={campania}")
+        if os.path.isdir(anterior):
+            shutil.rmtree(anterior)
+
+    with CatalogoCampanias(base_dir) as catalogo:
+        catalogo.ingerir(campaign_dir)
+        fallas = exportar_fallas(catalogo, campania, destino, filas_grupo)
+        snapshots = exportar_snapshots(catalogo, campania, campaign_dir, destino, filas_grupo)
+
+    print(f"[INFO] Parquet de {campania}: fallas {fallas or 0}, snapshots {snapshots or 0}")
+    print(f"[INFO] Dataset en: {destino}")
+    return destino
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        carpeta = sys.argv[1]
+    else:
+        from M_detector_campana import obtener_ultima_carpeta_campania
+        carpeta = obtener_ultima_carpeta_campania()
+    exportar_parquet(carpeta, sys.argv[2] if len(sys.argv) > 2 else None)
@@ -3,7 +3,10 @@ import csv
 import random
 from pathlib import Path
 from typing import Optional, Tuple
-from elftools.elf.elffile import ELFFile
+import numpy as np
+from M_modelo_elf import modelo_elf
+from M_cache_svd import TablaBits
+from M_mapa_ld import mapa_ld
 from M_analisis_memorias_mejorado import metodo_pseudo_mems
 
 class RandomFaultGenerator:
@@ -13,8 +16,8 @@ class RandomFaultGenerator:
         self.elf_path = Path(elf_path)
         self.map_path = Path(map_path)
 
-        self.flash_addresses = []   # direcciones tomadas desde CSV (si aplica)
-        self.register_bits = []     # registros/periféricos desde CSV (si aplica)
+        self.flash_addresses = np.zeros(0, dtype=np.uint32)   # direcciones ejecutables (en memoria o CSV)
+        self.register_bits = None   # TablaBits de registros/periféricos (en memoria o desde CSV)
 
         # Rango RAM / FLASH (metodo_pseudo_mems debe devolver RAM-PARCIAL y opcional FLASH-PARCIAL)
         mem = metodo_pseudo_mems(self.elf_path, self.map_path)
@@ -59,34 +62,29 @@ class RandomFaultGenerator:
     def _get_text_range(self) -> Optional[Tuple[int,int]]:
         """Lee el ELF y devuelve (start,end) de la sección .text si existe."""
         try:
-            with open(self.elf_path, 'rb') as f:
-                elf = ELFFile(f)
-                for sec in elf.iter_sections():
-                    if sec.name == '.text':
-                        start = sec['sh_addr']
-                        size = sec['sh_size']
-                        if start and size:
-                            return (int(start), int(start + size - 1))
+            return modelo_elf(self.elf_path).rango_texto()
         except Exception as e:
             print(f"⚠️  No se pudo leer ELF para obtener .text: {e}")
         return None
 
     def addr_to_section(self, addr: int) -> str:
         """Devuelve el nombre de la sección ELF que contiene addr o 'UNKNOWN'."""
+        return self.addrs_to_sections([addr])[0]
+
+    def addrs_to_sections(self, addrs) -> list:
+        """Sección de cada dirección de un lote (índice de intervalos del ELF, una sola búsqueda)."""
+        try:
+            secciones, _, _ = modelo_elf(self.elf_path).indice_direcciones().ubicar(addrs)
+            return [s or "UNKNOWN" for s in secciones]
+        except Exception:
+            return ["UNKNOWN"] * len(addrs)
+
+    def addr_to_object(self, addr: int) -> str:
+        """Archivo objeto (.o / miembro de .a) que aporta addr según el .map, o 'UNKNOWN'."""
         try:
-            with open(self.elf_path, 'rb') as f:
-                elf = ELFFile(f)
-                for sec in elf.iter_sections():
-                    start = sec['sh_addr']
-                    size = sec['sh_size']
-                    if start and size:
-                        s = int(start)
-                        e = int(start + size - 1)
-                        if s <= addr <= e:
-                            return sec.name
+            return mapa_ld(self.map_path).objeto_de(addr) or "UNKNOWN"
         except Exception:
-            pass
-        return "UNKNOWN"
+            return "UNKNOWN"
 
     # -----------------------
     # CSV loaders
@@ -95,24 +93,39 @@ class RandomFaultGenerator:
         """Carga direcciones de FLASH desde CSV (campo 'DIRECCION')."""
         if not self.flash_csv.exists():
             print(f"⚠️  CSV de FLASH no encontrado: {self.flash_csv} (continuando sin direcciones FLASH).")
-            self.flash_addresses = []
+            self.flash_addresses = np.zeros(0, dtype=np.uint32)
             return
         with open(self.flash_csv, newline='') as f:
             reader = csv.DictReader(f)
-            self.flash_addresses = [row['DIRECCION'] for row in reader if row.get('DIRECCION')]
+            self.flash_addresses = np.array([int(row['DIRECCION'], 16) for row in reader if row.get('DIRECCION')],
+                                            dtype=np.uint32)
         print(f"➡️  Direcciones FLASH cargadas: {len(self.flash_addresses)}")
 
+    def usar_direcciones(self, direcciones):
+        """Direcciones ejecutables ya en memoria (etapa ELF de ACOPLADO), sin pasar por el CSV."""
+        self.flash_addresses = np.asarray(direcciones, dtype=np.uint32)
+        print(f"➡️  Direcciones FLASH en memoria: {len(self.flash_addresses)}")
+
     def load_reg_csv(self):
-        """Carga registro/periféricos desde CSV (mantiene todas las columnas)."""
+        """Carga registro/periféricos desde un CSV exportado (a TablaBits, en columnas)."""
         if not self.reg_csv.exists():
             print(f"⚠️  CSV de registros no encontrado: {self.reg_csv} (continuando sin registros).")
-            self.register_bits = []
+            self.register_bits = None
             return
-        with open(self.reg_csv, newline='') as f:
-            reader = csv.DictReader(f)
-            self.register_bits = list(reader)
+        self.register_bits = TablaBits.desde_csv(self.reg_csv)
         print(f"➡️  Registros/periféricos cargados: {len(self.register_bits)}")
 
+    def usar_bits(self, bits: TablaBits):
+        """Bits de registros ya en memoria (ListaRegistros), sin pasar por el CSV."""
+        self.register_bits = bits
+        print(f"➡️  Registros/periféricos en memoria: {len(self.register_bits)}")
+
+    def _direccion_stop(self) -> str:
+        """DIRECCION STOP al azar entre las ejecutables ('N/A' si no hay)."""
+        if not len(self.flash_addresses):
+            return "N/A"
+        return f"0x{int(random.choice(self.flash_addresses)):x}"
+
     # -----------------------
     # Modo de falla
     # -----------------------
@@ -134,6 +147,13 @@ class RandomFaultGenerator:
         if fault_type.lower() not in tipos_validos:
             raise ValueError("Tipo de falla inválido: debe ser 'Registro', 'RAM', 'flash' o 'Todos'")
 
+        # Bits de registro: n índices de una vez sobre la tabla (el generador numpy toma su
+        # semilla de random, así random.seed() sigue fijando la campaña); solo se arman sus filas
+        muestra_bits = None
+        if fault_type.lower() in ("registro", "todos") and self.register_bits:
+            rng = np.random.default_rng(random.getrandbits(64))
+            muestra_bits = self.register_bits.filas(self.register_bits.muestrear(n, rng))
+
         for i in range(n):
             mode = self._choose_fault_mode(fault_mode)
 
@@ -148,10 +168,10 @@ class RandomFaultGenerator:
 
             # ---------- REGISTRO ----------
             if fault_type_actual == "registro":
-                if not self.register_bits:
-                    raise RuntimeError("CSV de registros no cargado o vacío.")
-                reg_bit = random.choice(self.register_bits)
-                direccion_flash = random.choice(self.flash_addresses) if (self.flash_addresses) else "N/A"
+                if not muestra_bits:
+                    raise RuntimeError("Bits de registros no cargados o vacíos.")
+                reg_bit = muestra_bits[i]
+                direccion_flash = self._direccion_stop()
                 fault = {
                     "FAULT_ID": i + 1,
                     "UBICACION": "Registro",
@@ -172,12 +192,8 @@ class RandomFaultGenerator:
                 mascara = f"0x{1 << bit_pos:08X}"
 
                 # DIRECCION STOP: elegir del CSV (segunda columna)
-                if self.flash_addresses:
-                    pick = random.choice(self.flash_addresses)
-                    try:
-                        direccion_stop_val = int(pick, 16)
-                    except ValueError:
-                        direccion_stop_val = self.flash_start  # fallback seguro
+                if len(self.flash_addresses):
+                    direccion_stop_val = int(random.choice(self.flash_addresses))
                 else:
                     # fallback si no hay CSV
                     if self.text_start is not None and self.text_end is not None:
@@ -217,7 +233,7 @@ class RandomFaultGenerator:
                 bit_pos = random.randint(0, 31)
                 mascara = f"0x{1 << bit_pos:08X}"
 
-                direccion_flash = random.choice(self.flash_addresses) if (self.flash_addresses) else "N/A"
+                direccion_flash = self._direccion_stop()
 
                 fault = {
                     "FAULT_ID": i + 1,
@@ -241,35 +257,59 @@ class RandomFaultGenerator:
     # Guardar CSV
     # -----------------------
     def save_to_csv(self, faults: list, out_path: Path):
-        out_path = Path(out_path)
-        # Para que el CSV tenga las columnas correctas por tipo, escribimos por filas agrupando
-        with open(out_path, "w", newline="") as f:
-            writer = None
-            for row in faults:
-                ubicacion = row.get("UBICACION", "")
-                if ubicacion == "Registro":
-                    fieldnames = ["FAULT_ID", "UBICACION", "TIPO_FALLA", "PERIFERICO", "REGISTRO", "CAMPO",
-                                  "BIT", "DIRECCION STOP", "DIRECCION INYECCION", "MASCARA", "TIPO DE ACCESO"]
-                elif ubicacion == "FLASH":
-                    # formato solicitado con STOP + INYECCION
-                    fieldnames = ["FAULT_ID", "UBICACION", "TIPO_FALLA",
-                                  "DIRECCION STOP", "DIRECCION INYECCION", "MASCARA", "BIT"]
-                elif ubicacion == "RAM":
-                    fieldnames = ["FAULT_ID", "UBICACION", "TIPO_FALLA",
-                                  "DIRECCION STOP", "DIRECCION INYECCION", "MASCARA", "BIT"]
-                else:
-                    # fila desconocida: omitimos
-                    continue
+        escribir_lista_inyeccion(faults, out_path)
+        self.resumen_secciones(faults)
+
+    def resumen_secciones(self, faults: list):
+        """Cuántas fallas de memoria caen en cada sección del ELF (una búsqueda para toda la lista)."""
+        addrs = []
+        for row in faults:
+            if row.get("UBICACION") in ("RAM", "FLASH"):
+                try:
+                    addrs.append(int(str(row.get("DIRECCION INYECCION")), 16))
+                except ValueError:
+                    pass
+        if not addrs:
+            return
+        conteo = {}
+        for sec in self.addrs_to_sections(addrs):
+            conteo[sec] = conteo.get(sec, 0) + 1
+        print("➡️  Fallas de memoria por sección: " +
+              ", ".join(f"{sec}={n}" for sec, n in sorted(conteo.items(), key=lambda x: -x[1])))
+
+
+def escribir_lista_inyeccion(faults: list, out_path: Path):
+    """LISTA_INYECCION.csv (entrada de la campaña: inyector, GOLDEN, reanudación)."""
+    out_path = Path(out_path)
+    # Para que el CSV tenga las columnas correctas por tipo, escribimos por filas agrupando
+    with open(out_path, "w", newline="") as f:
+        writer = None
+        for row in faults:
+            ubicacion = row.get("UBICACION", "")
+            if ubicacion == "Registro":
+                fieldnames = ["FAULT_ID", "UBICACION", "TIPO_FALLA", "PERIFERICO", "REGISTRO", "CAMPO",
+                              "BIT", "DIRECCION STOP", "DIRECCION INYECCION", "MASCARA", "TIPO DE ACCESO"]
+            elif ubicacion == "FLASH":
+                # formato solicitado con STOP + INYECCION
+                fieldnames = ["FAULT_ID", "UBICACION", "TIPO_FALLA",
+                              "DIRECCION STOP", "DIRECCION INYECCION", "MASCARA", "BIT"]
+            elif ubicacion == "RAM":
+                fieldnames = ["FAULT_ID", "UBICACION", "TIPO_FALLA",
+                              "DIRECCION STOP", "DIRECCION INYECCION", "MASCARA", "BIT"]
+            else:
+                # fila desconocida: omitimos
+                continue
+
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
 
-                if writer is None:
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
+            # asegurar que no falten claves
+            safe_row = {k: row.get(k, "") for k in fieldnames}
+            writer.writerow(safe_row)
 
-                # asegurar que no falten claves
-                safe_row = {k: row.get(k, "") for k in fieldnames}
-                writer.writerow(safe_row)
+    print(f"✅ Archivo CSV de fallas generado: {out_path}")
 
-        print(f"✅ Archivo CSV de fallas generado: {out_path}")
 
 # ---------------------------
 # Bloque main (prueba)
@@ -0,0 +1,247 @@
+#------------------------MODULO DE GESTION DE MCU EMULADO-------------------------------#
+"""
+M_gestion_MCU_emu.py
+
+Objetivo emulado (Cortex-M, Thumb) con la misma interfaz que usan FaultInjector y
+GOLDEN sobre el core de pyOCD: read_memory, write_memory, read_core_register,
+set_breakpoint, resume, halt, is_halted, reset_and_halt...
+
+El ELF se carga en memoria emulada (LMA de cada segmento) y el arranque se hace
+desde la tabla de vectores (.isr_vector), igual que en la placa.
+La memoria no cargada (periféricos, SCS) se mapea bajo demanda como RAM plana:
+el emulador NO modela periféricos, solo registra qué instrucciones los acceden.
+
+No soportado: firmware que espera un bit de estado de un periférico (while (!(RCC->CR &
+RCC_CR_HSERDY)), flags de UART/ADC...). Ese bit nunca cambia en la RAM plana, el programa
+se queda en el bucle y no llega a stop_address; EjecutorParalelo marca entonces las
+fallas de ese ELF como NO_INYECTADA_EMULADOR en vez de ejecutarlas.
+
+Requisitos:
+    pip install unicorn pyelftools
+"""
+from M_modelo_elf import modelo_elf
+from unicorn import (
+    Uc, UcError, UC_ARCH_ARM, UC_MODE_THUMB, UC_MODE_MCLASS,
+    UC_HOOK_CODE, UC_HOOK_MEM_READ, UC_HOOK_MEM_WRITE,
+    UC_HOOK_MEM_READ_UNMAPPED, UC_HOOK_MEM_WRITE_UNMAPPED, UC_PROT_ALL
+)
+from unicorn.arm_const import (
+    UC_ARM_REG_PC, UC_ARM_REG_SP, UC_ARM_REG_LR, UC_ARM_REG_XPSR,
+    UC_ARM_REG_R0, UC_ARM_REG_R1, UC_ARM_REG_R2, UC_ARM_REG_R3,
+    UC_ARM_REG_R4, UC_ARM_REG_R5, UC_ARM_REG_R6, UC_ARM_REG_R7,
+    UC_ARM_REG_R8, UC_ARM_REG_R9, UC_ARM_REG_R10, UC_ARM_REG_R11,
+    UC_ARM_REG_R12, UC_ARM_REG_PRIMASK
+)
+
+# Granularidad del mapeo bajo demanda (64 KB)
+PAGINA_EMU = 0x10000
+
+# Rango de periféricos en Cortex-M (región "Peripheral" del mapa ARMv7-M)
+PERIFERICOS_INICIO = 0x40000000
+PERIFERICOS_FIN = 0x5FFFFFFF
+
+# Instrucciones máximas por resume() antes de considerar el core colgado
+MAX_INSTRUCCIONES = 50_000_000
+
+REGISTROS_UC = {
+    'pc': UC_ARM_REG_PC, 'r15': UC_ARM_REG_PC,
+    'sp': UC_ARM_REG_SP, 'r13': UC_ARM_REG_SP,
+    'lr': UC_ARM_REG_LR, 'r14': UC_ARM_REG_LR,
+    'xpsr': UC_ARM_REG_XPSR, 'primask': UC_ARM_REG_PRIMASK,
+    'r0': UC_ARM_REG_R0, 'r1': UC_ARM_REG_R1, 'r2': UC_ARM_REG_R2, 'r3': UC_ARM_REG_R3,
+    'r4': UC_ARM_REG_R4, 'r5': UC_ARM_REG_R5, 'r6': UC_ARM_REG_R6, 'r7': UC_ARM_REG_R7,
+    'r8': UC_ARM_REG_R8, 'r9': UC_ARM_REG_R9, 'r10': UC_ARM_REG_R10, 'r11': UC_ARM_REG_R11,
+    'r12': UC_ARM_REG_R12,
+}
+
+
+class NucleoEmulado:
+    """Core emulado con la API mínima de pyOCD que usa la herramienta."""
+
+    class BreakpointType:
+        HW = 'hw'
+        SW = 'sw'
+        AUTO = 'auto'
+
+    def __init__(self, elf_path, max_instrucciones=MAX_INSTRUCCIONES):
+        self.elf_path = str(elf_path)
+        self.max_instrucciones = max_instrucciones
+        self.uc = Uc(UC_ARCH_ARM, UC_MODE_THUMB | UC_MODE_MCLASS)
+        self.paginas = set()
+        self.breakpoints = {}          # addr -> handle del hook
+        self.halted = True
+        self.error = None              # última excepción del emulador (crash)
+
+        # PC -> número de accesos a periféricos (para cribado de fallas)
+        self.accesos_perifericos = {}
+
+        self.segmentos, self.vector_base = self._leer_elf()
+
+        self.uc.hook_add(UC_HOOK_MEM_READ_UNMAPPED | UC_HOOK_MEM_WRITE_UNMAPPED, self._hook_sin_mapear)
+        self.uc.hook_add(UC_HOOK_MEM_READ | UC_HOOK_MEM_WRITE, self._hook_periferico,
+                         begin=PERIFERICOS_INICIO, end=PERIFERICOS_FIN)
+        self.reset_and_halt()
+
+    # ---------- carga del ELF ----------
+    def _leer_elf(self):
+        modelo = modelo_elf(self.elf_path)
+        segmentos = [(seg['paddr'], modelo.datos_segmento(seg)) for seg in modelo.segmentos
+                     if seg['tipo'] == 'PT_LOAD' and seg['filesz'] > 0]
+        return segmentos, modelo.vector_base()
+
+    def _asegurar_mapeo(self, addr, size):
+        inicio = addr & ~(PAGINA_EMU - 1)
+        fin = (addr + max(size, 1) + PAGINA_EMU - 1) & ~(PAGINA_EMU - 1)
+        for pagina in range(inicio, fin, PAGINA_EMU):
+            if pagina not in self.paginas:
+                self.uc.mem_map(pagina, PAGINA_EMU, UC_PROT_ALL)
+                self.paginas.add(pagina)
+
+    def _hook_sin_mapear(self, uc, access, address, size, value, user_data):
+        # Periféricos / SCS / RAM no cargada: se mapean como memoria plana
+        self._asegurar_mapeo(address, size)
+        return True
+
+    def _hook_periferico(self, uc, access, address, size, value, user_data):
+        pc = uc.reg_read(UC_ARM_REG_PC)
+        self.accesos_perifericos[pc] = self.accesos_perifericos.get(pc, 0) + 1
+
+    def _hook_breakpoint(self, uc, address, size, user_data):
+        uc.emu_stop()
+
+    def _invalidar_cache(self, addr):
+        # Los bloques ya traducidos no ven hooks añadidos/quitados después
+        try:
+            self.uc.ctl_remove_cache(addr, addr + 4)
+        except (AttributeError, UcError):
+            pass
+
+    # ---------- API tipo pyOCD ----------
+    def reset_and_halt(self, reset_type=None):
+        for addr, data in self.segmentos:
+            self._asegurar_mapeo(addr, len(data))
+            self.uc.mem_write(addr, data)
+        sp = self.read_memory(self.vector_base)
+        pc = self.read_memory(self.vector_base + 4)
+        for reg in REGISTROS_UC.values():
+            self.uc.reg_write(reg, 0)
+        self.uc.reg_write(UC_ARM_REG_SP, sp)
+        self.uc.reg_write(UC_ARM_REG_PC, pc & ~1)
+        self.uc.reg_write(UC_ARM_REG_XPSR, 0x01000000)
+        self.error = None
+        self.halted = True
+
+    def reset(self, reset_type=None):
+        self.reset_and_halt()
+        self.resume()
+
+    def halt(self):
+        self.halted = True
+
+    def is_halted(self):
+        return self.halted
+
+    def resume(self):
+        """Ejecuta de forma síncrona hasta un breakpoint, un crash o agotar el presupuesto."""
+        self.halted = False
+        self.error = None
+        try:
+            pc = self.uc.reg_read(UC_ARM_REG_PC)
+            if pc in self.breakpoints:
+                # Salir del BP actual: una instrucción sin el hook del BP
+                self.uc.hook_del(self.breakpoints.pop(pc))
+                self._invalidar_cache(pc)
+                try:
+                    self.uc.emu_start(pc | 1, 0xFFFFFFFF, count=1)
+                finally:
+                    self.set_breakpoint(pc)
+                pc = self.uc.reg_read(UC_ARM_REG_PC)
+            self.uc.emu_start(pc | 1, 0xFFFFFFFF, count=self.max_instrucciones)
+        except UcError as e:
+            self.error = e
+        self.halted = True
+
+    def ejecutar_hasta(self, direccion):
+        """Reanuda y devuelve True si el core se detuvo exactamente en 'direccion'."""
+        self.resume()
+        return self.error is None and self.read_core_register('pc') == direccion
+
+    def set_breakpoint(self, addr, tipo=None):
+        addr &= ~1
+        if addr in self.breakpoints:
+            return True
+        self.breakpoints[addr] = self.uc.hook_add(UC_HOOK_CODE, self._hook_breakpoint, begin=addr, end=addr)
+        self._invalidar_cache(addr)
+        return True
+
+    def remove_breakpoint(self, addr):
+        addr &= ~1
+        handle = self.breakpoints.pop(addr, None)
+        if handle is not None:
+            self.uc.hook_del(handle)
+            self._invalidar_cache(addr)
+
+    def get_breakpoints(self):
+        return list(self.breakpoints.keys())
+
+    def read_core_register(self, nombre):
+        return self.uc.reg_read(REGISTROS_UC[nombre.lower()]) & 0xFFFFFFFF
+
+    def write_core_register(self, nombre, valor):
+        reg = REGISTROS_UC[nombre.lower()]
+        if reg == UC_ARM_REG_PC:
+            valor &= ~1
+        self.uc.reg_write(reg, valor & 0xFFFFFFFF)
+
+    def read_memory(self, addr, transfer_size=32):
+        n = transfer_size // 8
+        self._asegurar_mapeo(addr, n)
+        return int.from_bytes(self.uc.mem_read(addr, n), 'little')
+
+    def write_memory(self, addr, valor, transfer_size=32):
+        n = transfer_size // 8
+        self._asegurar_mapeo(addr, n)
+        self.uc.mem_write(addr, (int(valor) & ((1 << transfer_size) - 1)).to_bytes(n, 'little'))
+
+    def read_memory_block32(self, addr, n_palabras):
+        self._asegurar_mapeo(addr, n_palabras * 4)
+        datos = bytes(self.uc.mem_read(addr, n_palabras * 4))
+        return [int.from_bytes(datos[i:i + 4], 'little') for i in range(0, len(datos), 4)]
+
+    def write_memory_block32(self, addr, palabras):
+        datos = b''.join((int(p) & 0xFFFFFFFF).to_bytes(4, 'little') for p in palabras)
+        self._asegurar_mapeo(addr, len(datos))
+        self.uc.mem_write(addr, datos)
+
+
+class MCU_EMU:
+    def __init__(self, opts, elf_path):
+        """
+        opts: se acepta por compatibilidad con MCU/MCU_RAM; solo se usa 'max_instrucciones'
+        elf_path: ELF que se carga en el objetivo emulado
+        """
+        self.opts = opts or {}
+        self.elf_path = elf_path
+        self.session = None
+        self.core = None
+        self.target = None
+
+    def __enter__(self):
+        self.core = NucleoEmulado(self.elf_path,
+                                  self.opts.get('max_instrucciones', MAX_INSTRUCCIONES))
+        self.target = self.core
+        print(f"[INFO] Objetivo emulado listo: {self.elf_path}")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.core = None
+        self.target = None
+
+
+if __name__ == '__main__':
+    elf_path = r"/Users/apple/Documents/PruebasST/LED/Debug/LED.elf"
+
+    with MCU_EMU({}, elf_path) as mcu:
+        core = mcu.core
+        print(f"PC inicial: 0x{core.read_core_register('pc'):08X}")
+        print(f"Valor en 0x20000000: {hex(core.read_memory(0x20000000))}")
@@ -17,7 +17,8 @@ import os
 import time
 from pyocd.core.helpers import ConnectHelper
 from pyocd.flash.file_programmer import FileProgrammer
-from elftools.elf.elffile import ELFFile
+from M_modelo_elf import modelo_elf
+from M_calibracion_swd import opciones_pyocd, ajustar_reloj_swd
 
 # Dirección del VTOR (SCB->VTOR) en Cortex-M
 VTOR_ADDR = 0xE000ED08
@@ -39,7 +40,7 @@ class MCU_RAM:
         """
         Abre sesión con pyOCD y prepara objetos (no programa automáticamente).
         """
-        self.session = ConnectHelper.session_with_chosen_probe(options=self.opts)
+        self.session = ConnectHelper.session_with_chosen_probe(options=opciones_pyocd(self.opts))
         if self.session is None:
             raise RuntimeError("[ERROR] No se detectó ningún probe compatible. ¿Está conectado?")
         self.session.open()
@@ -47,6 +48,7 @@ class MCU_RAM:
 
         self.target = self.session.board.target
         self.core = getattr(self.target, "selected_core", self.target)
+        self.core = ajustar_reloj_swd(self.session, self.core, self.opts)
         self.programmer = FileProgrammer(self.session)
 
         return self
@@ -82,12 +84,10 @@ class MCU_RAM:
         Devuelve la dirección (sh_addr) de la sección .isr_vector del ELF.
         Lanza excepción si no encuentra la sección.
         """
-        with open(self.elf_path, 'rb') as f:
-            ef = ELFFile(f)
-            sec = ef.get_section_by_name('.isr_vector')
-            if sec is None:
-                raise ValueError("No se encontró la sección .isr_vector en el ELF.")
-            return sec['sh_addr']
+        vector_base = modelo_elf(self.elf_path).vector_base(por_defecto=False)
+        if vector_base is None:
+            raise ValueError("No se encontró la sección .isr_vector en el ELF.")
+        return vector_base
 
     def boot_from_elf_vector(self, force_program=True, halt_before_program=True):
         """
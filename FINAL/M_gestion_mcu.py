@@ -1,6 +1,7 @@
 #------------------------MODULO DE GESTION DE SESION MCU-------------------------------#
 from pyocd.core.helpers import ConnectHelper
 from pyocd.flash.file_programmer import FileProgrammer
+from M_calibracion_swd import opciones_pyocd, ajustar_reloj_swd
 
 class MCU:
     def __init__(self, opts, elf_path):
@@ -20,13 +21,15 @@ class MCU:
         Abre la sesión con pyOCD, programa el ELF y obtiene el core.
         """
         #Cear sesión con pyOCD usando las opociones de configuración
-        self.session = ConnectHelper.session_with_chosen_probe(options=self.opts)
+        self.session = ConnectHelper.session_with_chosen_probe(options=opciones_pyocd(self.opts))
         self.session.open()
 
         #Se obtiene el target (MCU)
         self.target = self.session.board.target
         #Se guarda el core principal de CPU
         self.core = getattr(self.target, "selected_core", self.target)
+        #Se calibra el reloj SWD (o se toma de la cache por sonda/target)
+        self.core = ajustar_reloj_swd(self.session, self.core, self.opts)
 
         #Se progarma el MCU con el arhcivo ELF
         FileProgrammer(self.session).program(self.elf_path)
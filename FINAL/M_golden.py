@@ -3,10 +3,13 @@ import os
 import time
 from datetime import datetime
 
-from M_deteccion_stop import detectar_while_infinito
-from M_gestion_MCU_ram import MCU_RAM
-from M_gestion_mcu import  MCU
+from M_modelo_elf import modelo_elf
+from M_broker_sondas import abrir_mcu
+from M_escritor_csv import EscritorCSV
+from M_almacen_snapshots import (AlmacenSnapshots, a_u32, cargar_matriz, guardar_snapshots, compactar_delta,
+                                 COLUMNAS_REGISTROS)
 from M_detector_campana import obtener_ultima_carpeta_campania
+from M_politica_captura import politica_desde, leer_politica
 
 
 def parse_int_optional(s):
@@ -36,9 +39,56 @@ class FALLAGOLD:
         self.direccion_inyeccion = direccion_inyeccion
         self.ubicacion = ubicacion
 
+def leer_fallas_gold(csv_file):
+    """Lee del CSV de inyección solo lo que necesita GOLDEN (ID, ubicación, dirección)."""
+    lista = []
+    with open(csv_file, newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                id_falla = int(row['FAULT_ID'])
+                ubic = (row.get('UBICACION') or '').strip()
+                dir_iny = parse_int_optional(row.get('DIRECCION INYECCION'))
+                lista.append(FALLAGOLD(id_falla, dir_iny, ubic))
+            except Exception as e:
+                print(f'[WARNING] Fila ignorada: {e}')
+    return lista
+
+
+def filtrar_csv_fallas(origen, destino, ids):
+    """Copia a 'destino' solo las filas de 'origen' cuyo FAULT_ID está en 'ids'."""
+    with open(origen, newline='') as f_in, open(destino, 'w', newline='') as f_out:
+        reader = csv.DictReader(f_in)
+        writer = csv.DictWriter(f_out, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        for row in reader:
+            try:
+                if int(row['FAULT_ID']) in ids:
+                    writer.writerow(row)
+            except (KeyError, ValueError):
+                continue
+    return destino
+
+
 class GOLDEN:
-    def __init__(self, mcu = None, csv_file = None, elf_main_path = None, elf_ram_path = None, main_opts=None):
+    def __init__(self, mcu = None, csv_file = None, elf_main_path = None, elf_ram_path = None, main_opts=None,
+                 campaign_dir=None, broker=None, compactar=True, politica=None):
+        """
+        campaign_dir: (opcional) carpeta de campaña donde guardar snapshots_gold;
+                      si no se indica se usa la última campaña detectada.
+        broker: (opcional) dirección del broker de sondas para las sesiones temporales.
+        compactar: al terminar, reescribe los snapshots de la campaña como delta contra GOLDEN.
+        politica: (opcional) política de captura; por defecto la guardada en campania.json,
+                  para que GOLDEN lea las mismas ventanas y regiones que el inyector.
+        """
+        self.campaign_dir = campaign_dir
+        self.compactar = compactar
+        self.politica = politica
         self.mcu = mcu
+        self.mcu_temporal = None
+        self.broker = broker
+        self.escritor = None
+        self.almacenes = {}
         self.core = getattr(mcu, 'core', None) if mcu is not None  else None
         self.session = getattr(mcu, 'session', None) if mcu is not None else None
 
@@ -57,7 +107,7 @@ class GOLDEN:
         ]:
             if path:
                 try:
-                    addr, _ = detectar_while_infinito(path)
+                    addr, _ = modelo_elf(path).bucle_principal()
                     setattr(self, attr, addr)
                     print(f"[INFO] Stop address detectada ({label}): 0x{addr:08X}")
                 except Exception as e:
@@ -68,15 +118,13 @@ class GOLDEN:
 
         if self.lista_fallas:
             self.inicializar_archivos()
-        else:
-            self.campaign_dir = None
 
     def set_elf_paths(self, elf_main=None, elf_ram=None):
         """Establece rutas ELF desde la GUI o desde otro script."""
         if elf_main:
             self.elf_path = elf_main
             try:
-                resultado = detectar_while_infinito(self.elf_path)
+                resultado = modelo_elf(self.elf_path).bucle_principal()
                 addr_salto, _ = resultado
                 self.stop_address = addr_salto
                 print(f"[INFO] Stop address detectada (elf_main): 0x{self.stop_address:08X}")
@@ -87,7 +135,7 @@ class GOLDEN:
             self.elf_ram_path = elf_ram
             print(f"[INFO] elf_ram_path establecido: {self.elf_ram_path}")
             try:
-                resultado2 = detectar_while_infinito(self.elf_ram_path)
+                resultado2 = modelo_elf(self.elf_ram_path).bucle_principal()
                 addr_salto2, _ = resultado2
                 self.stop_address_flash = addr_salto2
                 print(f"[INFO] Stop address detectada (elf_main): 0x{self.stop_address:08X}")
@@ -103,18 +151,7 @@ class GOLDEN:
         if not path:
             raise ValueError(f'No hay ruta CSV para cargar')
         self.csv_file = path
-        self.lista_fallas = []
-        with open(self.csv_file, newline='') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                try:
-                    id_falla = int(row['FAULT_ID'])
-                    ubic = (row.get('UBICACION') or '').strip()
-                    dir_iny = parse_int_optional(row.get('DIRECCION INYECCION'))
-                    falla = FALLAGOLD(id_falla, dir_iny, ubic)
-                    self.lista_fallas.append(falla)
-                except Exception as e:
-                    print(f'[WARNING] Fila ignorada: {e}')
+        self.lista_fallas = leer_fallas_gold(self.csv_file)
         print(f'[INFO] {len(self.lista_fallas)} fallas cargadas')
         self.inicializar_archivos()
 
@@ -134,33 +171,35 @@ class GOLDEN:
         """
         Ahora la carpeta campaña SIEMPRE será la última detectada por el script externo.
         LISTA_INYECCION.csv NO se mueve.
-        Solo los snapshots_gold.csv se guardan en la última campaña.
+        Solo los snapshots_gold se guardan en la última campaña.
         """
 
         # ← ESTE es el cambio QUE PEDISTE
-        try:
-            campaign_dir = obtener_ultima_carpeta_campania()
-            print(f"[INFO] Carpeta de campaña detectada: {campaign_dir}")
-        except Exception as e:
-            raise RuntimeError(f"❌ No se pudo detectar campaña: {e}")
+        if self.campaign_dir:
+            campaign_dir = self.campaign_dir
+            print(f"[INFO] Carpeta de campaña indicada: {campaign_dir}")
+        else:
+            try:
+                campaign_dir = obtener_ultima_carpeta_campania()
+                print(f"[INFO] Carpeta de campaña detectada: {campaign_dir}")
+            except Exception as e:
+                raise RuntimeError(f"❌ No se pudo detectar campaña: {e}")
 
         self.campaign_dir = campaign_dir
 
-        # archivo donde se guardarán los snapshots GOLD (solo se crea ahí)
-        self.snapshot_gold_csv = os.path.join(self.campaign_dir, 'snapshots_gold.csv')
-
-        hay_memoria = any((f.ubicacion or '').lower() in ['ram', 'flash'] for f in self.lista_fallas)
-        self.mem_cols_count = 256 if hay_memoria else 1
-
-        mem_cols = [f"MEM_{i}" for i in range(self.mem_cols_count)]
-        header = ['Test_ID', 'Fault_ID', 'PC', 'SP', 'LR'] + [f'R{i}' for i in range(13)] + mem_cols
+        if self.politica is None:
+            self.politica = leer_politica(self.campaign_dir)
+        else:
+            self.politica = politica_desde(self.politica)
+        self.mem_cols_count = self.politica.palabras_memoria(self.lista_fallas)
 
+        # snapshots GOLD en binario uint32 (M_almacen_snapshots), solo en esa carpeta
         try:
-            with open(self.snapshot_gold_csv, 'w', newline='') as f:
-                csv.writer(f).writerow(header)
-            print(f"[INFO] Creado archivo GOLD en: {self.snapshot_gold_csv}")
+            self.almacenes = {'gold': AlmacenSnapshots(self.campaign_dir, 'gold', self.mem_cols_count,
+                                                       extras=self.politica.columnas_extra())}
+            print(f"[INFO] Creado archivo GOLD en: {self.almacenes['gold'].ruta_raw}")
         except Exception as e:
-            print(f"[ERROR] No se pudo crear {self.snapshot_gold_csv}: {e}")
+            print(f"[ERROR] No se pudo crear snapshots_gold en {self.campaign_dir}: {e}")
 # ---------- snapshots / lectura ----------
     def snapshot_registros(self):
         if self.core is None:
@@ -199,31 +238,52 @@ class GOLDEN:
                 mem.append(0)
         return mem
 
-    def construir_snapshot_dict(self, registros, memoria):
+    def construir_snapshot_dict(self, registros, memoria, extras=None):
+        if not self.politica.registros:
+            registros = {}
         snap = {}
-        snap['PC'] = _to_hex_safe(registros.get('pc', 0))
-        snap['SP'] = _to_hex_safe(registros.get('sp', 0))
-        snap['LR'] = _to_hex_safe(registros.get('lr', 0))
+        snap['PC'] = a_u32(registros.get('pc', 0))
+        snap['SP'] = a_u32(registros.get('sp', 0))
+        snap['LR'] = a_u32(registros.get('lr', 0))
         for i in range(13):
-            snap[f'R{i}'] = _to_hex_safe(registros.get(f'r{i}', 0))
+            snap[f'R{i}'] = a_u32(registros.get(f'r{i}', 0))
         for i in range(self.mem_cols_count):
             val = memoria[i] if i < len(memoria) else 0
-            snap[f'MEM_{i}'] = _to_hex_safe(val)
+            snap[f'MEM_{i}'] = a_u32(val)
+        for col, val in (extras or {}).items():
+            snap[col] = a_u32(val)
         return snap
 
     def guardar_snapshot(self, tipo, test_id, fault_id, snap):
-        path = self.snapshot_gold_csv if tipo == 'gold' else None
-        if path is None:
+        almacen = self.almacenes.get(tipo)
+        if almacen is None:
             return
-
-        row = [test_id, fault_id, snap['PC'], snap['SP'], snap['LR']]
-        row += [snap[f'R{i}'] for i in range(13)]
-
-        for i in range(self.mem_cols_count):
-            row.append(snap.get(f'MEM_{i}', _to_hex_safe(0)))
-
-        with open(path, 'a', newline='') as f:
-            csv.writer(f).writerow(row)
+        self.obtener_escritor().escribir_bytes(almacen.ruta_raw, almacen.fila(test_id, fault_id, snap))
+
+    def capturar_gold(self, falla, tamano_bytes):
+        """Snapshot GOLD con la ventana y las regiones extra de la política."""
+        registros = self.snapshot_registros()
+        memoria = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes) or [0]
+        extras = self.politica.leer_regiones(self.core, registros) if self.politica.regiones else None
+        self.guardar_snapshot('gold', falla.id_falla, falla.id_falla,
+                              self.construir_snapshot_dict(registros, memoria, extras))
+
+    # ---------- escritor en segundo plano ----------
+    def obtener_escritor(self):
+        """Escritor CSV en segundo plano (se crea al primer uso o tras cerrar_escritor())."""
+        if self.escritor is None or self.escritor.cerrado:
+            self.escritor = EscritorCSV()
+        return self.escritor
+
+    def cerrar_escritor(self):
+        """Drena las filas pendientes y consolida snapshots_gold.npy."""
+        if self.escritor is not None:
+            self.escritor.cerrar()
+        for almacen in self.almacenes.values():
+            try:
+                almacen.finalizar()
+            except Exception as e:
+                print(f"[WARNING] No se pudo consolidar {almacen.ruta_raw}: {e}")
 
     def esperar_halt(self, timeout=5.0):
         if self.core is None:
@@ -251,7 +311,7 @@ class GOLDEN:
                     self.session = None
 
             try:
-                with MCU_RAM(self.opts, self.elf_ram_path) as mcu_ram:
+                with abrir_mcu(self.opts, self.elf_ram_path, ram=True, broker=self.broker) as mcu_ram:
                     print("[INFO] Sesión temporal abierta para programar e inyectar (FLASH).")
                     try:
                         mcu_ram.core.set_breakpoint(self.stop_address_flash, mcu_ram.core.BreakpointType.HW)
@@ -284,7 +344,7 @@ class GOLDEN:
                     self.session = getattr(mcu_ram, 'session', None)
 
                     # ejecutar flujo de inyección FLASH (usa self.core del mcu_ram)
-                    resultado = self._inj_memoria_flash(falla, 256, delay)
+                    resultado = self._inj_memoria_flash(falla, self.politica.ventana('flash'), delay)
 
                 # ✅ Al salir del with → sesión temporal YA se cerró
                 # Limpieza de referencias para evitar estados corruptos
@@ -302,8 +362,9 @@ class GOLDEN:
             # asegurar sesión principal abierta
             if self.core is None:
                 try:
-                    temp_mcu = MCU(self.opts, self.elf_path)
+                    temp_mcu = abrir_mcu(self.opts, self.elf_path, broker=self.broker)
                     self.mcu = temp_mcu.__enter__()
+                    self.mcu_temporal = self.mcu
                     self.core = getattr(self.mcu, 'core', None)
                     self.session = getattr(self.mcu, 'session', None)
                 except Exception as e:
@@ -313,13 +374,14 @@ class GOLDEN:
                 self.core.set_breakpoint(self.stop_address, self.core.BreakpointType.HW)
             except Exception as e:
                 print(f"[WARNING] No se pudo establecer bp stop: {e}")
-            return self._inj_memoria(falla, 4, delay)
+            return self._inj_memoria(falla, self.politica.ventana('registro'), delay)
 
         elif ubic == 'ram':
             if self.core is None:
                 try:
-                    temp_mcu = MCU(self.opts, self.elf_path)
+                    temp_mcu = abrir_mcu(self.opts, self.elf_path, broker=self.broker)
                     self.mcu = temp_mcu.__enter__()
+                    self.mcu_temporal = self.mcu
                     self.core = getattr(self.mcu, 'core', None)
                     self.session = getattr(self.mcu, 'session', None)
                 except Exception as e:
@@ -329,7 +391,7 @@ class GOLDEN:
                 self.core.set_breakpoint(self.stop_address, self.core.BreakpointType.HW)
             except Exception as e:
                 print(f"[WARNING] No se pudo establecer bp stop: {e}")
-            return self._inj_memoria(falla, 256, delay)
+            return self._inj_memoria(falla, self.politica.ventana('ram'), delay)
 
     def _inj_memoria(self, falla, tamano_bytes, delay):
 
@@ -364,12 +426,7 @@ class GOLDEN:
 
                 if pc == self.stop_address:
                     # snapshot GOLD
-                    reg_pre = self.snapshot_registros()
-                    mem_pre = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                    if len(mem_pre) == 0:
-                        mem_pre = [0]
-                    snap_pre = self.construir_snapshot_dict(reg_pre, mem_pre)
-                    self.guardar_snapshot('gold', falla.id_falla, falla.id_falla, snap_pre)
+                    self.capturar_gold(falla, tamano_bytes)
                     print(f"[INFO] Snapshot GOLD guardado para falla #{falla.id_falla}")
                     return  # 🔹 Sal del while → pasa a la siguiente falla
 
@@ -397,17 +454,8 @@ class GOLDEN:
                 print(f"[INFO] MCU detenido en PC=0x{(pc or 0):08X}")
 
                 if pc == self.stop_address_flash:
-                    # snapshot before
-                    reg_pre = self.snapshot_registros()
-                    mem_pre = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                    if len(mem_pre) == 0:
-                        mem_pre = [0]
-                    try:
-                        valor_original = int(mem_pre[0])
-                    except Exception:
-                        valor_original = 0
-                    snap_pre = self.construir_snapshot_dict(reg_pre, mem_pre)
-                    self.guardar_snapshot('gold', falla.id_falla, falla.id_falla, snap_pre)
+                    # snapshot GOLD
+                    self.capturar_gold(falla, tamano_bytes)
                     try:
                         self.core.resume()
                         self.core.reset_and_halt()
@@ -423,12 +471,107 @@ class GOLDEN:
         self.tiempo_total_inicio = time.time()
 
         total_fallas = len(self.lista_fallas)
-        for falla in self.lista_fallas:
+        if not self.politica.fases:
+            print(f"[INFO] Política de captura '{self.politica.nivel}' sin snapshots: GOLDEN no es necesario")
+            return
+        try:
+            for falla in self.lista_fallas:
+                try:
+                    self.inject(falla)
+                except Exception as e:
+                    print(f"[ERROR] Error inyectando falla {falla.id_falla}: {e}")
+                    # continuar con la siguiente falla
+                self.obtener_escritor().checkpoint()
+        finally:
+            self.cerrar_escritor()
+            self.cerrar_sesion_temporal()
+
+        if self.compactar:
+            self.compactar_snapshots()
+
+    def compactar_snapshots(self):
+        """Reescribe los snapshots de la campaña como delta contra los GOLDEN recién medidos."""
+        try:
+            compactar_delta(self.campaign_dir)
+        except Exception as e:
+            print(f"[WARNING] No se pudieron compactar los snapshots: {e}")
+
+    def cerrar_sesion_temporal(self):
+        """Cierra la sesión que inject() abrió por su cuenta (libera la sonda o el arriendo del broker)."""
+        if self.mcu_temporal is not None:
             try:
-                self.inject(falla)
+                self.mcu_temporal.__exit__(None, None, None)
             except Exception as e:
-                print(f"[ERROR] Error inyectando falla {falla.id_falla}: {e}")
-                # continuar con la siguiente falla
+                print(f"[WARNING] No se pudo cerrar la sesión temporal: {e}")
+            if self.mcu is self.mcu_temporal:
+                self.mcu = None
+                self.core = None
+                self.session = None
+            self.mcu_temporal = None
+
+# ---------- cache de snapshots GOLDEN entre campañas ----------
+class CacheGolden:
+    """
+    Snapshots GOLDEN ya medidos, indexados por (ELF, ubicación, dirección de inyección,
+    firma de la política de captura). La ejecución sin falla hasta stop_address no depende
+    de la falla, así que dos campañas con el mismo ELF y la misma ventana pueden reutilizar
+    la fila GOLDEN de una misma dirección.
+    """
+
+    def __init__(self):
+        self.filas = {}
+
+    @staticmethod
+    def _firma(path):
+        try:
+            return (os.path.abspath(path), os.path.getmtime(path), os.path.getsize(path))
+        except (OSError, TypeError):
+            return None
+
+    def _clave(self, falla, elf_main, elf_ram, politica):
+        ubic = (falla.ubicacion or '').lower()
+        elf = elf_ram if ubic == 'flash' else elf_main
+        return (self._firma(elf), ubic, falla.direccion_inyeccion, politica.firma(ubic))
+
+    def faltantes(self, lista_fallas, elf_main, elf_ram, politica=None):
+        politica = politica_desde(politica)
+        return [f for f in lista_fallas if self._clave(f, elf_main, elf_ram, politica) not in self.filas]
+
+    def registrar(self, campaign_dir, lista_fallas, elf_main, elf_ram):
+        """Guarda en la cache las filas de los snapshots GOLD recién medidos en campaign_dir."""
+        matriz, _ = cargar_matriz(campaign_dir, 'gold', mmap=False)
+        if matriz is None:
+            return
+        politica = leer_politica(campaign_dir)
+        por_id = {f.id_falla: f for f in lista_fallas}
+        n_regs = len(COLUMNAS_REGISTROS)
+        n_extras = len(politica.columnas_extra())
+        fin_mem = matriz.shape[1] - n_extras
+        for row in matriz:
+            falla = por_id.get(int(row[1]))
+            if falla is None:
+                continue
+            # Solo la ventana de la ubicación: el resto de MEM_i es relleno de la campaña
+            palabras = politica.ventana(falla.ubicacion) // 4
+            self.filas[self._clave(falla, elf_main, elf_ram, politica)] = (
+                row[2:2 + n_regs].tolist(), row[2 + n_regs:fin_mem][:palabras].tolist(), row[fin_mem:].tolist())
+
+    def escribir(self, campaign_dir, lista_fallas, elf_main, elf_ram):
+        """Escribe los snapshots GOLD completos desde la cache (mismo formato que GOLDEN)."""
+        politica = leer_politica(campaign_dir)
+        mem_cols_count = politica.palabras_memoria(lista_fallas)
+
+        filas = []
+        for falla in lista_fallas:
+            fila = self.filas.get(self._clave(falla, elf_main, elf_ram, politica))
+            if fila is None:
+                continue
+            regs, mem, extras = fila
+            mem = (mem + [0] * mem_cols_count)[:mem_cols_count]
+            filas.append([falla.id_falla, falla.id_falla] + regs + mem + extras)
+        guardar_snapshots(campaign_dir, 'gold', filas, mem_cols_count, politica.columnas_extra())
+        return len(filas)
+
 
 # ---------- ejemplo de uso desde GUI / script ----------
 def main_example():
@@ -451,7 +594,7 @@ def main_example():
 
     # Abrir sesión principal (opcional — útil para fallas en RAM/registro)
     try:
-        with MCU(opts, elf_main) as mcu:
+        with abrir_mcu(opts, elf_main) as mcu:
             injector = GOLDEN(mcu=mcu, csv_file=csv_file, elf_main_path=elf_main, elf_ram_path=elf_ram, main_opts=opts)
             # Alternativamente la GUI podría llamar:
             # injector.cargar_elves_desde_gui(elf_main, elf_ram)
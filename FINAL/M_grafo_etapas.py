@@ -0,0 +1,102 @@
+#------------------------MODULO GRAFO DE ETAPAS-------------------------------#
+"""
+M_grafo_etapas.py
+
+Ejecución de las etapas de ACOPLADO como un grafo de dependencias pequeño.
+Antes pseudo() hacía ELF -> SVD -> generador -> conexión con la placa en serie, aunque
+el análisis del ELF y el del SVD no dependen entre sí y abrir la sesión (y programar
+el ELF) solo hace falta para inyectar.
+
+    grafo = GrafoEtapas("pseudo")
+    grafo.etapa('elf', analizar_elf)
+    grafo.etapa('svd', analizar_svd)
+    grafo.etapa('generador', generar, depende=['elf', 'svd'])
+    resultados = grafo.ejecutar()          # {nombre: valor devuelto}
+
+    - Cada etapa arranca en un ThreadPoolExecutor en cuanto terminan sus dependencias.
+      Hilos y no procesos: las etapas devuelven objetos en memoria (analizadores, sesión
+      con la sonda) y lo pesado (E/S, numpy, XML, USB) no retiene el GIL todo el tiempo.
+    - Si una etapa falla, las que dependen de ella no se lanzan; se espera a las que ya
+      corren, se llama a liberar(resultado) de las terminadas (p.ej. cerrar la sesión)
+      y se relanza el primer error.
+    - Al terminar se imprime cuándo empezó y acabó cada etapa respecto al inicio.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class GrafoEtapas:
+    def __init__(self, nombre="etapas"):
+        self.nombre = nombre
+        self.etapas = {}           # nombre -> (funcion, dependencias, liberar)
+        self.resultados = {}
+        self.tiempos = {}          # nombre -> (inicio, fin) en segundos desde ejecutar()
+
+    def etapa(self, nombre, funcion, depende=(), liberar=None):
+        """Agrega una etapa; funcion() sin argumentos (los resultados previos están en self.resultados)."""
+        for dep in depende:
+            if dep not in self.etapas:
+                raise ValueError(f"[ERROR] La etapa '{nombre}' depende de '{dep}', que no existe")
+        self.etapas[nombre] = (funcion, tuple(depende), liberar)
+
+    def _correr(self, nombre, t0):
+        inicio = time.perf_counter() - t0
+        try:
+            return self.etapas[nombre][0]()
+        finally:
+            self.tiempos[nombre] = (inicio, time.perf_counter() - t0)
+
+    def ejecutar(self):
+        t0 = time.perf_counter()
+        pendientes = dict(self.etapas)
+        en_curso = {}              # futuro -> nombre
+        error = None
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.etapas)),
+                                thread_name_prefix=self.nombre) as pool:
+            while pendientes or en_curso:
+                if error is None:
+                    listas = [n for n, (_, deps, _) in pendientes.items()
+                              if all(d in self.resultados for d in deps)]
+                    for nombre in listas:
+                        del pendientes[nombre]
+                        en_curso[pool.submit(self._correr, nombre, t0)] = nombre
+                if not en_curso:
+                    break
+                hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    nombre = en_curso.pop(futuro)
+                    try:
+                        self.resultados[nombre] = futuro.result()
+                    except Exception as e:
+                        print(f"[ERROR] Etapa '{nombre}' falló: {e}")
+                        error = error or e
+
+        self._resumen(time.perf_counter() - t0, pendientes if error else {})
+        if error is not None:
+            for nombre, resultado in self.resultados.items():
+                liberar = self.etapas[nombre][2]
+                if liberar is not None:
+                    liberar(resultado)
+            raise error
+        return self.resultados
+
+    def _resumen(self, total, omitidas):
+        suma = sum(fin - inicio for inicio, fin in self.tiempos.values())
+        print(f"[INFO] Etapas de {self.nombre}: {total:.2f} s en total ({suma:.2f} s sumando cada etapa)")
+        for nombre, (inicio, fin) in sorted(self.tiempos.items(), key=lambda x: x[1]):
+            print(f"    {nombre:<12} {inicio:7.2f} -> {fin:7.2f} s  ({fin - inicio:.2f} s)")
+        for nombre in omitidas:
+            print(f"    {nombre:<12} omitida (falló una dependencia)")
+
+
+if __name__ == '__main__':
+    def dormir(segundos, valor=None):
+        return lambda: (time.sleep(segundos), valor)[1]
+
+    grafo = GrafoEtapas("demo")
+    grafo.etapa('elf', dormir(0.3, 'elf'))
+    grafo.etapa('svd', dormir(0.2, 'svd'))
+    grafo.etapa('sonda', dormir(0.4, 'sesion'))
+    grafo.etapa('generador', dormir(0.1, 'lista'), depende=['elf', 'svd'])
+    print(grafo.ejecutar())
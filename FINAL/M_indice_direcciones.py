@@ -0,0 +1,99 @@
+#------------------------MODULO INDICE DE DIRECCIONES-------------------------------#
+"""
+M_indice_direcciones.py
+
+Índice de intervalos ordenado (arrays numpy + searchsorted) para pasar direcciones a
+(sección, símbolo, offset). Se construye una vez por firmware desde el modelo ELF
+compartido (M_modelo_elf) y resuelve millones de direcciones en una sola llamada:
+el generador lo usa para addr_to_section y el analizador para las columnas
+Seccion / Simbolo de analisis_avanzado.csv.
+
+    indice = modelo_elf(elf).indice_direcciones()
+    secciones, simbolos, offsets = indice.ubicar(direcciones)
+
+Las direcciones fuera de toda sección / símbolo devuelven "" y offset -1.
+Los símbolos que se solapan (alias, objetos anidados) se resuelven por el que
+empieza más cerca por debajo de la dirección.
+"""
+import numpy as np
+
+TIPOS_SIMBOLO = ('STT_FUNC', 'STT_OBJECT')
+
+
+class TablaIntervalos:
+    """Intervalos [inicio, fin) ordenados por inicio, con un nombre por intervalo."""
+
+    def __init__(self, intervalos):
+        intervalos = sorted(intervalos)
+        self.inicios = np.array([i[0] for i in intervalos], dtype=np.int64)
+        self.fines = np.array([i[1] for i in intervalos], dtype=np.int64)
+        self.nombres = np.array([i[2] for i in intervalos] + [""], dtype=object)
+
+    def __len__(self):
+        return len(self.inicios)
+
+    def buscar(self, direcciones):
+        """Índice del intervalo que contiene cada dirección (-1 si ninguno)."""
+        direcciones = np.asarray(direcciones, dtype=np.int64)
+        idx = np.searchsorted(self.inicios, direcciones, side='right') - 1
+        validos = idx >= 0
+        validos[validos] = direcciones[validos] < self.fines[idx[validos]]
+        return np.where(validos, idx, -1)
+
+
+class IndiceDirecciones:
+    def __init__(self, secciones, simbolos):
+        """
+        secciones: [(inicio, tamaño, nombre)]
+        simbolos:  [(inicio, tamaño, nombre)]   (solo los de tamaño > 0)
+        """
+        self.secciones = TablaIntervalos([(d, d + t, n) for d, t, n in secciones if t > 0])
+        self.simbolos = TablaIntervalos([(d, d + t, n) for d, t, n in simbolos if t > 0])
+
+    @classmethod
+    def desde_modelo(cls, modelo):
+        secciones = [(s['direccion'], s['tamano'], s['nombre']) for s in modelo.secciones_cargadas()]
+        # Funciones Thumb: st_value lleva el bit 0 a 1
+        simbolos = [(valor & ~0x1 if tipo == 'STT_FUNC' else valor, tamano, nombre)
+                    for nombre, valor, tamano, tipo in modelo.simbolos if tipo in TIPOS_SIMBOLO]
+        return cls(secciones, simbolos)
+
+    def ubicar(self, direcciones):
+        """(secciones, simbolos, offsets) para un lote de direcciones (arrays numpy)."""
+        direcciones = np.asarray(direcciones, dtype=np.int64)
+        i_sec = self.secciones.buscar(direcciones)
+        i_sim = self.simbolos.buscar(direcciones)
+        offsets = np.where(i_sim >= 0, direcciones - self.simbolos.inicios[np.maximum(i_sim, 0)], -1) \
+            if len(self.simbolos) else np.full(len(direcciones), -1, dtype=np.int64)
+        return self.secciones.nombres[i_sec], self.simbolos.nombres[i_sim], offsets
+
+    def seccion_de(self, direccion):
+        return self.secciones.nombres[self.secciones.buscar([direccion])[0]] or None
+
+    def simbolo_de(self, direccion):
+        """(símbolo, offset) o (None, -1)."""
+        _, simbolos, offsets = self.ubicar([direccion])
+        return (simbolos[0] or None), int(offsets[0])
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from M_modelo_elf import modelo_elf
+
+    if len(sys.argv) < 2:
+        print("Uso: python M_indice_direcciones.py firmware.elf [0xDIRECCION ...]")
+        sys.exit(1)
+    indice = modelo_elf(sys.argv[1]).indice_direcciones()
+    print(f"[INFO] {len(indice.secciones)} secciones, {len(indice.simbolos)} símbolos")
+    if len(sys.argv) > 2:
+        direcciones = [int(a, 16) for a in sys.argv[2:]]
+    else:
+        lo, hi = int(indice.secciones.inicios.min()), int(indice.secciones.fines.max())
+        direcciones = np.random.default_rng(0).integers(lo, hi, 1_000_000)
+    t0 = time.perf_counter()
+    secciones, simbolos, offsets = indice.ubicar(direcciones)
+    print(f"[INFO] {len(direcciones)} direcciones en {time.perf_counter() - t0:.3f} s")
+    for d, sec, sim, off in list(zip(direcciones, secciones, simbolos, offsets))[:10]:
+        print(f"  0x{int(d):08X}  {sec or '-':<14} {sim + f'+0x{off:x}' if sim else '-'}")
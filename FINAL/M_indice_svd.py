@@ -0,0 +1,176 @@
+#------------------------MODULO INDICE DEL REPOSITORIO SVD-------------------------------#
+"""
+M_indice_svd.py
+
+Índice nombre de dispositivo -> archivo .svd del repositorio cmsis-svd-data.
+ListaRegistros.find_svd_path hacía rglob sobre miles de archivos en cada llamada y
+solo conocía las dos placas escritas a mano en micro_svds.
+
+    - El índice se guarda en cache_svd/indice_<hash del repo>.json con la lista de
+      .svd y el mtime de cada carpeta. Al cargarlo solo se hace stat de las carpetas:
+      las que cambiaron (archivos nuevos/borrados) se vuelven a listar, el resto no.
+    - Claves: nombre del archivo sin .svd en mayúsculas (STM32F407, STM32F40x...).
+    - buscar("STM32F407VGTx") prueba el nombre exacto y después prefijos cada vez más
+      cortos (STM32F407VGT, STM32F407VG, ... STM32F407): cada prueba es un acceso a dict.
+      En cada largo, si no hay nombre exacto, se prueban los nombres con 'x' como
+      comodín de ese mismo largo (STM32F40x) antes de acortar más: así STM32F401 usa
+      STM32F40x y no cae en un prefijo de otra familia. No se acorta por debajo del
+      prefijo de familia (STM32F4, NRF52...).
+
+Así, para una placa nueva basta con el nombre del dispositivo en MICROCONTROLADORES
+(M_configuracion_automatica).
+"""
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from M_cache_svd import CARPETA_CACHE
+
+VERSION_INDICE = 1
+
+# Prefijo de familia: letras + hasta dos dígitos (+ letra y dígito): STM32F4, NRF52, LPC17
+PATRON_FAMILIA = re.compile(r'^[A-Z]+\d{1,2}(?:[A-Z]\d)?')
+
+# ruta del repositorio -> IndiceSVD
+_INDICES = {}
+
+
+class IndiceSVD:
+    def __init__(self, repo, carpeta_cache=CARPETA_CACHE):
+        self.repo = os.path.abspath(str(repo))
+        clave = hashlib.sha1(self.repo.encode()).hexdigest()[:16]
+        self.ruta = os.path.join(carpeta_cache, f"indice_{clave}.json")
+        self.carpetas = {}         # carpeta relativa -> {'mtime': ns, 'svd': [archivos], 'sub': [carpetas]}
+        self.archivos = {}         # NOMBRE -> ruta relativa
+        self._cargar()
+        if self._actualizar():
+            self._guardar()
+        self._reconstruir()
+
+    # ---------- persistencia ----------
+    def _cargar(self):
+        try:
+            with open(self.ruta) as f:
+                datos = json.load(f)
+            if datos.get('version') == VERSION_INDICE and datos.get('repo') == self.repo:
+                self.carpetas = datos['carpetas']
+        except (OSError, ValueError, KeyError):
+            self.carpetas = {}
+
+    def _guardar(self):
+        try:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            tmp = self.ruta + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'version': VERSION_INDICE, 'repo': self.repo, 'carpetas': self.carpetas}, f)
+            os.replace(tmp, self.ruta)
+        except OSError as e:
+            print(f"[WARNING] No se pudo guardar el índice SVD: {e}")
+
+    # ---------- actualización incremental ----------
+    def _listar(self, relativa):
+        """Lista una carpeta: sus .svd y subcarpetas."""
+        svd, sub = [], []
+        with os.scandir(os.path.join(self.repo, relativa)) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False) and not e.name.startswith('.'):
+                    sub.append(os.path.join(relativa, e.name) if relativa else e.name)
+                elif e.name.lower().endswith('.svd'):
+                    svd.append(e.name)
+        return svd, sub
+
+    def _actualizar(self):
+        """Recorre las carpetas conocidas por mtime; devuelve True si algo cambió."""
+        if not os.path.isdir(self.repo):
+            cambio = bool(self.carpetas)
+            self.carpetas = {}
+            return cambio
+        cambio, vistas, pendientes = False, set(), ['']
+        while pendientes:
+            relativa = pendientes.pop()
+            vistas.add(relativa)
+            try:
+                mtime = os.stat(os.path.join(self.repo, relativa)).st_mtime_ns
+            except OSError:
+                continue
+            previa = self.carpetas.get(relativa)
+            if previa is None or previa['mtime'] != mtime:
+                svd, sub = self._listar(relativa)
+                self.carpetas[relativa] = {'mtime': mtime, 'svd': svd, 'sub': sub}
+                cambio = True
+            pendientes.extend(self.carpetas[relativa]['sub'])
+        for relativa in set(self.carpetas) - vistas:
+            del self.carpetas[relativa]
+            cambio = True
+        if cambio:
+            print(f"[INFO] Índice SVD actualizado: {self.repo}")
+        return cambio
+
+    def _reconstruir(self):
+        self.archivos = {}
+        for relativa in sorted(self.carpetas):
+            for nombre in self.carpetas[relativa]['svd']:
+                self.archivos.setdefault(os.path.splitext(nombre)[0].upper(), os.path.join(relativa, nombre))
+        # Nombres con comodín 'x' (STM32F40x), agrupados por largo
+        self._comodines = {}
+        for n in self.archivos:
+            if 'X' in n[-3:]:
+                self._comodines.setdefault(len(n), []).append(n)
+
+    def refrescar(self):
+        """Vuelve a mirar el mtime de cada carpeta; relista y guarda solo si algo cambió."""
+        if self._actualizar():
+            self._guardar()
+            self._reconstruir()
+        return self
+
+    # ---------- búsqueda ----------
+    def buscar(self, dispositivo):
+        """Ruta del .svd para un nombre de dispositivo o alias, o None."""
+        nombre = str(dispositivo).upper()
+        if nombre.endswith('.SVD'):
+            nombre = nombre[:-4]
+        familia = PATRON_FAMILIA.match(nombre)
+        minimo = len(familia.group()) if familia else len(nombre)
+        for n in range(len(nombre), min(minimo, len(nombre)) - 1, -1):
+            relativa = self.archivos.get(nombre[:n])
+            if relativa:
+                return Path(self.repo) / relativa
+            for comodin in sorted(self._comodines.get(n, ())):
+                if all(c == 'X' or c == d for c, d in zip(comodin, nombre)):
+                    return Path(self.repo) / self.archivos[comodin]
+        return None
+
+    def __len__(self):
+        return len(self.archivos)
+
+
+def indice_svd(repo, carpeta_cache=CARPETA_CACHE):
+    """
+    IndiceSVD del repositorio, memorizado en el proceso. Cada llamada revisa el mtime
+    de todas las carpetas (como el índice en disco): un .svd nuevo en una subcarpeta
+    no cambia el mtime de la raíz.
+    """
+    repo = os.path.abspath(str(repo))
+    previo = _INDICES.get(repo)
+    if previo is not None:
+        return previo.refrescar()
+    indice = IndiceSVD(repo, carpeta_cache)
+    _INDICES[repo] = indice
+    return indice
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Uso: python M_indice_svd.py repo_svd [DISPOSITIVO ...]")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    indice = IndiceSVD(sys.argv[1])
+    print(f"[INFO] {len(indice)} archivos SVD ({time.perf_counter() - t0:.3f} s)")
+    for dispositivo in sys.argv[2:]:
+        print(f"  {dispositivo} -> {indice.buscar(dispositivo)}")
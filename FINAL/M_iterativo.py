@@ -2,6 +2,9 @@ import os
 import pandas as pd
 import streamlit as st
 
+from M_almacen_snapshots import cargar_snapshots, a_hex, existe_fase
+from M_catalogo import CatalogoCampanias
+
 
 # =====================================================
 # Función para detectar todas las campañas
@@ -9,9 +12,18 @@ import streamlit as st
 def obtener_todas_las_campanas():
     """
     Regresa todas las carpetas campaign_ ordenadas por fecha.
+    Usa el catálogo SQLite (M_catalogo); si no está disponible, recorre la carpeta.
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
+    try:
+        with CatalogoCampanias(base_dir) as catalogo:
+            catalogo.ingerir_carpeta()
+            catalogo.depurar()
+            return catalogo.campanias()["nombre"].tolist()
+    except Exception as e:
+        print(f"[WARNING] Catálogo de campañas no disponible: {e}")
+
     campañas = [
         d for d in os.listdir(base_dir)
         if d.startswith("campaign_") and os.path.isdir(os.path.join(base_dir, d))
@@ -30,13 +42,14 @@ def cargar_campana(nombre):
     base_dir = os.path.dirname(os.path.abspath(__file__))
     ruta = os.path.join(base_dir, nombre)
 
-    gold_path = os.path.join(ruta, "snapshots_gold.csv")
-    after_path = os.path.join(ruta, "snapshots_after_stable.csv")
     fault_path = os.path.join(ruta, "faults_log.csv")
     analisis_path = os.path.join(ruta, "analisis_avanzado.csv")
 
-    gold = pd.read_csv(gold_path)
-    after = pd.read_csv(after_path)
+    # Snapshots binarios (M_almacen_snapshots), mostrados en hexadecimal;
+    # vacíos si la política de captura de la campaña no los guarda
+    gold = a_hex(cargar_snapshots(ruta, "gold")) if existe_fase(ruta, "gold") else pd.DataFrame(columns=["Fault_ID"])
+    after = (a_hex(cargar_snapshots(ruta, "after_stable")) if existe_fase(ruta, "after_stable")
+             else pd.DataFrame(columns=["Fault_ID"]))
     faultlog = pd.read_csv(fault_path)
     analisis = pd.read_csv(analisis_path)
 
@@ -80,6 +93,12 @@ def resumen():
     gold, after, faultlog, analisis, ruta = cargar_campana(seleccion)
     st.sidebar.success(f"Campaña cargada: {seleccion}")
 
+    # -------------------------------------------------
+    # Consulta entre campañas (catálogo SQLite)
+    # -------------------------------------------------
+    st.sidebar.header("🔎 Buscar entre campañas")
+    direccion = st.sidebar.text_input("Dirección de inyección (hex)", "")
+
     # -------------------------------------------------
     # Resumen técnico
     # -------------------------------------------------
@@ -96,6 +115,14 @@ def resumen():
     col3.metric("Propagadas", propagadas)
     col4.metric("No aplicadas", no_aplicadas)
 
+    if direccion.strip():
+        st.header(f"Fallas en {direccion.strip()} (todas las campañas)")
+        try:
+            with CatalogoCampanias() as catalogo:
+                st.dataframe(catalogo.fallas(direccion=direccion.strip()).astype(str), use_container_width=True)
+        except Exception as e:
+            st.error(f"No se pudo consultar el catálogo: {e}")
+
     # -------------------------------------------------
     # Gráficos
     # -------------------------------------------------
@@ -149,7 +176,7 @@ def resumen():
     # GOLD
     gold_match = gold[gold["Fault_ID"] == fid]
     if gold_match.empty:
-        st.error("No existe snapshot GOLD para este Fault_ID")
+        st.error("No existe snapshot GOLD para este Fault_ID (o la política de captura no guarda snapshots)")
         return
     gold_row = gold_match.iloc[0]
 
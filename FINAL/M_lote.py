@@ -0,0 +1,261 @@
+#------------------------MODULO DE EJECUCION POR LOTES-------------------------------#
+"""
+M_lote.py
+
+Ejecución desatendida (sin GUI ni Streamlit) de una cola de campañas.
+
+La cola es un JSON con valores comunes y una lista de campañas:
+
+    {
+      "comun": {
+        "elf_flash": "LED/Debug/LED.elf",   "map_flash": "LED/Debug/LED.map",
+        "elf_ram": "RAM/Debug/RAM.elf",     "map_ram": "RAM/Debug/RAM.map",
+        "microcontrolador": "stm32f407g-disc1"
+      },
+      "campanias": [
+        {"nombre": "gpiod_ram", "modo": "pseudo", "periferico": "GPIOD",
+         "numero_fallas": 100, "ubicacion": "RAM", "tipo_falla": "todos"},
+        {"nombre": "flash", "modo": "pseudo_flash", "periferico": "GPIOD",
+         "numero_fallas": 50, "ubicacion": "flash", "tipo_falla": "bitflip"},
+        {"nombre": "replay", "modo": "reproducir_csv", "csv": "fallas_nocturnas.csv"}
+      ]
+    }
+
+Modos: pseudo, pseudo_flash, reproducir_csv, emulado, cribado.
+Cada campaña puede indicar "politica" (nivel o dict de M_politica_captura), p.ej.
+    "politica": {"nivel": "estandar", "regiones": [{"nombre": "pila", "pila": 64}]}
+    "politica": {"nivel": "estandar", "perifericos": ["GPIOD", "RCC"]}
+Cada campaña puede indicar "semilla" (lista de fallas reproducible, y reutilizable de
+cache_etapas/ si nada cambió) y "exportar_csv": true para dejar además
+DIRECCIONES_EJECUTABLE.csv y LISTA_FALLAS_PERIFERICO.csv.
+Las rutas relativas se resuelven respecto a la carpeta del archivo de cola.
+
+Entre campañas se reutilizan:
+    - la sesión de la sonda (broker de sondas, M_broker_sondas),
+    - las salidas de las etapas ELF/SVD/generador, por hash de sus entradas (M_cache_etapas),
+    - los snapshots GOLDEN ya medidos (ACOPLADO.artefactos).
+
+Cada campaña deja resumen.json en su carpeta y el lote completo un
+resumen_lote_YYYYmmdd_HHMMSS.json. El código de salida es 1 si alguna campaña falló.
+
+Uso:
+    python M_lote.py cola.json
+    python M_lote.py cola.json --sin-broker --detener-en-error
+"""
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")   # sin ventanas de matplotlib
+
+import argparse
+import json
+import shutil
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from M_acomplado2 import ACOPLADO
+from M_analizador import resolver_estado_final
+from M_broker_sondas import asegurar_broker
+
+MODOS = ('pseudo', 'pseudo_flash', 'reproducir_csv', 'emulado', 'cribado')
+
+# Valores por defecto de ACOPLADO para entradas que no los necesitan (p.ej. reproducir_csv)
+VALORES_DEFECTO = {
+    "periferico": "GENERAL",
+    "numero_fallas": 0,
+    "ubicacion": "RAM",
+    "tipo_falla": "todos",
+}
+
+RUTAS = ('elf_flash', 'map_flash', 'elf_ram', 'map_ram', 'csv')
+
+
+# ---------- cola ----------
+def cargar_cola(ruta_cola):
+    """Devuelve la lista de definiciones de campaña con 'comun' ya aplicado y rutas absolutas."""
+    ruta_cola = Path(ruta_cola).resolve()
+    with open(ruta_cola) as f:
+        datos = json.load(f)
+
+    if isinstance(datos, list):
+        comun, campanias = {}, datos
+    else:
+        comun, campanias = datos.get("comun", {}), datos.get("campanias", [])
+
+    cola = []
+    for i, entrada in enumerate(campanias, start=1):
+        definicion = {**VALORES_DEFECTO, **comun, **entrada}
+        definicion.setdefault("nombre", f"campania_{i}")
+        definicion.setdefault("modo", "reproducir_csv" if "csv" in definicion else "pseudo")
+        if definicion["modo"] not in MODOS:
+            raise ValueError(f"[ERROR] Modo desconocido en '{definicion['nombre']}': {definicion['modo']}")
+        for clave in RUTAS:
+            if definicion.get(clave):
+                definicion[clave] = str((ruta_cola.parent / definicion[clave]).resolve())
+        cola.append(definicion)
+    return cola
+
+
+# ---------- resumen por campaña ----------
+def _carpetas_campania(base_dir):
+    return {str(p) for p in Path(base_dir).glob("campaign_*") if p.is_dir()}
+
+
+def resumir_campania(camp_dir):
+    """Conteos legibles por máquina a partir de los CSV de una carpeta de campaña."""
+    resumen = {"campaign_dir": camp_dir}
+
+    log_csv = os.path.join(camp_dir, "faults_log.csv")
+    if os.path.exists(log_csv):
+        faultlog = pd.read_csv(log_csv)
+        ids = faultlog["Fault_ID"].unique()
+        estados = [resolver_estado_final(faultlog, fid) for fid in ids]
+        resumen["fallas"] = int(len(ids))
+        resumen["estados"] = {e: estados.count(e) for e in sorted(set(estados))}
+
+    analisis_csv = os.path.join(camp_dir, "analisis_avanzado.csv")
+    if os.path.exists(analisis_csv):
+        analisis = pd.read_csv(analisis_csv)
+        resumen["clasificacion"] = {k: int(v) for k, v in analisis["Clasificacion"].value_counts().items()}
+
+    resumen["archivos"] = sorted(os.listdir(camp_dir))
+    return resumen
+
+
+# ---------- ejecutor ----------
+class EjecutorLote:
+    def __init__(self, ruta_cola, usar_broker=True, detener_en_error=False, salida=None):
+        """
+        ruta_cola: archivo JSON con la cola de campañas
+        usar_broker: mantiene la sonda abierta entre campañas (M_broker_sondas)
+        detener_en_error: corta la cola en la primera campaña fallida
+        salida: carpeta del resumen del lote (por defecto, la de la cola)
+        """
+        self.ruta_cola = Path(ruta_cola).resolve()
+        self.cola = cargar_cola(self.ruta_cola)
+        self.detener_en_error = detener_en_error
+        self.salida = Path(salida) if salida else self.ruta_cola.parent
+        self.broker = asegurar_broker() if usar_broker else None
+
+        # Compartido por todas las instancias de ACOPLADO del lote
+        self.artefactos = {}
+        self.resultados = []
+
+    def _acoplado(self, d):
+        return ACOPLADO(
+            elf_flash=d["elf_flash"],
+            map_flash=d.get("map_flash", ""),
+            elf_ram=d.get("elf_ram", ""),
+            map_ram=d.get("map_ram", ""),
+            microcontrolador=d["microcontrolador"],
+            periferico=d["periferico"],
+            numero_fallas=int(d["numero_fallas"]),
+            ubicacion=d["ubicacion"],
+            tipo_falla=d["tipo_falla"],
+            broker=self.broker,
+            artefactos=self.artefactos,
+            politica=d.get("politica"),
+            semilla=d.get("semilla"),
+            exportar_csv=bool(d.get("exportar_csv", False))
+        )
+
+    def _ejecutar_una(self, d):
+        acop = self._acoplado(d)
+        if d.get("opts"):
+            acop.opts.update(d["opts"])
+
+        modo = d["modo"]
+        if modo == "pseudo":
+            acop.pseudo(abrir_gui=False)
+        elif modo == "pseudo_flash":
+            acop.pseudo_flash(abrir_gui=False)
+        elif modo == "reproducir_csv":
+            # GOLDEN y el analizador buscan la última campaña junto a este módulo: el CSV se copia
+            # ahí para que la carpeta de campaña del inyector se cree en el mismo sitio
+            ruta_csv = acop.out_dir / "LISTA_REPRODUCCION.csv"
+            shutil.copyfile(d["csv"], ruta_csv)
+            acop.reproducir_csv(ruta_csv, abrir_gui=False)
+        elif modo == "emulado":
+            acop.emulado(abrir_gui=False, max_procesos=d.get("max_procesos"))
+        elif modo == "cribado":
+            acop.cribado(abrir_gui=False, fraccion_calibracion=d.get("fraccion_calibracion", 0.05),
+                         max_procesos=d.get("max_procesos"))
+
+    def ejecutar(self):
+        print(f"[INFO] ===== LOTE: {len(self.cola)} campañas desde {self.ruta_cola} =====")
+        base_dir = Path(__file__).resolve().parent
+        inicio_lote = datetime.now()
+
+        for n, d in enumerate(self.cola, start=1):
+            print(f"\n[INFO] ----- Campaña {n}/{len(self.cola)}: {d['nombre']} ({d['modo']}) -----")
+            resultado = {"nombre": d["nombre"], "modo": d["modo"],
+                         "inicio": datetime.now().isoformat(timespec="seconds")}
+            previas = _carpetas_campania(base_dir)
+            t0 = time.time()
+            try:
+                self._ejecutar_una(d)
+            except Exception as e:
+                resultado["error"] = str(e)
+                resultado["traceback"] = traceback.format_exc()
+                print(f"[ERROR] Campaña '{d['nombre']}' falló: {e}")
+            resultado["segundos"] = round(time.time() - t0, 2)
+
+            # ACOPLADO captura los errores de cada etapa: el resultado se juzga por lo generado
+            nuevas = sorted(_carpetas_campania(base_dir) - previas, key=os.path.getmtime)
+            resultado["campanias"] = [resumir_campania(c) for c in nuevas]
+            completas = [c for c in resultado["campanias"] if "clasificacion" in c]
+            if "error" in resultado or not nuevas:
+                resultado["estado"] = "error"
+            elif len(completas) == len(nuevas):
+                resultado["estado"] = "ok"
+            else:
+                resultado["estado"] = "incompleta"
+
+            for c in resultado["campanias"]:
+                with open(os.path.join(c["campaign_dir"], "resumen.json"), "w") as f:
+                    json.dump({**{k: v for k, v in resultado.items() if k != "campanias"}, **c},
+                              f, indent=2, ensure_ascii=False)
+
+            self.resultados.append(resultado)
+            print(f"[INFO] Campaña '{d['nombre']}': {resultado['estado']} ({resultado['segundos']} s)")
+            if resultado["estado"] != "ok" and self.detener_en_error:
+                print("[WARNING] Lote detenido por error (--detener-en-error).")
+                break
+
+        return self.guardar_resumen(inicio_lote)
+
+    def guardar_resumen(self, inicio_lote):
+        resumen = {
+            "cola": str(self.ruta_cola),
+            "inicio": inicio_lote.isoformat(timespec="seconds"),
+            "fin": datetime.now().isoformat(timespec="seconds"),
+            "broker": list(self.broker) if self.broker else None,
+            "total": len(self.cola),
+            "ejecutadas": len(self.resultados),
+            "ok": sum(r["estado"] == "ok" for r in self.resultados),
+            "campanias": self.resultados,
+        }
+        self.salida.mkdir(parents=True, exist_ok=True)
+        ruta = self.salida / f"resumen_lote_{inicio_lote.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(ruta, "w") as f:
+            json.dump(resumen, f, indent=2, ensure_ascii=False)
+        print(f"\n[INFO] Lote terminado: {resumen['ok']}/{resumen['total']} campañas OK")
+        print(f"[INFO] Resumen del lote guardado en: {ruta}")
+        return resumen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ejecución desatendida de una cola de campañas")
+    parser.add_argument("cola", help="archivo JSON con la cola de campañas")
+    parser.add_argument("--sin-broker", action="store_true", help="abrir sesiones directas en cada etapa")
+    parser.add_argument("--detener-en-error", action="store_true", help="cortar la cola en el primer fallo")
+    parser.add_argument("--salida", default=None, help="carpeta para resumen_lote_*.json")
+    args = parser.parse_args()
+
+    lote = EjecutorLote(args.cola, usar_broker=not args.sin_broker,
+                        detener_en_error=args.detener_en_error, salida=args.salida)
+    resumen = lote.ejecutar()
+    sys.exit(0 if resumen["ok"] == resumen["total"] else 1)
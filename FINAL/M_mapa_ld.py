@@ -0,0 +1,252 @@
+#------------------------MODULO MAPA DEL ENLAZADOR (GNU ld .map)-------------------------------#
+"""
+M_mapa_ld.py
+
+Parser del archivo .map de GNU ld. Se lee línea a línea (sin readlines) y se construye:
+
+    regiones             Memory Configuration: nombre, origen, longitud, atributos
+    secciones_salida     .text, .data, .bss... con dirección, tamaño y dirección de carga
+    secciones_entrada    cada sección de entrada con su objeto de origen (main.o,
+                         libc.a(lib_a-memcpy.o)...) y la sección de salida a la que va
+    simbolos             símbolos del mapa; el tamaño sale del siguiente símbolo de la
+                         misma sección de entrada (o de su final)
+
+Las secciones de entrada y los símbolos van a índices de intervalos
+(M_indice_direcciones.TablaIntervalos): "¿qué .o / qué símbolo tiene esta dirección?"
+es una búsqueda binaria, también por lotes con ubicar().
+
+Cache: como el modelo ELF, en cache_elf/<sha256>.map.json por contenido, y mapa_ld(ruta)
+devuelve el mismo objeto en el proceso mientras el archivo no cambie.
+"""
+import json
+import os
+import re
+
+import numpy as np
+
+from M_indice_direcciones import TablaIntervalos
+from M_modelo_elf import CARPETA_CACHE, hash_archivo
+
+VERSION_CACHE = 1
+
+# Secciones de salida que no ocupan memoria del MCU (aunque el mapa les dé dirección 0)
+NO_CARGADAS = ('.debug', '.comment', '.ARM.attributes', '.stab', '.line', '.gnu.attributes')
+
+_HEX = r'0x([0-9a-fA-F]+)'
+RE_REGION = re.compile(rf'^(\S+)\s+{_HEX}\s+{_HEX}(?:\s+(\S+))?\s*$')
+RE_SECCION = re.compile(rf'^(\S+)\s+{_HEX}\s+{_HEX}(?:\s+(.*?))?\s*$')
+RE_CONTINUACION = re.compile(rf'^\s+{_HEX}\s+{_HEX}(?:\s+(.*?))?\s*$')
+RE_SIMBOLO = re.compile(rf'^\s+{_HEX}\s+([A-Za-z_.$][\w.$]*)\s*$')
+RE_CARGA = re.compile(rf'load address {_HEX}')
+
+# ruta absoluta -> (mtime, tamaño, MapaLd)
+_MAPAS = {}
+
+
+# ---------- parser ----------
+def _parsear(lineas):
+    """Recorre el .map una vez; devuelve el dict serializable (regiones, secciones, símbolos)."""
+    regiones, salida, entrada, simbolos = [], [], [], []
+    estado = None            # None / 'memoria' / 'mapa'
+    pendiente = None         # nombre de sección largo: los valores vienen en la línea siguiente
+    sal_actual = None        # sección de salida en curso
+
+    def agregar_seccion(nombre, direccion, tamano, resto, es_salida):
+        nonlocal sal_actual
+        if es_salida:
+            carga = RE_CARGA.search(resto or '')
+            sal_actual = {'nombre': nombre, 'direccion': direccion, 'tamano': tamano,
+                          'carga': int(carga.group(1), 16) if carga else None}
+            salida.append(sal_actual)
+        elif nombre != '*fill*' and tamano and sal_actual is not None \
+                and not sal_actual['nombre'].startswith(NO_CARGADAS):
+            entrada.append({'nombre': nombre, 'direccion': direccion, 'tamano': tamano,
+                            'objeto': (resto or '').strip(), 'salida': sal_actual['nombre']})
+
+    for linea in lineas:
+        linea = linea.rstrip('\r\n')
+        if linea.startswith('Memory Configuration'):
+            estado = 'memoria'
+            continue
+        if linea.startswith('Linker script and memory map'):
+            estado = 'mapa'
+            continue
+        if linea.startswith('Cross Reference Table'):
+            break
+        if estado == 'memoria':
+            m = RE_REGION.match(linea)
+            if m and m.group(1) != '*default*':
+                regiones.append({'nombre': m.group(1), 'origen': int(m.group(2), 16),
+                                 'longitud': int(m.group(3), 16), 'atributos': m.group(4) or ''})
+            continue
+        if estado != 'mapa' or not linea.strip():
+            continue
+
+        if pendiente is not None:
+            m = RE_CONTINUACION.match(linea)
+            nombre, es_salida = pendiente
+            pendiente = None
+            if m:
+                agregar_seccion(nombre, int(m.group(1), 16), int(m.group(2), 16), m.group(3), es_salida)
+                continue
+
+        es_salida = not linea[0].isspace()
+        es_entrada = linea.startswith(' ') and len(linea) > 1 and not linea[1].isspace()
+        if es_salida or es_entrada:
+            texto = linea.strip()
+            if texto.startswith(('*(', 'LOAD ', 'START GROUP', 'END GROUP', 'OUTPUT(', 'KEEP')) \
+                    or '(' in texto.split()[0] and not texto.startswith('COMMON'):
+                continue
+            m = RE_SECCION.match(texto)
+            if m:
+                agregar_seccion(m.group(1), int(m.group(2), 16), int(m.group(3), 16), m.group(4), es_salida)
+            elif len(texto.split()) == 1:
+                pendiente = (texto, es_salida)
+            continue
+
+        m = RE_SIMBOLO.match(linea)
+        if m and entrada and sal_actual is not None:
+            simbolos.append([m.group(2), int(m.group(1), 16), len(entrada) - 1])
+
+    return {'version': VERSION_CACHE, 'regiones': regiones, 'secciones_salida': salida,
+            'secciones_entrada': entrada, 'simbolos': _tamanos_simbolos(simbolos, entrada)}
+
+
+def _tamanos_simbolos(simbolos, entrada):
+    """[nombre, dirección, tamaño, objeto]: tamaño = hasta el siguiente símbolo de la misma sección."""
+    por_seccion = {}
+    for nombre, direccion, i_sec in simbolos:
+        sec = entrada[i_sec]
+        # El símbolo se listó después de la sección, pero puede pertenecer a otra (alias de enlazador)
+        if sec['direccion'] <= direccion < sec['direccion'] + sec['tamano']:
+            por_seccion.setdefault(i_sec, []).append((direccion, nombre))
+    resultado = []
+    for i_sec, lista in por_seccion.items():
+        sec = entrada[i_sec]
+        fin = sec['direccion'] + sec['tamano']
+        direcciones = sorted({d for d, _ in lista}) + [fin]
+        siguiente = {d: direcciones[i + 1] for i, d in enumerate(direcciones[:-1])}
+        for direccion, nombre in lista:
+            resultado.append([nombre, direccion, siguiente[direccion] - direccion, sec['objeto']])
+    return sorted(resultado, key=lambda s: s[1])
+
+
+# ---------- modelo ----------
+class MapaLd:
+    def __init__(self, ruta, carpeta_cache=CARPETA_CACHE):
+        self.ruta = os.path.abspath(str(ruta))
+        if not os.path.isfile(self.ruta):
+            raise FileNotFoundError(f"Archivo .map no encontrado: {self.ruta}")
+        self.hash = hash_archivo(self.ruta)
+        self.carpeta_cache = carpeta_cache
+
+        datos = self._leer_cache()
+        if datos is None:
+            print(f"[INFO] Analizando mapa del enlazador: {self.ruta}")
+            with open(self.ruta, 'r', errors='ignore') as f:
+                datos = _parsear(f)
+            self._guardar_cache(datos)
+        self.regiones = datos['regiones']
+        self.secciones_salida = datos['secciones_salida']
+        self.secciones_entrada = sorted(datos['secciones_entrada'],
+                                        key=lambda s: (s['direccion'], s['direccion'] + s['tamano'], s['objeto']))
+        self.simbolos = datos['simbolos']
+
+        # Índices (mismo orden que las listas: TablaIntervalos ordena igual)
+        self._tabla_entrada = TablaIntervalos([(s['direccion'], s['direccion'] + s['tamano'], s['objeto'])
+                                               for s in self.secciones_entrada])
+        self._tabla_simbolos = TablaIntervalos([(d, d + t, n) for n, d, t, _ in self.simbolos if t > 0])
+        self._salida = np.array([s['salida'] for s in self.secciones_entrada] + [""], dtype=object)
+        self._nombres = np.array([s['nombre'] for s in self.secciones_entrada] + [""], dtype=object)
+
+    # ---------- cache en disco ----------
+    def _ruta_cache(self):
+        return os.path.join(self.carpeta_cache, self.hash + '.map.json')
+
+    def _leer_cache(self):
+        try:
+            with open(self._ruta_cache()) as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return datos if datos.get('version') == VERSION_CACHE else None
+
+    def _guardar_cache(self, datos):
+        try:
+            os.makedirs(self.carpeta_cache, exist_ok=True)
+            tmp = self._ruta_cache() + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(datos, f)
+            os.replace(tmp, self._ruta_cache())
+        except OSError as e:
+            print(f"[WARNING] No se pudo guardar la cache del mapa: {e}")
+
+    # ---------- consultas ----------
+    def region(self, nombre):
+        return next((r for r in self.regiones if r['nombre'] == nombre), None)
+
+    def secciones_cargadas(self):
+        """Secciones de salida con tamaño dentro de alguna región de memoria."""
+        return [s for s in self.secciones_salida
+                if s['tamano'] and not s['nombre'].startswith(NO_CARGADAS)
+                and any(r['origen'] <= s['direccion'] < r['origen'] + r['longitud'] for r in self.regiones)]
+
+    def ubicar(self, direcciones):
+        """
+        Para un lote de direcciones: (seccion_salida, seccion_entrada, objeto, simbolo, offset)
+        como arrays numpy; "" / -1 donde no hay nada.
+        """
+        direcciones = np.asarray(direcciones, dtype=np.int64)
+        i_ent = self._tabla_entrada.buscar(direcciones)
+        i_sim = self._tabla_simbolos.buscar(direcciones)
+        inicios = self._tabla_simbolos.inicios
+        offsets = np.where(i_sim >= 0, direcciones - inicios[np.maximum(i_sim, 0)], -1) \
+            if len(inicios) else np.full(len(direcciones), -1, dtype=np.int64)
+        return self._salida[i_ent], self._nombres[i_ent], self._tabla_entrada.nombres[i_ent], \
+            self._tabla_simbolos.nombres[i_sim], offsets
+
+    def objeto_de(self, direccion):
+        """Archivo objeto que aporta la dirección, o None."""
+        return self._tabla_entrada.nombres[self._tabla_entrada.buscar([direccion])[0]] or None
+
+    def tamano_por_objeto(self, region=None):
+        """{objeto: bytes} (opcionalmente solo dentro de una región); para ponderar objetivos."""
+        r = self.region(region) if region else None
+        tamanos = {}
+        for s in self.secciones_entrada:
+            if r and not r['origen'] <= s['direccion'] < r['origen'] + r['longitud']:
+                continue
+            tamanos[s['objeto']] = tamanos.get(s['objeto'], 0) + s['tamano']
+        return dict(sorted(tamanos.items(), key=lambda x: -x[1]))
+
+
+def mapa_ld(ruta, carpeta_cache=CARPETA_CACHE):
+    """MapaLd memoizado en el proceso (se recarga si el archivo cambia)."""
+    ruta = os.path.abspath(str(ruta))
+    estado = os.stat(ruta)
+    previo = _MAPAS.get(ruta)
+    if previo and previo[0] == estado.st_mtime_ns and previo[1] == estado.st_size:
+        return previo[2]
+    mapa = MapaLd(ruta, carpeta_cache)
+    _MAPAS[ruta] = (estado.st_mtime_ns, estado.st_size, mapa)
+    return mapa
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Uso: python M_mapa_ld.py firmware.map [0xDIRECCION ...]")
+        sys.exit(1)
+    mapa = mapa_ld(sys.argv[1])
+    for r in mapa.regiones:
+        print(f"  {r['nombre']:<10} 0x{r['origen']:08X}  {r['longitud']:>8} bytes  {r['atributos']}")
+    print(f"[INFO] {len(mapa.secciones_salida)} secciones de salida, {len(mapa.secciones_entrada)} de entrada, "
+          f"{len(mapa.simbolos)} símbolos")
+    for objeto, tam in list(mapa.tamano_por_objeto().items())[:10]:
+        print(f"  {tam:>8}  {objeto}")
+    if len(sys.argv) > 2:
+        direcciones = [int(a, 16) for a in sys.argv[2:]]
+        for d, *info in zip(direcciones, *mapa.ubicar(direcciones)):
+            sal, ent, obj, sim, off = info
+            print(f"  0x{d:08X}  {sal or '-'}  {ent or '-'}  {obj or '-'}  {sim + f'+0x{off:x}' if sim else '-'}")
@@ -0,0 +1,235 @@
+#------------------------MODULO MODELO ELF COMPARTIDO-------------------------------#
+"""
+M_modelo_elf.py
+
+Un solo modelo del ELF para todos los módulos. Antes cada etapa volvía a abrir y
+analizar el mismo archivo en cada campaña (nm + objdump para stop_address dos veces por
+constructor de FaultInjector/GOLDEN, objdump otra vez para las direcciones ejecutables,
+pyelftools en metodo_pseudo_mems, el generador, MCU_RAM, el emulador...).
+El código se decodifica en el proceso (M_decodificador_thumb): no hace falta el toolchain.
+
+ElfModel carga el ELF una vez (mmap + pyelftools) y expone:
+    secciones, segmentos, simbolos, entrada
+    seccion(nombre), simbolo(nombre), rango_texto(), vector_base(), datos_segmento(seg)
+    indice_direcciones()               dirección -> (sección, símbolo, offset) por lotes
+    direcciones_ejecutables(seccion)   lista de direcciones de instrucción
+    bucle_principal()                  (salto, destino) del while(1) de main = stop_address
+
+Cache:
+    - en memoria: modelo_elf(ruta) devuelve el mismo objeto mientras el archivo no cambie
+    - en disco: cache_elf/<sha256>.json, por contenido; una segunda campaña sobre el
+      mismo firmware no vuelve a analizar nada
+"""
+import hashlib
+import json
+import mmap
+import os
+
+VERSION_CACHE = 2
+
+CARPETA_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache_elf")
+
+SHF_WRITE, SHF_ALLOC, SHF_EXECINSTR = 0x1, 0x2, 0x4
+
+# ruta absoluta -> (mtime, tamaño, ElfModel)
+_MODELOS = {}
+
+
+def hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class ElfModel:
+    def __init__(self, ruta, carpeta_cache=CARPETA_CACHE):
+        self.ruta = os.path.abspath(str(ruta))
+        if not os.path.isfile(self.ruta):
+            raise FileNotFoundError(f"Archivo ELF no encontrado: {self.ruta}")
+        self.hash = hash_archivo(self.ruta)
+        self.carpeta_cache = carpeta_cache
+        self._por_nombre = None
+        self._direcciones = {}
+        self._indice = None
+
+        datos = self._leer_cache()
+        if datos is None:
+            datos = self._analizar()
+            self._guardar_cache(datos)
+        self.entrada = datos['entrada']
+        self.secciones = datos['secciones']
+        self.segmentos = datos['segmentos']
+        self.simbolos = datos['simbolos']
+        self._bucle = False                          # False = aún no calculado
+
+    # ---------- análisis (una vez por contenido) ----------
+    def _analizar(self):
+        from elftools.elf.elffile import ELFFile
+        print(f"[INFO] Analizando ELF: {self.ruta}")
+        with open(self.ruta, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            elf = ELFFile(mm)
+            secciones = [{'nombre': s.name, 'direccion': s['sh_addr'], 'tamano': s['sh_size'],
+                          'flags': s['sh_flags'], 'tipo': s['sh_type'], 'offset': s['sh_offset']}
+                         for s in elf.iter_sections()]
+            segmentos = [{'tipo': s['p_type'], 'vaddr': s['p_vaddr'], 'paddr': s['p_paddr'],
+                          'offset': s['p_offset'], 'filesz': s['p_filesz'], 'memsz': s['p_memsz'],
+                          'flags': s['p_flags']}
+                         for s in elf.iter_segments()]
+            symtab = elf.get_section_by_name('.symtab')
+            simbolos = [[s.name, s['st_value'], s['st_size'], s['st_info']['type']]
+                        for s in (symtab.iter_symbols() if symtab else []) if s.name]
+            entrada = elf.header['e_entry']
+        return {'version': VERSION_CACHE, 'entrada': entrada, 'secciones': secciones,
+                'segmentos': segmentos, 'simbolos': simbolos}
+
+    # ---------- cache en disco ----------
+    def _ruta_cache(self, sufijo='.json'):
+        return os.path.join(self.carpeta_cache, self.hash + sufijo)
+
+    def _leer_cache(self):
+        try:
+            with open(self._ruta_cache()) as f:
+                datos = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return datos if datos.get('version') == VERSION_CACHE else None
+
+    def _guardar_cache(self, datos):
+        try:
+            os.makedirs(self.carpeta_cache, exist_ok=True)
+            tmp = self._ruta_cache('.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(datos, f)
+            os.replace(tmp, self._ruta_cache())
+        except OSError as e:
+            print(f"[WARNING] No se pudo guardar la cache del ELF: {e}")
+
+    # ---------- consultas ----------
+    def seccion(self, nombre):
+        return next((s for s in self.secciones if s['nombre'] == nombre), None)
+
+    def secciones_cargadas(self):
+        """Secciones con dirección y tamaño (las que ocupan memoria en el MCU)."""
+        return [s for s in self.secciones if s['direccion'] and s['tamano']]
+
+    def simbolo(self, nombre):
+        """(valor, tamaño, tipo) del primer símbolo con ese nombre, o None."""
+        if self._por_nombre is None:
+            self._por_nombre = {}
+            for n, valor, tamano, tipo in self.simbolos:
+                self._por_nombre.setdefault(n, (valor, tamano, tipo))
+        return self._por_nombre.get(nombre)
+
+    def rango_texto(self):
+        """(inicio, fin) inclusivo de .text, o None."""
+        s = self.seccion('.text')
+        if s and s['direccion'] and s['tamano']:
+            return s['direccion'], s['direccion'] + s['tamano'] - 1
+        return None
+
+    def seccion_que_contiene(self, direccion):
+        return next((s for s in self.secciones_cargadas()
+                     if s['direccion'] <= direccion < s['direccion'] + s['tamano']), None)
+
+    def seccion_de(self, direccion):
+        return self.indice_direcciones().seccion_de(direccion)
+
+    def indice_direcciones(self):
+        """Índice de intervalos sección/símbolo (M_indice_direcciones), construido una vez."""
+        if self._indice is None:
+            from M_indice_direcciones import IndiceDirecciones
+            self._indice = IndiceDirecciones.desde_modelo(self)
+        return self._indice
+
+    def vector_base(self, por_defecto=True):
+        """Dirección de .isr_vector; sin la sección, e_entry alineado (o None si por_defecto=False)."""
+        s = self.seccion('.isr_vector')
+        if s is not None:
+            return s['direccion']
+        return self.entrada & ~0xFF if por_defecto else None
+
+    def datos_segmento(self, segmento):
+        """Bytes del archivo de un segmento (p_filesz)."""
+        with open(self.ruta, 'rb') as f:
+            f.seek(segmento['offset'])
+            return f.read(segmento['filesz'])
+
+    def datos_seccion(self, seccion):
+        """Bytes del archivo de una sección (b'' si es NOBITS)."""
+        if seccion['tipo'] == 'SHT_NOBITS':
+            return b''
+        with open(self.ruta, 'rb') as f:
+            f.seek(seccion['offset'])
+            return f.read(seccion['tamano'])
+
+    def marcas_mapeo(self):
+        """Símbolos de mapeo ARM ($t código Thumb, $d datos) como [(dirección, marca)]."""
+        return [(valor, nombre) for nombre, valor, _, _ in self.simbolos
+                if nombre[:2] in ('$t', '$d', '$a') and (len(nombre) == 2 or nombre[2] == '.')]
+
+    def rango_funcion(self, nombre):
+        """(inicio, fin) inclusivo de una función (sin el bit Thumb), o (None, None)."""
+        simbolo = self.simbolo(nombre)
+        if simbolo is None:
+            return None, None
+        inicio = simbolo[0] & ~0x1
+        tamano = simbolo[1]
+        if not tamano:
+            # Sin tamaño en la tabla: hasta el final de su sección
+            sec = self.seccion_que_contiene(inicio)
+            tamano = sec['direccion'] + sec['tamano'] - inicio if sec else 2
+        return inicio, inicio + tamano - 1
+
+    # ---------- análisis de código (perezoso, en el proceso) ----------
+    def direcciones_ejecutables(self, seccion='.text'):
+        """Direcciones de instrucción de una sección de código (np.ndarray uint32)."""
+        if seccion not in self._direcciones:
+            from M_decodificador_thumb import direcciones_instrucciones
+            sec = self.seccion(seccion)
+            if sec is None:
+                print(f"[WARNING] Sección {seccion} no encontrada en {self.ruta}")
+                return direcciones_instrucciones(b'', 0)
+            self._direcciones[seccion] = direcciones_instrucciones(
+                self.datos_seccion(sec), sec['direccion'], self.marcas_mapeo())
+        return self._direcciones[seccion]
+
+    def bucle_principal(self):
+        """(dirección del salto, destino) del while(1) de main, o None si no hay."""
+        if self._bucle is False:
+            from M_decodificador_thumb import bucle_en_rango
+            inicio, fin = self.rango_funcion('main')
+            if inicio is None:
+                raise RuntimeError("No se encontró la función main.")
+            sec = self.seccion_que_contiene(inicio)
+            if sec is None:
+                raise RuntimeError("La función main no está en ninguna sección cargada.")
+            self._bucle = bucle_en_rango(self.datos_seccion(sec), sec['direccion'],
+                                         self.direcciones_ejecutables(sec['nombre']), inicio, fin)
+        return self._bucle
+
+
+def modelo_elf(ruta, carpeta_cache=CARPETA_CACHE):
+    """ElfModel memoizado en el proceso (se recarga si el archivo cambia)."""
+    ruta = os.path.abspath(str(ruta))
+    estado = os.stat(ruta)
+    previo = _MODELOS.get(ruta)
+    if previo and previo[0] == estado.st_mtime_ns and previo[1] == estado.st_size:
+        return previo[2]
+    modelo = ElfModel(ruta, carpeta_cache)
+    _MODELOS[ruta] = (estado.st_mtime_ns, estado.st_size, modelo)
+    return modelo
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Uso: python M_modelo_elf.py firmware.elf")
+        sys.exit(1)
+    m = modelo_elf(sys.argv[1])
+    print(f"[INFO] {m.ruta}  sha256={m.hash[:16]}...")
+    for s in m.secciones_cargadas():
+        print(f"  {s['nombre']:<16} 0x{s['direccion']:08X}  {s['tamano']:>8} bytes")
+    print(f"[INFO] {len(m.simbolos)} símbolos, {len(m.segmentos)} segmentos, vector_base=0x{m.vector_base():08X}")
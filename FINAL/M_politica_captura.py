@@ -0,0 +1,237 @@
+#------------------------MODULO POLITICA DE CAPTURA DE SNAPSHOTS-------------------------------#
+"""
+M_politica_captura.py
+
+Qué se lee del target en cada falla. Antes siempre se tomaban tres snapshots
+(before, after, after_stable) con todos los registros y una ventana fija; con una
+política se elige por campaña:
+
+    nivel:     'ninguno' | 'minimo' | 'estandar' | 'completo'  (valores base, ver NIVELES)
+    fases:     subconjunto de ('before', 'after', 'after_stable')
+    registros: True/False (PC, SP, LR, R0-R12)
+    ventanas:  bytes de la ventana de memoria por ubicación {'ram': 256, 'flash': 256, 'registro': 4}
+    regiones:  memoria extra en cada snapshot (columnas X_<nombre>_<i>):
+                 {"nombre": "pila",   "pila": 128}                     128 bytes desde SP
+                 {"nombre": "estado", "simbolo": "g_estado"}           símbolo del ELF (tamaño del símbolo)
+                 {"nombre": "GPIOD",  "direccion": 0x40020C00, "tamano": 32}
+    ram_completa: False | True (rango RAM-PARCIAL del ELF) | [inicio, fin]
+               lee toda la RAM en stop_address y guarda solo el diff contra GOLDEN
+               (M_propagacion_ram)
+    crc_objetivo: False | True (área libre tras .bss) | dirección
+               con ram_completa, el MCU calcula el CRC32 de cada bloque y solo se leen
+               por SWD los bloques distintos de GOLDEN (M_crc_objetivo)
+    perifericos: ['GPIOD', 'RCC', ...] banco de registros legibles de cada periférico según
+               el SVD (campo 'svd'); columnas X_<periférico>_<registro>, un bloque por
+               rango contiguo y sin registros con efectos al leerse (M_captura_perifericos)
+
+La política se guarda en campania.json (M_diario_campana); GOLDEN, el ejecutor emulado
+y el analizador la leen de ahí para capturar y comparar lo mismo.
+
+Ejemplo:
+    PoliticaCaptura('estandar', regiones=[{"nombre": "pila", "pila": 64}])
+"""
+import json
+import os
+
+# Valores base por nivel
+NIVELES = {
+    # Solo faults_log: clasificación por el estado del inyector
+    'ninguno':  {'fases': [], 'registros': False,
+                 'ventanas': {'ram': 4, 'flash': 4, 'registro': 4}},
+    # after_stable con registros y la palabra inyectada
+    'minimo':   {'fases': ['after_stable'], 'registros': True,
+                 'ventanas': {'ram': 4, 'flash': 4, 'registro': 4}},
+    # after_stable con la ventana completa (lo que usa el analizador)
+    'estandar': {'fases': ['after_stable'], 'registros': True,
+                 'ventanas': {'ram': 256, 'flash': 256, 'registro': 4}},
+    # comportamiento histórico: las tres fases
+    'completo': {'fases': ['before', 'after', 'after_stable'], 'registros': True,
+                 'ventanas': {'ram': 256, 'flash': 256, 'registro': 4}},
+}
+
+NIVEL_POR_DEFECTO = 'completo'
+
+FASES_CAPTURA = ('before', 'after', 'after_stable')
+
+# Tamaño máximo de una región tomada de un símbolo del ELF (bytes)
+MAX_REGION = 1024
+
+
+class PoliticaCaptura:
+    def __init__(self, nivel=NIVEL_POR_DEFECTO, fases=None, registros=None, ventanas=None, regiones=None,
+                 ram_completa=False, crc_objetivo=False, perifericos=None, svd=None):
+        if nivel not in NIVELES:
+            raise ValueError(f"[ERROR] Nivel de captura desconocido: {nivel} (válidos: {', '.join(NIVELES)})")
+        base = NIVELES[nivel]
+        self.nivel = nivel
+        self.fases = [f for f in (base['fases'] if fases is None else fases) if f in FASES_CAPTURA]
+        self.registros = base['registros'] if registros is None else bool(registros)
+        self.ventanas = {**base['ventanas'], **{k.lower(): int(v) for k, v in (ventanas or {}).items()}}
+        self.regiones = [dict(r) for r in (regiones or [])]
+        self.ram_completa = list(ram_completa) if isinstance(ram_completa, (list, tuple)) else bool(ram_completa)
+        self.crc_objetivo = crc_objetivo if isinstance(crc_objetivo, bool) else int(crc_objetivo)
+        self.perifericos = [str(p).upper() for p in (perifericos or [])]
+        self.svd = str(svd) if svd else None
+
+    # ---------- consultas ----------
+    def incluye(self, fase):
+        return fase in self.fases
+
+    def ventana(self, ubicacion):
+        """Bytes de la ventana de memoria para una ubicación (múltiplo de 4, al menos 4)."""
+        tam = self.ventanas.get((ubicacion or '').lower(), 4)
+        return max(4, (tam + 3) // 4 * 4)
+
+    def palabras_memoria(self, lista_fallas):
+        """Columnas MEM_i necesarias: la ventana más grande de las ubicaciones de la lista."""
+        ubicaciones = {(f.ubicacion or '').lower() for f in lista_fallas}
+        return max([self.ventana(u) // 4 for u in ubicaciones] or [1])
+
+    def columnas_extra(self):
+        cols = []
+        for r in self.regiones:
+            if 'registros' in r:
+                cols += [f"X_{r['nombre']}_{reg}" for reg in r['registros']]
+            else:
+                cols += [f"X_{r['nombre']}_{i}" for i in range(self._tamano(r) // 4)]
+        return cols
+
+    def columnas_perifericos(self):
+        """Columnas X_ que vienen de bancos de registros de periféricos."""
+        return [f"X_{r['nombre']}_{reg}" for r in self.regiones if 'registros' in r for reg in r['registros']]
+
+    def firma(self, ubicacion):
+        """Lo que determina el contenido de un snapshot de esa ubicación (clave de la cache GOLDEN)."""
+        return (self.ventana(ubicacion), self.registros, json.dumps(self.regiones, sort_keys=True))
+
+    # ---------- regiones extra ----------
+    @staticmethod
+    def _tamano(region):
+        if 'bloques' in region:
+            return 4 * sum(n for _, n in region['bloques'])
+        tam = region.get('pila', region.get('tamano', 4))
+        return max(4, min(int(tam), MAX_REGION) // 4 * 4)
+
+    def resolver_simbolos(self, elf_path):
+        """Completa dirección/tamaño de las regiones dadas por símbolo a partir del ELF."""
+        pendientes = [r for r in self.regiones if 'simbolo' in r and 'direccion' not in r]
+        if not pendientes or not elf_path:
+            return
+        try:
+            from M_modelo_elf import modelo_elf
+            elf = modelo_elf(elf_path)
+            for r in pendientes:
+                simbolo = elf.simbolo(r['simbolo'])
+                if not simbolo:
+                    print(f"[WARNING] Símbolo '{r['simbolo']}' no encontrado en {elf_path}: región omitida")
+                    continue
+                r['direccion'] = simbolo[0]
+                r.setdefault('tamano', simbolo[1] or 4)
+        except Exception as e:
+            print(f"[WARNING] No se pudieron resolver los símbolos de las regiones extra: {e}")
+        self.regiones = [r for r in self.regiones if 'pila' in r or 'direccion' in r]
+
+    def resolver_perifericos(self, svd_path=None):
+        """Convierte 'perifericos' en regiones con bloques de lectura a partir del SVD."""
+        hechos = {r.get('periferico') for r in self.regiones}
+        pendientes = [p for p in self.perifericos if p not in hechos]
+        self.svd = self.svd or (str(svd_path) if svd_path else None)
+        if not pendientes:
+            return
+        if not self.svd:
+            print(f"[WARNING] Sin archivo SVD: periféricos {pendientes} no se capturan")
+            return
+        try:
+            from M_captura_perifericos import regiones_perifericos
+            self.regiones += regiones_perifericos(self.svd, pendientes)
+        except Exception as e:
+            print(f"[WARNING] No se pudieron resolver los periféricos desde {self.svd}: {e}")
+
+    def resolver_ram(self, elf_path):
+        """Con ram_completa=True fija el rango RAM-PARCIAL del ELF; devuelve (inicio, fin) o None."""
+        if self.ram_completa is True:
+            from M_propagacion_ram import rango_ram
+            rango = rango_ram(elf_path) if elf_path else None
+            if rango is None:
+                print("[WARNING] No se pudo determinar el rango de RAM: captura de RAM completa desactivada")
+                self.ram_completa = False
+            else:
+                self.ram_completa = [int(rango[0]), int(rango[1])]
+        return tuple(self.ram_completa) if self.ram_completa else None
+
+    def resolver_crc(self, elf_path):
+        """Con crc_objetivo=True fija el área de trabajo de la rutina CRC; devuelve la dirección o None."""
+        if self.crc_objetivo is True:
+            from M_crc_objetivo import direccion_trabajo
+            try:
+                self.crc_objetivo = direccion_trabajo(elf_path) or False
+            except Exception as e:
+                print(f"[WARNING] No se pudo ubicar el área de la rutina CRC: {e}")
+                self.crc_objetivo = False
+        return self.crc_objetivo if self.crc_objetivo is not False else None
+
+    def leer_regiones(self, core, registros):
+        """dict {X_<nombre>_<i>: valor} de las regiones extra (0 si no se pueden leer)."""
+        valores = {}
+        for r in self.regiones:
+            if 'bloques' in r:
+                from M_captura_perifericos import leer_bloques
+                valores.update(zip([f"X_{r['nombre']}_{reg}" for reg in r['registros']], leer_bloques(core, r)))
+                continue
+            palabras = self._tamano(r) // 4
+            if 'pila' in r:
+                inicio = (registros.get('sp') or 0) & ~0x3
+            else:
+                inicio = int(r['direccion']) & ~0x3
+            try:
+                datos = core.read_memory_block32(inicio, palabras) if inicio else [0] * palabras
+            except Exception:
+                datos = [0] * palabras
+            for i, v in enumerate(datos):
+                valores[f"X_{r['nombre']}_{i}"] = v
+        return valores
+
+    # ---------- serialización ----------
+    def a_dict(self):
+        return {'nivel': self.nivel, 'fases': self.fases, 'registros': self.registros,
+                'ventanas': self.ventanas, 'regiones': self.regiones, 'ram_completa': self.ram_completa,
+                'crc_objetivo': self.crc_objetivo, 'perifericos': self.perifericos, 'svd': self.svd}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        return cls(datos.get('nivel', NIVEL_POR_DEFECTO), datos.get('fases'), datos.get('registros'),
+                   datos.get('ventanas'), datos.get('regiones'), datos.get('ram_completa', False),
+                   datos.get('crc_objetivo', False), datos.get('perifericos'), datos.get('svd'))
+
+    def __repr__(self):
+        return f"PoliticaCaptura({self.nivel}, fases={self.fases}, ventanas={self.ventanas})"
+
+
+def politica_desde(valor):
+    """Acepta None (por defecto), un nombre de nivel, un dict o una PoliticaCaptura."""
+    if valor is None:
+        return PoliticaCaptura()
+    if isinstance(valor, PoliticaCaptura):
+        return valor
+    if isinstance(valor, str):
+        return PoliticaCaptura(valor)
+    return PoliticaCaptura.desde_dict(valor)
+
+
+def leer_politica(campaign_dir):
+    """Política guardada en campania.json; la histórica ('completo') si no hay."""
+    try:
+        with open(os.path.join(campaign_dir, "campania.json")) as f:
+            datos = json.load(f).get('politica')
+    except (OSError, ValueError, TypeError):
+        datos = None
+    return politica_desde(datos)
+
+
+if __name__ == '__main__':
+    for nivel in NIVELES:
+        p = PoliticaCaptura(nivel)
+        print(f"{nivel:9s} fases={p.fases} registros={p.registros} ventanas={p.ventanas}")
+    p = PoliticaCaptura('estandar', regiones=[{"nombre": "pila", "pila": 64},
+                                             {"nombre": "GPIOD", "direccion": 0x40020C00, "tamano": 32}])
+    print(p, p.columnas_extra()[:3], len(p.columnas_extra()))
@@ -0,0 +1,339 @@
+#------------------------MODULO PROPAGACION EN TODA LA RAM-------------------------------#
+"""
+M_propagacion_ram.py
+
+La comparación GOLD vs AFTER_STABLE solo ve la ventana alrededor de la dirección
+inyectada. Con la política de captura 'ram_completa' (M_politica_captura) se lee además
+toda la RAM usada por el programa (rango RAM-PARCIAL de metodo_pseudo_mems) al llegar a
+stop_address y se compara contra la imagen GOLDEN con numpy (XOR + conteo de bits).
+
+Solo se guarda el diff disperso, nunca la imagen de cada falla:
+    ram_gold.npy              imagen GOLDEN (una por campaña, ELF principal)
+    ram_gold.json             rango leído
+    ram_diff.d32              registros crudos durante la campaña:
+                              Fault_ID, Fault_ID, n, (palabra, xor) * n
+    ram_diff.npz              filas (Fault_ID, Fault_ID, inicio, n) + pares (palabra, xor)
+                              (mismo formato que los snapshots delta de M_almacen_snapshots)
+    propagacion_ram.csv       métricas por falla: palabras y bits corruptos, símbolos afectados
+
+Con huellas CRC (política crc_objetivo, M_crc_objetivo) el MCU calcula el CRC32 de cada
+bloque de PALABRAS_BLOQUE palabras y por SWD solo se leen los bloques cuya huella no
+coincide con la de la imagen GOLDEN. En la primera falla se cronometran ambos modos y,
+si la rutina resulta más lenta que leer la RAM completa (MCU lento, sonda rápida), se
+deja de usar.
+
+Las fallas FLASH corren sobre el ELF de RAM (otra imagen de memoria) y no se comparan.
+
+Uso:
+    python M_propagacion_ram.py [carpeta_campaña]     # resumen de la propagación
+"""
+import csv
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from M_almacen_snapshots import DTYPE, _leer_raw_delta, _unir_delta, _cargar_npz
+from M_crc_objetivo import CRCObjetivo, huellas_imagen
+
+# Palabras por lectura en bloque (4 KiB): una lectura fallida solo pierde ese bloque
+PALABRAS_BLOQUE = 1024
+
+ARCHIVO_GOLD = "ram_gold.npy"
+ARCHIVO_GOLD_META = "ram_gold.json"
+ARCHIVO_DIFF_RAW = "ram_diff.d32"
+ARCHIVO_DIFF = "ram_diff.npz"
+ARCHIVO_METRICAS = "propagacion_ram.csv"
+
+COLUMNAS_METRICAS = ['Fault_ID', 'Palabras_Corruptas', 'Bits_Corruptos', 'Simbolos_Afectados']
+
+SIN_SIMBOLO = "<sin_simbolo>"
+
+
+# ---------- rango de RAM ----------
+def _rango_secciones(elf_path):
+    """Secciones escribibles cargadas en memoria (.data, .bss, heap/stack)."""
+    from M_modelo_elf import modelo_elf, SHF_WRITE, SHF_ALLOC
+    inicio = fin = None
+    for sec in modelo_elf(elf_path).secciones:
+        flags = sec['flags']
+        if not (flags & SHF_WRITE and flags & SHF_ALLOC) or sec['tamano'] == 0:
+            continue
+        inicio = sec['direccion'] if inicio is None else min(inicio, sec['direccion'])
+        fin = sec['direccion'] + sec['tamano'] if fin is None else max(fin, sec['direccion'] + sec['tamano'])
+    return (inicio, fin - 1) if inicio is not None else None
+
+
+def rango_ram(elf_path, map_path=None):
+    """
+    (inicio, fin) inclusivo de la RAM a comparar. Usa RAM-PARCIAL de metodo_pseudo_mems
+    con el .map (por defecto el .map junto al ELF); sin .map, las secciones escribibles del ELF.
+    """
+    map_path = map_path or os.path.splitext(str(elf_path))[0] + ".map"
+    if os.path.exists(map_path):
+        try:
+            from M_analisis_memorias_mejorado import metodo_pseudo_mems
+            ram = metodo_pseudo_mems(str(elf_path), map_path).get("RAM-PARCIAL")
+            if ram:
+                return int(ram[0], 16), int(ram[1], 16)
+        except (Exception, SystemExit) as e:
+            print(f"[WARNING] metodo_pseudo_mems falló ({e}); se usan las secciones del ELF")
+    return _rango_secciones(elf_path)
+
+
+# ---------- lectura y diff ----------
+def leer_ram(core, inicio, fin, palabras_bloque=PALABRAS_BLOQUE):
+    """Imagen uint32 de [inicio, fin] leída por bloques (un bloque ilegible queda en 0)."""
+    inicio &= ~0x3
+    n = (fin - inicio) // 4 + 1
+    imagen = np.zeros(n, dtype=DTYPE)
+    for ofs in range(0, n, palabras_bloque):
+        cuantas = min(palabras_bloque, n - ofs)
+        try:
+            imagen[ofs:ofs + cuantas] = core.read_memory_block32(inicio + ofs * 4, cuantas)
+        except Exception as e:
+            print(f"[WARNING] No se pudo leer RAM en 0x{inicio + ofs * 4:08X} ({cuantas} palabras): {e}")
+    return imagen
+
+
+def contar_bits(valores):
+    valores = np.asarray(valores, dtype=DTYPE)
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(valores).sum())
+    return int(np.unpackbits(valores.view(np.uint8)).sum())
+
+
+def diff_ram(gold, imagen):
+    """(índices de palabra, xor) de las palabras que difieren de GOLDEN."""
+    xor = np.bitwise_xor(gold, imagen)
+    idx = np.flatnonzero(xor)
+    return idx.astype(DTYPE), xor[idx]
+
+
+def ejecutar_hasta_stop(core, stop_address, timeout=5.0):
+    """Reset y ejecución sin falla hasta stop_address; True si se detuvo ahí."""
+    core.reset_and_halt()
+    core.set_breakpoint(stop_address, core.BreakpointType.HW)
+    core.resume()
+    t0 = time.time()
+    while not core.is_halted():
+        if time.time() - t0 > timeout:
+            core.halt()
+            return False
+        time.sleep(0.01)
+    return core.read_core_register('pc') == stop_address
+
+
+# ---------- símbolos ----------
+class TablaSimbolos:
+    """Objetos del ELF (inicio, fin, nombre) ordenados, para ubicar palabras corruptas."""
+
+    def __init__(self, elf_path=None, inicio=0, fin=0xFFFFFFFF):
+        objetos = []
+        if elf_path:
+            try:
+                from M_modelo_elf import modelo_elf
+                for nombre, valor, tamano, tipo in modelo_elf(elf_path).simbolos:
+                    if tipo == 'STT_OBJECT' and tamano > 0 and inicio <= valor <= fin:
+                        objetos.append((valor, valor + tamano, nombre))
+            except Exception as e:
+                print(f"[WARNING] No se pudieron leer los símbolos de {elf_path}: {e}")
+        objetos.sort()
+        self.inicios = np.array([o[0] for o in objetos], dtype=np.int64)
+        self.fines = np.array([o[1] for o in objetos], dtype=np.int64)
+        self.nombres = [o[2] for o in objetos]
+
+    def afectados(self, direcciones):
+        """Nombres de los símbolos que contienen alguna de las direcciones (en orden de dirección)."""
+        direcciones = np.asarray(direcciones, dtype=np.int64)
+        if len(direcciones) == 0:
+            return []
+        pos = np.searchsorted(self.inicios, direcciones, side='right') - 1
+        dentro = (pos >= 0) & (direcciones < self.fines[np.clip(pos, 0, None)]) if len(self.inicios) \
+            else np.zeros(len(direcciones), dtype=bool)
+        nombres = [self.nombres[p] for p in dict.fromkeys(pos[dentro].tolist())]
+        if not dentro.all():
+            nombres.append(SIN_SIMBOLO)
+        return nombres
+
+
+# ---------- propagación de una campaña ----------
+class PropagacionRAM:
+    """
+    Imagen GOLDEN de la RAM y diffs dispersos de cada falla en una carpeta de campaña.
+    Las filas se devuelven como bytes/listas para encolarlas en el EscritorCSV del inyector.
+    Con trabajo_crc (dirección del área de la rutina CRC) solo se leen los bloques cuya
+    huella calculada en el objetivo difiere de GOLDEN.
+    """
+
+    def __init__(self, campaign_dir, inicio, fin, elf_path=None, reanudar=False, trabajo_crc=None):
+        self.campaign_dir = campaign_dir
+        self.inicio = inicio & ~0x3
+        self.fin = fin
+        self.trabajo_crc = trabajo_crc
+        self.huellas_gold = None
+        self.segundos_lectura = None   # lectura completa, medida en la primera falla con CRC
+        self.bloques_leidos = self.bloques_total = 0
+        self.ruta_gold = os.path.join(campaign_dir, ARCHIVO_GOLD)
+        self.ruta_raw = os.path.join(campaign_dir, ARCHIVO_DIFF_RAW)
+        self.ruta_diff = os.path.join(campaign_dir, ARCHIVO_DIFF)
+        self.ruta_metricas = os.path.join(campaign_dir, ARCHIVO_METRICAS)
+        self.simbolos = TablaSimbolos(elf_path, self.inicio, fin)
+        self.gold = np.load(self.ruta_gold) if os.path.exists(self.ruta_gold) else None
+
+        if not reanudar:
+            for ruta in (self.ruta_raw, self.ruta_diff):
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+            with open(self.ruta_metricas, 'w', newline='') as f:
+                csv.writer(f).writerow(COLUMNAS_METRICAS)
+        open(self.ruta_raw, 'ab').close()
+
+    def capturar_gold(self, core):
+        self.guardar_gold(leer_ram(core, self.inicio, self.fin))
+
+    def guardar_gold(self, imagen):
+        self.gold = np.asarray(imagen, dtype=DTYPE)
+        self.huellas_gold = None
+        np.save(self.ruta_gold, self.gold)
+        with open(os.path.join(self.campaign_dir, ARCHIVO_GOLD_META), 'w') as f:
+            json.dump({'inicio': self.inicio, 'fin': self.fin, 'palabras': len(self.gold)}, f, indent=2)
+        print(f"[INFO] Imagen GOLDEN de RAM: 0x{self.inicio:08X}-0x{self.fin:08X} ({len(self.gold)} palabras)")
+
+    def diff(self, core):
+        """(índices, xor) contra GOLDEN leyendo la RAM del core."""
+        if self.trabajo_crc is not None:
+            try:
+                if self.segundos_lectura is None:
+                    self._comparar_modos(core)
+                if self.trabajo_crc is not None:
+                    return self._diff_crc(core)
+            except Exception as e:
+                print(f"[WARNING] Huellas CRC en el objetivo fallaron ({e}); se lee la RAM completa")
+        return diff_ram(self.gold, leer_ram(core, self.inicio, self.fin))
+
+    def _comparar_modos(self, core):
+        """Cronometra lectura completa vs huellas CRC y desactiva las huellas si son más lentas."""
+        t0 = time.perf_counter()
+        leer_ram(core, self.inicio, self.fin)
+        self.segundos_lectura = time.perf_counter() - t0
+        contadores = (self.bloques_leidos, self.bloques_total)
+        t0 = time.perf_counter()
+        self._diff_crc(core)
+        segundos_crc = time.perf_counter() - t0
+        self.bloques_leidos, self.bloques_total = contadores
+        if segundos_crc >= self.segundos_lectura:
+            print(f"[INFO] Huellas CRC más lentas que leer la RAM ({segundos_crc:.3f} s vs "
+                  f"{self.segundos_lectura:.3f} s): se lee la RAM completa")
+            self.trabajo_crc = None
+
+    def _diff_crc(self, core):
+        n = len(self.gold)
+        bloques = range(0, n, PALABRAS_BLOQUE)
+        if self.huellas_gold is None:
+            self.huellas_gold = huellas_imagen(self.gold, self.inicio, PALABRAS_BLOQUE, self.trabajo_crc)
+        regiones = [(self.inicio + 4 * i, 4 * min(PALABRAS_BLOQUE, n - i)) for i in bloques]
+        huellas = CRCObjetivo(core, self.trabajo_crc).huellas(regiones)
+
+        # La rutina ya restauró su área: los bloques distintos se leen con el contenido real
+        indices, xores = [], []
+        for k, i in enumerate(bloques):
+            if huellas[k] == self.huellas_gold[k]:
+                continue
+            fin_bloque = self.inicio + 4 * (i + regiones[k][1] // 4) - 1
+            idx, xor = diff_ram(self.gold[i:i + regiones[k][1] // 4],
+                                leer_ram(core, regiones[k][0], fin_bloque))
+            indices.append(idx + i)
+            xores.append(xor)
+            self.bloques_leidos += 1
+        self.bloques_total += len(regiones)
+        if not indices:
+            return np.empty(0, dtype=DTYPE), np.empty(0, dtype=DTYPE)
+        return np.concatenate(indices).astype(DTYPE), np.concatenate(xores)
+
+    def registro(self, fault_id, idx, xor):
+        """(bytes del diff disperso, fila de métricas) de una falla."""
+        registro = np.empty(3 + 2 * len(idx), dtype=DTYPE)
+        registro[:3] = (fault_id, fault_id, len(idx))
+        registro[3::2] = idx
+        registro[4::2] = xor
+        simbolos = self.simbolos.afectados(self.inicio + 4 * np.asarray(idx, dtype=np.int64))
+        fila = [fault_id, len(idx), contar_bits(xor), ";".join(simbolos)]
+        return registro.tobytes(), fila
+
+    def finalizar(self):
+        """Consolida ram_diff.d32 en ram_diff.npz (se puede llamar varias veces)."""
+        if not os.path.exists(self.ruta_raw):
+            return
+        filas, pares = _leer_raw_delta(self.ruta_raw)
+        if os.path.exists(self.ruta_diff):
+            filas, pares = _unir_delta(*_cargar_npz(self.ruta_diff), filas, pares)
+        np.savez(self.ruta_diff, filas=filas, pares=pares)
+        os.remove(self.ruta_raw)
+        if self.bloques_total:
+            print(f"[INFO] Huellas CRC: {self.bloques_leidos} de {self.bloques_total} bloques de RAM "
+                  f"leídos por SWD")
+
+    def depurar(self, conservar):
+        """Al reanudar: deja solo los diffs de las fallas que llegaron al diario."""
+        self.finalizar()
+        if not os.path.exists(self.ruta_diff):
+            return 0
+        filas, pares = _cargar_npz(self.ruta_diff)
+        mascara = np.isin(filas[:, 1].astype(np.int64), np.array(sorted(conservar), dtype=np.int64))
+        quedan = filas[mascara].copy()
+        tramos = [pares[int(i):int(i) + int(n)] for _, _, i, n in quedan]
+        nuevos = np.concatenate(tramos) if tramos else np.empty((0, 2), dtype=DTYPE)
+        quedan[:, 2] = np.concatenate([[0], np.cumsum(quedan[:, 3])[:-1]]) if len(quedan) else []
+        np.savez(self.ruta_diff, filas=quedan, pares=nuevos)
+        open(self.ruta_raw, 'ab').close()
+        return int((~mascara).sum())
+
+
+# ---------- lectura para el analizador ----------
+def cargar_metricas(campaign_dir):
+    """DataFrame de propagacion_ram.csv, o None si la campaña no capturó la RAM completa."""
+    ruta = os.path.join(campaign_dir, ARCHIVO_METRICAS)
+    if not os.path.exists(ruta):
+        return None
+    import pandas as pd
+    df = pd.read_csv(ruta, keep_default_na=False)
+    return df.drop_duplicates('Fault_ID', keep='last')
+
+
+def cargar_diff(campaign_dir, fault_id):
+    """dict {dirección: (gold, falla)} de las palabras corruptas de una falla."""
+    ruta = os.path.join(campaign_dir, ARCHIVO_DIFF)
+    partes = []
+    if os.path.exists(ruta):
+        partes.append(_cargar_npz(ruta))
+    if os.path.exists(os.path.join(campaign_dir, ARCHIVO_DIFF_RAW)):
+        partes.append(_leer_raw_delta(os.path.join(campaign_dir, ARCHIVO_DIFF_RAW)))
+    if not partes:
+        return {}
+    filas, pares = partes[0] if len(partes) == 1 else _unir_delta(*partes[0], *partes[1])
+    with open(os.path.join(campaign_dir, ARCHIVO_GOLD_META)) as f:
+        inicio = json.load(f)['inicio']
+    gold = np.load(os.path.join(campaign_dir, ARCHIVO_GOLD), mmap_mode='r')
+    resultado = {}
+    for _, fid, i, n in filas:
+        if int(fid) != int(fault_id):
+            continue
+        for palabra, xor in pares[int(i):int(i) + int(n)]:
+            g = int(gold[palabra])
+            resultado[inicio + 4 * int(palabra)] = (g, g ^ int(xor))
+    return resultado
+
+
+if __name__ == '__main__':
+    from M_detector_campana import obtener_ultima_carpeta_campania
+
+    camp = sys.argv[1] if len(sys.argv) > 1 else obtener_ultima_carpeta_campania()
+    df = cargar_metricas(camp)
+    if df is None:
+        print(f"[INFO] {camp} no tiene captura de RAM completa")
+    else:
+        print(df.to_string(index=False))
+        print(f"\nFallas con RAM corrupta: {(df['Palabras_Corruptas'] > 0).sum()} de {len(df)}")
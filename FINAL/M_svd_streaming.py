@@ -0,0 +1,201 @@
+#------------------------MODULO SVD EN STREAMING (POR PERIFÉRICO)-------------------------------#
+"""
+M_svd_streaming.py
+
+Extracción de uno o pocos periféricos del SVD sin analizar el dispositivo entero.
+Cuando en VentanaA se elige un solo periférico (p.ej. GPIOD), SVDParser expandía todos
+los periféricos del STM32F407 y después filtrar_periferico descartaba casi todo.
+
+Aquí el XML se recorre con iterparse y cada <peripheral> se procesa al cerrarse:
+si no es uno de los pedidos se descarta y se quita del árbol, así que el tiempo y la
+memoria dependen de lo elegido, no del dispositivo.
+
+    - derivedFrom: si un periférico pedido deriva de otro (GPIOE de GPIOA...), una
+      segunda pasada extrae solo los bases que falten (y sus propios bases).
+    - clusters y arrays (dim / dimIncrement / dimIndex) de registros y clusters se
+      expanden con sus offsets; size/access se heredan dispositivo -> periférico ->
+      cluster -> registro -> campo, como en el SVD.
+
+El resultado tiene las mismas tablas que M_cache_svd.digerir_svd, así que se usa igual:
+    DispositivoSVD(svd_path, tablas=extraer_perifericos(svd_path, ["GPIOD"]))
+"""
+import re
+import xml.etree.ElementTree as ET
+
+from M_cache_svd import ConstructorTablas
+
+# Mismo texto que str(SVDAccessType) de cmsis_svd, para que los CSV no cambien
+ACCESOS = {
+    'read-only': 'SVDAccessType.READ_ONLY',
+    'write-only': 'SVDAccessType.WRITE_ONLY',
+    'read-write': 'SVDAccessType.READ_WRITE',
+    'writeOnce': 'SVDAccessType.WRITE_ONCE',
+    'read-writeOnce': 'SVDAccessType.READ_WRITE_ONCE',
+}
+
+
+def _entero(texto, por_defecto=None):
+    if texto is None:
+        return por_defecto
+    texto = texto.strip().lower()
+    if texto.startswith('#'):
+        return int(texto[1:].replace('x', '0'), 2)
+    return int(texto, 0)
+
+
+def _texto(elem, etiqueta, por_defecto=None):
+    hijo = elem.find(etiqueta)
+    return hijo.text.strip() if hijo is not None and hijo.text else por_defecto
+
+
+def _indices_dim(elem):
+    """Índices de un elemento con <dim> (['0', '1'...] o los de <dimIndex>), o None."""
+    dim = _entero(_texto(elem, 'dim'))
+    if not dim:
+        return None
+    indice = _texto(elem, 'dimIndex')
+    if indice and ',' in indice:
+        return [i.strip() for i in indice.split(',')]
+    m = re.fullmatch(r'(\d+)-(\d+)', indice or '')
+    if m:
+        return [str(i) for i in range(int(m.group(1)), int(m.group(2)) + 1)]
+    m = re.fullmatch(r'([A-Z])-([A-Z])', indice or '')
+    if m:
+        return [chr(c) for c in range(ord(m.group(1)), ord(m.group(2)) + 1)]
+    return [str(i) for i in range(dim)]
+
+
+def _expandir(elem, nombre, offset):
+    """[(nombre, offset)] de un registro/cluster, uno por elemento si es un array."""
+    indices = _indices_dim(elem)
+    if indices is None:
+        return [(nombre, offset)]
+    paso = _entero(_texto(elem, 'dimIncrement'), 0)
+    return [(nombre.replace('%s', i), offset + n * paso) for n, i in enumerate(indices)]
+
+
+def _rango_campo(field):
+    """(bit_offset, bit_width) con cualquiera de las tres formas del SVD."""
+    if field.find('bitOffset') is not None:
+        return _entero(_texto(field, 'bitOffset')), _entero(_texto(field, 'bitWidth'), 1)
+    if field.find('lsb') is not None:
+        lsb, msb = _entero(_texto(field, 'lsb')), _entero(_texto(field, 'msb'))
+        return lsb, msb - lsb + 1
+    m = re.fullmatch(r'\[(\d+):(\d+)\]', _texto(field, 'bitRange', ''))
+    if m:
+        msb, lsb = int(m.group(1)), int(m.group(2))
+        return lsb, msb - lsb + 1
+    return 0, 1
+
+
+# ---------- registros de un periférico (ya cerrado en el árbol) ----------
+def _registros(contenedor, base, heredado, prefijo=''):
+    """
+    Recorre <registers> / <cluster>:
+        [(registro, [(campo, bit_offset, ancho, acceso)], dirección, acceso, tamaño)]
+    heredado = {'size': ..., 'access': ...} del nivel superior. Los registros de un
+    cluster se nombran <cluster>_<registro>, como en cmsis_svd.
+    """
+    resultado = []
+    for hijo in contenedor:
+        nivel = {'size': _entero(_texto(hijo, 'size'), heredado['size']),
+                 'access': _texto(hijo, 'access', heredado['access'])}
+        nombre = _texto(hijo, 'name', '')
+        offset = _entero(_texto(hijo, 'addressOffset'), 0)
+        if hijo.tag == 'cluster':
+            for nombre_cluster, off in _expandir(hijo, nombre, offset):
+                resultado += _registros(hijo, base + off, nivel, f"{prefijo}{nombre_cluster}_")
+        elif hijo.tag == 'register':
+            campos = []
+            fields = hijo.find('fields')
+            for field in (fields if fields is not None else []):
+                bit_offset, ancho = _rango_campo(field)
+                campos.append((_texto(field, 'name', ''), bit_offset, ancho,
+                               _texto(field, 'access', nivel['access'])))
+            for nombre_reg, off in _expandir(hijo, nombre, offset):
+                resultado.append((prefijo + nombre_reg, campos, base + off, nivel['access'], nivel['size']))
+    return resultado
+
+
+def _leer_periferico(elem, por_defecto):
+    nivel = {'size': _entero(_texto(elem, 'size'), por_defecto['size']),
+             'access': _texto(elem, 'access', por_defecto['access'])}
+    registros = elem.find('registers')
+    return {
+        'nombre': _texto(elem, 'name', ''),
+        'descripcion': _texto(elem, 'description'),
+        'base': _entero(_texto(elem, 'baseAddress'), 0),
+        'derivado': elem.get('derivedFrom'),
+        'nivel': nivel,
+        'registros': registros,        # el elemento se conserva solo para los elegidos
+    }
+
+
+def _recorrer(svd_path, buscados):
+    """Una pasada por el XML: {nombre: periférico} de los buscados (en mayúsculas)."""
+    encontrados, por_defecto = {}, {'size': None, 'access': None}
+    pila = []
+    for evento, elem in ET.iterparse(str(svd_path), events=('start', 'end')):
+        if evento == 'start':
+            pila.append(elem)
+            continue
+        pila.pop()
+        if elem.tag in ('size', 'access') and len(pila) == 1:
+            por_defecto[elem.tag] = elem.text.strip() if elem.tag == 'access' else _entero(elem.text)
+        elif elem.tag == 'peripheral' and len(pila) == 2:
+            nombre = (_texto(elem, 'name') or '').upper()
+            if nombre in buscados:
+                encontrados[nombre] = _leer_periferico(elem, por_defecto)
+            # Se suelta del árbol: lo no elegido no ocupa memoria
+            pila[-1].remove(elem)
+    return encontrados
+
+
+def extraer_perifericos(svd_path, nombres):
+    """Tablas (formato M_cache_svd.digerir_svd) solo con los periféricos pedidos."""
+    pedidos = [str(n).upper() for n in nombres]
+    perifericos = _recorrer(svd_path, set(pedidos))
+    # Bases de derivedFrom que no estaban entre los pedidos (una pasada más, solo si hace falta)
+    faltan = {p['derivado'].upper() for p in perifericos.values()
+              if p['derivado'] and p['registros'] is None} - set(perifericos)
+    while faltan:
+        bases = _recorrer(svd_path, faltan)
+        perifericos.update(bases)
+        faltan = {p['derivado'].upper() for p in bases.values()
+                  if p['derivado'] and p['registros'] is None} - set(perifericos)
+
+    constructor = ConstructorTablas()
+    for nombre in pedidos:
+        p = perifericos.get(nombre)
+        if p is None:
+            print(f"[WARNING] Periférico '{nombre}' no está en el SVD: omitido")
+            continue
+        origen = p
+        while origen['registros'] is None and origen['derivado']:
+            origen = perifericos.get(origen['derivado'].upper(), {'registros': None, 'derivado': None})
+        descripcion = p['descripcion'] if p['descripcion'] is not None else origen.get('descripcion')
+        constructor.periferico(p['nombre'], descripcion)
+        if origen['registros'] is None:
+            continue
+        nivel = {'size': p['nivel']['size'] or origen['nivel']['size'],
+                 'access': p['nivel']['access'] or origen['nivel']['access']}
+        for reg, campos, reg_addr, reg_acc, reg_size in _registros(origen['registros'], p['base'], nivel):
+            reg_access = ACCESOS.get(reg_acc, "unknown") if reg_acc else "unknown"
+            campos = [(c, off, ancho, ACCESOS.get(acc) if acc else None) for c, off, ancho, acc in campos]
+            constructor.registro(reg, reg_addr, reg_access, reg_size, campos)
+    return constructor.tablas()
+
+
+if __name__ == '__main__':
+    import sys
+    import time
+
+    from M_cache_svd import DispositivoSVD
+
+    if len(sys.argv) < 3:
+        print("Uso: python M_svd_streaming.py dispositivo.svd PERIFERICO [PERIFERICO...]")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    dispositivo = DispositivoSVD(sys.argv[1], tablas=extraer_perifericos(sys.argv[1], sys.argv[2:]))
+    print(f"[INFO] {len(dispositivo)} bits de {', '.join(dispositivo.per_nombre)} "
+          f"({time.perf_counter() - t0:.3f} s)")
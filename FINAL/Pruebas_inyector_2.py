@@ -2,11 +2,18 @@ import csv
 import os
 import time
 from datetime import datetime
-from M_deteccion_stop import detectar_while_infinito
+from M_modelo_elf import modelo_elf
 
 # wrappers de gestión de sesión (asegúrate de que existen y funcionan)
-from M_gestion_MCU_ram import MCU_RAM
-from M_gestion_mcu import MCU
+from M_broker_sondas import abrir_mcu
+from M_escritor_csv import EscritorCSV, ErrorEscritura
+from M_almacen_snapshots import (AlmacenSnapshots, a_u32, congelar_referencia, cargar_referencia,
+                                 depurar_fase, es_delta)
+from M_diario_campana import (DiarioCampania, guardar_campania, leer_campania, depurar_faults_log,
+                              CONTADORES)
+from M_politica_captura import politica_desde
+from M_catalogo import catalogar
+from M_propagacion_ram import PropagacionRAM, ejecutar_hasta_stop
 
 # ---------- utilidades ----------
 def parse_int_optional(s):
@@ -32,6 +39,10 @@ def _to_hex_safe(val):
 
 
 # ---------- clases ----------
+class EnlacePerdido(RuntimeError):
+    """No se pudo abrir o reprogramar la sesión: la falla no se inyectó y no va al diario."""
+
+
 class FALLA:
     def __init__(self, id_falla, direccion_inyeccion, direccion_breakpoint, mascara, tipo, ubicacion):
         self.id_falla = id_falla
@@ -74,15 +85,32 @@ class FALLA:
 
 
 class FaultInjector:
-    def __init__(self, mcu=None, csv_file=None, elf_main_path=None, elf_ram_path=None, main_opts=None):
+    def __init__(self, mcu=None, csv_file=None, elf_main_path=None, elf_ram_path=None, main_opts=None,
+                 broker=None, politica=None):
         """
-        mcu: (opcional) sesión principal ya abierta (instancia devuelta por MCU(opts, elf))
+        mcu: (opcional) sesión principal ya abierta (instancia devuelta por abrir_mcu(opts, elf))
         csv_file: ruta al CSV con lista de fallas
         elf_main_path: ruta al ELF principal (puede ser None; la GUI puede establecerlo luego)
         elf_ram_path: ruta al ELF alterno para programar en RAM (usada en inyecciones FLASH)
         main_opts: opciones pyOCD principales (dict)
+        broker: (opcional) dirección del broker de sondas; las sesiones temporales se piden
+                al broker en lugar de abrirse directamente
+        politica: (opcional) política de captura de snapshots (M_politica_captura): nombre de
+                  nivel, dict o PoliticaCaptura; por defecto las tres fases completas
         """
         self.mcu = mcu
+        self.mcu_temporal = None
+        self.broker = broker
+        self.escritor = None
+        self.almacenes = {}
+        self.campaign_dir = None
+
+        # diario de progreso (M_diario_campana): fallas ya terminadas y tiempo acumulado
+        self.diario = None
+        self.completadas = set()
+        self.segundos_previos = 0.0
+        self.politica = politica_desde(politica)
+        self.propagacion = None
         self.core = getattr(mcu, 'core', None) if mcu is not None else None
         self.session = getattr(mcu, 'session', None) if mcu is not None else None
 
@@ -111,7 +139,7 @@ class FaultInjector:
         # intentar detectar stop_address solo si existe elf principal
         if self.elf_path:
             try:
-                resultado = detectar_while_infinito(self.elf_path)
+                resultado = modelo_elf(self.elf_path).bucle_principal()
                 addr_salto, _ = resultado
                 self.stop_address = addr_salto
                 print(f"[INFO] Stop address detectada: 0x{self.stop_address:08X}")
@@ -123,22 +151,18 @@ class FaultInjector:
 
         if self.elf_ram_path:
             try:
-                resultado2 = detectar_while_infinito(self.elf_ram_path)
+                resultado2 = modelo_elf(self.elf_ram_path).bucle_principal()
                 addr_salto2, _ = resultado2
                 self.stop_address_flash = addr_salto2
                 print(f"[INFO] Stop address detectada: 0x{self.stop_address_flash:08X}")
             except Exception as e:
-                self.stop_address = None
-                print(f"[WARNING] No se pudo detectar stop_address (elf_main missing o error): {e}")
+                self.stop_address_flash = None
+                print(f"[WARNING] No se pudo detectar stop_address (elf_ram missing o error): {e}")
         else:
-            self.stop_address = None
+            self.stop_address_flash = None
 
-        # inicializar archivos si CSV ya cargado
-        if self.lista_fallas:
-            self.inicializar_archivos()
-        else:
-            # Si la GUI carga el CSV después, inicializará archivos entonces.
-            self.campaign_dir = None
+        # cargar_csv() ya creó la carpeta de campaña; si la GUI carga el CSV después,
+        # inicializará archivos entonces.
 
     # ---------- API para la GUI ----------
     def set_elf_paths(self, elf_main=None, elf_ram=None):
@@ -146,7 +170,7 @@ class FaultInjector:
         if elf_main:
             self.elf_path = elf_main
             try:
-                resultado = detectar_while_infinito(self.elf_path)
+                resultado = modelo_elf(self.elf_path).bucle_principal()
                 addr_salto, _ = resultado
                 self.stop_address = addr_salto
                 print(f"[INFO] Stop address detectada (elf_main): 0x{self.stop_address:08X}")
@@ -157,7 +181,7 @@ class FaultInjector:
             self.elf_ram_path = elf_ram
             print(f"[INFO] elf_ram_path establecido: {self.elf_ram_path}")
             try:
-                resultado2 = detectar_while_infinito(self.elf_ram_path)
+                resultado2 = modelo_elf(self.elf_ram_path).bucle_principal()
                 addr_salto2, _ = resultado2
                 self.stop_address_flash = addr_salto2
                 print(f"[INFO] Stop address detectada (elf_main): 0x{self.stop_address_flash:08X}")
@@ -174,6 +198,11 @@ class FaultInjector:
         if not path:
             raise ValueError("No hay ruta CSV para cargar.")
         self.csv_file = path
+        self._leer_lista_fallas()
+        # inicializar archivos
+        self.inicializar_archivos()
+
+    def _leer_lista_fallas(self):
         self.lista_fallas = []
         with open(self.csv_file, newline='') as f:
             reader = csv.DictReader(f)
@@ -190,8 +219,6 @@ class FaultInjector:
                 except Exception as e:
                     print(f"[WARNING] Fila ignorada: {e}")
         print(f"[INFO] {len(self.lista_fallas)} fallas cargadas.")
-        # inicializar archivos
-        self.inicializar_archivos()
 
     # ---------- archivos y snapshots ----------
     def inicializar_archivos(self):
@@ -201,24 +228,28 @@ class FaultInjector:
         os.makedirs(self.campaign_dir, exist_ok=True)
         print(f"[INFO] Carpeta de campaña creada: {self.campaign_dir}")
 
-        self.snapshot_before_csv = os.path.join(self.campaign_dir, 'snapshots_before.csv')
-        self.snapshot_after_csv = os.path.join(self.campaign_dir, 'snapshots_after.csv')
-        self.snapshot_after_stable_csv = os.path.join(self.campaign_dir, 'snapshots_after_stable.csv')
-
-        hay_memoria = any((f.ubicacion or '').lower() in ['ram', 'flash'] for f in self.lista_fallas)
-        self.mem_cols_count = 256 if hay_memoria else 1
-
-        mem_cols = [f"MEM_{i}" for i in range(self.mem_cols_count)]
-        header = ['Test_ID', 'Fault_ID', 'PC', 'SP', 'LR'] + [f'R{i}' for i in range(13)] + mem_cols
-
-
-        for path in [self.snapshot_before_csv, self.snapshot_after_csv, self.snapshot_after_stable_csv]:
+        # Columnas MEM_i: la ventana más grande que pide la política para las fallas de la lista
+        self.politica.resolver_simbolos(self.elf_path)
+        self.politica.resolver_perifericos()
+        self.mem_cols_count = self.politica.palabras_memoria(self.lista_fallas)
+        print(f"[INFO] Política de captura: {self.politica}")
+
+        # RAM completa en stop_address: solo se guarda el diff contra la imagen GOLDEN
+        rango_ram = self.politica.resolver_ram(self.elf_path)
+        self.propagacion = PropagacionRAM(self.campaign_dir, *rango_ram, elf_path=self.elf_path,
+                                          trabajo_crc=self.politica.resolver_crc(self.elf_path)) \
+            if rango_ram else None
+
+        # Snapshots en binario uint32 (M_almacen_snapshots); los CSV se exportan bajo demanda.
+        # Solo se crean las fases que la política captura
+        self.almacenes = {}
+        for tipo in self.politica.fases:
             try:
-                with open(path, 'w', newline='') as f:
-                    csv.writer(f).writerow(header)
-                print(f"[INFO] Creado archivo: {path} (MEM cols: {self.mem_cols_count})")
+                self.almacenes[tipo] = AlmacenSnapshots(self.campaign_dir, tipo, self.mem_cols_count,
+                                                        extras=self.politica.columnas_extra())
+                print(f"[INFO] Creado archivo: {self.almacenes[tipo].ruta_raw} (MEM cols: {self.mem_cols_count})")
             except Exception as e:
-                print(f"[WARNING] No se pudo crear {path}: {e}")
+                print(f"[WARNING] No se pudo crear snapshots_{tipo}: {e}")
 
         self.faults_log_csv = os.path.join(self.campaign_dir, 'faults_log.csv')
         try:
@@ -240,6 +271,114 @@ class FaultInjector:
         except Exception as e:
             print(f"[WARNING] No se pudo crear faults_log.csv: {e}")
 
+        # diario de progreso para poder reanudar la campaña tras un corte
+        self.diario = DiarioCampania(self.campaign_dir)
+        self.completadas = set()
+        self.segundos_previos = 0.0
+        try:
+            guardar_campania(self.campaign_dir, self.csv_file, self.elf_path, self.elf_ram_path,
+                             self.mem_cols_count, self.politica)
+        except Exception as e:
+            print(f"[WARNING] No se pudo guardar campania.json (la campaña no será reanudable): {e}")
+
+    # ---------- reanudación ----------
+    @classmethod
+    def reanudar_campania(cls, campaign_dir, mcu=None, main_opts=None, broker=None,
+                          elf_main_path=None, elf_ram_path=None):
+        """
+        Reabre una carpeta de campaña interrumpida: ejecutar() sigue con las fallas que
+        no llegaron al diario y agrega a los mismos archivos.
+        """
+        datos = leer_campania(campaign_dir)
+        injector = cls(mcu=mcu, csv_file=None,
+                       elf_main_path=elf_main_path or datos['elf_main_path'],
+                       elf_ram_path=elf_ram_path or datos['elf_ram_path'],
+                       main_opts=main_opts, broker=broker)
+        injector.abrir_campania(campaign_dir, datos)
+        return injector
+
+    def abrir_campania(self, campaign_dir, datos=None):
+        datos = datos or leer_campania(campaign_dir)
+        self.campaign_dir = campaign_dir
+        self.csv_file = datos['lista_fallas']
+        self._leer_lista_fallas()
+        self.mem_cols_count = datos['mem_cols_count']
+        self.politica = politica_desde(datos.get('politica'))
+        self.faults_log_csv = os.path.join(self.campaign_dir, 'faults_log.csv')
+
+        self.diario = DiarioCampania(self.campaign_dir)
+        registros = self.diario.leer()
+        self.diario.recortar(len(registros))
+        self.completadas, contadores, self.segundos_previos = self.diario.estado()
+
+        # Se descartan las filas de la falla que estaba en curso al cortarse
+        quitadas = depurar_faults_log(self.faults_log_csv, self.completadas)
+        referencia = cargar_referencia(self.campaign_dir)
+        self.almacenes = {}
+        for tipo in self.politica.fases:
+            quitadas += depurar_fase(self.campaign_dir, tipo, self.completadas)
+            delta = es_delta(self.campaign_dir, tipo)
+            self.almacenes[tipo] = AlmacenSnapshots(self.campaign_dir, tipo, self.mem_cols_count,
+                                                    referencia if delta else None, reanudar=True,
+                                                    extras=self.politica.columnas_extra())
+
+        rango_ram = self.politica.resolver_ram(self.elf_path)
+        if rango_ram:
+            self.propagacion = PropagacionRAM(self.campaign_dir, *rango_ram, elf_path=self.elf_path,
+                                              reanudar=True, trabajo_crc=self.politica.resolver_crc(self.elf_path))
+            quitadas += self.propagacion.depurar(self.completadas)
+            depurar_faults_log(self.propagacion.ruta_metricas, self.completadas)
+
+        for nombre in CONTADORES:
+            setattr(self, nombre, contadores.get(nombre, 0))
+
+        print(f"[INFO] Campaña reanudada: {self.campaign_dir}")
+        print(f"[INFO] {len(self.completadas)} de {len(self.lista_fallas)} fallas ya terminadas "
+              f"({self.segundos_previos:.1f} s); {quitadas} filas incompletas descartadas")
+
+    def copiar_contadores(self):
+        return {nombre: getattr(self, nombre, 0) for nombre in CONTADORES}
+
+    def restaurar_contadores(self, contadores):
+        """Descarta los incrementos de una falla que no llega al diario (se repite al reanudar)."""
+        for nombre, valor in contadores.items():
+            setattr(self, nombre, valor)
+
+    def registrar_completada(self, falla):
+        """Línea de diario de la falla, encolada después de sus filas y seguida de flush + fsync."""
+        self.completadas.add(falla.id_falla)
+        if self.diario is None:
+            return
+        escritor = self.obtener_escritor()
+        escritor.escribir_diario(self.diario.ruta,
+                                 self.diario.linea(falla.id_falla, self, time.time() - self.tiempo_total_inicio))
+        escritor.checkpoint()
+
+    def enlace_activo(self):
+        """False si la sonda dejó de responder (la falla en curso no se da por terminada)."""
+        if self.core is None:
+            return True
+        try:
+            self.core.read_core_register('pc')
+            return True
+        except Exception:
+            return False
+
+    def activar_delta(self, referencia=None):
+        """
+        Guarda las fases capturadas como delta contra GOLDEN (M_almacen_snapshots).
+        Requiere que los snapshots GOLDEN de esta campaña ya existan; sin ellos no cambia nada.
+        """
+        referencia = referencia or congelar_referencia(self.campaign_dir)
+        if referencia is None:
+            print("[WARNING] No hay snapshots GOLDEN en la campaña: se guardan snapshots completos")
+            return False
+        for tipo in self.politica.fases:
+            self.almacenes[tipo] = AlmacenSnapshots(self.campaign_dir, tipo, self.mem_cols_count, referencia,
+                                                    extras=self.politica.columnas_extra())
+        print(f"[INFO] Snapshots en modo delta contra GOLDEN ({len(referencia)} filas de referencia)")
+        return True
+
     # ---------- snapshots / lectura ----------
     def snapshot_registros(self):
         if self.core is None:
@@ -278,51 +417,130 @@ class FaultInjector:
                 mem.append(0)
         return mem
 
-    def construir_snapshot_dict(self, registros, memoria):
+    def construir_snapshot_dict(self, registros, memoria, extras=None):
+        # Sin registros en la política las columnas de registros quedan en 0
+        if not self.politica.registros:
+            registros = {}
         snap = {}
-        snap['PC'] = _to_hex_safe(registros.get('pc', 0))
-        snap['SP'] = _to_hex_safe(registros.get('sp', 0))
-        snap['LR'] = _to_hex_safe(registros.get('lr', 0))
+        snap['PC'] = a_u32(registros.get('pc', 0))
+        snap['SP'] = a_u32(registros.get('sp', 0))
+        snap['LR'] = a_u32(registros.get('lr', 0))
         for i in range(13):
-            snap[f'R{i}'] = _to_hex_safe(registros.get(f'r{i}', 0))
+            snap[f'R{i}'] = a_u32(registros.get(f'r{i}', 0))
         for i in range(self.mem_cols_count):
             val = memoria[i] if i < len(memoria) else 0
-            snap[f'MEM_{i}'] = _to_hex_safe(val)
+            snap[f'MEM_{i}'] = a_u32(val)
+        for col, val in (extras or {}).items():
+            snap[col] = a_u32(val)
         return snap
 
     def guardar_snapshot(self, tipo, test_id, fault_id, snap):
-        if tipo == 'before':
-            path = self.snapshot_before_csv
-        elif tipo == 'after':
-            path = self.snapshot_after_csv
-        else:
-            path = self.snapshot_after_stable_csv
-        row = [test_id, fault_id, snap['PC'], snap['SP'], snap['LR']]
-        row += [snap[f'R{i}'] for i in range(13)]
-        for i in range(self.mem_cols_count):
-            row.append(snap.get(f'MEM_{i}', _to_hex_safe(0)))
-        with open(path, 'a', newline='') as f:
-            csv.writer(f).writerow(row)
+        almacen = self.almacenes.get(tipo if tipo in ('before', 'after') else 'after_stable')
+        if almacen is None:
+            return
+        self.obtener_escritor().escribir_bytes(almacen.ruta_raw, almacen.fila(test_id, fault_id, snap))
+
+    def capturar(self, tipo, falla, tamano_bytes):
+        """
+        Snapshot de una fase según la política; devuelve la ventana leída (al menos [0]).
+        Si la fase no se captura solo se lee la palabra inyectada que necesita 'before'.
+        """
+        if tipo == 'after_stable':
+            self.capturar_ram(falla)
+        if not self.politica.incluye(tipo):
+            if tipo != 'before':
+                return [0]
+            return self.snapshot_memoria_bloque(falla.direccion_inyeccion, 4) or [0]
+        registros = self.snapshot_registros()
+        memoria = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes) or [0]
+        extras = self.politica.leer_regiones(self.core, registros) if self.politica.regiones else None
+        self.guardar_snapshot(tipo, falla.id_falla, falla.id_falla,
+                              self.construir_snapshot_dict(registros, memoria, extras))
+        return memoria
+
+    # ---------- RAM completa (M_propagacion_ram) ----------
+    def preparar_ram_gold(self):
+        """Imagen GOLDEN de la RAM (una ejecución sin falla hasta stop_address) si aún no existe."""
+        if self.propagacion is None or self.propagacion.gold is not None or self.stop_address is None:
+            return
+        try:
+            if ejecutar_hasta_stop(self.core, self.stop_address):
+                self.propagacion.capturar_gold(self.core)
+            else:
+                print("[WARNING] La ejecución GOLDEN no llegó a stop_address: sin diff de RAM completa")
+            self.core.reset_and_halt()
+        except Exception as e:
+            print(f"[WARNING] No se pudo capturar la imagen GOLDEN de RAM: {e}")
+
+    def capturar_ram(self, falla):
+        """Diff disperso de toda la RAM contra GOLDEN (no aplica a fallas FLASH: otro ELF)."""
+        if self.propagacion is None or self.propagacion.gold is None:
+            return
+        if (falla.ubicacion or '').lower() == 'flash':
+            return
+        try:
+            datos, fila = self.propagacion.registro(falla.id_falla, *self.propagacion.diff(self.core))
+        except Exception as e:
+            print(f"[WARNING] No se pudo comparar la RAM completa en la falla {falla.id_falla}: {e}")
+            return
+        escritor = self.obtener_escritor()
+        escritor.escribir_bytes(self.propagacion.ruta_raw, datos)
+        escritor.escribir(self.propagacion.ruta_metricas, fila)
 
     def log_falla(self, falla, valor_original, valor_con_falla, valor_leido, estado):
         try:
-            with open(self.faults_log_csv, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([
-                    falla.id_falla,
-                    _to_hex_safe(falla.direccion_inyeccion),
-                    _to_hex_safe(falla.direccion_breakpoint),
-                    falla.tipo,
-                    _to_hex_safe(falla.mascara),
-                    falla.ubicacion,
-                    _to_hex_safe(valor_original),
-                    _to_hex_safe(valor_con_falla),
-                    _to_hex_safe(valor_leido),
-                    estado
-                ])
+            self.obtener_escritor().escribir(self.faults_log_csv, [
+                falla.id_falla,
+                _to_hex_safe(falla.direccion_inyeccion),
+                _to_hex_safe(falla.direccion_breakpoint),
+                falla.tipo,
+                _to_hex_safe(falla.mascara),
+                falla.ubicacion,
+                _to_hex_safe(valor_original),
+                _to_hex_safe(valor_con_falla),
+                _to_hex_safe(valor_leido),
+                estado
+            ])
         except Exception as e:
             print(f"[WARNING] No se pudo escribir en faults_log.csv: {e}")
 
+    # ---------- escritor en segundo plano ----------
+    def obtener_escritor(self):
+        """Escritor CSV en segundo plano (se crea al primer uso o tras cerrar_escritor())."""
+        if self.escritor is None or self.escritor.cerrado:
+            self.escritor = EscritorCSV()
+        return self.escritor
+
+    def cerrar_escritor(self):
+        """Drena las filas pendientes, cierra los archivos y consolida los snapshots en .npy."""
+        if self.escritor is not None:
+            self.escritor.cerrar()
+        for almacen in list(getattr(self, 'almacenes', {}).values()) + [self.propagacion]:
+            if almacen is None:
+                continue
+            try:
+                almacen.finalizar()
+            except Exception as e:
+                print(f"[WARNING] No se pudo consolidar {almacen.ruta_raw}: {e}")
+
+    def clasificar_aplicacion(self, valor_con_falla, valor_leido):
+        """Clasificación NASA-STYLE de la escritura de la falla; actualiza los contadores."""
+        if valor_con_falla is None:
+            self.errores_bp += 1
+            return "NO_INYECTADA_APLICANDO"
+        if valor_leido is None:
+            self.no_leido += 1
+            return "NO_LEIDO"
+        try:
+            if int(valor_leido) != int(valor_con_falla):
+                self.no_escritas += 1
+                return "NO_ESCRITA"
+            self.ok += 1
+            return "OK"
+        except Exception:
+            self.no_leido += 1
+            return "NO_LEIDO"
+
     def esperar_halt(self, timeout=5.0):
         if self.core is None:
             return False
@@ -375,7 +593,7 @@ class FaultInjector:
 
             # abrir sesión temporal MCU_RAM y programar/inyectar dentro del context manager
             try:
-                with MCU_RAM(self.opts, self.elf_ram_path) as mcu_ram:
+                with abrir_mcu(self.opts, self.elf_ram_path, ram=True, broker=self.broker) as mcu_ram:
                     print("[INFO] Sesión temporal abierta para programar e inyectar (FLASH).")
                     # programa e intenta arrancar desde .isr_vector (usa boot_from_elf_vector)
                     if falla.direccion_breakpoint:
@@ -412,7 +630,7 @@ class FaultInjector:
                     self.session = getattr(mcu_ram, 'session', None)
 
                     # ejecutar flujo de inyección FLASH (usa self.core del mcu_ram)
-                    resultado = self._inj_memoria_flash(falla, 256, delay)
+                    resultado = self._inj_memoria_flash(falla, self.politica.ventana('flash'), delay)
 
                 # ✅ Al salir del with → sesión temporal YA se cerró
                 # Limpieza de referencias para evitar estados corruptos
@@ -424,51 +642,41 @@ class FaultInjector:
                 return resultado
 
             except Exception as e:
-                print(f"[ERROR] Falló reprogramación/inyección FLASH: {e}")
-                self.no_inyectadas += 1
-                try:
-                    self.log_falla(falla, None, None, None, "NO_INYECTADA_REPROG_ERROR")
-                except Exception:
-                    pass
-                self.errores_bp += 1
-                return
+                # Sin sesión o sin reprogramar no hubo inyección: enlace caído, la falla se reintenta
+                raise EnlacePerdido(f"Falló reprogramación/inyección FLASH: {e}") from e
 
         elif ubic == 'registro':
             # asegurar sesión principal abierta
             if self.core is None:
                 try:
-                    temp_mcu = MCU(self.opts, self.elf_path)
+                    temp_mcu = abrir_mcu(self.opts, self.elf_path, broker=self.broker)
                     self.mcu = temp_mcu.__enter__()
+                    self.mcu_temporal = self.mcu
                     self.core = getattr(self.mcu, 'core', None)
                     self.session = getattr(self.mcu, 'session', None)
                 except Exception as e:
-                    print(f"[ERROR] No se pudo abrir sesión principal para registro: {e}")
-                    self.no_inyectadas += 1
-                    self.errores_bp += 1
-                    return
+                    raise EnlacePerdido(f"No se pudo abrir sesión principal para registro: {e}") from e
             try:
                 self.core.set_breakpoint(self.stop_address, self.core.BreakpointType.HW)
             except Exception as e:
                 print(f"[WARNING] No se pudo establecer bp stop: {e}")
-            return self._inj_memoria(falla, 4, delay)
+            return self._inj_memoria(falla, self.politica.ventana('registro'), delay)
 
         elif ubic == 'ram':
             if self.core is None:
                 try:
-                    temp_mcu = MCU(self.opts, self.elf_path)
+                    temp_mcu = abrir_mcu(self.opts, self.elf_path, broker=self.broker)
                     self.mcu = temp_mcu.__enter__()
+                    self.mcu_temporal = self.mcu
                     self.core = getattr(self.mcu, 'core', None)
                     self.session = getattr(self.mcu, 'session', None)
                 except Exception as e:
-                    print(f"[ERROR] No se pudo abrir sesión principal para RAM: {e}")
-                    self.no_inyectadas += 1
-                    self.errores_bp += 1
-                    return
+                    raise EnlacePerdido(f"No se pudo abrir sesión principal para RAM: {e}") from e
             try:
                 self.core.set_breakpoint(self.stop_address, self.core.BreakpointType.HW)
             except Exception as e:
                 print(f"[WARNING] No se pudo establecer bp stop: {e}")
-            return self._inj_memoria(falla, 256, delay)
+            return self._inj_memoria(falla, self.politica.ventana('ram'), delay)
 
         else:
             print(f"[WARNING] Inyección no realizada en {ubic} {falla.ubicacion}")
@@ -493,6 +701,9 @@ class FaultInjector:
         print(f"[INFO] Tipo de falla: {falla.tipo}")
         print(f"[INFO] Ubicación: {falla.ubicacion}")
 
+        # imagen GOLDEN de la RAM antes de la primera falla (política ram_completa)
+        self.preparar_ram_gold()
+
         # para RAM/registro se permite reset_and_halt (si procede)
         try:
             if falla.ubicacion and falla.ubicacion.lower() in ['ram', 'registro']:
@@ -584,16 +795,11 @@ class FaultInjector:
                 if pc == bp_addr:
                     # snapshot before
                     print(hex(self.core.read_core_register('pc')))
-                    reg_pre = self.snapshot_registros()
-                    mem_pre = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                    if len(mem_pre) == 0:
-                        mem_pre = [0]
+                    mem_pre = self.capturar('before', falla, tamano_bytes)
                     try:
                         valor_original = int(mem_pre[0])
                     except Exception:
                         valor_original = 0
-                    snap_pre = self.construir_snapshot_dict(reg_pre, mem_pre)
-                    self.guardar_snapshot('before', falla.id_falla, falla.id_falla, snap_pre)
 
                     # aplicar falla
                     print("[INFO] Aplicando falla...")
@@ -612,31 +818,10 @@ class FaultInjector:
                         self.no_lectura += 1
 
                     # snapshot after
-                    reg_post = self.snapshot_registros()
-                    mem_post = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                    if len(mem_post) == 0:
-                        mem_post = [0]
-                    snap_post = self.construir_snapshot_dict(reg_post, mem_post)
-                    self.guardar_snapshot('after', falla.id_falla, falla.id_falla, snap_post)
+                    self.capturar('after', falla, tamano_bytes)
 
                     # Clasificación NASA-STYLE
-                    if valor_con_falla is None:
-                        estado = "NO_INYECTADA_APLICANDO"
-                        self.errores_bp += 1
-                    elif valor_leido is None:
-                        estado = "NO_LEIDO"
-                        self.no_leido += 1
-                    else:
-                        try:
-                            if int(valor_leido) != int(valor_con_falla):
-                                estado = "NO_ESCRITA"
-                                self.no_escritas += 1
-                            else:
-                                estado = "OK"
-                                self.ok += 1
-                        except Exception:
-                            estado = "NO_LEIDO"
-                            self.no_leido += 1
+                    estado = self.clasificar_aplicacion(valor_con_falla, valor_leido)
 
                     try:
                         self.log_falla(falla, valor_original, valor_con_falla, valor_leido, estado)
@@ -679,12 +864,7 @@ class FaultInjector:
                             if pc_final == self.stop_address:
 
                                 print(f"[✅] Falla ID {falla.id_falla} COMPLETADA y llegó al stop_address.")
-                                reg_st = self.snapshot_registros()
-                                mem_st = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                                if len(mem_st) == 0:
-                                    mem_st = [0]
-                                snap_st = self.construir_snapshot_dict(reg_st, mem_st)
-                                self.guardar_snapshot('after_stable', falla.id_falla, falla.id_falla, snap_st)
+                                self.capturar('after_stable', falla, tamano_bytes)
 
                                 try:
                                     self.core.reset_and_halt()
@@ -807,16 +987,11 @@ class FaultInjector:
                 # --- Caso 1: llegó al breakpoint temporal (inyectar falla) ---
                 if pc == bp_addr:
                     # snapshot before
-                    reg_pre = self.snapshot_registros()
-                    mem_pre = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                    if len(mem_pre) == 0:
-                        mem_pre = [0]
+                    mem_pre = self.capturar('before', falla, tamano_bytes)
                     try:
                         valor_original = int(mem_pre[0])
                     except Exception:
                         valor_original = 0
-                    snap_pre = self.construir_snapshot_dict(reg_pre, mem_pre)
-                    self.guardar_snapshot('before', falla.id_falla, falla.id_falla, snap_pre)
 
                     # aplicar falla
                     print("[INFO] Aplicando falla...")
@@ -829,31 +1004,10 @@ class FaultInjector:
                         self.no_lectura += 1
 
                     # snapshot after
-                    reg_post = self.snapshot_registros()
-                    mem_post = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                    if len(mem_post) == 0:
-                        mem_post = [0]
-                    snap_post = self.construir_snapshot_dict(reg_post, mem_post)
-                    self.guardar_snapshot('after', falla.id_falla, falla.id_falla, snap_post)
+                    self.capturar('after', falla, tamano_bytes)
 
                     # Clasificación NASA-STYLE
-                    if valor_con_falla is None:
-                        estado = "NO_INYECTADA_APLICANDO"
-                        self.errores_bp += 1
-                    elif valor_leido is None:
-                        estado = "NO_LEIDO"
-                        self.no_leido += 1
-                    else:
-                        try:
-                            if int(valor_leido) != int(valor_con_falla):
-                                estado = "NO_ESCRITA"
-                                self.no_escritas += 1
-                            else:
-                                estado = "OK"
-                                self.ok += 1
-                        except Exception:
-                            estado = "NO_LEIDO"
-                            self.no_leido += 1
+                    estado = self.clasificar_aplicacion(valor_con_falla, valor_leido)
 
                     try:
                         self.log_falla(falla, valor_original, valor_con_falla, valor_leido, estado)
@@ -904,12 +1058,7 @@ class FaultInjector:
 
                             if pc_final == self.stop_address_flash:
                                 print(f"[✅] Falla FLASH {falla.id_falla} COMPLETADA y llegó al stop_address en {hex(pc_final)}")
-                                reg_st = self.snapshot_registros()
-                                mem_st = self.snapshot_memoria_bloque(falla.direccion_inyeccion, tamano_bytes)
-                                if len(mem_st) == 0:
-                                    mem_st = [0]
-                                snap_st = self.construir_snapshot_dict(reg_st, mem_st)
-                                self.guardar_snapshot('after_stable', falla.id_falla, falla.id_falla, snap_st)
+                                self.capturar('after_stable', falla, tamano_bytes)
 
                                 try:
                                     self.core.reset_and_halt()
@@ -940,17 +1089,72 @@ class FaultInjector:
     # ---------- ejecutar campaña ----------
     def ejecutar(self):
         print("[INFO] ================= INICIANDO CAMPAÑA =================")
-        self.tiempo_total_inicio = time.time()
+        # Al reanudar, el tiempo ya invertido se suma al de esta ejecución
+        self.tiempo_total_inicio = time.time() - self.segundos_previos
 
-        total_fallas = len(self.lista_fallas)
-        for falla in self.lista_fallas:
+        try:
             try:
-                self.inject(falla)
+                for falla in self.lista_fallas:
+                    if falla.id_falla in self.completadas:
+                        continue
+                    contadores = self.copiar_contadores()
+                    try:
+                        self.inject(falla)
+                    except EnlacePerdido as e:
+                        # No se registra en el diario: reanudar_campania la vuelve a intentar
+                        self.restaurar_contadores(contadores)
+                        print(f"[ERROR] {e}")
+                        self.obtener_escritor().checkpoint()
+                        print(f"[ERROR] Se perdió la conexión con la sonda en la falla {falla.id_falla}. "
+                              f"Campaña detenida; para continuar: "
+                              f"FaultInjector.reanudar_campania(r'{self.campaign_dir}', ...)")
+                        break
+                    except ErrorEscritura:
+                        raise
+                    except Exception as e:
+                        print(f"[ERROR] Error inyectando falla {falla.id_falla}: {e}")
+                        # continuar con la siguiente falla (no se marca como terminada y sus
+                        # contadores no pasan a la línea de diario de la siguiente)
+                        self.restaurar_contadores(contadores)
+                        self.obtener_escritor().checkpoint()
+                    else:
+                        if self.enlace_activo():
+                            # flush + fsync en el hilo escritor; no bloquea la siguiente falla
+                            self.registrar_completada(falla)
+                            continue
+                        self.restaurar_contadores(contadores)
+                    if not self.enlace_activo():
+                        print(f"[ERROR] Se perdió la conexión con la sonda en la falla {falla.id_falla}. "
+                              f"Campaña detenida; para continuar: "
+                              f"FaultInjector.reanudar_campania(r'{self.campaign_dir}', ...)")
+                        break
+            except ErrorEscritura as e:
+                # Filas que no llegaron a disco: se para sin registrar más fallas en el diario
+                print(f"[ERROR] {e}. Campaña detenida; para continuar: "
+                      f"FaultInjector.reanudar_campania(r'{self.campaign_dir}', ...)")
+        finally:
+            self.cerrar_escritor()
+            self.cerrar_sesion_temporal()
+        self.reportar()
+        catalogar(self.campaign_dir)
+
+    def cerrar_sesion_temporal(self):
+        """Cierra la sesión que inject() abrió por su cuenta (libera la sonda o el arriendo del broker)."""
+        if self.mcu_temporal is not None:
+            try:
+                self.mcu_temporal.__exit__(None, None, None)
             except Exception as e:
-                print(f"[ERROR] Error inyectando falla {falla.id_falla}: {e}")
-                # continuar con la siguiente falla
+                print(f"[WARNING] No se pudo cerrar la sesión temporal: {e}")
+            if self.mcu is self.mcu_temporal:
+                self.mcu = None
+                self.core = None
+                self.session = None
+            self.mcu_temporal = None
 
+    def reportar(self):
+        """Imprime el reporte NASA-style y guarda resumen.txt en la carpeta de campaña."""
         tiempo_total = time.time() - self.tiempo_total_inicio
+        total_fallas = len(self.lista_fallas)
         fallas_no_iny = self.no_inyectadas
         fallas_no_escritas = self.no_inyectadas_valor_no_escrito
         errores_lectura = self.no_lectura
@@ -1016,7 +1220,7 @@ def main_example():
 
     # Abrir sesión principal (opcional — útil para fallas en RAM/registro)
     try:
-        with MCU(opts, elf_main) as mcu:
+        with abrir_mcu(opts, elf_main) as mcu:
             injector = FaultInjector(mcu=mcu, csv_file=csv_file, elf_main_path=elf_main, elf_ram_path=elf_ram, main_opts=opts)
             # Alternativamente la GUI podría llamar:
             # injector.cargar_elves_desde_gui(elf_main, elf_ram)